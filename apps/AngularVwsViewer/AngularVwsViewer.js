@@ -34,6 +34,12 @@ var SESSION_COMMAND_OPEN = 'open';
 var SESSION_COMMAND_SCHEDULE = 'schedule';
 var SESSION_COMMAND_IMAGEFEED = 'imagefeed';
 var SESSION_COMMAND_STATUS = 'status';
+var SESSION_COMMAND_WATCH = 'watch';
+
+// Maximum time the server holds a status watch request (in seconds)
+var STATUS_WATCH_WAIT = 30;
+// Delay before watching the status again after a failed request (in milliseconds)
+var STATUS_WATCH_RETRY_DELAY = 2000;
 
 var DEFAULT_URI = ''
 
@@ -106,14 +112,21 @@ app.controller('vwsController', function($scope, $attrs){
         oReq.send(bodyStr);
         oReq.onload = function() {
             if (oReq.readyState == XMLHttpRequest.DONE) {
-                if( command==='status' ) {
-                    // The status of the remote rendering resource has been fetched.
-                    // {{status}} can be populated accordingly
-                    var obj = JSON.parse(oReq.response);
-                    $scope.currentStatus = obj.code;
-                    $scope.$apply(function() {
-                        $scope.status = obj.description;
-                    });
+                if( command.indexOf(SESSION_COMMAND_WATCH)===0 ) {
+                    // The status of the remote rendering resource has changed, or the watch
+                    // request timed out. {{status}} can be populated accordingly and the status
+                    // is watched again
+                    if( oReq.status===200 ) {
+                        var obj = JSON.parse(oReq.response);
+                        $scope.currentStatus = obj.code;
+                        $scope.$apply(function() {
+                            $scope.status = obj.description;
+                        });
+                        watchStatus();
+                    }
+                    else {
+                        setTimeout(watchStatus, STATUS_WATCH_RETRY_DELAY);
+                    }
                 }
                 else if( command===SESSION_COMMAND_IMAGEFEED ) {
                     // The URI of the image streamer has been fetched. {{imagefeeduri}} can be
@@ -161,12 +174,16 @@ app.controller('vwsController', function($scope, $attrs){
     }
 
     /**
-     * Starts a timer that queries the remote rendering resource status and update the local
-     * 'currentStatus' member variable. The result of the query populates {{status}}
+     * Waits for the next change of the remote rendering resource status and updates the local
+     * 'currentStatus' member variable. The server only answers when the status differs from
+     * 'currentStatus', or after STATUS_WATCH_WAIT seconds. The result of the query populates
+     * {{status}}
      */
-    var statusQuery = setInterval(function () {
-        doRequest(REST_VERB_GET, MODULE_SESSION, SESSION_COMMAND_STATUS);
-    }, 2000);
+    function watchStatus() {
+        doRequest(REST_VERB_GET, MODULE_SESSION, SESSION_COMMAND_WATCH +
+            '?wait=' + STATUS_WATCH_WAIT + '&since=' + $scope.currentStatus);
+    }
+    watchStatus();
 
     // Create a session on the Rendering Resource Manager and initiates the process of starting
     // the remote rendering resource
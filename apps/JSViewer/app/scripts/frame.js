@@ -32,9 +32,12 @@ var SESSION_STATUS_STOPPING = 4;
 
 // Variables
 var secondsBeforeStartSession = 1; // sec
+var statusWatchWait = 30; // sec
+var statusWatchRetryDelay = 2; // sec
 var vocabularyRetrieved = 0;
 var sessionStatus = SESSION_STATUS_STOPPED;
 var firstImageRetrieved = false;
+var frameSequence = null;
 var rendering = false;
 var container;
 var camera, controls;
@@ -65,26 +68,54 @@ function doRequest(method, url, callback, body) {
     return oReq.response
 }
 
+/*
+ * Fetches the latest frame of the rendering resource as a raw image, and displays it once
+ * loaded. The URL of the previous frame is released to free the corresponding memory.
+ */
 function getImage() {
     if (sessionStatus === SESSION_STATUS_RUNNING) {
-        doRequest('GET', serviceUrl + '/session/IMAGEJPEG', function (event) {
+        var oReq = new XMLHttpRequest();
+        oReq.onload = function (event) {
             if (event.target.status === 200) {
-                var jsonObject = JSON.parse(event.target.responseText);
-                renderedImage.src = "data:image/jpg;base64," + jsonObject["data"];
+                // Frames are shared with the other viewers of the session, and unchanged
+                // frames are not displayed again
+                var sequence = event.target.getResponseHeader('X-Frame-Sequence');
+                if (sequence !== null && sequence === frameSequence) {
+                    return;
+                }
+                frameSequence = sequence;
+                var previousSrc = renderedImage.src;
+                renderedImage.src = URL.createObjectURL(event.target.response);
+                if (previousSrc.indexOf('blob:') === 0) {
+                    URL.revokeObjectURL(previousSrc);
+                }
                 var frame = parent.document.getElementById('mainFrame');
                 renderedImage.height = frame.clientHeight * 0.95;
                 renderedImage.width = frame.clientHeight * 16 / 9 * 0.95;
                 firstImageRetrieved = true;
             } else {
                 var sessionStatusControl = parent.document.getElementById('sessionstatus');
-                sessionStatusControl.innerHTML = event.target.responseText;
+                var reader = new FileReader();
+                reader.onload = function () {
+                    sessionStatusControl.innerHTML = reader.result;
+                };
+                reader.readAsText(event.target.response);
             }
-        });
+        };
+        oReq.withCredentials = true;
+        oReq.open('GET', serviceUrl + '/session/image', true);
+        oReq.responseType = 'blob';
+        oReq.send();
     }
 }
 
-var statusQuery = setInterval(function () {
-    doRequest('GET', serviceUrl + '/session/status', function (event) {
+/*
+ * Waits for the next change of the session status. The server only answers when the status
+ * differs from sessionStatus, or after statusWatchWait seconds, and the status is then watched
+ * again.
+ */
+function watchStatus() {
+    doRequest('GET', serviceUrl + '/session/watch?wait=' + statusWatchWait + '&since=' + sessionStatus, function (event) {
         var sessionStatusControl = parent.document.getElementById('sessionstatus');
         sessionStatusControl.innerHTML = event.target.responseText;
         if (event.target.status === 200) {
@@ -120,15 +151,42 @@ var statusQuery = setInterval(function () {
                     }
                 }
             }
+            watchStatus();
+        } else {
+            setTimeout(watchStatus, statusWatchRetryDelay * 1000);
         }
     });
+}
 
-    doRequest('GET', serviceUrl + '/session/log', function (event) {
+// Logs are retrieved in the background by the resource manager. The task is queued on one
+// cycle, and its result is displayed on the following ones. Only the bytes written since the
+// previous retrieval are requested, and appended to the displayed log
+var logTaskId = null;
+var logOffset = 0;
+var logQuery = setInterval(function () {
+    var url = serviceUrl + '/session/log?offset=' + logOffset;
+    if (logTaskId !== null) {
+        url = serviceUrl + '/session/task?task_id=' + logTaskId;
+    }
+    doRequest('GET', url, function (event) {
+        if (event.target.status === 202) {
+            var task = JSON.parse(event.target.responseText);
+            logTaskId = task.task_id || logTaskId;
+            return;
+        }
+        logTaskId = null;
         if (event.target.status === 200) {
             var span = parent.document.getElementById('renderingresourceidlog');
-            var response = event.target.responseText;
-            response = response.replace(/[\n\r]/g, '<br/>');
-            span.innerHTML = response;
+            var response = JSON.parse(event.target.responseText);
+            if (response.offset === logOffset) {
+                return;
+            }
+            if (response.offset < logOffset) {
+                // The log was truncated and is displayed again from its beginning
+                span.innerHTML = '';
+            }
+            logOffset = response.offset;
+            span.innerHTML += response.contents.replace(/[\n\r]/g, '<br/>');
             span.className = 'show';
         }
     });
@@ -240,7 +298,8 @@ function startRenderer(event) {
         };
 
         doRequest('PUT', serviceUrl + '/session/schedule', function (eventSchedule) {
-            if (eventSchedule.target.status === 200) {
+            // The rendering resource is either assigned from the warm pool, or scheduled
+            if (eventSchedule.target.status === 200 || eventSchedule.target.status === 202) {
                 setTimeout(init, secondsBeforeStartSession * 1000);
             } else {
                 var sessionStatusControl = parent.document.getElementById('sessionstatus');
@@ -364,5 +423,7 @@ deleteSession(function () {
     // 2nd create a new one
     var span = parent.document.getElementById('renderingresourceidlog');
     span.innerHTML = '';
+    logOffset = 0;
     createSession(startRenderer);
+    watchStatus();
 });
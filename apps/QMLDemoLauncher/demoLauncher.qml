@@ -96,8 +96,8 @@ Item {
                     onClicked: {
                         view.currentIndex = index
                         Utils.launch(demo)
-                        timer.interval = 2000;
-                        timer.repeat = true;
+                        timer.interval = 1;
+                        timer.repeat = false;
                         timer.start();
                     }
                 }
@@ -122,6 +122,10 @@ Item {
             spacing: 5
             Component.onCompleted: {
                 Utils.internalQmlObject.statusSignal.connect(updateStatusBox);
+                Utils.internalQmlObject.watchSignal.connect(function(delay) {
+                    timer.interval = Math.max(delay, 1);
+                    timer.start();
+                });
             }
         }
 
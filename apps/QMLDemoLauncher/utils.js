@@ -19,13 +19,16 @@
  */
 
 // Variables
-var internalQmlObject = Qt.createQmlObject('import QtQuick 2.0; QtObject { signal statusSignal(string value) }', Qt.application, 'InternalQmlObject');
+var internalQmlObject = Qt.createQmlObject('import QtQuick 2.0; QtObject { signal statusSignal(string value); signal watchSignal(int delay) }', Qt.application, 'InternalQmlObject');
 var serviceUrl = 'https://visualization-dev.humanbrainproject.eu/viz/rendering-resource-manager/v1';
 var connected = false;
 var STATUS_NONE = 0;
 var STATUS_SESSION_CREATED = 1;
 var STATUS_SESSION_RUNNING = 2;
 var currentStatus = STATUS_NONE;
+var sessionStatusCode = 0;
+var STATUS_WATCH_WAIT = 30;
+var STATUS_WATCH_RETRY_DELAY = 2000;
 
 var openSessionParams = {
     owner: 'bbpdemolauncher',
@@ -69,6 +72,8 @@ function startRenderer(){
     doRequest('PUT', serviceUrl + '/session/schedule',  rendererParams);
 }
 
+// Waits for the next change of the session status. Once the server answers, watchSignal tells
+// the caller how long to wait before watching the status again
 function updateStatus(){
     var oReq = new XMLHttpRequest();
     oReq.withCredentials = true;
@@ -76,15 +81,19 @@ function updateStatus(){
         if (oReq.readyState == 4 ) {
             var sig;
             try {
-                sig = JSON.parse(oReq.responseText).description
+                var obj = JSON.parse(oReq.responseText);
+                sig = obj.description;
+                sessionStatusCode = obj.code;
             }
             catch(err) {
                 sig = oReq.responseText
             }
             internalQmlObject.statusSignal(sig);
+            internalQmlObject.watchSignal(oReq.status == 200 ? 0 : STATUS_WATCH_RETRY_DELAY);
         }
     }
-    oReq.open('GET', serviceUrl + '/session/status', true);
+    oReq.open('GET', serviceUrl + '/session/watch?wait=' + STATUS_WATCH_WAIT +
+              '&since=' + sessionStatusCode, true);
     oReq.setRequestHeader('HBP', openSessionParams.configuration_id);
     oReq.send();
 }
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# pylint: disable=R0801
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+"""gateway.py"""
+import sys
+
+# Sockets, threads and sleeps must be made cooperative before any other module is imported
+from gevent import monkey
+monkey.patch_all()
+
+# pylint: disable=C0413
+from rendering_resource_manager_service.service import gateway
+
+gateway.main(sys.argv[1:])
@@ -29,11 +29,14 @@ This modules defines the data structure used by the rendering resource manager t
 user session
 """
 
+import json
+
 from rest_framework import serializers, viewsets
 from django.http import HttpResponse
 from rendering_resource_manager_service import utils as consts
 from rendering_resource_manager_service.session.models import Session
 import rendering_resource_manager_service.session.management.session_manager as session_manager
+from rendering_resource_manager_service.session.management import frontend_health
 
 
 class AdminSerializer(serializers.ModelSerializer):
@@ -84,3 +87,13 @@ class AdminViewSet(viewsets.ModelViewSet):
             return HttpResponse(status=status[0], content=status[1])
         else:
             return HttpResponse(status=401, content=command + ' is an invalid command')
+
+    @classmethod
+    def frontend_health(cls, request):
+        """
+        Returns the health of the Slurm cluster nodes
+        :param : request: The REST request
+        :rtype : A Json response containing the score and circuit state of each cluster node
+        """
+        response = json.dumps(frontend_health.globalFrontendHealth.scores())
+        return HttpResponse(status=200, content=response, content_type='application/json')
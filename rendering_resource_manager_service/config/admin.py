@@ -38,7 +38,8 @@ class RenderingResourceSettingsAdmin(admin.ModelAdmin):
     fields = ['id', 'command_line', 'environment_variables', 'modules',
               'process_rest_parameters_format', 'scheduler_rest_parameters_format',
               'project', 'queue', 'exclusive', 'nb_nodes', 'nb_cpus', 'nb_gpus', 'memory',
-              'graceful_exit', 'wait_until_running', 'name', 'description']
+              'graceful_exit', 'wait_until_running', 'streaming_proxy',
+              'warm_pool_size', 'warm_pool_max_idle', 'backend', 'name', 'description']
 
 try:
     admin.site.unregister(RenderingResourceSettings)
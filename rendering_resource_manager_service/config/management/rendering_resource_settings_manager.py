@@ -35,6 +35,7 @@ import rest_framework.status as http_status
 from django.db import IntegrityError, transaction
 from rest_framework.renderers import JSONRenderer
 import json
+from rendering_resource_manager_service.session.management import job_manager
 
 
 class RenderingResourceSettingsManager(object):
@@ -66,9 +67,16 @@ class RenderingResourceSettingsManager(object):
                 memory=params['memory'],
                 graceful_exit=params['graceful_exit'],
                 wait_until_running=params['wait_until_running'],
+                streaming_proxy=params.get('streaming_proxy', False),
+                warm_pool_size=params.get('warm_pool_size', 0),
+                warm_pool_max_idle=params.get('warm_pool_max_idle', 600),
+                backend=str(params.get('backend', '')).upper(),
                 name=params['name'],
                 description=params['description']
             )
+            status = cls.__validate(settings)
+            if status is not None:
+                return status
             with transaction.atomic():
                 settings.save(force_insert=True)
             msg = 'Rendering Resource ' + settings_id + ' successfully configured'
@@ -79,6 +87,24 @@ class RenderingResourceSettingsManager(object):
             response = json.dumps({'contents': str(e)})
             return [http_status.HTTP_409_CONFLICT, response]
 
+    @staticmethod
+    def __validate(settings):
+        """
+        Checks that a rendering resource config can be used with its backend. Warm pools are
+        not supported by backends authenticating with the token of the user, since warm
+        rendering resources are allocated before any user requests them
+        :param settings: Rendering resource config
+        :return: An HTTP status describing the error, or None if the config is valid
+        """
+        backend = job_manager.configuration_backend(settings)
+        if settings.warm_pool_size > 0 and job_manager.requires_user_token(backend):
+            msg = 'warm_pool_size is not supported by the ' + backend + \
+                  ' backend, which needs the token of the user'
+            log.error(msg)
+            response = json.dumps({'contents': msg})
+            return [http_status.HTTP_400_BAD_REQUEST, response]
+        return None
+
     @classmethod
     def update(cls, params):
         """
@@ -102,8 +128,16 @@ class RenderingResourceSettingsManager(object):
             settings.memory = params['memory']
             settings.graceful_exit = params['graceful_exit']
             settings.wait_until_running = params['wait_until_running']
+            settings.streaming_proxy = params.get('streaming_proxy', settings.streaming_proxy)
+            settings.warm_pool_size = params.get('warm_pool_size', settings.warm_pool_size)
+            settings.warm_pool_max_idle = \
+                params.get('warm_pool_max_idle', settings.warm_pool_max_idle)
+            settings.backend = str(params.get('backend', settings.backend)).upper()
             settings.name = params['name']
             settings.description = params['description']
+            status = cls.__validate(settings)
+            if status is not None:
+                return status
             with transaction.atomic():
                 settings.save()
             return [http_status.HTTP_200_OK, '']
@@ -48,6 +48,10 @@ class RenderingResourceSettings(models.Model):
     memory = models.IntegerField(default=0)
     graceful_exit = models.BooleanField(default=True)
     wait_until_running = models.BooleanField(default=True)
+    streaming_proxy = models.BooleanField(default=False)
+    warm_pool_size = models.IntegerField(default=0)
+    warm_pool_max_idle = models.IntegerField(default=600)
+    backend = models.CharField(max_length=50, default='')
     name = models.CharField(max_length=4096, default='')
     description = models.CharField(max_length=4096, default='')
 
@@ -63,7 +67,8 @@ class RenderingResourceSettings(models.Model):
             'scheduler_rest_parameters_format',
             'project', 'queue', 'exclusive',
             'nb_nodes', 'nb_cpus', 'nb_gpus', 'memory',
-            'graceful_exit', 'wait_until_running',
+            'graceful_exit', 'wait_until_running', 'streaming_proxy',
+            'warm_pool_size', 'warm_pool_max_idle', 'backend',
             'name', 'description')
 
     def __str__(self):
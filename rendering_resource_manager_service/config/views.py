@@ -57,7 +57,8 @@ class RenderingResourceSettingsSerializer(serializers.ModelSerializer):
                   'scheduler_rest_parameters_format',
                   'project', 'queue', 'exclusive',
                   'nb_nodes', 'nb_cpus', 'nb_gpus', 'memory',
-                  'graceful_exit', 'wait_until_running',
+                  'graceful_exit', 'wait_until_running', 'streaming_proxy',
+                  'warm_pool_size', 'warm_pool_max_idle', 'backend',
                   'name', 'description')
 
 
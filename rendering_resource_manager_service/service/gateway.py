@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+# pylint: disable=C0413
+
+"""
+Gateway entry point serving the application with gevent.
+
+Every request is handled by a greenlet, and socket operations (commands forwarded to the
+rendering resources, status probes, long-polls and event streams) yield to the other requests
+instead of blocking a worker for up to REQUEST_TIMEOUT. A single process can therefore serve
+thousands of concurrent interactive clients, while sharing the session database with the
+Django application. The gateway also upgrades WebSocket connections, which are tunnelled to
+the rendering resources (see session/management/websocket_tunnel.py). gevent and the WebSocket
+libraries are optional dependencies, installed with the 'gateway' extra.
+
+Sockets, threads and sleeps are made cooperative by the gateway.py launcher, or when this module
+is executed, before any other module is imported. Importing this module has no side effect.
+"""
+
+if __name__ == '__main__':
+    from gevent import monkey
+    monkey.patch_all()
+
+import os
+import sys
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                      'rendering_resource_manager_service.service.settings')
+
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+from geventwebsocket.handler import WebSocketHandler
+
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.utils.custom_logging as log
+from rendering_resource_manager_service.session.management import websocket_tunnel
+
+
+def create_server(address, port, application):
+    """
+    Creates the gateway server, which is not started
+    :param address: Address on which the gateway listens
+    :param port: Port on which the gateway listens
+    :param application: WSGI application served by the gateway
+    :return: The gevent WSGI server
+    """
+    pool = Pool(settings.GATEWAY_MAX_CONNECTIONS)
+    return WSGIServer(
+        (address, port), websocket_tunnel.WebSocketTunnelMiddleware(application),
+        spawn=pool, handler_class=WebSocketHandler, log=None)
+
+
+def serve(address, port):
+    """
+    Serves the application until the process is interrupted
+    :param address: Address on which the gateway listens
+    :param port: Port on which the gateway listens
+    """
+    # Importing the WSGI application also starts the keep-alive and liveness prober threads
+    from rendering_resource_manager_service.service.wsgi import application
+    server = create_server(address, port, application)
+    log.info(1, 'Gateway listening on ' + address + ':' + str(port))
+    server.serve_forever()
+
+
+def main(args):
+    """
+    Starts the gateway
+    :param args: Optional address and port, given as 'address:port' or 'port'
+    """
+    address = settings.GATEWAY_ADDRESS
+    port = settings.GATEWAY_PORT
+    if len(args) > 0:
+        if ':' in args[0]:
+            address, port = args[0].rsplit(':', 1)
+        else:
+            port = args[0]
+    serve(address, int(port))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
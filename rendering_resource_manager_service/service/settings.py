@@ -175,7 +175,16 @@ sys.path.append(BASE_DIR + '/rendering_resource_manager_service')
 # Job allocator
 RESOURCE_ALLOCATOR_SLURM = 'SLURM'
 RESOURCE_ALLOCATOR_UNICORE = 'UNICORE'
+RESOURCE_ALLOCATOR_SLURM_REST = 'SLURM_REST'
+RESOURCE_ALLOCATOR_NODE_AGENT = 'NODE_AGENT'
 RESOURCE_ALLOCATOR = RESOURCE_ALLOCATOR_UNICORE
+# Additional backends that configurations (or schedule requests) can select with their
+# 'backend' attribute. Configurations without a backend use RESOURCE_ALLOCATOR
+RESOURCE_ALLOCATORS = []
+
+# Maximum number of simultaneous requests sent to a Slurm cluster node or a Unicore site by
+# the job manager. 0 means unbounded
+SCHEDULER_MAX_REQUESTS_PER_CLUSTER = 0
 
 # Slurm (To be modified by deployment process)
 SLURM_USERNAME = 'TO_BE_MODIFIED'
@@ -185,6 +194,45 @@ SLURM_HOSTS = ['TO_BE_MODIFIED']
 SLURM_DEFAULT_QUEUE = 'TO_BE_MODIFIED'
 SLURM_DEFAULT_TIME = 'TO_BE_MODIFIED'
 
+# Allocation mode: either try the Slurm hosts one after the other, or submit the allocation to
+# all of them at the same time and keep the first granted job
+SLURM_ALLOCATION_MODE_SEQUENTIAL = 'sequential'
+SLURM_ALLOCATION_MODE_CONCURRENT = 'concurrent'
+SLURM_ALLOCATION_MODE = SLURM_ALLOCATION_MODE_SEQUENTIAL
+
+# Cluster nodes are tried in order of health. A cluster node failing
+# SLURM_FRONTEND_FAILURE_THRESHOLD times in a row is skipped for SLURM_FRONTEND_COOLDOWN seconds
+SLURM_FRONTEND_FAILURE_THRESHOLD = 3
+SLURM_FRONTEND_COOLDOWN = 300
+
+# Launch mode: either allocate a job and launch the rendering resource with srun, or submit a
+# job script with sbatch. In batch mode, rendering resources report their hostname to the
+# service, which must be reachable from the compute nodes at SLURM_CALLBACK_URL (for example
+# http://<host>:<port>/rendering-resource-manager/v1)
+SLURM_LAUNCH_MODE_INTERACTIVE = 'interactive'
+SLURM_LAUNCH_MODE_BATCH = 'batch'
+SLURM_LAUNCH_MODE = SLURM_LAUNCH_MODE_INTERACTIVE
+SLURM_CALLBACK_URL = 'TO_BE_MODIFIED'
+
+# Persistent SSH connections to the Slurm cluster nodes
+SLURM_SSH_BINARY = '/usr/bin/ssh'
+SLURM_SSH_CONTROL_DIR = '/tmp/rrm_ssh'
+SLURM_SSH_CONNECT_TIMEOUT = 10
+
+# Slurm REST API (To be modified by deployment process). Jobs are submitted to slurmrestd at
+# SLURM_REST_URL (for example http://<host>:6820), authenticated with a JSON web token. The log
+# files of the rendering resources are read through the first of the SLURM_HOSTS
+SLURM_REST_URL = 'TO_BE_MODIFIED'
+SLURM_REST_API_VERSION = 'v0.0.38'
+SLURM_REST_USERNAME = 'TO_BE_MODIFIED'
+SLURM_REST_TOKEN = 'TO_BE_MODIFIED'
+
+# Node agents (To be modified by deployment process). Rendering resources are launched by the
+# agents running on the rendering hosts (see utils/node_agent.py), given by their URL (for
+# example http://<host>:8765). NODE_AGENT_TOKEN must match the token of the agents
+NODE_AGENT_URLS = ['TO_BE_MODIFIED']
+NODE_AGENT_TOKEN = 'TO_BE_MODIFIED'
+
 # Unicore
 UNICORE_DEFAULT_REGISTRY_URL = 'TO_BE_MODIFIED'
 UNICORE_DEFAULT_SITE = 'TO_BE_MODIFIED'
@@ -193,6 +241,8 @@ UNICORE_DEFAULT_HTTP_PROXIES = {
     'ftp': 'TO_BE_MODIFIED',
     'https': 'TO_BE_MODIFIED',
 }
+# Verification of the certificates of the Unicore sites: True, False, or the path of a CA bundle
+UNICORE_SSL_VERIFY = True
 
 # ClientID needed by the HBP collab project browser
 SOCIAL_AUTH_HBP_KEY = 'TO_BE_MODIFIED'
@@ -201,6 +251,26 @@ SOCIAL_AUTH_HBP_KEY = 'TO_BE_MODIFIED'
 IMAGE_STREAMING_SERVICE_URL = 'TO_BE_MODIFIED'
 REQUEST_TIMEOUT = 5
 
+# Pool of persistent HTTP connections used for outbound requests
+HTTP_POOL_MAX_HOSTS = 256
+HTTP_POOL_CONNECTIONS_PER_HOST = 4
+HTTP_POOL_IDLE_TIMEOUT = 120
+
+# Asynchronous gateway (see service/gateway.py)
+GATEWAY_ADDRESS = '0.0.0.0'
+GATEWAY_PORT = 8080
+GATEWAY_MAX_CONNECTIONS = 10000
+
+# Number of threads running the background tasks (schedule, stop, log retrieval)
+TASK_QUEUE_WORKERS = 4
+
+# Local archive of the rendering resource logs, fetched when sessions are destroyed. The oldest
+# logs are deleted when the archive exceeds LOG_ARCHIVE_MAX_SIZE bytes, and only the last
+# LOG_ARCHIVE_MAX_FILE_SIZE bytes of each log are archived
+LOG_ARCHIVE_DIRECTORY = '/tmp/rrm_logs'
+LOG_ARCHIVE_MAX_SIZE = 256 * 1024 * 1024
+LOG_ARCHIVE_MAX_FILE_SIZE = 16 * 1024 * 1024
+
 try:
     from local_settings import * # pylint: disable=F0401,W0403,W0401,W0614
 except ImportError as e:
@@ -27,7 +27,7 @@ This modules allows integration of this application into the HBP collab
 
 from django.http import HttpResponse
 import json
-import requests
+import rendering_resource_manager_service.utils.http_pool as http_pool
 from rendering_resource_manager_service.service.settings import SOCIAL_AUTH_HBP_KEY
 
 HBP_ENV_URL = 'https://collab.humanbrainproject.eu/config.json'
@@ -37,7 +37,7 @@ HBP_ENV_URL = 'https://collab.humanbrainproject.eu/config.json'
 def config(request):
     '''Render the config file'''
 
-    r = requests.get(url=HBP_ENV_URL)
+    r = http_pool.get(url=HBP_ENV_URL)
     json_response = json.loads(r.text)
     r.close()
 
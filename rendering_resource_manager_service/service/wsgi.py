@@ -31,8 +31,16 @@ https://docs.djangoproject.com/en/1.7/howto/deployment/wsgi/
 """
 
 from django.core.wsgi import get_wsgi_application
+from rendering_resource_manager_service.session.management import agent_job_manager
+from rendering_resource_manager_service.session.management import job_manager
 from rendering_resource_manager_service.session.management import keep_alive_thread
+from rendering_resource_manager_service.session.management import liveness_prober
+from rendering_resource_manager_service.session.management import session_manager
+from rendering_resource_manager_service.session.management import slurm_job_watcher
+from rendering_resource_manager_service.session.management import task_queue
+from rendering_resource_manager_service.session.management import warm_pool
 from rendering_resource_manager_service.session.models import Session
+import rendering_resource_manager_service.service.settings as settings
 
 application = get_wsgi_application()
 
@@ -41,3 +49,39 @@ application = get_wsgi_application()
 thread = keep_alive_thread.KeepAliveThread(Session.objects)
 thread.setDaemon(True)  # This guaranties that the thread is destroyed when the main process ends
 thread.start()
+
+# Start liveness prober thread
+# pylint: disable=E1101
+prober_thread = liveness_prober.LivenessProberThread(
+    Session.objects, session_manager.SessionManager.probe_rendering_resource)
+prober_thread.setDaemon(True)
+prober_thread.start()
+
+# Start Slurm job watcher thread
+if settings.RESOURCE_ALLOCATOR_SLURM in job_manager.enabled_backends():
+    # pylint: disable=E1101
+    watcher_thread = slurm_job_watcher.SlurmJobWatcherThread(Session.objects)
+    watcher_thread.setDaemon(True)
+    watcher_thread.start()
+
+# Start node agent event watcher threads
+if settings.RESOURCE_ALLOCATOR_NODE_AGENT in job_manager.enabled_backends():
+    for agent in settings.NODE_AGENT_URLS:
+        # pylint: disable=E1101
+        agent_thread = agent_job_manager.AgentEventWatcherThread(Session.objects, agent)
+        agent_thread.setDaemon(True)
+        agent_thread.start()
+
+# Start task workers, and the thread recovering the tasks interrupted in any process
+heartbeat_thread = task_queue.TaskHeartbeatThread(task_queue.globalTaskQueue)
+heartbeat_thread.setDaemon(True)
+heartbeat_thread.start()
+for _ in range(settings.TASK_QUEUE_WORKERS):
+    worker_thread = task_queue.TaskWorkerThread(task_queue.globalTaskQueue)
+    worker_thread.setDaemon(True)
+    worker_thread.start()
+
+# Start warm pool thread
+pool_thread = warm_pool.WarmPoolThread(warm_pool.globalWarmPool)
+pool_thread.setDaemon(True)
+pool_thread.start()
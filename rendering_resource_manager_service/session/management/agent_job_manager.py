@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The agent job manager launches rendering resources through the node agents running on the
+rendering hosts (see utils/node_agent.py), without going through a scheduler. Sessions are
+placed on the agent with the most free slots, and the exit of their processes is reported by
+the agents.
+"""
+
+import json
+import threading
+import time
+import uuid
+
+import requests
+
+import rendering_resource_manager_service.session.management.session_manager_settings as settings
+from rendering_resource_manager_service.config.management import \
+    rendering_resource_settings_manager as manager
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.utils.node_agent as node_agent
+from rendering_resource_manager_service.session.management.job_locks import JobLocks
+from rendering_resource_manager_service.session.models import \
+    SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, SESSION_STATUS_BUSY, \
+    SESSION_STATUS_SCHEDULING, SESSION_STATUS_SCHEDULED, SESSION_STATUS_FAILED
+import rendering_resource_manager_service.service.settings as global_settings
+
+
+def agent_request(method, agent, path, data=None, timeout=None, **kwargs):
+    """
+    Sends a request to a node agent
+    :param method: HTTP verb
+    :param agent: URL of the agent
+    :param path: Path of the resource
+    :param data: Dictionary sent as the JSON body of the request
+    :param timeout: Timeout of the request, REQUEST_TIMEOUT if None (in seconds)
+    :param kwargs: Optional arguments passed to requests
+    :return: The HTTP code and the decoded JSON response
+    :raise requests.exceptions.RequestException: if the agent cannot be reached
+    :raise ValueError: if the response is not valid JSON
+    """
+    headers = {
+        'X-Agent-Token': global_settings.NODE_AGENT_TOKEN,
+        'Content-Type': 'application/json'
+    }
+    body = None if data is None else json.dumps(data)
+    response = http_pool.request(
+        method, agent + path, headers=headers, data=body,
+        timeout=timeout or global_settings.REQUEST_TIMEOUT, **kwargs)
+    return [response.status_code, response.json()]
+
+
+class AgentJobManager(object):
+    """
+    The job manager class provides methods for managing rendering resources with node agents
+    """
+
+    def __init__(self):
+        """
+        Setup job manager
+        """
+        self._locks = JobLocks(global_settings.SCHEDULER_MAX_REQUESTS_PER_CLUSTER)
+
+    def schedule(self, session, job_information, auth_token=None):
+        """
+        Launches the rendering resource on a node agent. If successful, the session job_id is
+        populated and the session status is set to SESSION_STATUS_STARTING
+        :param session: Current user session
+        :param job_information: Information about the job
+        :param auth_token: Not used by node agents
+        :return: A Json response containing on ok status or a description of the error
+        """
+        status = self.allocate(session, job_information)
+        if status[0] == 200:
+            status = self.start(session, job_information)
+        return status
+
+    def allocate(self, session, job_information):
+        """
+        Launches the rendering resource on the agent with the most free slots. Agents are tried
+        one after the other until one of them accepts the process. If successful, the session
+        job_id, cluster_node, http_host and http_port (chosen by the agent) are populated and
+        the session status is set to SESSION_STATUS_SCHEDULED
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
+        rr_settings = \
+            manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+        cpus = job_information.nb_cpus or rr_settings.nb_cpus
+        gpus = job_information.nb_gpus or rr_settings.nb_gpus
+        self._locks.lock_session(session.id)
+        try:
+            session.status = SESSION_STATUS_SCHEDULING
+            session.save()
+            status = [400, json.dumps({'contents': 'No node agent has enough free slots'})]
+            for agent, hostname in self._candidates(cpus, gpus):
+                process_id = uuid.uuid4().hex
+                description = {
+                    'id': process_id,
+                    'command': self._build_command(
+                        session, job_information, hostname, process_id),
+                    'cpus': cpus,
+                    'gpus': gpus
+                }
+                try:
+                    with self._locks.cluster(agent):
+                        code, response = agent_request('POST', agent, '/processes', description)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    code, response = [503, {'contents': str(e)}]
+                if code != 200:
+                    log.info(1, 'Node agent ' + agent + ' refused the process: ' +
+                             str(response.get('contents')))
+                    status = [400, json.dumps({'contents': str(response.get('contents'))})]
+                    continue
+                log.info(1, 'Launched process ' + process_id + ' on node agent ' + agent)
+                job_information.cluster_node = agent
+                session.cluster_node = agent
+                session.job_id = process_id
+                session.http_host = hostname
+                session.http_port = response['port']
+                session.status = SESSION_STATUS_SCHEDULED
+                session.save()
+                return [200, json.dumps({'message': 'Job scheduled', 'jobId': process_id})]
+            session.status = SESSION_STATUS_FAILED
+            session.save()
+            return status
+        finally:
+            self._locks.unlock_session(session.id)
+
+    @staticmethod
+    def _candidates(cpus, gpus):
+        """
+        Queries the slots of all agents
+        :param cpus: Number of CPUs needed by the rendering resource
+        :param gpus: Number of GPUs needed by the rendering resource
+        :return: The URL and hostname of the agents having enough free slots, the agents with
+                 the most free GPUs and CPUs first
+        """
+        candidates = list()
+        for index, agent in enumerate(global_settings.NODE_AGENT_URLS):
+            try:
+                code, slots = agent_request('GET', agent, '/slots')
+            except (requests.exceptions.RequestException, ValueError) as e:
+                log.error('Node agent ' + agent + ' cannot be reached: ' + str(e))
+                continue
+            if code != 200 or slots['free_cpus'] < cpus or slots['free_gpus'] < gpus:
+                continue
+            # The configuration order is kept between agents with the same free slots
+            candidates.append([-slots['free_gpus'], -slots['free_cpus'], index,
+                               agent, slots['hostname']])
+        return [[candidate[3], candidate[4]] for candidate in sorted(candidates)]
+
+    @staticmethod
+    def _build_command(session, job_information, hostname, process_id):
+        """
+        Builds the shell command loading the modules and launching the rendering resource
+        :param session: Current user session
+        :param job_information: Information about the job
+        :param hostname: Hostname of the rendering resource
+        :param process_id: Id of the process on the agent
+        :return: A string containing the command. The port of the rendering resource is chosen
+                 by the agent and given to the command in the RRM_PORT variable
+        """
+        rr_settings = \
+            manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+
+        commands = list()
+        if rr_settings.modules:
+            commands = ['source /etc/profile', 'module purge']
+            for module in rr_settings.modules.split():
+                commands.append('module load ' + module.strip())
+
+        variables = (rr_settings.environment_variables or '').split()
+        variables += (job_information.environment or '').split()
+        rest_parameters = manager.RenderingResourceSettingsManager.format_rest_parameters(
+            str(rr_settings.scheduler_rest_parameters_format),
+            str(hostname),
+            '${' + node_agent.PORT_VARIABLE + '}',
+            'rest' + str(rr_settings.id + session.id),
+            process_id)
+        parameters = rest_parameters.split() + (job_information.params or '').split()
+        commands.append(' '.join(variables + [rr_settings.command_line] + parameters))
+        return ' && '.join(commands)
+
+    def start(self, session, job_information):
+        """
+        The rendering resource is launched by the agent when it is allocated. If successful, the
+        session status is set to SESSION_STATUS_STARTING
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
+        rr_settings = \
+            manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+        if rr_settings.wait_until_running:
+            session.status = SESSION_STATUS_STARTING
+        else:
+            session.status = SESSION_STATUS_RUNNING
+        session.save()
+        response = json.dumps({'message': session.configuration_id + ' successfully started'})
+        return [200, response]
+
+    def stop(self, session):
+        """
+        Gently stops the rendering resource, and terminates its process
+        :param session: Current user session
+        :return: A Json response containing on ok status or a description of the error
+        """
+        self._locks.lock_session(session.id)
+        try:
+            # pylint: disable=E1101
+            setting = manager.RenderingResourceSettings.objects.get(id=session.configuration_id)
+            if setting.graceful_exit and session.http_host != '':
+                log.info(1, 'Gracefully exiting rendering resource')
+                try:
+                    url = 'http://' + session.http_host + ':' + str(session.http_port) + \
+                          '/' + settings.RR_SPECIFIC_COMMAND_EXIT
+                    http_pool.put(url=url, timeout=global_settings.REQUEST_TIMEOUT).close()
+                except requests.exceptions.RequestException as e:
+                    log.error(str(e))
+            return self.kill(session)
+        finally:
+            self._locks.unlock_session(session.id)
+
+    def kill(self, session):
+        """
+        Terminates the process of the rendering resource
+        :param session: Current user session
+        :return: A Json response containing on ok status or a description of the error
+        """
+        if not session.job_id:
+            return [500, 'Unexpected error']
+        try:
+            log.info(1, 'Stopping process ' + session.job_id)
+            with self._locks.cluster(session.cluster_node):
+                code, response = agent_request(
+                    'DELETE', session.cluster_node, '/processes/' + session.job_id)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(str(e))
+            return [400, json.dumps({'contents': str(e)})]
+        if code != 200:
+            return [400, json.dumps({'contents': str(response.get('contents'))})]
+        msg = 'Job successfully cancelled'
+        log.info(1, msg)
+        return [200, json.dumps({'contents': msg})]
+
+    def _process(self, session):
+        """
+        Queries the agent for the process of the given session
+        :param session: Current user session
+        :return: A dictionary describing the process, or None if it does not exist
+        """
+        if not session.job_id:
+            return None
+        try:
+            code, response = agent_request(
+                'GET', session.cluster_node, '/processes/' + session.job_id)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(str(e))
+            return None
+        return response if code == 200 else None
+
+    def hostname(self, session):
+        """
+        Retrieve the hostname of the agent running the rendering resource
+        :param session: Current user session
+        :return: The hostname of the agent if the process is running, FAILED if it exited, and
+                 empty otherwise
+        """
+        process = self._process(session)
+        if process is None:
+            return ''
+        if not process['running']:
+            return 'FAILED'
+        return process['hostname']
+
+    def job_information(self, session):
+        """
+        Returns information about the process
+        :param session: Current user session
+        :return: A string containing the description of the process returned by the agent
+        """
+        process = self._process(session)
+        return '' if process is None else json.dumps(process)
+
+    def rendering_resource_out_log(self, session, offset=0, length=None, tail=None):
+        """
+        Returns the contents of the rendering resource output
+        :param session: Current user session
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining log if None
+        :param tail: Number of lines to be returned from the end of the log. If specified,
+                     offset and length are ignored
+        :return: A string containing the output log, and the offset following the returned bytes
+        """
+        return self._rendering_resource_log(session, False, offset, length, tail)
+
+    def rendering_resource_err_log(self, session, offset=0, length=None, tail=None):
+        """
+        Returns the contents of the rendering resource error output
+        :param session: Current user session
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining log if None
+        :param tail: Number of lines to be returned from the end of the log. If specified,
+                     offset and length are ignored
+        :return: A string containing the error log, and the offset following the returned bytes
+        """
+        return self._rendering_resource_log(session, True, offset, length, tail)
+
+    def fetch_rendering_resource_log(self, session, err, max_size):
+        """
+        Returns the end of the rendering resource output or error, whatever the status of the
+        session. This is typically used to archive the logs when the session is destroyed
+        :param session: Current user session
+        :param err: True for the error log
+        :param max_size: Maximum number of bytes to be returned
+        :return: A string containing the end of the log, or None if it cannot be read
+        """
+        result = self._read_log(session, {'err': int(err), 'last': max_size})
+        return None if result is None else result[0]
+
+    def follow_rendering_resource_log(self, session, err=False):
+        """
+        Logs are followed with successive range requests to the agent (see
+        rendering_resource_out_log)
+        :param session: Current user session
+        :param err: True to follow the error log
+        :return: None
+        """
+        return None
+
+    def _rendering_resource_log(self, session, err, offset, length, tail):
+        """
+        Returns the requested part of the rendering resource log
+        :param session: Current user session
+        :param err: True for the error log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining log if None
+        :param tail: Number of lines to be returned from the end of the log, or None
+        :return: A string containing the log, and the offset following the returned bytes
+        """
+        parameters = {'err': int(err), 'offset': offset}
+        if length is not None:
+            parameters['length'] = length
+        if tail is not None:
+            parameters['tail'] = tail
+        result = self._read_log(session, parameters)
+        if result is None:
+            return [settings.LOG_NOT_AVAILABLE, offset]
+        return result
+
+    @staticmethod
+    def _read_log(session, parameters):
+        """
+        Reads part of a log from the agent running the rendering resource
+        :param session: Current user session
+        :param parameters: Query parameters of the log request
+        :return: The contents of the log and the offset following them, or None if the log
+                 cannot be read
+        """
+        if not session.job_id:
+            return None
+        try:
+            code, response = agent_request(
+                'GET', session.cluster_node, '/processes/' + session.job_id + '/log',
+                params=parameters)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(str(e))
+            return None
+        if code != 200:
+            return None
+        return [response['contents'].encode('utf-8'), response['offset']]
+
+
+def process_exited(sessions, agent, events):
+    """
+    Marks the sessions whose rendering resource exited as failed
+    :param sessions: Session objects manager
+    :param agent: URL of the agent reporting the events
+    :param events: Exit events reported by the agent
+    """
+    for event in events:
+        for session in sessions.filter(
+                cluster_node=agent, job_id=event['id'],
+                status__in=[SESSION_STATUS_SCHEDULED, SESSION_STATUS_STARTING,
+                            SESSION_STATUS_RUNNING, SESSION_STATUS_BUSY]):
+            log.info(1, 'Rendering resource of session ' + str(session.id) +
+                     ' exited with code ' + str(event['exit_code']))
+            session.status = SESSION_STATUS_FAILED
+            session.save()
+
+
+class AgentEventWatcherThread(threading.Thread):
+    """
+    Waits for the process exit events of a node agent
+    """
+
+    def __init__(self, sessions, agent):
+        """
+        Initialization
+        :param sessions: Session objects manager
+        :param agent: URL of the agent
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self.sessions = sessions
+        self.agent = agent
+        log.info(1, 'Node agent event watcher thread started for ' + agent + '...')
+
+    def run(self):
+        """
+        Waits for events and marks the sessions whose rendering resource exited as failed
+        """
+        sequence = 0
+        while self.signal:
+            try:
+                code, response = agent_request(
+                    'GET', self.agent, '/events',
+                    timeout=settings.NODE_AGENT_EVENTS_WAIT + global_settings.REQUEST_TIMEOUT,
+                    params={'since': sequence, 'wait': settings.NODE_AGENT_EVENTS_WAIT})
+                if code != 200:
+                    raise ValueError('Node agent returned ' + str(code))
+                process_exited(self.sessions, self.agent, response['events'])
+                sequence = response['sequence']
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                log.error('Failed to get events from node agent ' + self.agent + ': ' + str(e))
+                time.sleep(settings.NODE_AGENT_RETRY_DELAY)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The frame manager fetches the images produced by rendering resources and returns them as raw
+bytes, whether the rendering resource provides them as such or encoded in base64 in a JSON
+document. Frames are shared by all viewers of a session through the frame hub, so that the
+load of a rendering resource does not depend on the number of viewers.
+"""
+
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models.signals import post_delete
+
+import rest_framework.status as http_status
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.models import Session
+
+
+# Signatures of the supported image formats
+IMAGE_SIGNATURES = [
+    ('\xff\xd8\xff', 'image/jpeg'),
+    ('\x89PNG\r\n\x1a\n', 'image/png'),
+]
+
+
+def image_content_type(data):
+    """
+    :param data: Image bytes
+    :return: The content type of the image, or None if the format is not supported
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    return None
+
+
+def decode_frame(content, content_type):
+    """
+    Decodes the frame returned by a rendering resource
+    :param content: Body of the rendering resource response
+    :param content_type: Content type of the rendering resource response
+    :return: A list containing the image bytes and their content type
+    :raise ValueError: if the response does not contain a supported image
+    """
+    if content_type.startswith('image/'):
+        return [content, content_type.split(';')[0].strip()]
+    try:
+        data = base64.b64decode(json.loads(content)[consts.RR_IMAGE_DATA_FIELD])
+    except (KeyError, TypeError) as e:
+        raise ValueError('Invalid image payload: ' + str(e))
+    content_type = image_content_type(data)
+    if content_type is None:
+        raise ValueError('Unsupported image format')
+    return [data, content_type]
+
+
+def fetch_frame(host, port):
+    """
+    Fetches the current frame of the given rendering resource
+    :param host: Host of the rendering resource
+    :param port: Port of the rendering resource
+    :return: A list containing the HTTP code, the image bytes (or a description of the error)
+             and the content type
+    :raise requests.exceptions.RequestException: if the rendering resource cannot be reached
+    """
+    url = 'http://' + host + ':' + str(port) + '/' + consts.RR_SPECIFIC_COMMAND_IMAGE
+    log.info(2, 'Fetching frame from ' + url)
+    response = http_pool.get(url, timeout=settings.REQUEST_TIMEOUT)
+    content = response.content
+    content_type = response.headers.get('Content-Type', '')
+    response.close()
+    if response.status_code != http_status.HTTP_200_OK:
+        return [response.status_code, content, content_type]
+    try:
+        return [http_status.HTTP_200_OK] + decode_frame(content, content_type)
+    except ValueError as e:
+        log.error('Invalid frame from ' + url + ': ' + str(e))
+        return [http_status.HTTP_502_BAD_GATEWAY,
+                json.dumps({'contents': str(e)}), 'application/json']
+
+
+class Frame(object):
+    """
+    Frame fetched from a rendering resource
+    """
+
+    def __init__(self, status, sequence, etag):
+        """
+        Initialization
+        :param status: List containing the HTTP code, the image bytes (or a description of the
+               error) and the content type, as returned by fetch_frame
+        :param sequence: Sequence number of the frame, incremented each time the image changes
+        :param etag: Entity tag identifying the image
+        """
+        self.code = status[0]
+        self.data = status[1]
+        self.content_type = status[2]
+        self.sequence = sequence
+        self.etag = etag
+        self.timestamp = time.time()
+
+
+class FrameHub(object):
+    """
+    Thread safe cache of the latest frame of each session. A rendering resource is queried at
+    most once per interval, whatever the number of viewers, and the least recently used frames
+    are dropped when the cache exceeds its size
+    """
+
+    def __init__(self, interval, max_size, fetch=fetch_frame):
+        """
+        Initialization
+        :param interval: Minimum delay between two frames fetched from a rendering resource
+               (in seconds)
+        :param max_size: Maximum number of bytes held by the cache
+        :param fetch: Function taking a host and port and returning the current frame
+        """
+        self._mutex = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._interval = interval
+        self._max_size = max_size
+        self._fetch = fetch
+
+    def _entry(self, session_id):
+        """
+        Returns the entry of the given session, creating it if needed. The entry holds a lock
+        serializing the fetches, and the latest frame
+        :param session_id: Id of the session
+        """
+        with self._mutex:
+            entry = self._entries.pop(str(session_id), None)
+            if entry is None:
+                entry = [threading.Lock(), None]
+            # Most recently used frames are kept at the end of the dictionary
+            self._entries[str(session_id)] = entry
+            return entry
+
+    def _store(self, session_id, entry, frame):
+        """
+        Stores a frame and drops the least recently used ones if the cache is full. The size of
+        the frame is only counted if the entry is still in the cache: an entry removed or
+        evicted while its frame was being fetched is no longer accounted for
+        :param session_id: Id of the session
+        :param entry: Entry of the session
+        :param frame: Frame to be stored
+        """
+        with self._mutex:
+            if self._entries.get(str(session_id)) is not entry:
+                entry[1] = frame
+                return
+            if entry[1] is not None:
+                self._size -= len(entry[1].data)
+            entry[1] = frame
+            self._size += len(frame.data)
+            for key in self._entries.keys():
+                if self._size <= self._max_size or key == str(session_id):
+                    break
+                evicted_frame = self._entries.pop(key)[1]
+                if evicted_frame is not None:
+                    self._size -= len(evicted_frame.data)
+
+    def get_frame(self, session_id, host, port):
+        """
+        Returns the latest frame of the given session, fetching a new one from the rendering
+        resource if the latest frame is older than the interval. Viewers requesting a frame
+        while it is being fetched wait for it instead of querying the rendering resource
+        :param session_id: Id of the session
+        :param host: Host of the rendering resource
+        :param port: Port of the rendering resource
+        :return: The latest Frame
+        :raise requests.exceptions.RequestException: if the rendering resource cannot be reached
+        """
+        entry = self._entry(session_id)
+        with entry[0]:
+            frame = entry[1]
+            if frame is not None and time.time() < frame.timestamp + self._interval:
+                return frame
+            status = self._fetch(host, port)
+            etag = '"' + hashlib.md5(status[1]).hexdigest() + '"'
+            sequence = 0
+            if frame is not None:
+                sequence = frame.sequence
+                if frame.etag != etag or frame.code != status[0]:
+                    sequence += 1
+            frame = Frame(status, sequence, etag)
+            self._store(session_id, entry, frame)
+            return frame
+
+    def remove(self, session_id):
+        """
+        Removes the frame of the given session
+        :param session_id: Id of the session
+        """
+        with self._mutex:
+            entry = self._entries.pop(str(session_id), None)
+            if entry is not None and entry[1] is not None:
+                self._size -= len(entry[1].data)
+
+    def size(self):
+        """
+        :return: The number of bytes held by the cache
+        """
+        with self._mutex:
+            return self._size
+
+
+# Global hub serving the frames of all sessions
+globalFrameHub = FrameHub(consts.FRAME_HUB_INTERVAL, consts.FRAME_HUB_MAX_SIZE)
+
+
+# pylint: disable=W0613
+def remove_frame(sender, instance, **kwargs):
+    """
+    Removes the frame of a session that has been deleted
+    :param sender: Session model
+    :param instance: Session that has been deleted
+    """
+    globalFrameHub.remove(instance.id)
+
+
+post_delete.connect(remove_frame, sender=Session)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The frontend health tracker records the outcome and latency of the requests sent to the Slurm
+cluster nodes, and orders the cluster nodes so that the healthiest are tried first. A cluster
+node failing repeatedly is skipped for a cooldown period (its circuit is open), after which a
+single request is allowed to check whether it recovered. Only failures to reach a cluster node
+count: requests rejected by the scheduler (busy queue, invalid account or partition) come from
+a healthy cluster node, and are tracked separately.
+"""
+
+import threading
+import time
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+
+
+# States of the circuit of a cluster node
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half-open'
+
+
+class FrontendStatistics(object):
+    """
+    Health of a cluster node
+    """
+
+    def __init__(self):
+        """
+        Initialization. Unknown cluster nodes are considered healthy so that they are tried
+        """
+        self.requests = 0
+        self.successes = 0
+        self.success_rate = 1.0
+        self.latency = 0.0
+        self.last_latency = 0.0
+        self.consecutive_failures = 0
+        self.rejections = 0
+        self.open_until = None
+        self.trial_until = None
+
+    def score(self):
+        """
+        :return: A score between 0 and 1, decreasing with the failure rate and the latency
+        """
+        return self.success_rate / (1.0 + self.latency / consts.FRONTEND_HEALTH_LATENCY_REFERENCE)
+
+    def circuit(self, now):
+        """
+        :param now: Current time
+        :return: The state of the circuit of the cluster node
+        """
+        if self.open_until is None:
+            return CIRCUIT_CLOSED
+        if now < self.open_until:
+            return CIRCUIT_OPEN
+        return CIRCUIT_HALF_OPEN
+
+
+class FrontendHealth(object):
+    """
+    Thread safe health tracker of the cluster nodes
+    """
+
+    def __init__(self, failure_threshold, cooldown):
+        """
+        Initialization
+        :param failure_threshold: Number of consecutive failures after which the circuit of a
+                                  cluster node is opened
+        :param cooldown: Delay during which a cluster node with an open circuit is skipped
+                         (in seconds)
+        """
+        self._mutex = threading.Lock()
+        self._statistics = dict()
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+
+    def record(self, host, latency, success):
+        """
+        Records the outcome of a request sent to a cluster node
+        :param host: Cluster node
+        :param latency: Time taken by the cluster node to answer (in seconds)
+        :param success: True if the cluster node answered, False if it could not be reached
+        """
+        smoothing = consts.FRONTEND_HEALTH_SMOOTHING
+        with self._mutex:
+            statistics = self._statistics.setdefault(host, FrontendStatistics())
+            outcome = 1.0 if success else 0.0
+            if statistics.requests == 0:
+                statistics.latency = latency
+                statistics.success_rate = outcome
+            else:
+                statistics.latency += smoothing * (latency - statistics.latency)
+                statistics.success_rate += smoothing * (outcome - statistics.success_rate)
+            statistics.requests += 1
+            statistics.last_latency = latency
+            if success:
+                statistics.successes += 1
+                statistics.consecutive_failures = 0
+                if statistics.open_until is not None:
+                    log.info(1, 'Closing circuit of cluster node ' + host)
+                statistics.open_until = None
+                statistics.trial_until = None
+                return
+            statistics.consecutive_failures += 1
+            if statistics.consecutive_failures >= self._failure_threshold:
+                log.info(1, 'Opening circuit of cluster node ' + host + ' after ' +
+                         str(statistics.consecutive_failures) + ' consecutive failures')
+                statistics.open_until = time.time() + self._cooldown
+                statistics.trial_until = None
+
+    def record_rejection(self, host):
+        """
+        Records a request rejected by the scheduler of a cluster node. Rejections do not affect
+        the health of the cluster node, which answered
+        :param host: Cluster node
+        """
+        with self._mutex:
+            self._statistics.setdefault(host, FrontendStatistics()).rejections += 1
+
+    def order(self, hosts):
+        """
+        Returns the cluster nodes to be tried, the healthiest first. Cluster nodes with an open
+        circuit are skipped, and a single request is let through once their cooldown expires.
+        If all cluster nodes are skipped, they are all returned so that requests are not
+        rejected without being tried
+        :param hosts: Configured cluster nodes
+        :return: The cluster nodes in the order in which they should be tried
+        """
+        now = time.time()
+        with self._mutex:
+            candidates = list()
+            for index, host in enumerate(hosts):
+                statistics = self._statistics.get(host, FrontendStatistics())
+                circuit = statistics.circuit(now)
+                if circuit == CIRCUIT_OPEN:
+                    continue
+                if circuit == CIRCUIT_HALF_OPEN:
+                    # Other requests skip the cluster node until the outcome of the trial
+                    # request is recorded, or until the cooldown expires again if it is not
+                    # sent. Only failures extend the time during which the circuit is open
+                    if statistics.trial_until is not None and now < statistics.trial_until:
+                        continue
+                    statistics.trial_until = now + self._cooldown
+                # The configuration order is kept between cluster nodes with the same score
+                candidates.append([-statistics.score(), index, host])
+        if not candidates:
+            log.info(1, 'All cluster nodes have an open circuit, trying them anyway')
+            return list(hosts)
+        return [candidate[2] for candidate in sorted(candidates)]
+
+    def scores(self):
+        """
+        :return: A dictionary containing, per cluster node, its score, the number of requests,
+                 successes and scheduler rejections, the smoothed success rate and latency (in
+                 seconds), the number of consecutive failures and the state of its circuit
+        """
+        now = time.time()
+        with self._mutex:
+            return dict(
+                (host, {
+                    'score': statistics.score(),
+                    'requests': statistics.requests,
+                    'successes': statistics.successes,
+                    'success_rate': statistics.success_rate,
+                    'latency': statistics.latency,
+                    'last_latency': statistics.last_latency,
+                    'consecutive_failures': statistics.consecutive_failures,
+                    'rejections': statistics.rejections,
+                    'circuit': statistics.circuit(now)})
+                for host, statistics in self._statistics.items())
+
+
+# Global health tracker of the Slurm cluster nodes
+globalFrontendHealth = FrontendHealth(
+    settings.SLURM_FRONTEND_FAILURE_THRESHOLD, settings.SLURM_FRONTEND_COOLDOWN)
@@ -32,6 +32,7 @@ import json
 import rendering_resource_manager_service.service.settings as settings
 from rendering_resource_manager_service.session.models import Session
 import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
 from rendering_resource_manager_service.session.management.session_manager_settings \
     import COOKIE_ID
 
@@ -107,7 +108,7 @@ class ImageFeedManager(object):
             log.info(1, '__do_request(' + method + ', ' + url + ')')
             headers = {'Content-Type': 'application/json',
                        'Cookie': COOKIE_ID + '=' + str(self._session_id)}
-            response = requests.request(
+            response = http_pool.request(
                 method=method, timeout=settings.REQUEST_TIMEOUT,
                 url=url, headers=headers, data=uri)
             log.info(1, 'Response: ' + response.text)
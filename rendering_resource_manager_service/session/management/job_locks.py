@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+Locks used by the job managers. Lifecycle operations (allocation, start, stop) are serialized
+per session, so that requests for different sessions never wait for each other, and the number
+of simultaneous requests sent to each cluster can optionally be bounded to protect the frontends
+"""
+
+from contextlib import contextmanager
+from threading import Lock, RLock, BoundedSemaphore
+
+
+class JobLocks(object):
+    """
+    Per-session locks and per-cluster semaphores. Session locks are discarded as soon as no
+    thread holds or waits for them
+    """
+
+    def __init__(self, max_requests_per_cluster):
+        """
+        Initialization
+        :param max_requests_per_cluster: Maximum number of simultaneous requests sent to a
+               cluster. 0 means unbounded
+        """
+        self._mutex = Lock()
+        self._session_locks = dict()
+        self._cluster_semaphores = dict()
+        self._max_requests_per_cluster = max_requests_per_cluster
+
+    def lock_session(self, session_id):
+        """
+        Waits until no other lifecycle operation is running for the given session. The lock
+        is reentrant, and every call must be followed by a call to unlock_session
+        :param session_id: Id of the session
+        """
+        key = str(session_id)
+        with self._mutex:
+            entry = self._session_locks.setdefault(key, [RLock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def unlock_session(self, session_id):
+        """
+        Releases the lock of the given session
+        :param session_id: Id of the session
+        """
+        key = str(session_id)
+        with self._mutex:
+            entry = self._session_locks[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._session_locks[key]
+        entry[0].release()
+
+    @contextmanager
+    def cluster(self, cluster):
+        """
+        Context manager bounding the number of simultaneous requests sent to the given cluster
+        :param cluster: Name of the cluster node or site
+        """
+        if self._max_requests_per_cluster <= 0:
+            yield
+            return
+        with self._mutex:
+            semaphore = self._cluster_semaphores.get(cluster)
+            if semaphore is None:
+                semaphore = BoundedSemaphore(self._max_requests_per_cluster)
+                self._cluster_semaphores[cluster] = semaphore
+        with semaphore:
+            yield
+
+    def size(self):
+        """
+        :return: The number of sessions for which a lifecycle operation is running or waiting
+        """
+        with self._mutex:
+            return len(self._session_locks)
@@ -25,16 +25,20 @@
 # All rights reserved. Do not distribute without further notice.
 
 """
-The job manager is in charge of managing jobs.
+The job manager is in charge of managing jobs. Each configuration names the backend allocating
+its rendering resources (Slurm, UNICORE, slurmrestd or node agents), so that a single service
+can spread sessions across several of them. Backends are only loaded when first used.
 """
 
-import rendering_resource_manager_service.session.management.slurm_job_manager \
-    as slurm_job_manager
-import rendering_resource_manager_service.session.management.unicore_job_manager \
-    as unicore_job_manager
+import importlib
+import threading
+
 import rendering_resource_manager_service.service.settings \
     as global_settings
 
+# Backends authenticating with the token of the user scheduling the job
+USER_TOKEN_BACKENDS = [global_settings.RESOURCE_ALLOCATOR_UNICORE]
+
 
 class JobInformation(object):
     """
@@ -60,9 +64,127 @@ class JobInformation(object):
         # self.work_dir = None
         self.job = None
 
-# Global job manager used for all allocations
-globalJobManager = None
-if global_settings.RESOURCE_ALLOCATOR == global_settings.RESOURCE_ALLOCATOR_SLURM:
-    globalJobManager = slurm_job_manager.SlurmJobManager()
-elif global_settings.RESOURCE_ALLOCATOR == global_settings.RESOURCE_ALLOCATOR_UNICORE:
-    globalJobManager = unicore_job_manager.UnicoreJobManager()
+
+class JobManagerRegistry(object):
+    """
+    Registry of the job managers, indexed by backend name. Job managers are created on first use
+    """
+
+    def __init__(self, backends):
+        """
+        Initialization
+        :param backends: Dictionary giving, for each backend name, the module and class name of
+                         its job manager
+        """
+        self._mutex = threading.Lock()
+        self._backends = backends
+        self._job_managers = dict()
+
+    def get(self, name):
+        """
+        Returns the job manager of the given backend, creating it if needed
+        :param name: Name of the backend, the default one if empty
+        :return: The job manager
+        :raise ValueError: if the backend is unknown or not enabled
+        """
+        name = str(name or global_settings.RESOURCE_ALLOCATOR).upper()
+        if name not in self._backends or name not in enabled_backends():
+            raise ValueError('Backend ' + name + ' is not enabled')
+        with self._mutex:
+            job_manager = self._job_managers.get(name)
+            if job_manager is None:
+                module_name, class_name = self._backends[name]
+                module = importlib.import_module(module_name)
+                job_manager = getattr(module, class_name)()
+                self._job_managers[name] = job_manager
+            return job_manager
+
+    def loaded(self):
+        """
+        :return: The names of the backends whose job manager was created
+        """
+        with self._mutex:
+            return self._job_managers.keys()
+
+
+def enabled_backends():
+    """
+    :return: The names of the backends that can be used by the configurations, the default
+             backend being always enabled
+    """
+    backends = [str(name).upper() for name in global_settings.RESOURCE_ALLOCATORS]
+    if global_settings.RESOURCE_ALLOCATOR not in backends:
+        backends.append(global_settings.RESOURCE_ALLOCATOR)
+    return backends
+
+
+def configuration_backend(rr_settings):
+    """
+    :param rr_settings: Rendering resource configuration
+    :return: The name of the backend allocating the rendering resources of the configuration
+    """
+    return str(rr_settings.backend or global_settings.RESOURCE_ALLOCATOR).upper()
+
+
+def requires_user_token(backend):
+    """
+    :param backend: Name of a backend
+    :return: True if the backend authenticates with the token of the user scheduling the job,
+             and can therefore not allocate rendering resources on behalf of the service
+    """
+    return str(backend).upper() in USER_TOKEN_BACKENDS
+
+
+def session_backend(session):
+    """
+    :param session: Current user session
+    :return: The name of the backend that allocated the job of the session
+    """
+    return str(session.backend or global_settings.RESOURCE_ALLOCATOR).upper()
+
+
+def backend_sessions(sessions, name):
+    """
+    Filters the sessions whose job was allocated by the given backend
+    :param sessions: Session objects manager or query set
+    :param name: Name of the backend
+    :return: A query set of the sessions
+    """
+    if name == global_settings.RESOURCE_ALLOCATOR:
+        return sessions.filter(backend__in=['', name])
+    return sessions.filter(backend=name)
+
+
+def get_job_manager(session):
+    """
+    :param session: Current user session
+    :return: The job manager of the backend that allocated the job of the session
+    """
+    return globalJobManagerRegistry.get(session_backend(session))
+
+
+def hostname_reported(session):
+    """
+    :param session: Current user session
+    :return: True if the rendering resource reports its hostname through the callback command,
+             in which case the hostname is never queried from the scheduler
+    """
+    return session_backend(session) == global_settings.RESOURCE_ALLOCATOR_SLURM and \
+        global_settings.SLURM_LAUNCH_MODE == global_settings.SLURM_LAUNCH_MODE_BATCH
+
+
+# Job managers of all backends, created when first used
+globalJobManagerRegistry = JobManagerRegistry({
+    global_settings.RESOURCE_ALLOCATOR_SLURM: [
+        'rendering_resource_manager_service.session.management.slurm_job_manager',
+        'SlurmJobManager'],
+    global_settings.RESOURCE_ALLOCATOR_UNICORE: [
+        'rendering_resource_manager_service.session.management.unicore_job_manager',
+        'UnicoreJobManager'],
+    global_settings.RESOURCE_ALLOCATOR_SLURM_REST: [
+        'rendering_resource_manager_service.session.management.slurm_rest_job_manager',
+        'SlurmRestJobManager'],
+    global_settings.RESOURCE_ALLOCATOR_NODE_AGENT: [
+        'rendering_resource_manager_service.session.management.agent_job_manager',
+        'AgentJobManager']
+})
@@ -33,9 +33,12 @@ import datetime
 
 from django.db import transaction
 import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
 from rendering_resource_manager_service.session.models import SESSION_STATUS_STOPPING
 import job_manager
 import process_manager
+from rendering_resource_manager_service.session.management import liveness_prober
+from rendering_resource_manager_service.session.management import log_archive
 
 
 # Delay after which a session is closed if no keep-alive message is received (in seconds)
@@ -68,13 +71,34 @@ class KeepAliveThread(threading.Thread):
                 if datetime.datetime.now() > session.valid_until:
                     log.info(1, "Session " + str(session.id) +
                              " timed out. Session will now be closed")
-                    session.status = SESSION_STATUS_STOPPING
-                    with transaction.atomic():
-                        session.save()
-                    if session.process_pid != -1:
-                        process_manager.ProcessManager.stop(session)
-                    if session.job_id is not None and session.job_id != '':
-                        job_manager.globalJobManager.stop(session)
-                    with transaction.atomic():
-                        session.delete()
+                    try:
+                        self.close_session(session)
+                    # pylint: disable=W0703
+                    except Exception as e:
+                        log.error('Failed to close session ' + str(session.id) + ': ' + str(e))
             time.sleep(KEEP_ALIVE_FREQUENCY)
+
+    @staticmethod
+    def close_session(session):
+        """
+        Stops the rendering resource of a timed out session, and destroys the session
+        :param session: Session that timed out
+        """
+        session.status = SESSION_STATUS_STOPPING
+        with transaction.atomic():
+            session.save()
+        if session.process_pid != -1:
+            process_manager.ProcessManager.stop(session)
+        if session.job_id is not None and session.job_id != '':
+            # Logs are archived first, as stopping the job may delete them
+            log_archive.archive_session(session)
+            try:
+                job_manager.get_job_manager(session).stop(session)
+            except ValueError as e:
+                # The backend of the session was disabled, its job is left to expire
+                log.error('Job ' + str(session.job_id) + ' of session ' + str(session.id) +
+                          ' cannot be stopped: ' + str(e))
+        with transaction.atomic():
+            session.delete()
+        liveness_prober.globalLivenessSnapshot.remove(session.id)
+        http_pool.evict(session.http_host, session.http_port)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=W0403
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+"""
+The liveness prober periodically checks that the rendering resources of active sessions are
+able to serve REST requests. Results are stored in a shared snapshot so that session status
+requests can be answered without contacting the rendering resources.
+"""
+
+import threading
+import datetime
+from multiprocessing.pool import ThreadPool
+
+import rendering_resource_manager_service.utils.custom_logging as log
+from rendering_resource_manager_service.session.models import \
+    SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, SESSION_STATUS_BUSY
+
+
+# Frequency at which rendering resources are probed (in seconds)
+LIVENESS_PROBE_FREQUENCY = 2
+
+# Delay after which a probe result is no longer trusted (in seconds)
+LIVENESS_PROBE_EXPIRY = 30
+
+# Maximum number of rendering resources probed simultaneously
+LIVENESS_PROBE_WORKERS = 8
+
+# Session states for which rendering resources are probed
+LIVENESS_PROBED_STATES = [SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, SESSION_STATUS_BUSY]
+
+
+class LivenessStatus(object):
+    """
+    Result of the last probe of a rendering resource
+    """
+
+    def __init__(self, code, contents):
+        """
+        Initialization
+        :param code: HTTP code returned by the probe (200, 404 or 503)
+        :param contents: Response of the rendering resource, or description of the error
+        """
+        self.code = code
+        self.contents = contents
+        self.timestamp = datetime.datetime.now()
+
+    def is_expired(self):
+        """
+        :return: True if the probe result is too old to be trusted
+        """
+        return datetime.datetime.now() > \
+            self.timestamp + datetime.timedelta(seconds=LIVENESS_PROBE_EXPIRY)
+
+
+class LivenessSnapshot(object):
+    """
+    Thread safe snapshot of the latest probe results, indexed by session id
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self._mutex = threading.Lock()
+        self._statuses = dict()
+        self._probe_requested = threading.Event()
+
+    def get(self, session_id):
+        """
+        Returns the latest probe result for the given session
+        :param session_id: Id of the session
+        :return: A LivenessStatus, or None if the session was never probed or if the result
+                 has expired
+        """
+        with self._mutex:
+            status = self._statuses.get(str(session_id))
+        if status is None or status.is_expired():
+            return None
+        return status
+
+    def set(self, session_id, status):
+        """
+        Stores the probe result for the given session
+        :param session_id: Id of the session
+        :param status: LivenessStatus of the session
+        """
+        with self._mutex:
+            self._statuses[str(session_id)] = status
+
+    def remove(self, session_id):
+        """
+        Removes the probe result of the given session
+        :param session_id: Id of the session
+        """
+        with self._mutex:
+            self._statuses.pop(str(session_id), None)
+
+    def retain(self, session_ids):
+        """
+        Removes the probe results of all sessions but the given ones
+        :param session_ids: Ids of the sessions to keep
+        """
+        session_ids = [str(session_id) for session_id in session_ids]
+        with self._mutex:
+            for session_id in self._statuses.keys():
+                if session_id not in session_ids:
+                    del self._statuses[session_id]
+
+    def request_probe(self):
+        """
+        Wakes up the prober so that sessions are probed without waiting for the next cycle
+        """
+        self._probe_requested.set()
+
+    def wait_for_probe_request(self, timeout):
+        """
+        Waits until a probe is requested or the timeout expires
+        :param timeout: Maximum waiting time (in seconds)
+        """
+        self._probe_requested.wait(timeout)
+        self._probe_requested.clear()
+
+
+def _get_pool():
+    """
+    Returns the pool of threads used to probe rendering resources, creating it if needed
+    """
+    global _pool
+    with _pool_mutex:
+        if _pool is None:
+            _pool = ThreadPool(LIVENESS_PROBE_WORKERS)
+    return _pool
+
+
+def probe_sessions(sessions, probe):
+    """
+    Probes the rendering resources of the given sessions concurrently and stores the results in
+    the global snapshot
+    :param sessions: Sessions to be probed
+    :param probe: Function taking a session and returning an HTTP code and a description
+    """
+    def probe_session(session):
+        """
+        Probes the rendering resource of the given session
+        :param session: Session to be probed
+        """
+        try:
+            status = probe(session)
+            globalLivenessSnapshot.set(session.id, LivenessStatus(status[0], status[1]))
+        # pylint: disable=W0703
+        except Exception as e:
+            log.error('Failed to probe session ' + str(session.id) + ': ' + str(e))
+
+    _get_pool().map(probe_session, sessions)
+
+
+class LivenessProberThread(threading.Thread):
+    """
+    Probes the rendering resources of all starting, running or busy sessions
+    """
+
+    def __init__(self, sessions, probe):
+        """
+        Initialization
+        :param sessions: Session objects manager
+        :param probe: Function taking a session and returning an HTTP code and a description
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self.sessions = sessions
+        self._probe = probe
+        log.info(1, 'Liveness prober thread started...')
+
+    def run(self):
+        """
+        Probes all active sessions and waits for the next cycle
+        """
+        while self.signal:
+            sessions = list(self.sessions.filter(status__in=LIVENESS_PROBED_STATES))
+            globalLivenessSnapshot.retain([session.id for session in sessions])
+            log.info(2, 'Probing ' + str(len(sessions)) + ' rendering resources')
+            probe_sessions(sessions, self._probe)
+            globalLivenessSnapshot.wait_for_probe_request(LIVENESS_PROBE_FREQUENCY)
+
+
+# Global snapshot shared by the prober and the session status requests
+globalLivenessSnapshot = LivenessSnapshot()
+
+# Pool of threads probing the rendering resources
+_pool = None
+_pool_mutex = threading.Lock()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The log archive keeps a compressed copy of the rendering resource logs once sessions are
+destroyed, so that they can be read without accessing the cluster. The size of the archive is
+bounded, and the oldest logs are deleted first.
+"""
+
+import gzip
+import os
+import re
+import threading
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.session.management import job_manager
+
+
+# Extension of the archived logs
+LOG_ARCHIVE_EXTENSION = '.gz'
+
+
+class LogArchive(object):
+    """
+    Compressed logs stored in a local directory, indexed by session id
+    """
+
+    def __init__(self, directory, max_size):
+        """
+        Initialization
+        :param directory: Directory where the logs are stored
+        :param max_size: Maximum number of bytes used by the archive
+        """
+        self._mutex = threading.Lock()
+        self._directory = directory
+        self._max_size = max_size
+
+    def _file_name(self, session_id, err):
+        """
+        :param session_id: Id of the session
+        :param err: True for the error log
+        :return: Full path of the archived log
+        """
+        name = re.sub(r'[^a-zA-Z0-9_\-]', '_', str(session_id))
+        return os.path.join(
+            self._directory, name + ('.err' if err else '.out') + LOG_ARCHIVE_EXTENSION)
+
+    def store(self, session_id, err, contents):
+        """
+        Stores a log, replacing the previous one of the session, and deletes the oldest logs
+        if the archive exceeds its maximum size
+        :param session_id: Id of the session
+        :param err: True for the error log
+        :param contents: Contents of the log
+        """
+        filename = self._file_name(session_id, err)
+        with self._mutex:
+            if not os.path.isdir(self._directory):
+                os.makedirs(self._directory)
+            temporary_filename = filename + '.tmp'
+            log_file = gzip.open(temporary_filename, 'wb')
+            try:
+                log_file.write(contents)
+            finally:
+                log_file.close()
+            os.rename(temporary_filename, filename)
+            self._enforce_retention()
+
+    def _enforce_retention(self):
+        """
+        Deletes the oldest logs until the archive fits in its maximum size. Must be called with
+        the mutex locked
+        """
+        files = list()
+        for name in os.listdir(self._directory):
+            if name.endswith(LOG_ARCHIVE_EXTENSION):
+                path = os.path.join(self._directory, name)
+                files.append([os.path.getmtime(path), os.path.getsize(path), path])
+        files.sort()
+        size = sum([f[1] for f in files])
+        for _, file_size, path in files:
+            if size <= self._max_size:
+                break
+            log.info(1, 'Deleting archived log ' + path)
+            os.remove(path)
+            size -= file_size
+
+    def read(self, session_id, err=False, offset=0, length=None, tail=None):
+        """
+        Returns part of an archived log
+        :param session_id: Id of the session
+        :param err: True for the error log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining log if None
+        :param tail: Number of lines to be returned from the end of the log. If specified,
+                     offset and length are ignored
+        :return: The requested contents and the offset following the returned bytes, or None
+                 if the log is not archived
+        """
+        try:
+            log_file = gzip.open(self._file_name(session_id, err), 'rb')
+        except IOError:
+            return None
+        try:
+            contents = log_file.read()
+        finally:
+            log_file.close()
+        if tail is not None:
+            lines = contents.splitlines(True)
+            return [''.join(lines[-tail:]) if tail > 0 else '', len(contents)]
+        if offset > len(contents):
+            return ['', len(contents)]
+        end = len(contents) if length is None else offset + length
+        contents = contents[offset:end]
+        return [contents, offset + len(contents)]
+
+
+# Global archive of the logs of destroyed sessions
+globalLogArchive = LogArchive(settings.LOG_ARCHIVE_DIRECTORY, settings.LOG_ARCHIVE_MAX_SIZE)
+
+
+def archive_session(session):
+    """
+    Fetches the logs of the rendering resource of a session that is being destroyed, and stores
+    them in the global archive. Failures are logged and do not prevent the session from being
+    destroyed
+    :param session: Session being destroyed
+    """
+    if session.job_id is None or session.job_id == '':
+        return
+    for err in [False, True]:
+        try:
+            contents = job_manager.get_job_manager(session).fetch_rendering_resource_log(
+                session, err, settings.LOG_ARCHIVE_MAX_FILE_SIZE)
+            if contents is not None:
+                globalLogArchive.store(session.id, err, contents)
+        # pylint: disable=W0703
+        except Exception as e:
+            log.error('Failed to archive log of session ' + str(session.id) + ': ' + str(e))
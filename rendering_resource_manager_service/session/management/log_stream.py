@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The log stream hub follows the output and error files of rendering resources and sends their
+lines to any number of subscribers. Each file is followed once, whatever the number of
+subscribers, and stops being followed when its last subscriber leaves.
+"""
+
+import json
+import threading
+import time
+import Queue
+
+from django.db.models.signals import post_delete
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.management import job_manager
+from rendering_resource_manager_service.session.models import Session
+
+
+def load_session(session_id):
+    """
+    :param session_id: Id of the session
+    :return: The session, or None if it does not exist anymore
+    """
+    try:
+        return Session.objects.get(id=session_id)
+    except Session.DoesNotExist:
+        return None
+
+
+class LogFollowerThread(threading.Thread):
+    """
+    Follows a rendering resource log and publishes its lines. The job manager follows the file
+    with a single remote process when it can, and the file is read by successive ranges
+    otherwise. The session is reloaded at each poll, so that a log that is not available yet
+    is followed as soon as the rendering resource starts
+    """
+
+    def __init__(self, session, err, publish, backend=None, sessions=None):
+        """
+        Initialization
+        :param session: Session holding the rendering resource
+        :param err: True to follow the error log
+        :param publish: Function called with each line, and with None when the log can no
+                        longer be followed
+        :param backend: Job manager providing the log, the job manager of the session if None
+        :param sessions: Function loading a session from its id, load_session if None
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self._session_id = session.id
+        self._err = err
+        self._publish = publish
+        self._backend = backend
+        self._sessions = sessions or load_session
+        self._process = None
+
+    def _job_manager(self, session):
+        """
+        :param session: Session holding the rendering resource
+        :return: The job manager providing the log
+        """
+        if self._backend is not None:
+            return self._backend
+        return job_manager.get_job_manager(session)
+
+    def run(self):
+        """
+        Publishes the lines of the log until the follower is stopped
+        """
+        try:
+            self._follow()
+        # pylint: disable=W0703
+        except Exception as e:
+            log.error('Failed to follow log of session ' + str(self._session_id) + ': ' + str(e))
+        self._publish(None)
+
+    def _follow(self):
+        """
+        Publishes the lines of the log, followed by the job manager or read by successive
+        ranges. Until the log is available, the job manager is asked again to follow it at
+        each poll, as the rendering resource may have started meanwhile
+        """
+        offset = None
+        pending = ''
+        while self.signal:
+            session = self._sessions(self._session_id)
+            if session is None:
+                return
+            backend = self._job_manager(session)
+            if offset is None:
+                process = backend.follow_rendering_resource_log(session, self._err)
+                if process is not None:
+                    self._follow_process(process)
+                    return
+            if self._err:
+                read = backend.rendering_resource_err_log
+            else:
+                read = backend.rendering_resource_out_log
+            if offset is None:
+                contents, next_offset = read(session, tail=consts.LOG_STREAM_BACKLOG)
+            else:
+                contents, next_offset = read(session, offset)
+            if contents != consts.LOG_NOT_AVAILABLE:
+                offset = next_offset
+                lines = (pending + contents).splitlines(True)
+                pending = ''
+                if lines and not lines[-1].endswith('\n'):
+                    # Incomplete lines are published once terminated
+                    pending = lines.pop()
+                for line in lines:
+                    self._publish(line)
+            time.sleep(consts.LOG_STREAM_INTERVAL)
+
+    def _follow_process(self, process):
+        """
+        Publishes the lines written by the remote process following the log
+        :param process: Process following the log
+        """
+        self._process = process
+        if not self.signal:
+            process.terminate()
+        for line in iter(process.stdout.readline, ''):
+            if not self.signal:
+                break
+            self._publish(line)
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+
+    def stop(self):
+        """
+        Stops following the log
+        """
+        self.signal = False
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+
+class LogStream(object):
+    """
+    Log followed for a set of subscribers
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self.subscribers = list()
+        self.follower = None
+
+
+class LogStreamHub(object):
+    """
+    Thread safe registry of the followed logs, indexed by session id and log
+    """
+
+    def __init__(self, backend=None, sessions=None):
+        """
+        Initialization
+        :param backend: Job manager providing the logs, the job manager of each session if None
+        :param sessions: Function loading a session from its id, load_session if None
+        """
+        self._mutex = threading.Lock()
+        self._streams = dict()
+        self._backend = backend
+        self._sessions = sessions
+
+    def subscribe(self, session, err=False):
+        """
+        Subscribes to the log of the given session, following it if this is the first
+        subscriber
+        :param session: Session holding the rendering resource
+        :param err: True to subscribe to the error log
+        :return: A queue receiving the lines of the log, and None when the log can no longer be
+                 followed
+        """
+        key = (str(session.id), err)
+        subscriber = Queue.Queue(consts.LOG_STREAM_QUEUE_SIZE)
+        with self._mutex:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = LogStream()
+                stream.follower = LogFollowerThread(
+                    session, err, lambda line: self._publish(key, stream, line), self._backend,
+                    self._sessions)
+                stream.follower.setDaemon(True)
+                self._streams[key] = stream
+                log.info(1, 'Following log of session ' + key[0])
+                stream.follower.start()
+            stream.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, session_id, err, subscriber):
+        """
+        Removes a subscriber, and stops following the log if it was the last one
+        :param session_id: Id of the session
+        :param err: True for the error log
+        :param subscriber: Queue returned by subscribe
+        """
+        key = (str(session_id), err)
+        with self._mutex:
+            stream = self._streams.get(key)
+            if stream is None or subscriber not in stream.subscribers:
+                return
+            stream.subscribers.remove(subscriber)
+            if stream.subscribers:
+                return
+            del self._streams[key]
+        log.info(1, 'Stopped following log of session ' + key[0])
+        stream.follower.stop()
+
+    def _publish(self, key, stream, line):
+        """
+        Sends a line to the subscribers of a stream. Lines are dropped for subscribers that
+        do not keep up
+        :param key: Key of the stream
+        :param stream: Stream the line belongs to
+        :param line: Line of the log, or None if the log can no longer be followed
+        """
+        with self._mutex:
+            subscribers = list(stream.subscribers)
+            if line is None and self._streams.get(key) is stream:
+                del self._streams[key]
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(line)
+            except Queue.Full:
+                log.debug(1, 'Dropping log line for slow subscriber of session ' + key[0])
+
+    def remove(self, session_id):
+        """
+        Stops following the logs of the given session
+        :param session_id: Id of the session
+        """
+        with self._mutex:
+            streams = [self._streams.pop(key) for key in self._streams.keys()
+                       if key[0] == str(session_id)]
+        for stream in streams:
+            stream.follower.stop()
+            for subscriber in stream.subscribers:
+                try:
+                    subscriber.put_nowait(None)
+                except Queue.Full:
+                    pass
+
+    def size(self):
+        """
+        :return: The number of followed logs
+        """
+        with self._mutex:
+            return len(self._streams)
+
+    def events(self, session, err=False, duration=consts.LOG_STREAM_DURATION):
+        """
+        Generates server-sent events for each line of the log of the given session. Comments
+        are sent periodically to keep the connection alive, and the stream ends when the log
+        can no longer be followed, when the duration expires or when the client disconnects
+        :param session: Session holding the rendering resource
+        :param err: True to stream the error log
+        :param duration: Maximum duration of the stream (in seconds)
+        """
+        subscriber = self.subscribe(session, err)
+        deadline = time.time() + duration
+        try:
+            while time.time() < deadline:
+                try:
+                    line = subscriber.get(
+                        timeout=min(consts.LOG_STREAM_HEARTBEAT, max(deadline - time.time(), 0)))
+                except Queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if line is None:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+                contents = line
+                if isinstance(line, str):
+                    contents = line.decode('utf-8', 'replace')
+                yield 'event: log\ndata: ' + json.dumps({'contents': contents}) + '\n\n'
+        finally:
+            self.unsubscribe(session.id, err, subscriber)
+
+
+# Global hub following the logs of all sessions
+globalLogStreamHub = LogStreamHub()
+
+# Log streams running at the same time (see LogStreamViewSet)
+globalLogStreams = threading.BoundedSemaphore(consts.LOG_STREAM_MAX_CONCURRENT)
+
+
+# pylint: disable=W0613
+def remove_log_streams(sender, instance, **kwargs):
+    """
+    Stops following the logs of a session that has been deleted
+    :param sender: Session model
+    :param instance: Session that has been deleted
+    """
+    globalLogStreamHub.remove(instance.id)
+
+
+post_delete.connect(remove_log_streams, sender=Session)
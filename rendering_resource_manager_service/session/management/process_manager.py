@@ -30,10 +30,12 @@ The process manager is in charge of managing system processes using their PID
 import signal
 import time
 import subprocess
-import urllib2
 import json
+import requests
 
 import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.service.settings as global_settings
 from rendering_resource_manager_service.config.management import \
     rendering_resource_settings_manager as manager
 from rendering_resource_manager_service.session.models import SESSION_STATUS_STARTING
@@ -150,10 +152,10 @@ class ProcessManager(object):
                 try:
                     url = 'http://' + session_info.http_host + ':' + \
                           str(session_info.http_port) + '/' + 'EXIT'
-                    req = urllib2.Request(url=url)
-                    urllib2.urlopen(req).read()
+                    r = http_pool.get(url=url, timeout=global_settings.REQUEST_TIMEOUT)
+                    r.close()
                 # pylint: disable=W0702
-                except urllib2.URLError as e:
+                except requests.exceptions.RequestException as e:
                     log.error('Cannot gracefully exit.' + str(e))
 
             log.info(1, 'Terminating process ' + str(session_info.process_pid))
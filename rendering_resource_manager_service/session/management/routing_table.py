@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The routing table keeps, for each session known to be running, the address of its rendering
+resource so that forwarded commands can be sent without checking the status of the session
+first. The table is local to the process. Entries are invalidated when the session leaves the
+running state, when the address of its rendering resource changes, and when it is destroyed.
+"""
+
+import threading
+import datetime
+
+from django.db.models.signals import post_save, post_delete
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.models import Session, SESSION_STATUS_RUNNING
+
+
+class Route(object):
+    """
+    Address of the rendering resource held by a session
+    """
+
+    def __init__(self, host, port, status, streaming_proxy=False):
+        """
+        Initialization
+        :param host: Host of the rendering resource
+        :param port: Port of the rendering resource
+        :param status: Status of the session when the route was created
+        :param streaming_proxy: True if requests are relayed in streaming mode
+        """
+        self.host = host
+        self.port = port
+        self.status = status
+        self.streaming_proxy = streaming_proxy
+        self.valid_until = datetime.datetime.now() + \
+            datetime.timedelta(seconds=consts.ROUTING_TABLE_ENTRY_TIMEOUT)
+
+    def is_expired(self):
+        """
+        :return: True if the status of the session must be checked again before using the route
+        """
+        return datetime.datetime.now() > self.valid_until
+
+
+class RoutingTable(object):
+    """
+    Thread safe table of routes indexed by session id
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self._mutex = threading.Lock()
+        self._routes = dict()
+
+    def get(self, session_id):
+        """
+        Returns the route of the given session
+        :param session_id: Id of the session
+        :return: A Route, or None if the session is unknown or if the route has expired
+        """
+        with self._mutex:
+            route = self._routes.get(str(session_id))
+        if route is None or route.is_expired():
+            return None
+        return route
+
+    def set(self, session_id, route):
+        """
+        Stores the route of the given session
+        :param session_id: Id of the session
+        :param route: Route of the session
+        """
+        with self._mutex:
+            self._routes[str(session_id)] = route
+
+    def remove(self, session_id):
+        """
+        Removes the route of the given session
+        :param session_id: Id of the session
+        """
+        with self._mutex:
+            route = self._routes.pop(str(session_id), None)
+        if route is not None:
+            log.info(2, 'Route to session ' + str(session_id) + ' invalidated')
+
+    def remove_if_moved(self, session_id, host, port):
+        """
+        Removes the route of the given session if it does not lead to the given address
+        :param session_id: Id of the session
+        :param host: Current host of the rendering resource of the session
+        :param port: Current port of the rendering resource of the session
+        """
+        with self._mutex:
+            route = self._routes.get(str(session_id))
+            if route is None or (route.host == host and route.port == port):
+                return
+            del self._routes[str(session_id)]
+        log.info(2, 'Route to session ' + str(session_id) + ' invalidated')
+
+    def clear(self):
+        """
+        Removes all routes
+        """
+        with self._mutex:
+            self._routes.clear()
+
+    def size(self):
+        """
+        :return: The number of routes in the table
+        """
+        with self._mutex:
+            return len(self._routes)
+
+
+# Global routing table used by the forwarding fast path
+globalRoutingTable = RoutingTable()
+
+
+# pylint: disable=W0613
+def invalidate_route(sender, instance, **kwargs):
+    """
+    Invalidates the route of a session that has been deleted
+    :param sender: Session model
+    :param instance: Session that has been deleted
+    """
+    globalRoutingTable.remove(instance.id)
+
+
+# pylint: disable=W0613
+def update_route(sender, instance, **kwargs):
+    """
+    Invalidates the route of a session that has been saved, if the session is no longer running
+    or if the address of its rendering resource changed. Other changes, such as keep-alive
+    updates, keep the route. Note that bulk updates do not send signals and must invalidate the
+    routes explicitly
+    :param sender: Session model
+    :param instance: Session that has been saved
+    """
+    if instance.status != SESSION_STATUS_RUNNING:
+        globalRoutingTable.remove(instance.id)
+    else:
+        globalRoutingTable.remove_if_moved(instance.id, instance.http_host, instance.http_port)
+
+
+post_save.connect(update_route, sender=Session)
+post_delete.connect(invalidate_route, sender=Session)
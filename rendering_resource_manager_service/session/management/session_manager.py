@@ -31,12 +31,15 @@ This class is in charge of handling session and ensures persistent storage in a
 
 import requests
 import datetime
+import time
 import uuid
+import threading
 import json
 
 from django.db import IntegrityError, transaction
 from django.http import HttpResponse
-from rendering_resource_manager_service.config.models import SystemGlobalSettings
+from rendering_resource_manager_service.config.models import SystemGlobalSettings, \
+    RenderingResourceSettings
 from rendering_resource_manager_service.session.models import Session, \
     SESSION_STATUS_STOPPED, SESSION_STATUS_SCHEDULED, SESSION_STATUS_STARTING, \
     SESSION_STATUS_RUNNING, SESSION_STATUS_STOPPING, SESSION_STATUS_BUSY, \
@@ -45,12 +48,16 @@ from rest_framework.renderers import JSONRenderer
 from rest_framework.parsers import JSONParser
 import rest_framework.status as http_status
 import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
 import rendering_resource_manager_service.session.management.session_manager_settings as consts
 from rendering_resource_manager_service.session.management import keep_alive_thread
+from rendering_resource_manager_service.session.management import liveness_prober
+from rendering_resource_manager_service.session.management import log_archive
+from rendering_resource_manager_service.session.management import routing_table
 from rendering_resource_manager_service.config.management import \
     rendering_resource_settings_manager as manager
 import rendering_resource_manager_service.service.settings as global_settings
-from job_manager import globalJobManager
+import job_manager
 import process_manager
 
 
@@ -170,9 +177,19 @@ class SessionManager(object):
             if session.process_pid != -1:
                 process_manager.ProcessManager.stop(session)
             if session.job_id is not None and session.job_id != '':
-                globalJobManager.stop(session)
-                globalJobManager.kill(session)
+                # Logs are archived first, as stopping the job may delete them
+                log_archive.archive_session(session)
+                try:
+                    session_job_manager = job_manager.get_job_manager(session)
+                    session_job_manager.stop(session)
+                    session_job_manager.kill(session)
+                except ValueError as e:
+                    # The backend of the session was disabled, its job is left to expire
+                    log.error('Job ' + str(session.job_id) + ' of session ' + str(session_id) +
+                              ' cannot be stopped: ' + str(e))
             session.delete()
+            liveness_prober.globalLivenessSnapshot.remove(session_id)
+            http_pool.evict(session.http_host, session.http_port)
             msg = 'Session successfully destroyed'
             log.info(1, msg)
             response = json.dumps({'contents': str(msg)})
@@ -249,55 +266,100 @@ class SessionManager(object):
         """
         try:
             session = Session.objects.get(id=session_id)
-            try:
-                url = 'http://' + session.http_host + ':' + \
-                      str(session.http_port) + '/' + consts.RR_SPECIFIC_COMMAND_VOCABULARY
-                log.info(1, 'Requesting vocabulary from ' + url)
-                r = requests.put(
-                    url=url,
-                    timeout=global_settings.REQUEST_TIMEOUT)
-                response = r.text
-                r.close()
-                return [http_status.HTTP_200_OK, response]
-            except requests.exceptions.RequestException as e:
-                # Failed to contact rendering resource, make sure that the corresponding
-                # job is still allocated
-                log.info(1, str(e))
-                hostname = ''
-                try:
-                    hostname = globalJobManager.hostname(session)
-                except AttributeError as e:
-                    log.error(str(e))
-
-                if hostname == '':
-                    log.info(1, 'Job has been cancelled. Destroying session')
-                    cls.delete_session(session_id)
-                    return [http_status.HTTP_404_NOT_FOUND, str(e)]
-                return [http_status.HTTP_503_SERVICE_UNAVAILABLE, str(e)]
+            return cls.probe_rendering_resource(session)
         except Session.DoesNotExist as e:
             # Requested session does not exist
             log.info(1, str(e))
             return [http_status.HTTP_404_NOT_FOUND, str(e)]
 
+    @classmethod
+    def probe_rendering_resource(cls, session):
+        """
+        Queries the vocabulary of the rendering resource held by the given session. If the
+        rendering resource cannot be contacted and the corresponding job is not allocated
+        anymore, the session is destroyed
+        :param session: Session holding the rendering resource
+        :return 200 code if rendering resource is able to provide vocabulary. 503
+                otherwise. 404 if the job has been cancelled.
+        """
+        if session.http_host == '':
+            # The job is not running yet, and is therefore not considered as cancelled
+            return [http_status.HTTP_503_SERVICE_UNAVAILABLE,
+                    'Rendering resource is not running yet']
+        try:
+            url = 'http://' + session.http_host + ':' + \
+                  str(session.http_port) + '/' + consts.RR_SPECIFIC_COMMAND_VOCABULARY
+            log.info(1, 'Requesting vocabulary from ' + url)
+            r = http_pool.put(
+                url=url,
+                timeout=global_settings.REQUEST_TIMEOUT)
+            response = r.text
+            r.close()
+            return [http_status.HTTP_200_OK, response]
+        except requests.exceptions.RequestException as e:
+            # Failed to contact rendering resource, make sure that the corresponding
+            # job is still allocated
+            log.info(1, str(e))
+            hostname = ''
+            try:
+                hostname = job_manager.get_job_manager(session).hostname(session)
+            except (AttributeError, ValueError) as e:
+                log.error(str(e))
+
+            if hostname in ['', 'FAILED']:
+                log.info(1, 'Job has been cancelled. Destroying session')
+                cls.delete_session(session.id)
+                return [http_status.HTTP_404_NOT_FOUND, str(e)]
+            return [http_status.HTTP_503_SERVICE_UNAVAILABLE, str(e)]
+
     @staticmethod
-    def __status_response(http_code, session_id, code, description, hostname, port):
+    def __liveness_status(session_id):
         """
-        Builds a JSon representation of the given parameters for HTTP responses
-        :param http_code: HTTP code
+        Returns the latest result of the background liveness probe of the rendering resource
+        held by the given session. The rendering resource itself is never contacted.
+        :param session_id: Id of the session
+        :return: A tuple containing the HTTP code and the description of the probe, or None if
+                 no recent probe result is available, in which case a probe is requested
+        """
+        status = liveness_prober.globalLivenessSnapshot.get(session_id)
+        if status is None:
+            liveness_prober.globalLivenessSnapshot.request_probe()
+            return None
+        return [status.code, status.contents]
+
+    @staticmethod
+    def __status_description(session_id, code, description, hostname, port):
+        """
+        Builds a dictionary describing the status of a session
         :param session_id: Session identifier
         :param code: Status code
         :param description: Status description
         :param hostname: Hostname of the rendering resource
         :param port: Port of the rendering resource
-        :return: JSon representation of the given parameters
+        :return: Dictionary describing the status of the session
         """
-        return [http_code, json.dumps({
+        return {
             'session': str(session_id),
             'code': code,
             'description': description,
             'hostname': hostname,
             'port': str(port)
-        })]
+        }
+
+    @staticmethod
+    def __status_response(http_code, session_id, code, description, hostname, port):
+        """
+        Builds a JSon representation of the given parameters for HTTP responses
+        :param http_code: HTTP code
+        :param session_id: Session identifier
+        :param code: Status code
+        :param description: Status description
+        :param hostname: Hostname of the rendering resource
+        :param port: Port of the rendering resource
+        :return: JSon representation of the given parameters
+        """
+        return [http_code, json.dumps(SessionManager.__status_description(
+            session_id, code, description, hostname, port))]
 
     @staticmethod
     def status_as_string(status):
@@ -325,6 +387,80 @@ class SessionManager(object):
         elif status == SESSION_STATUS_BUSY:
             return 'Busy'
 
+    @staticmethod
+    def __needs_liveness(session, wait_until_running):
+        """
+        :param session: Session to evaluate
+        :param wait_until_running: True if the rendering resource must answer liveness probes
+               before being considered as running
+        :return: True if the status of the session depends on the liveness of its rendering
+                 resource
+        """
+        return session.status in [SESSION_STATUS_RUNNING, SESSION_STATUS_BUSY] or \
+            (session.status == SESSION_STATUS_STARTING and wait_until_running)
+
+    @staticmethod
+    def __evaluate_status(session, liveness, wait_until_running):
+        """
+        Evaluates the new status of a session from its current status and from the latest
+        liveness probe of its rendering resource. The session itself is not modified
+        :param session: Session to evaluate
+        :param liveness: HTTP code and description of the latest liveness probe, or None if
+               not available
+        :param wait_until_running: True if the rendering resource must answer liveness probes
+               before being considered as running
+        :return: A tuple containing the new status code and its description. The status code is
+                 None if the job has been cancelled
+        """
+        # pylint: disable=R0911
+        session_status = session.status
+        liveness_code = None
+        if liveness is not None:
+            liveness_code = liveness[0]
+
+        if session_status == SESSION_STATUS_SCHEDULING:
+            return [session_status, str(session.configuration_id + ' is scheduled')]
+        elif session_status == SESSION_STATUS_SCHEDULED or \
+                session_status == SESSION_STATUS_GETTING_HOSTNAME:
+            if session.http_host != '':
+                return [SESSION_STATUS_STARTING, session.configuration_id + ' is starting']
+            return [session_status, str(session.configuration_id + ' is scheduled')]
+        elif session_status == SESSION_STATUS_STARTING:
+            # Rendering resource might be running but not yet capable of
+            # serving REST requests. The vocabulary is probed to make
+            # sure that the rendering resource is ready to serve REST
+            # requests.
+            if not wait_until_running or liveness_code == http_status.HTTP_200_OK:
+                return [SESSION_STATUS_RUNNING, session.configuration_id + ' is up and running']
+            elif liveness_code == http_status.HTTP_404_NOT_FOUND:
+                return [None, 'Job has been cancelled']
+            return [session_status, session.configuration_id +
+                    ' is starting but the HTTP interface is not yet available']
+        elif session_status == SESSION_STATUS_RUNNING:
+            if liveness_code is None or liveness_code == http_status.HTTP_200_OK:
+                # Rendering resource is currently running
+                return [session_status, session.configuration_id + ' is up and running']
+            elif liveness_code == http_status.HTTP_404_NOT_FOUND:
+                return [None, 'Job has been cancelled']
+            # Rendering resource has been started but is not responding anymore, it is busy
+            return [SESSION_STATUS_BUSY, session.configuration_id + ' is busy']
+        elif session_status == SESSION_STATUS_BUSY:
+            if liveness_code == http_status.HTTP_200_OK:
+                # Rendering resource is not busy anymore
+                return [SESSION_STATUS_RUNNING, session.configuration_id + ' is up and running']
+            elif liveness_code == http_status.HTTP_404_NOT_FOUND:
+                return [None, 'Job has been cancelled']
+            return [session_status, session.configuration_id + ' is busy']
+        elif session_status == SESSION_STATUS_STOPPING:
+            # Rendering resource is currently in the process of terminating.
+            return [session_status, str(session.configuration_id + ' is terminating...')]
+        elif session_status == SESSION_STATUS_STOPPED:
+            # Rendering resource is currently not active.
+            return [session_status, str(session.configuration_id + ' is not active')]
+        elif session_status == SESSION_STATUS_FAILED:
+            return [session_status, str('Job allocation failed for ' + session.configuration_id)]
+        return [session_status, 'Undefined']
+
     @staticmethod
     def query_status(session_id):
         """
@@ -335,115 +471,272 @@ class SessionManager(object):
         - Running: The rendering resource is started and ready to respond to REST requests
         - Stopping: tThe request for stopping the slurm job was made, but the application is not yet
           terminated
+        The availability of the rendering resource is read from the snapshot maintained by the
+        liveness prober thread, no request is sent to the rendering resource.
         :param session_id: Id of the session to be queried
         :return 200 code if rendering resource is able to process REST requests. 503
                 otherwise. 404 if specified session does not exist.
         """
         try:
             session = Session.objects.get(id=session_id)
-            status_description = 'Undefined'
             session_status = session.status
 
             log.info(1, 'Current session status is: ' +
                      SessionManager.status_as_string(session_status))
 
-            if session_status == SESSION_STATUS_SCHEDULING:
-                status_description = str(session.configuration_id + ' is scheduled')
-            elif session_status == SESSION_STATUS_SCHEDULED or \
-                            session_status == SESSION_STATUS_GETTING_HOSTNAME:
-                if session.http_host != '':
-                    status_description = session.configuration_id + ' is starting'
-                    log.info(1, status_description)
-                    session.status = SESSION_STATUS_STARTING
-                    session.save()
-                else:
-                    status_description = str(session.configuration_id + ' is scheduled')
-            elif session_status == SESSION_STATUS_STARTING:
-                # Rendering resource might be running but not yet capable of
-                # serving REST requests. The vocabulary is invoked to make
-                # sure that the rendering resource is ready to serve REST
-                # requests.
+            wait_until_running = True
+            if session_status == SESSION_STATUS_STARTING:
                 rr_settings = \
                     manager.RenderingResourceSettingsManager.\
                         get_by_id(session.configuration_id.lower())
-                if not rr_settings.wait_until_running:
-                    status_description = session.configuration_id + ' is up and running'
-                    log.info(1, status_description)
-                    session.status = SESSION_STATUS_RUNNING
-                    session.save()
-                else:
-                    log.info(1, 'Requesting rendering resource vocabulary')
-                    status = SessionManager.request_vocabulary(session_id)
-                    if status[0] == http_status.HTTP_200_OK and \
-                                    status[0] != http_status.HTTP_404_NOT_FOUND:
-                        status_description = session.configuration_id + ' is up and running'
-                        log.info(1, status_description)
-                        session.status = SESSION_STATUS_RUNNING
-                        session.save()
-                    elif status[0] == http_status.HTTP_404_NOT_FOUND:
-                        return [http_status.HTTP_404_NOT_FOUND, 'Job has been cancelled']
-                    else:
-                        status_description = session.configuration_id + \
-                            ' is starting but the HTTP interface is not yet available'
-            elif session_status == SESSION_STATUS_RUNNING:
+                wait_until_running = rr_settings.wait_until_running
+
+            liveness = None
+            if SessionManager.__needs_liveness(session, wait_until_running):
+                liveness = SessionManager.__liveness_status(session_id)
+
+            status = SessionManager.__evaluate_status(session, liveness, wait_until_running)
+            if status[0] is None:
+                return SessionManager.__status_response(
+                    http_code=http_status.HTTP_404_NOT_FOUND, session_id=session_id,
+                    code=SESSION_STATUS_STOPPED, description=status[1],
+                    hostname='', port=0)
+            log.info(1, status[1])
+
+            if session_status == SESSION_STATUS_RUNNING:
                 # Update the timestamp if the current value is expired
                 sgs = SystemGlobalSettings.objects.get()
                 if datetime.datetime.now() > session.valid_until:
                     session.valid_until = datetime.datetime.now() + datetime.timedelta(
                         seconds=sgs.session_keep_alive_timeout)
                     session.save()
-                status = SessionManager.request_vocabulary(session_id)
-                if status[0] == http_status.HTTP_200_OK:
-                    # Rendering resource is currently running
-                    status_description = session.configuration_id + ' is up and running'
-                elif status[0] == http_status.HTTP_404_NOT_FOUND:
-                    return SessionManager.__status_response(
-                        http_code=status[0], session_id=session_id,
-                        code=SESSION_STATUS_STOPPED, description='Job has been cancelled',
-                        hostname='', port=0)
-                else:
-                    # Rendering resource has been started but is not responding anymore, it is busy
-                    status_description = session.configuration_id + ' is busy'
-                    session.status = SESSION_STATUS_BUSY
-                    session.save()
-
-            elif session_status == SESSION_STATUS_BUSY:
-                status = SessionManager.request_vocabulary(session_id)
-                if status[0] == http_status.HTTP_200_OK:
-                    # Rendering resource is not busy anymore
-                    status_description = session.configuration_id + ' is up and running'
-                    session.status = SESSION_STATUS_RUNNING
-                    session.save()
-                else:
-                    if status[0] == http_status.HTTP_404_NOT_FOUND:
-                        return SessionManager.__status_response(
-                            http_code=status[0], session_id=session_id,
-                            code=SESSION_STATUS_STOPPED, description='Job has been cancelled',
-                            hostname='', port=0)
-                    else:
-                        status_description = session.configuration_id + ' is busy'
 
+            if status[0] != session_status:
+                session.status = status[0]
+                session.save()
             elif session_status == SESSION_STATUS_STOPPING:
-                # Rendering resource is currently in the process of terminating.
-                status_description = str(session.configuration_id + ' is terminating...')
                 session.delete()
                 session.save()
-            elif session_status == SESSION_STATUS_STOPPED:
-                # Rendering resource is currently not active.
-                status_description = str(session.configuration_id + ' is not active')
-            elif session_status == SESSION_STATUS_FAILED:
-                status_description = str('Job allocation failed for ' + session.configuration_id)
 
-            status_code = session.status
             return SessionManager.__status_response(
                 http_code=http_status.HTTP_200_OK, session_id=session_id,
-                code=status_code, description=status_description,
+                code=session.status, description=status[1],
                 hostname=session.http_host, port=session.http_port)
         except Session.DoesNotExist as e:
             # Requested session does not exist
             log.error(str(e))
             return [http_status.HTTP_404_NOT_FOUND, str(e)]
 
+    @staticmethod
+    def query_statuses(session_ids):
+        """
+        Queries the status of several sessions at once. Sessions are read with a single query,
+        and liveness results are taken from the snapshot maintained by the liveness prober: no
+        request is sent to the rendering resources or to the job managers, and no session is
+        destroyed. Status transitions are stored with one update per new status
+        :param session_ids: Ids of the sessions to be queried, at most
+               STATUS_QUERY_MAX_SESSIONS
+        :return 200 code and a JSON document containing the status of each existing session
+                and the list of unknown session ids. 400 if too many sessions are queried
+        """
+        if len(session_ids) > consts.STATUS_QUERY_MAX_SESSIONS:
+            response = json.dumps({'contents': 'At most ' +
+                                               str(consts.STATUS_QUERY_MAX_SESSIONS) +
+                                               ' sessions can be queried at once'})
+            return [http_status.HTTP_400_BAD_REQUEST, response]
+        sessions = list(Session.objects.filter(id__in=session_ids))
+        configuration_ids = set([session.configuration_id.lower() for session in sessions])
+        wait_until_running = dict(
+            RenderingResourceSettings.objects.filter(id__in=configuration_ids).values_list(
+                'id', 'wait_until_running'))
+
+        def waits(session):
+            """
+            :return: True if the rendering resource of the session must answer liveness probes
+                     before being considered as running
+            """
+            return wait_until_running.get(session.configuration_id.lower(), True)
+
+        statuses = list()
+        transitions = dict()
+        probe_requested = False
+        for session in sessions:
+            liveness = None
+            if SessionManager.__needs_liveness(session, waits(session)):
+                liveness = liveness_prober.globalLivenessSnapshot.get(session.id)
+                if liveness is not None:
+                    liveness = [liveness.code, liveness.contents]
+                elif not probe_requested:
+                    # Sessions without a recent probe result are probed in the background
+                    liveness_prober.globalLivenessSnapshot.request_probe()
+                    probe_requested = True
+            status = SessionManager.__evaluate_status(session, liveness, waits(session))
+            if status[0] is None:
+                statuses.append(SessionManager.__status_description(
+                    session.id, SESSION_STATUS_STOPPED, status[1], '', 0))
+                continue
+            if status[0] != session.status:
+                transitions.setdefault(status[0], list()).append(session.id)
+            statuses.append(SessionManager.__status_description(
+                session.id, status[0], status[1], session.http_host, session.http_port))
+
+        # Bulk updates do not send signals, routes of sessions leaving the running state are
+        # invalidated explicitly
+        for new_status, ids in transitions.items():
+            Session.objects.filter(id__in=ids).update(status=new_status)
+            if new_status != SESSION_STATUS_RUNNING:
+                for session_id in ids:
+                    routing_table.globalRoutingTable.remove(session_id)
+
+        # Update the timestamp of running sessions if the current value is expired
+        sgs = SystemGlobalSettings.objects.get()
+        now = datetime.datetime.now()
+        Session.objects.filter(
+            id__in=[session.id for session in sessions],
+            status=SESSION_STATUS_RUNNING, valid_until__lt=now).update(
+                valid_until=now + datetime.timedelta(seconds=sgs.session_keep_alive_timeout))
+
+        found_ids = [str(session.id) for session in sessions]
+        unknown_ids = [str(session_id) for session_id in session_ids
+                       if str(session_id) not in found_ids]
+        return [http_status.HTTP_200_OK,
+                json.dumps({'statuses': statuses, 'unknown': unknown_ids})]
+
+    @classmethod
+    def verify_hostname(cls, session):
+        """
+        Verify the existence of an hostname for the current session, and tries
+        to populate it if null
+        :param session: Session holding the rendering resource
+        :return: A tuple containing the status and a description of the hostname
+        """
+        log.info(2, 'Verifying hostname ' + session.http_host + ' for session ' + str(session.id))
+        if job_manager.hostname_reported(session) and session.http_host == '':
+            # The rendering resource reports its hostname once it is launched
+            msg = 'Job scheduled but ' + session.configuration_id + ' is not yet running'
+            response = json.dumps({'contents': str(msg)})
+            return [200, response]
+        if not session.status == SESSION_STATUS_GETTING_HOSTNAME and \
+                session.job_id and session.http_host == '':
+            session.status = SESSION_STATUS_GETTING_HOSTNAME
+            session.save()
+            log.info(1, 'Querying JOB hostname for job id: ' + str(session.job_id))
+            try:
+                hostname = job_manager.get_job_manager(session).hostname(session)
+            except ValueError as e:
+                # The backend of the session was disabled, the session can only be destroyed
+                log.error(str(e))
+                hostname = 'FAILED'
+            if hostname == '':
+                msg = 'Job scheduled but ' + session.configuration_id + ' is not yet running'
+                log.error(msg)
+                if session.status != SESSION_STATUS_STARTING:
+                    session.status = SESSION_STATUS_SCHEDULED
+                    session.save()
+                response = json.dumps({'contents': str(msg)})
+                return [200, response]
+            elif hostname == 'FAILED':
+                cls.delete_session(session.id)
+                msg = 'Job as been cancelled'
+                log.error(msg)
+                response = json.dumps({'contents': str(msg)})
+                return [404, response]
+            else:
+                session.http_host = hostname
+                session.save()
+                msg = 'Resolved hostname for job ' + str(session.job_id) + ' to ' + \
+                      str(session.http_host)
+                log.info(1, msg)
+                response = json.dumps({'contents': str(msg)})
+                return [200, response]
+        response = json.dumps({'contents': str('Job is running on host ' + session.http_host)})
+        return [200, response]
+
+    @staticmethod
+    def __status_changed(status, since):
+        """
+        Compares a session status with the values known by the client
+        :param status: Decoded JSON status of the session, as returned by query_status
+        :param since: Dictionary containing the code, and optionally the hostname and port,
+               known by the client
+        :return: True if any of the values known by the client has changed
+        """
+        for key in ['code', 'hostname', 'port']:
+            if since.get(key) is not None and str(since[key]) != str(status[key]):
+                return True
+        return False
+
+    @classmethod
+    def __check_hostname(cls, session_id, next_check):
+        """
+        Resolves the hostname of a scheduled session, the same way the session commands do,
+        so that clients only watching the status see the rendering resource start. The
+        scheduler is queried at most once every STATUS_WATCH_HOSTNAME_INTERVAL seconds
+        :param session_id: Id of the watched session
+        :param next_check: Time of the next check
+        :return: The time of the following check
+        """
+        if time.time() < next_check:
+            return next_check
+        try:
+            session = Session.objects.get(id=session_id)
+            if session.job_id and session.http_host == '':
+                cls.verify_hostname(session)
+        except Session.DoesNotExist:
+            pass
+        return time.time() + consts.STATUS_WATCH_HOSTNAME_INTERVAL
+
+    @staticmethod
+    def wait_for_status_change(session_id, since, timeout):
+        """
+        Waits until the status code, hostname or port of the session differs from the values
+        known by the client, or until the timeout expires (long-poll)
+        :param session_id: Id of the session to be queried
+        :param since: Dictionary containing the code, and optionally the hostname and port,
+               known by the client
+        :param timeout: Maximum waiting time (in seconds)
+        :return: The result of query_status for the session
+        """
+        deadline = time.time() + timeout
+        next_check = time.time()
+        while True:
+            next_check = SessionManager.__check_hostname(session_id, next_check)
+            status = SessionManager.query_status(session_id)
+            if status[0] != http_status.HTTP_200_OK or \
+                    SessionManager.__status_changed(json.loads(status[1]), since) or \
+                    time.time() >= deadline:
+                return status
+            time.sleep(consts.STATUS_WATCH_INTERVAL)
+
+    @staticmethod
+    def status_events(session_id, duration=consts.STATUS_STREAM_DURATION):
+        """
+        Generates server-sent events for each change of the status code, hostname or port of
+        the session. Comments are sent periodically to keep the connection alive, and the
+        stream ends when the session is destroyed or when the duration expires
+        :param session_id: Id of the session to be queried
+        :param duration: Maximum duration of the stream (in seconds)
+        """
+        deadline = time.time() + duration
+        heartbeat = time.time() + consts.STATUS_STREAM_HEARTBEAT
+        last_status = None
+        next_check = time.time()
+        while time.time() < deadline:
+            next_check = SessionManager.__check_hostname(session_id, next_check)
+            status = SessionManager.query_status(session_id)
+            if status[0] != http_status.HTTP_200_OK:
+                yield 'event: error\ndata: ' + json.dumps({'contents': str(status[1])}) + '\n\n'
+                return
+            current_status = json.loads(status[1])
+            if last_status is None or SessionManager.__status_changed(current_status, last_status):
+                last_status = current_status
+                heartbeat = time.time() + consts.STATUS_STREAM_HEARTBEAT
+                yield 'event: status\ndata: ' + status[1] + '\n\n'
+            elif time.time() >= heartbeat:
+                heartbeat = time.time() + consts.STATUS_STREAM_HEARTBEAT
+                yield ': keep-alive\n\n'
+            time.sleep(consts.STATUS_WATCH_INTERVAL)
+
     @classmethod
     def keep_alive_session(cls, session_id):
         """
@@ -494,3 +787,7 @@ class SessionManager(object):
         except KeyError:
             log.error('No authentication token provided')
             return None
+
+
+# Status watches running at the same time (see StatusWatchViewSet)
+globalStatusWatches = threading.BoundedSemaphore(consts.STATUS_WATCH_MAX_CONCURRENT)
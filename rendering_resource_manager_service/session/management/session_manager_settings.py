@@ -64,12 +64,124 @@ SLURM_OUTPUT_PREFIX_NFS = '/home/' + global_settings.SLURM_USERNAME +\
 SLURM_ERR_FILE = 'err.log'
 SLURM_OUT_FILE = 'out.log'
 SLURM_ALLOCATION_TIMEOUT = 10
+# Maximum time to wait for the concurrent allocation commands to answer (in seconds)
+SLURM_ALLOCATION_RESULT_TIMEOUT = \
+    SLURM_ALLOCATION_TIMEOUT + global_settings.SLURM_SSH_CONNECT_TIMEOUT + 30
+
+# Delimiter of the job script passed to sbatch in batch launch mode
+SLURM_JOB_SCRIPT_DELIMITER = 'RRM_JOB_SCRIPT'
+
+# Prefix of the file, in the home directory of the cluster user, holding the callback token of
+# a batch job until the job script reads it
+SLURM_CALLBACK_TOKEN_FILE = '.rrm_callback_'
+
+# Header carrying the callback token of a batch job
+SLURM_CALLBACK_TOKEN_HEADER = 'X-RRM-Callback-Token'
+
+# Frequency at which the Slurm jobs of all sessions are listed, and delay after which a listing
+# is no longer trusted (in seconds)
+SLURM_JOB_WATCH_INTERVAL = 2
+SLURM_JOB_WATCH_EXPIRY = 30
 
 # Session management
 RRM_SPECIFIC_COMMAND_KEEPALIVE = 'keepalive'
 RRM_SPECIFIC_COMMAND_RESUME = 'resume'
 RRM_SPECIFIC_COMMAND_SUSPEND = 'suspend'
 
+# Session commands handled by the resource manager, all others are forwarded to the rendering
+# resource
+RRM_SESSION_COMMAND_IMAGE = 'image'
+RRM_SESSION_COMMAND_CALLBACK = 'callback'
+RRM_SESSION_COMMANDS = ['schedule', 'open', 'status', 'log', 'err', 'job',
+                        RRM_SESSION_COMMAND_IMAGE, RRM_SESSION_COMMAND_CALLBACK]
+
+# Session status watch (long-poll and server-sent events): the hostname of scheduled sessions
+# is resolved every STATUS_WATCH_HOSTNAME_INTERVAL seconds, and at most
+# STATUS_WATCH_MAX_CONCURRENT watches run at the same time
+STATUS_WATCH_DEFAULT_WAIT = 30
+STATUS_WATCH_MAX_WAIT = 60
+STATUS_WATCH_INTERVAL = 0.5
+STATUS_WATCH_HOSTNAME_INTERVAL = 5
+STATUS_WATCH_MAX_CONCURRENT = 16
+STATUS_STREAM_DURATION = 300
+STATUS_STREAM_HEARTBEAT = 15
+
+# Maximum number of sessions queried by a single batch status request, which keeps the
+# session lookup below the limit of variables of a database query
+STATUS_QUERY_MAX_SESSIONS = 500
+
+# Size of the chunks relayed by the streaming proxy (in bytes)
+STREAMING_CHUNK_SIZE = 65536
+
+# WebSocket tunnels to the rendering resources (see websocket_tunnel.py)
+WEBSOCKET_TUNNEL_PATH = '/session/websocket'
+WEBSOCKET_KEEP_ALIVE_INTERVAL = 10
+
 # Rendering resource commands
 RR_SPECIFIC_COMMAND_VOCABULARY = 'registry'
 RR_SPECIFIC_COMMAND_EXIT = 'v1/exit'
+RR_SPECIFIC_COMMAND_IMAGE = 'IMAGEJPEG'
+
+# Field holding the base64 encoded image in the JSON frames of the rendering resources
+RR_IMAGE_DATA_FIELD = 'data'
+
+# Frames shared by the viewers of a session: minimum delay between two frames fetched from a
+# rendering resource (in seconds), and maximum memory used by the frames of all sessions
+FRAME_HUB_INTERVAL = 0.04
+FRAME_HUB_MAX_SIZE = 64 * 1024 * 1024
+FRAME_SEQUENCE_HEADER = 'X-Frame-Sequence'
+
+# Delay after which the status of a running session is checked again before forwarding
+# commands to its rendering resource (in seconds)
+ROUTING_TABLE_ENTRY_TIMEOUT = 30
+
+# Background tasks (see task_queue.py): commands run by the task workers, frequency at which
+# pending tasks are looked up, and delay after which finished tasks are deleted (in seconds)
+TASK_COMMAND_SCHEDULE = 'schedule'
+TASK_COMMAND_STOP = 'stop'
+TASK_COMMAND_LOG = 'log'
+TASK_COMMAND_ERR = 'err'
+TASK_QUEUE_POLL_INTERVAL = 1
+TASK_QUEUE_RETENTION = 600
+
+# Commands that can safely be run again when interrupted, and task parameters that are removed
+# from the database once the task is finished
+TASK_REPLAYABLE_COMMANDS = [TASK_COMMAND_STOP, TASK_COMMAND_LOG, TASK_COMMAND_ERR]
+TASK_SECRET_PARAMETERS = ['auth_token']
+
+# Frequency at which the processes refresh the heartbeat of the tasks they run, and delay after
+# which a task whose heartbeat stopped is considered interrupted (in seconds)
+TASK_QUEUE_HEARTBEAT_INTERVAL = 10
+TASK_QUEUE_HEARTBEAT_EXPIRY = 60
+
+# Maximum number of bytes read from the end of a log file when its last lines are requested
+LOG_TAIL_CHUNK_SIZE = 65536
+
+# Contents returned instead of the log while the rendering resource is not started
+LOG_NOT_AVAILABLE = 'Not currently available'
+
+# Log streams (see log_stream.py): number of last lines sent when a stream starts, frequency at
+# which logs that cannot be followed are read (in seconds), maximum number of lines waiting for
+# a subscriber, frequency of keep-alive comments, maximum duration of a stream (in seconds) and
+# maximum number of streams running at the same time
+LOG_STREAM_BACKLOG = 100
+LOG_STREAM_INTERVAL = 1
+LOG_STREAM_QUEUE_SIZE = 1000
+LOG_STREAM_HEARTBEAT = 15
+LOG_STREAM_DURATION = 3600
+LOG_STREAM_MAX_CONCURRENT = 16
+
+# Health of the Slurm cluster nodes (see frontend_health.py): weight of the latest request in
+# the smoothed success rate and latency, and latency halving the score of a cluster node
+FRONTEND_HEALTH_SMOOTHING = 0.2
+FRONTEND_HEALTH_LATENCY_REFERENCE = 10.0
+
+# Node agents (see agent_job_manager.py): maximum duration of a request waiting for process
+# exit events (in seconds), and delay before retrying an agent that could not be reached
+NODE_AGENT_EVENTS_WAIT = 30
+NODE_AGENT_RETRY_DELAY = 5
+
+# Warm pool of pre-allocated rendering resources (see warm_pool.py): owner of the warm sessions,
+# and frequency at which the pool is refilled (in seconds)
+WARM_POOL_OWNER = 'warm-pool'
+WARM_POOL_INTERVAL = 10
@@ -29,10 +29,12 @@
 The Slurm job manager is in charge of managing slurm jobs.
 """
 
-import subprocess
 import requests
 import traceback
+import threading
 from threading import Lock
+import time
+import Queue
 import json
 import re
 from string import Template
@@ -41,15 +43,19 @@ import rendering_resource_manager_service.session.management.session_manager_set
 from rendering_resource_manager_service.config.management import \
     rendering_resource_settings_manager as manager
 import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.utils.tools as tools
+from rendering_resource_manager_service.session.management import slurm_job_watcher
+from rendering_resource_manager_service.session.management import frontend_health
+from rendering_resource_manager_service.session.management.job_locks import JobLocks
 from rendering_resource_manager_service.session.models import \
     SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, \
     SESSION_STATUS_SCHEDULING, SESSION_STATUS_SCHEDULED, SESSION_STATUS_FAILED
 import rendering_resource_manager_service.service.settings as global_settings
 
-
-SLURM_SSH_COMMAND = '/usr/bin/ssh -i ' + \
-                  global_settings.SLURM_SSH_KEY + ' ' + \
-                  global_settings.SLURM_USERNAME + '@'
+# DNS names of compute nodes, which start with a letter, unlike IP addresses
+COMPUTE_NODE_PATTERN = re.compile(r'^[a-zA-Z][a-zA-Z0-9-]*(\.[a-zA-Z0-9-]+)*$')
 
 
 class SlurmJobManager(object):
@@ -61,7 +67,9 @@ class SlurmJobManager(object):
         """
         Setup job manager
         """
-        self._mutex = Lock()
+        self._locks = JobLocks(global_settings.SCHEDULER_MAX_REQUESTS_PER_CLUSTER)
+        self._statistics_mutex = Lock()
+        self._allocation_statistics = dict()
 
     def schedule(self, session, job_information, auth_token=None):
         """
@@ -72,6 +80,8 @@ class SlurmJobManager(object):
         :param auth_token: Currently not used by Slurm
         :return: A Json response containing on ok status or a description of the error
         """
+        if global_settings.SLURM_LAUNCH_MODE == global_settings.SLURM_LAUNCH_MODE_BATCH:
+            return self.submit(session, job_information)
         status = self.allocate(session, job_information)
         if status[0] == 200:
             session.http_host = self.hostname(session)
@@ -87,10 +97,28 @@ class SlurmJobManager(object):
         :param job_information: Information about the job
         :return: A Json response containing on ok status or a description of the error
         """
+        if global_settings.SLURM_ALLOCATION_MODE == \
+                global_settings.SLURM_ALLOCATION_MODE_CONCURRENT:
+            self._locks.lock_session(session.id)
+            try:
+                return self._allocate_concurrently(session, job_information)
+            finally:
+                self._locks.unlock_session(session.id)
+        return self._allocate_sequentially(session, job_information)
+
+    def _allocate_sequentially(self, session, job_information):
+        """
+        Submits the allocation to the cluster nodes one after the other, until one of them
+        grants the job
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
         status = None
-        for cluster_node in global_settings.SLURM_HOSTS:
+        for cluster_node in frontend_health.globalFrontendHealth.order(
+                global_settings.SLURM_HOSTS):
+            self._locks.lock_session(session.id)
             try:
-                self._mutex.acquire()
                 session.status = SESSION_STATUS_SCHEDULING
                 session.cluster_node = cluster_node
                 session.save()
@@ -99,20 +127,23 @@ class SlurmJobManager(object):
 
                 job_information.cluster_node = cluster_node
                 command_line = self._build_allocation_command(session, job_information)
-                process = subprocess.Popen(
-                    [command_line],
-                    shell=True,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE)
-
-                error = process.communicate()[1]
-                if len(re.findall('Granted', error)) != 0:
-                    session.job_id = re.findall('\\d+', error)[0]
+                start_time = time.time()
+                try:
+                    with self._locks.cluster(cluster_node):
+                        result = ssh_pool.run(cluster_node, command_line)
+                except OSError as e:
+                    result = [-1, '', str(e)]
+                error = result[2]
+                job_id = self._granted_job_id(error)
+                self._record_allocation(cluster_node, time.time() - start_time, job_id,
+                                        self._reached(result))
+                if job_id is not None:
+                    session.job_id = job_id
                     log.info(1, 'Allocated job ' + str(session.job_id) +
                              ' on cluster node ' + cluster_node)
                     session.status = SESSION_STATUS_SCHEDULED
                     session.save()
+                    slurm_job_watcher.globalSlurmJobTable.request_refresh()
                     response = json.dumps({'message': 'Job scheduled', 'jobId': session.job_id})
                     status = [200, response]
                     break
@@ -122,16 +153,191 @@ class SlurmJobManager(object):
                     log.error(error)
                     response = json.dumps({'contents': error})
                     status = [400, response]
-                process.stdin.close()
             except OSError as e:
                 log.error(str(e))
                 response = json.dumps({'contents': str(e)})
                 status = [400, response]
             finally:
-                if self._mutex.locked():
-                    self._mutex.release()
+                self._locks.unlock_session(session.id)
         return status
 
+    def _allocate_concurrently(self, session, job_information):
+        """
+        Submits the allocation to all cluster nodes at the same time. The first granted job is
+        kept and the jobs granted by the other cluster nodes are cancelled
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
+        session.status = SESSION_STATUS_SCHEDULING
+        session.save()
+
+        cluster_nodes = frontend_health.globalFrontendHealth.order(global_settings.SLURM_HOSTS)
+        log.info(1, 'Scheduling job for session ' + session.id + ' on ' +
+                 str(len(cluster_nodes)) + ' cluster nodes')
+
+        command_line = self._build_allocation_command(session, job_information)
+        cluster_node, job_id, error = self._submit_allocation(cluster_nodes, command_line)
+        if job_id is None:
+            session.status = SESSION_STATUS_FAILED
+            session.save()
+            log.error(error)
+            return [400, json.dumps({'contents': error})]
+
+        log.info(1, 'Allocated job ' + str(job_id) + ' on cluster node ' + cluster_node)
+        job_information.cluster_node = cluster_node
+        session.cluster_node = cluster_node
+        session.job_id = job_id
+        session.status = SESSION_STATUS_SCHEDULED
+        session.save()
+        slurm_job_watcher.globalSlurmJobTable.request_refresh()
+        return [200, json.dumps({'message': 'Job scheduled', 'jobId': job_id})]
+
+    def _submit_allocation(self, cluster_nodes, command_line):
+        """
+        Runs the allocation command on the given cluster nodes concurrently and returns as soon
+        as one of them grants the job. Jobs granted afterwards are cancelled in the background
+        :param cluster_nodes: Cluster nodes to which the allocation is submitted
+        :param command_line: Allocation command
+        :return: The cluster node, the granted job id (None if no job was granted) and the
+                 error returned by the last cluster node
+        """
+        results = Queue.Queue()
+
+        def submit(cluster_node):
+            """
+            Runs the allocation command on the given cluster node. A result is always posted,
+            so that the caller is not left waiting if the command fails unexpectedly
+            :param cluster_node: Cluster node to which the allocation is submitted
+            """
+            start_time = time.time()
+            result = [-1, '', 'Allocation failed on ' + cluster_node]
+            job_id = None
+            try:
+                try:
+                    with self._locks.cluster(cluster_node):
+                        result = ssh_pool.run(cluster_node, command_line)
+                except OSError as e:
+                    result = [-1, '', str(e)]
+                job_id = self._granted_job_id(result[2])
+                self._record_allocation(cluster_node, time.time() - start_time, job_id,
+                                        self._reached(result))
+            # pylint: disable=W0703
+            except Exception as e:
+                log.error('Allocation failed on ' + cluster_node + ': ' + str(e))
+            finally:
+                results.put([cluster_node, job_id, result[2]])
+
+        for cluster_node in cluster_nodes:
+            thread = threading.Thread(target=submit, args=(cluster_node,))
+            thread.daemon = True
+            thread.start()
+
+        result = [None, None, 'No cluster node is configured']
+        deadline = time.time() + settings.SLURM_ALLOCATION_RESULT_TIMEOUT
+        pending = len(cluster_nodes)
+        while pending > 0:
+            try:
+                result = results.get(timeout=max(0, deadline - time.time()))
+            except Queue.Empty:
+                result = [None, None, 'No cluster node answered the allocation in time']
+                break
+            pending -= 1
+            if result[1] is not None:
+                break
+        if pending > 0:
+            # Jobs granted by the cluster nodes that did not answer yet are not used
+            thread = threading.Thread(target=self._cancel_late_grants, args=(results, pending))
+            thread.daemon = True
+            thread.start()
+        return result
+
+    @staticmethod
+    def _cancel_late_grants(results, pending):
+        """
+        Cancels the jobs granted after the allocation was already satisfied by another cluster
+        node
+        :param results: Queue receiving the allocation results
+        :param pending: Number of allocation results still to be received
+        """
+        for _ in range(pending):
+            cluster_node, job_id, _ = results.get()
+            if job_id is None:
+                continue
+            log.info(1, 'Cancelling job ' + job_id + ' granted by cluster node ' + cluster_node)
+            try:
+                ssh_pool.run(cluster_node, 'scancel ' + job_id)
+            except OSError as e:
+                log.error('Failed to cancel job ' + job_id + ' on ' + cluster_node + ': ' + str(e))
+
+    @staticmethod
+    def _granted_job_id(error):
+        """
+        :param error: Error output of the allocation command
+        :return: The id of the granted job, or None if the allocation failed
+        """
+        if len(re.findall('Granted', error)) == 0:
+            return None
+        return re.findall('\\d+', error)[0]
+
+    @staticmethod
+    def _reached(result):
+        """
+        :param result: Exit code, output and error output of a command run on a cluster node,
+                       the exit code being negative if ssh could not be run
+        :return: True if the cluster node was reached, whatever the outcome of the command
+        """
+        return result[0] >= 0 and result[0] != ssh_pool.SSH_CONNECTION_ERROR
+
+    def _record_allocation(self, cluster_node, latency, job_id, reached=True):
+        """
+        Records the latency of an allocation request, and its outcome. Only failures to reach
+        the cluster node affect its health: allocations rejected by the scheduler are counted
+        separately
+        :param cluster_node: Cluster node to which the allocation was submitted
+        :param latency: Time taken by the cluster node to answer (in seconds)
+        :param job_id: Granted job id, or None if the allocation failed
+        :param reached: False if the cluster node could not be reached
+        """
+        if job_id is not None:
+            outcome = 'granted'
+        elif reached:
+            outcome = 'rejected'
+        else:
+            outcome = 'unreachable'
+        log.info(1, 'Allocation on cluster node ' + cluster_node + ' took ' +
+                 '%.2f' % latency + ' seconds (' + outcome + ')')
+        with self._statistics_mutex:
+            statistics = self._allocation_statistics.setdefault(
+                cluster_node, {'requests': 0, 'grants': 0, 'rejections': 0,
+                               'total_latency': 0.0})
+            statistics['requests'] += 1
+            if job_id is not None:
+                statistics['grants'] += 1
+            elif reached:
+                statistics['rejections'] += 1
+            statistics['total_latency'] += latency
+            statistics['last_latency'] = latency
+        frontend_health.globalFrontendHealth.record(cluster_node, latency, reached)
+        if job_id is None and reached:
+            frontend_health.globalFrontendHealth.record_rejection(cluster_node)
+
+    def allocation_statistics(self):
+        """
+        :return: A dictionary containing, per cluster node, the number of allocation requests,
+                 grants and rejections, and the average and last allocation latencies (in
+                 seconds)
+        """
+        with self._statistics_mutex:
+            return dict(
+                (cluster_node, {
+                    'requests': statistics['requests'],
+                    'grants': statistics['grants'],
+                    'rejections': statistics['rejections'],
+                    'average_latency': statistics['total_latency'] / statistics['requests'],
+                    'last_latency': statistics['last_latency']})
+                for cluster_node, statistics in self._allocation_statistics.items())
+
     def start(self, session, job_information):
         """
         Start the rendering resource using the job allocated by the schedule method. If successful,
@@ -140,55 +346,23 @@ class SlurmJobManager(object):
         :param job_information: Information about the job
         :return: A Json response containing on ok status or a description of the error
         """
+        self._locks.lock_session(session.id)
         try:
-            self._mutex.acquire()
             session.status = SESSION_STATUS_STARTING
             session.save()
 
             rr_settings = \
                 manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+            full_command = '\'' + ' && '.join(self._build_launch_commands(
+                session, job_information, session.http_host, session.job_id)) + '\''
 
-            # Modules
-            full_command = '\'source /etc/profile &&  module purge && '
-            if rr_settings.modules is not None:
-                values = rr_settings.modules.split()
-                for module in values:
-                    full_command += 'module load ' + module.strip() + ' && '
-
-            # Environment variables
-            if rr_settings.environment_variables is not None:
-                values = rr_settings.environment_variables.split()
-                values += job_information.environment.split()
-                for variable in values:
-                    full_command += variable + ' '
-
-            # Command lines parameters
-            rest_parameters = manager.RenderingResourceSettingsManager.format_rest_parameters(
-                str(rr_settings.scheduler_rest_parameters_format),
-                str(session.http_host),
-                str(session.http_port),
-                'rest' + str(rr_settings.id + session.id),
-                str(session.job_id))
-            full_command += rr_settings.command_line
-            values = rest_parameters.split()
-            values += job_information.params.split()
-            for parameter in values:
-                full_command += ' ' + parameter
-
-            # Output redirection
-            full_command += ' > ' + self._file_name(session, settings.SLURM_OUT_FILE)
-            full_command += ' 2> ' + self._file_name(session, settings.SLURM_ERR_FILE)
-            full_command += '\''
-
-            command_line = Template(' "srun --jobid=$job_id /bin/bash -c $full_command"').\
+            command_line = Template('srun --jobid=$job_id /bin/bash -c $full_command').\
                 substitute(job_id=session.job_id, full_command=full_command)
 
-            ssh_command = SLURM_SSH_COMMAND + session.cluster_node + command_line
+            with self._locks.cluster(session.cluster_node):
+                ssh_pool.spawn_detached(session.cluster_node, command_line)
 
-            subprocess.Popen([ssh_command], shell=True, stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-
-            log.info(1, 'Connect to frontend machine with command: ' + ssh_command)
+            log.info(1, 'Run on frontend machine ' + session.cluster_node + ': ' + command_line)
 
             if rr_settings.wait_until_running:
                 session.status = SESSION_STATUS_STARTING
@@ -202,8 +376,113 @@ class SlurmJobManager(object):
             response = json.dumps({'contents': str(e)})
             return [400, response]
         finally:
-            if self._mutex.locked():
-                self._mutex.release()
+            self._locks.unlock_session(session.id)
+
+    def submit(self, session, job_information):
+        """
+        Submits a job script launching the rendering resource, in a single request to the
+        cluster node. Once the job is running, the rendering resource reports its hostname and
+        port through the callback command, so that the hostname does not need to be queried.
+        If the submission is successful, the session job_id is populated and the session status
+        is set to SESSION_STATUS_SCHEDULED
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
+        status = [400, json.dumps({'contents': 'No cluster node is configured'})]
+        self._locks.lock_session(session.id)
+        try:
+            session.status = SESSION_STATUS_SCHEDULING
+            session.http_host = ''
+            session.save()
+            for cluster_node in frontend_health.globalFrontendHealth.order(
+                    global_settings.SLURM_HOSTS):
+                session.cluster_node = cluster_node
+                job_information.cluster_node = cluster_node
+                command_line = self._build_batch_command(session, job_information)
+                start_time = time.time()
+                try:
+                    with self._locks.cluster(cluster_node):
+                        result = ssh_pool.run(cluster_node, command_line)
+                except OSError as e:
+                    result = [-1, '', str(e)]
+                submitted = re.search(r'Submitted batch job (\d+)', result[1])
+                job_id = None
+                if submitted is not None:
+                    job_id = submitted.group(1)
+                self._record_allocation(cluster_node, time.time() - start_time, job_id,
+                                        self._reached(result))
+                if job_id is not None:
+                    error = self._release_batch_job(session, cluster_node, job_id)
+                    if error is not None:
+                        log.error(error)
+                        session.status = SESSION_STATUS_FAILED
+                        session.save()
+                        return [400, json.dumps({'contents': error})]
+                    log.info(1, 'Submitted job ' + job_id + ' on cluster node ' + cluster_node)
+                    session.job_id = job_id
+                    session.status = SESSION_STATUS_SCHEDULED
+                    session.save()
+                    slurm_job_watcher.globalSlurmJobTable.request_refresh()
+                    return [200, json.dumps({'message': 'Job scheduled', 'jobId': job_id})]
+                log.error(result[2])
+                status = [400, json.dumps({'contents': result[2]})]
+            session.status = SESSION_STATUS_FAILED
+            session.save()
+            return status
+        finally:
+            self._locks.unlock_session(session.id)
+
+    def _release_batch_job(self, session, cluster_node, job_id):
+        """
+        Hands the callback token over to a job submitted on hold, and releases the job. The
+        token is bound to the job id, which is only known once the job is submitted, and is
+        written to a file that only the cluster user can read
+        :param session: Current user session
+        :param cluster_node: Cluster node the job was submitted to
+        :param job_id: Id of the submitted job
+        :return: A description of the error, or None if the job was released
+        """
+        token_file = settings.SLURM_CALLBACK_TOKEN_FILE + str(job_id)
+        command = 'umask 077 && cat > "${HOME}/' + token_file + '" && scontrol release ' + \
+            str(job_id)
+        try:
+            with self._locks.cluster(cluster_node):
+                result = ssh_pool.run(
+                    cluster_node, command, tools.job_token(session.id, job_id) + '\n')
+        except OSError as e:
+            result = [-1, '', str(e)]
+        if result[0] == 0:
+            return None
+        try:
+            with self._locks.cluster(cluster_node):
+                ssh_pool.run(cluster_node, 'scancel ' + str(job_id) + '; rm -f "${HOME}/' +
+                             token_file + '"')
+        except OSError as e:
+            log.error(str(e))
+        return 'Failed to release job ' + str(job_id) + ': ' + result[2]
+
+    def is_compute_node(self, session, hostname):
+        """
+        Checks that a hostname reported through the callback command is a plausible name for
+        the compute node running the job of the session: a DNS name, not an address, within
+        the domain of the compute nodes, and matching the node allocated by Slurm when the job
+        was part of a recent listing
+        :param session: Current user session
+        :param hostname: Reported hostname
+        :return: True if the hostname is plausible
+        """
+        if COMPUTE_NODE_PATTERN.match(hostname) is None or \
+                hostname.lower().split('.')[0] == 'localhost':
+            return False
+        suffix = self._hostname_suffix(session)
+        if suffix and not hostname.endswith(suffix):
+            return False
+        watched, job = slurm_job_watcher.globalSlurmJobTable.get(
+            session.cluster_node, session.job_id)
+        if watched and job is not None and job.batch_host:
+            return hostname.split('.')[0] == job.batch_host.split('.')[0]
+        return True
 
     def stop(self, session):
         """
@@ -212,8 +491,8 @@ class SlurmJobManager(object):
         :return: A Json response containing on ok status or a description of the error
         """
         result = [500, 'Unexpected error']
+        self._locks.lock_session(session.id)
         try:
-            self._mutex.acquire()
             # pylint: disable=E1101
             setting = \
                 manager.RenderingResourceSettings.objects.get(
@@ -225,22 +504,22 @@ class SlurmJobManager(object):
                           ':' + str(session.http_port) + '/' + \
                           settings.RR_SPECIFIC_COMMAND_EXIT
                     log.info(1, url)
-                    r = requests.put(
+                    r = http_pool.put(
                         url=url,
                         timeout=global_settings.REQUEST_TIMEOUT)
                     r.close()
                 # pylint: disable=W0702
                 except requests.exceptions.RequestException as e:
                     log.error(traceback.format_exc(e))
-            result = self.kill(session)
+            with self._locks.cluster(session.cluster_node):
+                result = self.kill(session)
         except OSError as e:
             msg = str(e)
             log.error(msg)
             response = json.dumps({'contents': msg})
             result = [400, response]
         finally:
-            if self._mutex.locked():
-                self._mutex.release()
+            self._locks.unlock_session(session.id)
         return result
 
     @staticmethod
@@ -253,15 +532,8 @@ class SlurmJobManager(object):
         result = [500, 'Unexpected error']
         if session.job_id is not None:
             try:
-                command_line = SLURM_SSH_COMMAND + session.cluster_node + \
-                               ' scancel ' + session.job_id
                 log.info(1, 'Stopping job ' + session.job_id)
-                process = subprocess.Popen(
-                    [command_line],
-                    shell=True,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE)
-                output = process.communicate()[0]
+                output = ssh_pool.run(session.cluster_node, 'scancel ' + session.job_id)[1]
                 log.info(1, output)
                 msg = 'Job successfully cancelled'
                 log.info(1, msg)
@@ -277,7 +549,8 @@ class SlurmJobManager(object):
     def hostname(self, session):
         """
         Retrieve the hostname for the host of the given job is allocated.
-        Note: this uses ssh and scontrol on the SLURM_HOST
+        Note: this reads the job table of the Slurm job watcher, or uses ssh and scontrol on
+        the SLURM_HOST if the job is not watched yet
         Note: Due to DNS migration of CSCS compute nodes to bbp.epfl.ch domain
         it uses hardcoded value based on the front-end dns name (which was not migrated)
         :param session: Current user session
@@ -285,11 +558,7 @@ class SlurmJobManager(object):
         """
         hostname = self._query(session, 'BatchHost')
         if hostname != '':
-            domain = self._get_domain(session)
-            if domain == 'cscs.ch':
-                return hostname + '.bbp.epfl.ch'
-            elif domain == 'epfl.ch':
-                hostname = hostname + '.' + domain
+            hostname += self._hostname_suffix(session)
         return hostname
 
     def job_information(self, session):
@@ -300,26 +569,37 @@ class SlurmJobManager(object):
         """
         return self._query(session)
 
-    def rendering_resource_out_log(self, session):
+    def rendering_resource_out_log(self, session, offset=0, length=None, tail=None):
         """
         Returns the contents of the rendering resource output file
         :param session: Current user session
-        :return: A string containing the output log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file. If specified,
+                     offset and length are ignored
+        :return: A string containing the output log, and the offset following the returned bytes
         """
-        return self._rendering_resource_log(session, settings.SLURM_OUT_FILE)
+        return self._rendering_resource_log(
+            session, settings.SLURM_OUT_FILE, offset, length, tail)
 
-    def rendering_resource_err_log(self, session):
+    def rendering_resource_err_log(self, session, offset=0, length=None, tail=None):
         """
         Returns the contents of the rendering resource error file
         :param session: Current user session
-        :return: A string containing the error log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file. If specified,
+                     offset and length are ignored
+        :return: A string containing the error log, and the offset following the returned bytes
         """
-        return self._rendering_resource_log(session, settings.SLURM_ERR_FILE)
+        return self._rendering_resource_log(
+            session, settings.SLURM_ERR_FILE, offset, length, tail)
 
     @staticmethod
     def _query(session, attribute=None):
         """
-        Queries Slurm for information
+        Queries Slurm for information. The job table of the Slurm job watcher is used if the
+        job has been listed recently, and Slurm is queried directly otherwise
         :param session: Current user session
         :param attribute: Attribute to be queried
         :return: A Json response containing an ok status or a description of the error
@@ -327,17 +607,19 @@ class SlurmJobManager(object):
         value = ''
         if session.job_id is not None:
             try:
-                command_line = SLURM_SSH_COMMAND + session.cluster_node + \
-                               ' scontrol show job ' + str(session.job_id)
-                process = subprocess.Popen(
-                    [command_line],
-                    shell=True,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE)
-                output = process.communicate()[0]
+                watched, job = slurm_job_watcher.globalSlurmJobTable.get(
+                    session.cluster_node, session.job_id)
+                if watched:
+                    output = '' if job is None else job.details
+                else:
+                    output = ssh_pool.run(
+                        session.cluster_node, 'scontrol show job ' + str(session.job_id))[1]
+                    slurm_job_watcher.globalSlurmJobTable.request_refresh()
                 if attribute is None:
                     return output
+                if output == '':
+                    log.info(1, 'Job ' + str(session.job_id) + ' does not exist anymore')
+                    return value
                 status = re.search(r'JobState=(\w+)', output).group(1)
                 if status != 'CANCELLED':
                     value = re.search(attribute + r'=(\w+)', output).group(1)
@@ -348,47 +630,112 @@ class SlurmJobManager(object):
                 log.error(str(e))
         return value
 
-    def _file_name(self, session, extension):
+    def _file_name(self, session, extension, job_id=None):
         """
         Returns the contents of the log file with the specified extension
         :param session: Current user session
         :param extension: file extension (typically err or out)
+        :param job_id: Job id used in the file name, defaults to the job id of the session
         :return: A string containing the error log
         """
+        if job_id is None:
+            job_id = session.job_id
         domain = self._get_domain(session)
         if domain == 'epfl.ch':
-            return settings.SLURM_OUTPUT_PREFIX_NFS + '_' + str(session.job_id) + \
+            return settings.SLURM_OUTPUT_PREFIX_NFS + '_' + str(job_id) + \
                    '_' + session.configuration_id + '_' + extension
 
-        return settings.SLURM_OUTPUT_PREFIX + '_' + str(session.job_id) + \
+        return settings.SLURM_OUTPUT_PREFIX + '_' + str(job_id) + \
            '_' + session.configuration_id + '_' + extension
 
-    def _rendering_resource_log(self, session, extension):
+    def fetch_rendering_resource_log(self, session, err, max_size):
         """
-        Returns the contents of the specified file
+        Returns the end of the rendering resource output or error file, whatever the status of
+        the session. This is typically used to archive the logs when the session is destroyed
+        :param session: Current user session
+        :param err: True for the error file
+        :param max_size: Maximum number of bytes to be returned
+        :return: A string containing the end of the log, or None if it cannot be read
+        """
+        extension = settings.SLURM_ERR_FILE if err else settings.SLURM_OUT_FILE
+        command_line = 'tail -c ' + str(max_size) + ' ' + self._file_name(session, extension)
+        log.info(1, 'Fetching log: ' + command_line)
+        result = ssh_pool.run(session.cluster_node, command_line)
+        if result[0] != 0:
+            log.error('Failed to fetch log: ' + str(result[2]))
+            return None
+        return result[1]
+
+    def follow_rendering_resource_log(self, session, err=False):
+        """
+        Starts following the rendering resource output or error file on the cluster node. The
+        last lines of the file are written first, followed by the lines appended to it
+        :param session: Current user session
+        :param err: True to follow the error file
+        :return: The ssh process writing the lines to its output, or None if the rendering
+                 resource is not started
+        """
+        if session.status not in [SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING]:
+            return None
+        extension = settings.SLURM_ERR_FILE if err else settings.SLURM_OUT_FILE
+        command_line = 'tail -n ' + str(settings.LOG_STREAM_BACKLOG) + ' -F ' + \
+            self._file_name(session, extension)
+        log.info(1, 'Following log: ' + command_line)
+        return ssh_pool.spawn_detached(session.cluster_node, command_line)
+
+    def _rendering_resource_log(self, session, extension, offset, length, tail):
+        """
+        Returns the requested part of the specified file. Only that part is read and
+        transferred by the cluster node
         :param session: Current user session
         :param extension: File extension (typically err or out)
-        :return: A string containing the log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file, or None
+        :return: A string containing the log, and the offset following the returned bytes
         """
         try:
-            result = 'Not currently available'
-            if session.status in [SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING]:
-                filename = self._file_name(session, extension)
-                command_line = SLURM_SSH_COMMAND + session.cluster_node + \
-                               ' cat ' + filename
-                log.info(1, 'Querying log: ' + command_line)
-                process = subprocess.Popen(
-                    [command_line],
-                    shell=True,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE)
-                output = process.communicate()[0]
-                result = output
-            return result
+            if session.status not in [SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING]:
+                return [settings.LOG_NOT_AVAILABLE, offset]
+            filename = self._file_name(session, extension)
+            command_line = self._build_log_command(filename, offset, length, tail)
+            log.info(1, 'Querying log: ' + command_line)
+            output = ssh_pool.run(session.cluster_node, command_line)[1]
+            # The size of the file precedes the requested contents
+            size, _, contents = output.partition('\n')
+            try:
+                size = int(size)
+            except ValueError:
+                return ['', offset]
+            if tail is not None or offset > size:
+                # The client resynchronizes on the end of the file when it was truncated
+                return [contents, size]
+            return [contents, offset + len(contents)]
         except OSError as e:
-            return str(e)
+            return [str(e), offset]
         except IOError as e:
-            return str(e)
+            return [str(e), offset]
+
+    @staticmethod
+    def _build_log_command(filename, offset, length, tail):
+        """
+        Builds the command reading part of a log file on the cluster node. The command prints
+        the size of the file, followed by the requested contents
+        :param filename: Name of the log file
+        :param offset: Position of the first byte to be read
+        :param length: Maximum number of bytes to be read, the whole remaining file if None
+        :param tail: Number of lines to be read from the end of the file, or None
+        :return: A string containing the command
+        """
+        command_line = 'wc -c < ' + filename + ' && '
+        if tail is not None:
+            return command_line + 'tail -n ' + str(tail) + ' ' + filename
+        if offset == 0 and length is None:
+            return command_line + 'cat ' + filename
+        command_line += 'tail -c +' + str(offset + 1) + ' ' + filename
+        if length is not None:
+            command_line += ' | head -c ' + str(length)
+        return command_line
 
     @staticmethod
     def _get_domain(session):
@@ -399,14 +746,121 @@ class SlurmJobManager(object):
         """
         return session.cluster_node.partition('.')[2]
 
+    def _hostname_suffix(self, session):
+        """
+        Note: Due to DNS migration of CSCS compute nodes to bbp.epfl.ch domain
+        it uses hardcoded value based on the front-end dns name (which was not migrated)
+        :param session: Current user session
+        :return: The suffix appended to the name of the compute nodes to build their hostname
+        """
+        domain = self._get_domain(session)
+        if domain == 'cscs.ch':
+            return '.bbp.epfl.ch'
+        elif domain == 'epfl.ch':
+            return '.' + domain
+        return ''
+
+    def _build_launch_commands(self, session, job_information, hostname, job_id):
+        """
+        Builds the shell commands loading the modules and launching the rendering resource
+        :param session: Current user session
+        :param job_information: Information about the job
+        :param hostname: Hostname of the rendering resource
+        :param job_id: Id of the job
+        :return: A list of shell commands, to be run one after the other
+        """
+        rr_settings = \
+            manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+
+        # Modules
+        commands = ['source /etc/profile', 'module purge']
+        if rr_settings.modules is not None:
+            values = rr_settings.modules.split()
+            for module in values:
+                commands.append('module load ' + module.strip())
+
+        # Environment variables
+        full_command = ''
+        if rr_settings.environment_variables is not None:
+            values = rr_settings.environment_variables.split()
+            values += job_information.environment.split()
+            for variable in values:
+                full_command += variable + ' '
+
+        # Command lines parameters
+        rest_parameters = manager.RenderingResourceSettingsManager.format_rest_parameters(
+            str(rr_settings.scheduler_rest_parameters_format),
+            str(hostname),
+            str(session.http_port),
+            'rest' + str(rr_settings.id + session.id),
+            str(job_id))
+        full_command += rr_settings.command_line
+        values = rest_parameters.split()
+        values += job_information.params.split()
+        for parameter in values:
+            full_command += ' ' + parameter
+
+        # Output redirection
+        full_command += ' > ' + self._file_name(session, settings.SLURM_OUT_FILE, job_id)
+        full_command += ' 2> ' + self._file_name(session, settings.SLURM_ERR_FILE, job_id)
+        commands.append(full_command)
+        return commands
+
+    def _build_batch_command(self, session, job_information):
+        """
+        Builds the sbatch command submitting the job script of the rendering resource. The
+        script reports the hostname and port of the rendering resource to the callback URL of
+        the service before launching it
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A string containing the SLURM command, run on the cluster node
+        """
+        hostname = '${SLURMD_NODENAME}' + self._hostname_suffix(session)
+        callback_url = global_settings.SLURM_CALLBACK_URL + '/session/' + \
+            settings.RRM_SESSION_COMMAND_CALLBACK + \
+            '?' + settings.REQUEST_PARAMETER_SESSIONID + '=' + str(session.id) + \
+            '&hostname=' + hostname + '&port=' + str(session.http_port)
+        token_file = '${HOME}/' + settings.SLURM_CALLBACK_TOKEN_FILE + '${SLURM_JOB_ID}'
+        commands = self._build_launch_commands(
+            session, job_information, hostname, '${SLURM_JOB_ID}')
+        # The token is passed to curl as a header through its standard input, so that it does
+        # not appear on the command line of the compute node
+        commands.insert(len(commands) - 1,
+                        'RRM_TOKEN=$(cat "' + token_file + '"); rm -f "' + token_file + '"')
+        commands.insert(len(commands) - 1,
+                        'echo "header = \\"' + settings.SLURM_CALLBACK_TOKEN_HEADER +
+                        ': ${RRM_TOKEN}\\"" | ' +
+                        'curl -s -K - -X PUT "' + callback_url + '"')
+        script = '#!/bin/bash\n' + '\n'.join(commands)
+        command_line = 'sbatch --hold --output=/dev/null' + \
+                       self._build_job_options(session, job_information) + \
+                       ' <<\'' + settings.SLURM_JOB_SCRIPT_DELIMITER + '\'\n' + script + '\n' + \
+                       settings.SLURM_JOB_SCRIPT_DELIMITER
+        log.info(1, command_line)
+        return command_line
+
     @staticmethod
     def _build_allocation_command(session, job_information):
         """
-        Builds the SLURM allocation command line
+        Builds the SLURM allocation command line, run on the cluster node
         :param session: Current user session
         :param job_information: Information about the job
         :return: A string containing the SLURM command
         """
+        command_line = 'salloc --no-shell' + \
+                       ' --immediate=' + str(settings.SLURM_ALLOCATION_TIMEOUT) + \
+                       SlurmJobManager._build_job_options(session, job_information)
+        log.info(1, command_line)
+        return command_line
+
+    @staticmethod
+    def _build_job_options(session, job_information):
+        """
+        Builds the SLURM options describing the resources requested by the job
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A string containing the SLURM options
+        """
 
         rr_settings = \
             manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
@@ -453,12 +907,7 @@ class SlurmJobManager(object):
         log.info(1, 'Scheduling job for session ' + session.id)
 
         job_name = session.owner + '_' + rr_settings.id
-        command_line = SLURM_SSH_COMMAND + session.cluster_node + \
-                       ' salloc --no-shell' + \
-                       ' --immediate=' + str(settings.SLURM_ALLOCATION_TIMEOUT) + \
-                       ' --account=' + rr_settings.project + \
-                       ' --job-name=' + job_name + \
-                       ' --time=' + allocation_time + \
-                       options
-        log.info(1, command_line)
-        return command_line
+        return ' --account=' + rr_settings.project + \
+               ' --job-name=' + job_name + \
+               ' --time=' + allocation_time + \
+               options
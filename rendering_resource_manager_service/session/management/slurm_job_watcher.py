@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The Slurm job watcher periodically lists the jobs of all sessions with a single SSH command per
+cluster node, and stores their state in a shared job table. The Slurm job manager reads job
+states from that table instead of querying Slurm for every session.
+"""
+
+import re
+import threading
+import time
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+import rendering_resource_manager_service.service.settings as global_settings
+from rendering_resource_manager_service.session.management import job_manager
+
+
+class SlurmJob(object):
+    """
+    State of a Slurm job, as reported by scontrol
+    """
+
+    def __init__(self, details):
+        """
+        Initialization
+        :param details: One line description of the job, as returned by 'scontrol -o show job'
+        """
+        self.details = details
+        attributes = dict(re.findall(r'(\w+)=(\S*)', details))
+        self.job_id = attributes.get('JobId', '')
+        self.state = attributes.get('JobState', '')
+        self.batch_host = attributes.get('BatchHost', '')
+        self.start_time = attributes.get('StartTime', '')
+
+
+def parse_jobs(output):
+    """
+    Parses the output of 'scontrol -o show job'
+    :param output: Output of scontrol, one job per line
+    :return: A dictionary of SlurmJob indexed by job id
+    """
+    jobs = dict()
+    for line in output.splitlines():
+        if line.startswith('JobId='):
+            job = SlurmJob(line.strip())
+            jobs[job.job_id] = job
+    return jobs
+
+
+class SlurmJobTable(object):
+    """
+    Thread safe table of the jobs listed on each cluster node
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self._mutex = threading.Lock()
+        self._listings = dict()
+        self._refresh_requested = threading.Event()
+
+    def update(self, host, job_ids, jobs):
+        """
+        Stores the jobs listed on a cluster node
+        :param host: Cluster node
+        :param job_ids: Ids of the jobs that were listed
+        :param jobs: Dictionary of the SlurmJob found by the listing, indexed by job id
+        """
+        with self._mutex:
+            self._listings[host] = [time.time(), set(job_ids), jobs]
+
+    def get(self, host, job_id):
+        """
+        Returns the state of a job from the latest listing of its cluster node
+        :param host: Cluster node
+        :param job_id: Id of the job
+        :return: A list containing True and the SlurmJob (None if the job does not exist
+                 anymore) if the job was part of a recent listing, or False and None otherwise
+        """
+        with self._mutex:
+            listing = self._listings.get(host)
+        if listing is None or time.time() > listing[0] + consts.SLURM_JOB_WATCH_EXPIRY or \
+                str(job_id) not in listing[1]:
+            return [False, None]
+        return [True, listing[2].get(str(job_id))]
+
+    def retain(self, hosts):
+        """
+        Removes the listings of all cluster nodes but the given ones
+        :param hosts: Cluster nodes to keep
+        """
+        with self._mutex:
+            for host in self._listings.keys():
+                if host not in hosts:
+                    del self._listings[host]
+
+    def request_refresh(self):
+        """
+        Wakes up the watcher so that jobs are listed without waiting for the next cycle
+        """
+        self._refresh_requested.set()
+
+    def wait_for_refresh_request(self, timeout):
+        """
+        Waits until a refresh is requested or the timeout expires
+        :param timeout: Maximum waiting time (in seconds)
+        """
+        self._refresh_requested.wait(timeout)
+        self._refresh_requested.clear()
+
+
+def list_jobs(host, job_ids):
+    """
+    Lists the given jobs on a cluster node with a single scontrol command, and stores the
+    result in the global job table. All jobs known to Slurm are listed at once, so that the
+    exit code of the command tells whether the listing is complete: jobs missing from a
+    successful listing do not exist anymore, and failed listings are discarded
+    :param host: Cluster node
+    :param job_ids: Ids of the jobs to be listed
+    """
+    job_ids = [str(job_id) for job_id in job_ids]
+    if len(job_ids) == 0:
+        return
+    try:
+        status = ssh_pool.run(host, 'scontrol -o show job')
+    except OSError as e:
+        log.error('Failed to list jobs on ' + host + ': ' + str(e))
+        return
+    if status[0] != 0 or status[2].strip() != '':
+        log.error('Failed to list jobs on ' + host + ' (' + str(status[0]) + '): ' +
+                  status[2].strip())
+        return
+    jobs = parse_jobs(status[1])
+    globalSlurmJobTable.update(
+        host, job_ids, dict([[job_id, jobs[job_id]] for job_id in job_ids if job_id in jobs]))
+
+
+class SlurmJobWatcherThread(threading.Thread):
+    """
+    Lists the Slurm jobs of all sessions allocated by Slurm, one cluster node at a time
+    """
+
+    def __init__(self, sessions):
+        """
+        Initialization
+        :param sessions: Session objects manager
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self.sessions = sessions
+        log.info(1, 'Slurm job watcher thread started...')
+
+    def run(self):
+        """
+        Lists the jobs of all sessions and waits for the next cycle
+        """
+        while self.signal:
+            job_ids = dict()
+            sessions = job_manager.backend_sessions(
+                self.sessions, global_settings.RESOURCE_ALLOCATOR_SLURM)
+            for session in sessions.exclude(job_id='').exclude(cluster_node=''):
+                job_ids.setdefault(session.cluster_node, []).append(session.job_id)
+            globalSlurmJobTable.retain(job_ids.keys())
+            for host in job_ids:
+                log.info(2, 'Listing ' + str(len(job_ids[host])) + ' jobs on ' + host)
+                list_jobs(host, job_ids[host])
+            globalSlurmJobTable.wait_for_refresh_request(consts.SLURM_JOB_WATCH_INTERVAL)
+
+
+# Global table shared by the watcher and the Slurm job manager
+globalSlurmJobTable = SlurmJobTable()
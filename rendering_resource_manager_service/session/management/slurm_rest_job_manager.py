@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The Slurm REST job manager manages Slurm jobs through the REST API of slurmrestd, instead of
+running Slurm commands over SSH.
+"""
+
+import json
+import time
+
+import requests
+
+from rendering_resource_manager_service.config.management import \
+    rendering_resource_settings_manager as manager
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+from rendering_resource_manager_service.session.management import slurm_job_manager
+from rendering_resource_manager_service.session.models import \
+    SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, \
+    SESSION_STATUS_SCHEDULING, SESSION_STATUS_SCHEDULED, SESSION_STATUS_FAILED, \
+    SESSION_STATUS_GETTING_HOSTNAME
+import rendering_resource_manager_service.service.settings as global_settings
+
+
+# States of the jobs that have ended
+SLURM_JOB_END_STATES = ['BOOT_FAIL', 'CANCELLED', 'COMPLETED', 'DEADLINE', 'FAILED', 'NODE_FAIL',
+                        'OUT_OF_MEMORY', 'PREEMPTED', 'TIMEOUT']
+
+
+class SlurmRestJobManager(slurm_job_manager.SlurmJobManager):
+    """
+    The job manager class provides methods for managing Slurm jobs with slurmrestd. Jobs are
+    submitted as job scripts launching the rendering resource. slurmrestd does not give access
+    to files, so the logs are read through a Slurm cluster node as with the SSH job manager
+    """
+
+    def schedule(self, session, job_information, auth_token=None):
+        """
+        Submits the job launching the rendering resource. If successful, the session job_id is
+        populated and the session status is set to SESSION_STATUS_SCHEDULED. The session is
+        started when its hostname is resolved, once slurmrestd reports the job as running
+        :param session: Current user session
+        :param job_information: Information about the job
+        :param auth_token: Currently not used by Slurm
+        :return: A Json response containing on ok status or a description of the error
+        """
+        return self.allocate(session, job_information)
+
+    def allocate(self, session, job_information):
+        """
+        Submits the job script launching the rendering resource. If the submission is
+        successful, the session job_id is populated and the session status is set to
+        SESSION_STATUS_SCHEDULED
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
+        self._locks.lock_session(session.id)
+        try:
+            session.status = SESSION_STATUS_SCHEDULING
+            session.cluster_node = global_settings.SLURM_HOSTS[0]
+            session.http_host = ''
+            session.save()
+            job_information.cluster_node = session.cluster_node
+            description = self._build_job_description(session, job_information)
+            start_time = time.time()
+            job_id = None
+            reached = True
+            try:
+                with self._locks.cluster(global_settings.SLURM_REST_URL):
+                    code, response = self._request('POST', '/job/submit', description)
+                if code == 200 and not response.get('errors'):
+                    job_id = str(response['job_id'])
+                    error = ''
+                else:
+                    error = self._error_message(code, response)
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+                reached = False
+            except (ValueError, KeyError) as e:
+                error = str(e)
+            self._record_allocation(global_settings.SLURM_REST_URL,
+                                    time.time() - start_time, job_id, reached)
+            if job_id is None:
+                log.error(error)
+                session.status = SESSION_STATUS_FAILED
+                session.save()
+                return [400, json.dumps({'contents': error})]
+            log.info(1, 'Submitted job ' + job_id + ' to ' + global_settings.SLURM_REST_URL)
+            session.job_id = job_id
+            session.status = SESSION_STATUS_SCHEDULED
+            session.save()
+            return [200, json.dumps({'message': 'Job scheduled', 'jobId': job_id})]
+        finally:
+            self._locks.unlock_session(session.id)
+
+    def start(self, session, job_information):
+        """
+        The rendering resource is launched by the job script as soon as the job runs. If
+        successful, the session status is set to SESSION_STATUS_STARTING
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A Json response containing on ok status or a description of the error
+        """
+        rr_settings = \
+            manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+        if rr_settings.wait_until_running:
+            session.status = SESSION_STATUS_STARTING
+        else:
+            session.status = SESSION_STATUS_RUNNING
+        session.save()
+        response = json.dumps({'message': session.configuration_id + ' successfully started'})
+        return [200, response]
+
+    def kill(self, session):
+        """
+        Cancels the given job
+        :param session: Current user session
+        :return: A Json response containing on ok status or a description of the error
+        """
+        result = [500, 'Unexpected error']
+        if session.job_id is not None:
+            try:
+                log.info(1, 'Stopping job ' + session.job_id)
+                code, response = self._request('DELETE', '/job/' + str(session.job_id))
+                if code == 200 and not response.get('errors'):
+                    msg = 'Job successfully cancelled'
+                    log.info(1, msg)
+                    result = [200, json.dumps({'contents': msg})]
+                else:
+                    msg = self._error_message(code, response)
+                    log.error(msg)
+                    result = [400, json.dumps({'contents': msg})]
+            except (requests.exceptions.RequestException, ValueError) as e:
+                msg = str(e)
+                log.error(msg)
+                result = [400, json.dumps({'contents': msg})]
+        return result
+
+    def hostname(self, session):
+        """
+        Retrieve the hostname for the host of the given job is allocated. The session is started
+        when the job is running on a node
+        :param session: Current user session
+        :return: The hostname of the host if the job is running, FAILED if the job does not
+                 exist anymore or has ended, and empty otherwise (job pending, or slurmrestd
+                 cannot be reached)
+        """
+        if session.job_id is None or session.job_id == '':
+            return ''
+        try:
+            code, response = self._request('GET', '/job/' + str(session.job_id))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(str(e))
+            return ''
+        jobs = response.get('jobs', [])
+        if code == 404 or (code == 200 and not jobs):
+            log.info(1, 'Job ' + str(session.job_id) + ' does not exist anymore')
+            return 'FAILED'
+        if code != 200:
+            log.error(self._error_message(code, response))
+            return ''
+        state = jobs[0].get('job_state')
+        if state in SLURM_JOB_END_STATES:
+            log.info(1, 'Job ' + str(session.job_id) + ' ended with state ' + str(state))
+            return 'FAILED'
+        if state != 'RUNNING' or not jobs[0].get('batch_host'):
+            return ''
+        if session.status in [SESSION_STATUS_SCHEDULED, SESSION_STATUS_GETTING_HOSTNAME]:
+            self.start(session, None)
+        return jobs[0]['batch_host'] + self._hostname_suffix(session)
+
+    def job_information(self, session):
+        """
+        Returns information about the job
+        :param session: Current user session
+        :return: A string containing the description of the job returned by slurmrestd
+        """
+        job = self._get_job(session)
+        if job is None:
+            return ''
+        return json.dumps(job)
+
+    def _get_job(self, session):
+        """
+        Queries slurmrestd for the job of the given session
+        :param session: Current user session
+        :return: A dictionary describing the job, or None if the job does not exist
+        """
+        if session.job_id is None or session.job_id == '':
+            return None
+        try:
+            code, response = self._request('GET', '/job/' + str(session.job_id))
+            jobs = response.get('jobs', [])
+            if code != 200 or not jobs:
+                log.info(1, 'Job ' + str(session.job_id) + ' does not exist anymore')
+                return None
+            return jobs[0]
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(str(e))
+            return None
+
+    @staticmethod
+    def _request(method, path, data=None):
+        """
+        Sends a request to slurmrestd
+        :param method: HTTP verb
+        :param path: Path of the resource, relative to the API version
+        :param data: Dictionary sent as the JSON body of the request
+        :return: The HTTP code and the decoded JSON response
+        :raise requests.exceptions.RequestException: if slurmrestd cannot be reached
+        :raise ValueError: if the response is not valid JSON
+        """
+        url = global_settings.SLURM_REST_URL + '/slurm/' + \
+            global_settings.SLURM_REST_API_VERSION + path
+        headers = {
+            'X-SLURM-USER-NAME': global_settings.SLURM_REST_USERNAME,
+            'X-SLURM-USER-TOKEN': global_settings.SLURM_REST_TOKEN,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+        body = None if data is None else json.dumps(data)
+        response = http_pool.request(method, url, headers=headers, data=body,
+                                     timeout=global_settings.REQUEST_TIMEOUT)
+        return [response.status_code, response.json()]
+
+    @staticmethod
+    def _error_message(code, response):
+        """
+        :param code: HTTP code returned by slurmrestd
+        :param response: Decoded JSON response of slurmrestd
+        :return: A description of the errors reported by slurmrestd
+        """
+        errors = [str(error.get('error', error)) for error in response.get('errors', [])]
+        return 'slurmrestd returned ' + str(code) + ': ' + '; '.join(errors)
+
+    @staticmethod
+    def _time_limit(value):
+        """
+        Converts a Slurm time specification to minutes
+        :param value: Time, as minutes, [hours:]minutes:seconds or days-hours[:minutes:seconds]
+        :return: The number of minutes
+        """
+        days = 0
+        if '-' in value:
+            days, value = value.split('-', 1)
+            values = [int(v) for v in value.split(':')]
+            values += [0] * (3 - len(values))
+        else:
+            values = [int(v) for v in value.split(':')]
+            if len(values) < 3:
+                values = [0] + values + [0] * (2 - len(values))
+        hours, minutes, seconds = values
+        # Seconds are rounded up to the next minute
+        return int(days) * 1440 + hours * 60 + minutes + (1 if seconds else 0)
+
+    def _build_job_description(self, session, job_information):
+        """
+        Builds the job submitted to slurmrestd, containing the job script launching the
+        rendering resource and the resources it requests
+        :param session: Current user session
+        :param job_information: Information about the job
+        :return: A dictionary containing the job script and its properties
+        """
+        rr_settings = \
+            manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+
+        hostname = '${SLURMD_NODENAME}' + self._hostname_suffix(session)
+        commands = self._build_launch_commands(
+            session, job_information, hostname, '${SLURM_JOB_ID}')
+
+        allocation_time = global_settings.SLURM_DEFAULT_TIME
+        if job_information.allocation_time != '':
+            allocation_time = job_information.allocation_time
+
+        job = {
+            'name': session.owner + '_' + rr_settings.id,
+            'account': rr_settings.project,
+            'partition': job_information.queue or rr_settings.queue,
+            'time_limit': self._time_limit(allocation_time),
+            'cpus_per_task': job_information.nb_cpus or rr_settings.nb_cpus,
+            'standard_output': '/dev/null',
+            'standard_error': '/dev/null',
+            'environment': {'PATH': '/bin:/usr/bin:/usr/local/bin'}
+        }
+        if job_information.exclusive_allocation or rr_settings.exclusive:
+            job['exclusive'] = True
+        nb_nodes = job_information.nb_nodes or rr_settings.nb_nodes
+        if nb_nodes != 0:
+            job['nodes'] = nb_nodes
+        nb_gpus = job_information.nb_gpus or rr_settings.nb_gpus
+        if nb_gpus != 0:
+            job['tres_per_node'] = 'gres/gpu:' + str(nb_gpus)
+        memory = job_information.memory or rr_settings.memory
+        if memory != 0:
+            job['memory_per_node'] = memory
+        if job_information.reservation:
+            job['reservation'] = job_information.reservation
+
+        log.info(1, 'Scheduling job for session ' + session.id)
+        return {'script': '#!/bin/bash\n' + '\n'.join(commands) + '\n', 'job': job}
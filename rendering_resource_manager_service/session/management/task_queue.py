@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The task queue runs the long lasting session commands (job scheduling, session teardown and
+log retrieval) in the background, so that HTTP requests return immediately. Tasks are stored in
+the database and shared by all the processes of the service. Each process refreshes the
+heartbeat of the tasks it runs, so that the tasks of a process that stopped are recovered by
+another one.
+"""
+
+import os
+import json
+import uuid
+import time
+import socket
+import random
+import datetime
+import threading
+import traceback
+
+from django.db.models import Q
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.management import job_manager
+from rendering_resource_manager_service.session.management import session_manager
+from rendering_resource_manager_service.session.management import log_archive
+from rendering_resource_manager_service.config.management import \
+    rendering_resource_settings_manager as manager
+from rendering_resource_manager_service.session.models import Session, Task, \
+    TASK_STATUS_PENDING, TASK_STATUS_RUNNING, TASK_STATUS_COMPLETED, TASK_STATUS_FAILED
+import rendering_resource_manager_service.service.settings as global_settings
+
+
+class TaskQueue(object):
+    """
+    Database backed queue of session tasks. Each task command is executed by a handler taking
+    the session id and the task parameters, and returning an HTTP code and a description
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self._handlers = dict()
+        self._task_submitted = threading.Event()
+
+    def register(self, command, handler):
+        """
+        Registers the handler executing the tasks of the given command
+        :param command: Task command
+        :param handler: Function taking a session id and a dictionary of parameters, and
+               returning an HTTP code and a description of the result
+        """
+        self._handlers[command] = handler
+
+    def submit(self, session_id, command, parameters=None):
+        """
+        Adds a task to the queue
+        :param session_id: Id of the session the task is executed for
+        :param command: Task command
+        :param parameters: Dictionary of parameters passed to the task handler
+        :return: The id of the task
+        """
+        task = Task(
+            id=uuid.uuid4().hex,
+            session_id=str(session_id),
+            command=command,
+            parameters=json.dumps(parameters or dict()))
+        task.save(force_insert=True)
+        log.info(1, 'Queued task ' + task.id + ' <' + command + '> for session ' +
+                 str(session_id))
+        self._task_submitted.set()
+        return task.id
+
+    @staticmethod
+    def get(task_id):
+        """
+        :param task_id: Id of the task
+        :return: The task, or None if it does not exist
+        """
+        try:
+            return Task.objects.get(id=task_id)
+        except Task.DoesNotExist:
+            return None
+
+    @staticmethod
+    def owner():
+        """
+        :return: The identifier of the current process, owning the tasks it runs
+        """
+        return socket.gethostname() + ':' + str(os.getpid())
+
+    def claim(self):
+        """
+        Takes the oldest pending task. Workers may compete for the same task, but the status
+        update only succeeds for one of them
+        :return: The task, now running, or None if no task is pending
+        """
+        for task in Task.objects.filter(status=TASK_STATUS_PENDING)[:8]:
+            owner = self.owner()
+            heartbeat = datetime.datetime.now()
+            if Task.objects.filter(id=task.id, status=TASK_STATUS_PENDING).update(
+                    status=TASK_STATUS_RUNNING, owner=owner, heartbeat=heartbeat) == 1:
+                task.status = TASK_STATUS_RUNNING
+                task.owner = owner
+                task.heartbeat = heartbeat
+                return task
+        return None
+
+    def run(self, task):
+        """
+        Executes the given task and stores its result
+        :param task: Task to execute
+        """
+        log.info(1, 'Running task ' + task.id + ' <' + task.command + '> for session ' +
+                 task.session_id)
+        try:
+            handler = self._handlers.get(task.command)
+            if handler is None:
+                status = [400, json.dumps({'contents': 'Unknown task <' + task.command + '>'})]
+            else:
+                status = handler(task.session_id, json.loads(task.parameters))
+        # pylint: disable=W0703
+        except Exception as e:
+            log.error(str(traceback.format_exc(e)))
+            status = [500, json.dumps({'contents': str(e)})]
+        task.code = status[0]
+        task.contents = status[1]
+        if task.code < 400:
+            task.status = TASK_STATUS_COMPLETED
+        else:
+            task.status = TASK_STATUS_FAILED
+        task.parameters = scrub_parameters(task.parameters)
+        task.save()
+
+    def process_next(self):
+        """
+        Executes the oldest pending task, if any
+        :return: True if a task was executed
+        """
+        task = self.claim()
+        if task is None:
+            return False
+        self.run(task)
+        return True
+
+    def heartbeat(self):
+        """
+        Refreshes the heartbeat of the tasks run by the current process
+        """
+        Task.objects.filter(status=TASK_STATUS_RUNNING, owner=self.owner()).update(
+            heartbeat=datetime.datetime.now())
+
+    def recover(self):
+        """
+        Recovers the tasks whose heartbeat stopped, because the process running them stopped.
+        Each task is recovered by a single process, the update of its status only succeeding
+        for one of them. Tasks that can be run again are put back in the queue. Scheduling
+        tasks fail instead, as they may already have submitted a job, and their session is
+        stopped so that this job is not leaked
+        """
+        now = datetime.datetime.now()
+        expiry = now - datetime.timedelta(seconds=consts.TASK_QUEUE_HEARTBEAT_EXPIRY)
+        interrupted = Task.objects.filter(status=TASK_STATUS_RUNNING).filter(
+            Q(heartbeat__lt=expiry) | Q(heartbeat__isnull=True))
+        for task in interrupted:
+            claimed = Task.objects.filter(
+                id=task.id, status=TASK_STATUS_RUNNING, owner=task.owner,
+                heartbeat=task.heartbeat)
+            if task.command in consts.TASK_REPLAYABLE_COMMANDS:
+                if claimed.update(status=TASK_STATUS_PENDING, owner='', heartbeat=None,
+                                  updated=now) == 1:
+                    log.info(1, 'Resuming interrupted task ' + task.id + ' <' +
+                             task.command + '>')
+                    self._task_submitted.set()
+            elif claimed.update(
+                    status=TASK_STATUS_FAILED, code=500, updated=now,
+                    parameters=scrub_parameters(task.parameters),
+                    contents=json.dumps({'contents': 'Task was interrupted'})) == 1:
+                log.error('Task ' + task.id + ' <' + task.command + '> was interrupted, ' +
+                          'stopping session ' + task.session_id)
+                self.submit(task.session_id, consts.TASK_COMMAND_STOP)
+
+    @staticmethod
+    def purge():
+        """
+        Deletes the finished tasks whose result has been kept long enough
+        """
+        Task.objects.filter(
+            status__in=[TASK_STATUS_COMPLETED, TASK_STATUS_FAILED],
+            updated__lt=datetime.datetime.now() -
+            datetime.timedelta(seconds=consts.TASK_QUEUE_RETENTION)).delete()
+
+    def wait_for_task(self, timeout):
+        """
+        Waits until a task is submitted or the timeout expires
+        :param timeout: Maximum waiting time (in seconds)
+        """
+        self._task_submitted.wait(timeout)
+        self._task_submitted.clear()
+
+
+def scrub_parameters(parameters):
+    """
+    :param parameters: Json representation of the parameters of a task
+    :return: The Json representation of the parameters without the secret ones
+    """
+    try:
+        values = json.loads(parameters)
+    except ValueError:
+        return json.dumps(dict())
+    for name in consts.TASK_SECRET_PARAMETERS:
+        values.pop(name, None)
+    return json.dumps(values)
+
+
+def status_as_string(status):
+    """
+    :param status: Task status
+    :return: A description of the task status
+    """
+    return {
+        TASK_STATUS_PENDING: 'Pending',
+        TASK_STATUS_RUNNING: 'Running',
+        TASK_STATUS_COMPLETED: 'Completed',
+        TASK_STATUS_FAILED: 'Failed'
+    }.get(status)
+
+
+def schedule_job(session_id, parameters):
+    """
+    Allocates a job and starts the rendering resource of the given session
+    :param session_id: Id of the session
+    :param parameters: Job parameters, and token used to authenticate with the scheduler. The
+                       optional 'backend' parameter overrides the backend of the configuration
+    :return: A Json response containing on ok status or a description of the error
+    """
+    try:
+        session = Session.objects.get(id=session_id)
+    except Session.DoesNotExist:
+        return [404, json.dumps({'contents': 'Session does not exist'})]
+    rr_settings = \
+        manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
+    session.backend = str(parameters.get('backend') or rr_settings.backend or
+                          global_settings.RESOURCE_ALLOCATOR).upper()
+    try:
+        session_job_manager = job_manager.get_job_manager(session)
+    except ValueError as e:
+        return [400, json.dumps({'contents': str(e)})]
+    job_information = job_manager.JobInformation()
+    job_information.params = parameters.get('params') or ''
+    job_information.environment = parameters.get('environment') or ''
+    job_information.reservation = parameters.get('reservation')
+    job_information.nb_cpus = parameters.get('nb_cpus', 0)
+    job_information.nb_gpus = parameters.get('nb_gpus', 0)
+    job_information.nb_nodes = parameters.get('nb_nodes', 0)
+    job_information.memory = parameters.get('memory', 0)
+    job_information.queue = parameters.get('queue')
+    job_information.exclusive_allocation = parameters.get('exclusive', False)
+    job_information.allocation_time = parameters.get(
+        'allocation_time', global_settings.SLURM_DEFAULT_TIME)
+    session.http_host = ''
+    session.http_port = consts.DEFAULT_RENDERER_HTTP_PORT + random.randint(0, 1000)
+    session.save()
+    return session_job_manager.schedule(session, job_information, parameters.get('auth_token'))
+
+
+def stop_session(session_id, parameters):
+    """
+    Stops the rendering resource and destroys the given session
+    :param session_id: Id of the session
+    :param parameters: Not used
+    :return: A Json response containing on ok status or a description of the error
+    """
+    return session_manager.SessionManager.delete_session(session_id)
+
+
+def rendering_resource_log(session_id, parameters):
+    """
+    Retrieves part of the standard or error output of the rendering resource of the given session
+    :param session_id: Id of the session
+    :param parameters: 'err' set to True for the error output, 'offset' and 'length' for the
+                       range of bytes to be returned, or 'tail' for the number of last lines
+    :return: A Json response containing the log and the offset of the next bytes to be
+             requested, or a description of the error
+    """
+    try:
+        session = Session.objects.get(id=session_id)
+    except Session.DoesNotExist:
+        return archived_rendering_resource_log(
+            session_id, parameters.get('err', False), parameters)
+    offset = parameters.get('offset') or 0
+    contents = 'Rendering resource is currently unavailable'
+    if session.job_id:
+        session_job_manager = job_manager.get_job_manager(session)
+        if parameters.get('err', False):
+            log_function = session_job_manager.rendering_resource_err_log
+        else:
+            log_function = session_job_manager.rendering_resource_out_log
+        contents, offset = log_function(
+            session, offset, parameters.get('length'), parameters.get('tail'))
+    return [200, json.dumps({'contents': str(contents), 'offset': offset})]
+
+
+def archived_rendering_resource_log(session_id, err, parameters):
+    """
+    Retrieves part of the archived standard or error output of a destroyed session
+    :param session_id: Id of the session
+    :param err: True for the error output
+    :param parameters: 'offset' and 'length' for the range of bytes to be returned, or 'tail'
+                       for the number of last lines
+    :return: A Json response containing the log and the offset of the next bytes to be
+             requested, or a description of the error
+    """
+    result = log_archive.globalLogArchive.read(
+        session_id, err, parameters.get('offset') or 0, parameters.get('length'),
+        parameters.get('tail'))
+    if result is None:
+        return [404, json.dumps({'contents': 'Session does not exist'})]
+    return [200, json.dumps({'contents': result[0], 'offset': result[1]})]
+
+
+class TaskWorkerThread(threading.Thread):
+    """
+    Executes the pending tasks of the queue
+    """
+
+    def __init__(self, queue):
+        """
+        Initialization
+        :param queue: Task queue
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self._queue = queue
+        log.info(1, 'Task worker thread started...')
+
+    def run(self):
+        """
+        Executes tasks until the queue is empty, then waits for new ones
+        """
+        while self.signal:
+            try:
+                if self._queue.process_next():
+                    continue
+                self._queue.purge()
+            # pylint: disable=W0703
+            except Exception as e:
+                log.error('Failed to process tasks: ' + str(e))
+            self._queue.wait_for_task(consts.TASK_QUEUE_POLL_INTERVAL)
+
+
+class TaskHeartbeatThread(threading.Thread):
+    """
+    Refreshes the heartbeat of the tasks run by the current process, and recovers the tasks
+    interrupted in other processes
+    """
+
+    def __init__(self, queue):
+        """
+        Initialization
+        :param queue: Task queue
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self._queue = queue
+        log.info(1, 'Task heartbeat thread started...')
+
+    def run(self):
+        """
+        Refreshes the heartbeats and recovers interrupted tasks periodically
+        """
+        while self.signal:
+            try:
+                self._queue.heartbeat()
+                self._queue.recover()
+            # pylint: disable=W0703
+            except Exception as e:
+                log.error('Failed to recover tasks: ' + str(e))
+            time.sleep(consts.TASK_QUEUE_HEARTBEAT_INTERVAL)
+
+
+# Global queue of the session tasks
+globalTaskQueue = TaskQueue()
+globalTaskQueue.register(consts.TASK_COMMAND_SCHEDULE, schedule_job)
+globalTaskQueue.register(consts.TASK_COMMAND_STOP, stop_session)
+globalTaskQueue.register(consts.TASK_COMMAND_LOG, rendering_resource_log)
+globalTaskQueue.register(
+    consts.TASK_COMMAND_ERR,
+    lambda session_id, parameters: rendering_resource_log(
+        session_id, dict(parameters, err=True)))
@@ -26,46 +26,54 @@
 
 
 """
-The Unicore job manager is in charge of managing Unicore jobs.
+The Unicore job manager is in charge of managing Unicore jobs. The authentication token, site
+and working directory of each session are held by a per-session client, so that jobs of several
+users can be scheduled concurrently. Clients only live in memory, as the token of the user is
+not stored: sessions scheduled before a restart of the service can no longer be managed. They
+fail when their job is next queried, and their job is left to expire on the site.
 """
 
-import requests
-from threading import Lock
 import json
 import re
+import threading
 
+from django.db.models.signals import post_delete
 from rendering_resource_manager_service.config.management import \
     rendering_resource_settings_manager as manager
 import rendering_resource_manager_service.utils.custom_logging as log
-from rendering_resource_manager_service.session.models import \
+import rendering_resource_manager_service.utils.http_pool as http_pool
+from rendering_resource_manager_service.session.management.job_locks import JobLocks
+import rendering_resource_manager_service.session.management.session_manager_settings \
+    as consts
+from rendering_resource_manager_service.session.models import Session, \
     SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, \
     SESSION_STATUS_STOPPING, SESSION_STATUS_SCHEDULED
 import rendering_resource_manager_service.service.settings as global_settings
 
 
-class UnicoreJobManager(object):
+class UnicoreClient(object):
     """
-    The job manager class provides methods for managing Unicore jobs
+    Unicore client of a session. Requests are sent through the pool of keep-alive HTTP sessions,
+    one per site
     """
 
-    def __init__(self):
+    def __init__(self, auth_token, http_proxies):
         """
-        Setup job manager
+        Initialization
+        :param auth_token: Token for Unicore authentication
+        :param http_proxies: Proxies used to reach the registry and the sites
         """
-        self._mutex = Lock()
-        self._base_url = None
-        self._registry_url = None
-        self._http_proxies = global_settings.UNICORE_DEFAULT_HTTP_PROXIES
-        # TODO: Move following members to session object
-        self._auth_token = None
-        self._work_dir = None
+        self.auth_token = auth_token
+        self.site_url = None
+        self.work_dir = None
+        self._http_proxies = http_proxies
 
     def _get_json_headers(self):
         """
         :return: headers with authorization and content-type
         """
         headers = dict()
-        headers['Authorization'] = self._auth_token
+        headers['Authorization'] = self.auth_token
         headers['Content-type'] = 'application/json'
         headers['Accept'] = 'application/json'
         return headers
@@ -75,11 +83,23 @@ class UnicoreJobManager(object):
         :return: headers with authorization and content-type
         """
         headers = dict()
-        headers['Authorization'] = self._auth_token
+        headers['Authorization'] = self.auth_token
         headers['Content-type'] = 'application/octet-stream'
         headers['Accept'] = 'application/octet-stream'
         return headers
 
+    def _request(self, method, url, headers, **kwargs):
+        """
+        Sends a request to Unicore
+        :param method: HTTP verb
+        :param url: URL of the resource
+        :param headers: HTTP headers
+        :param kwargs: Optional arguments passed to requests
+        :return: The HTTP response
+        """
+        return http_pool.request(method, url, proxies=self._http_proxies, headers=headers,
+                                 verify=global_settings.UNICORE_SSL_VERIFY, **kwargs)
+
     def get_sites(self):
         """
         read the base URLs of the available sites from the registry. If the registry_url is None,
@@ -87,8 +107,7 @@ class UnicoreJobManager(object):
         :return: available sites
         """
         registry_url = global_settings.UNICORE_DEFAULT_REGISTRY_URL
-        r = requests.get(registry_url, proxies=self._http_proxies,
-                         headers=self._get_json_headers(), verify=False)
+        r = self._request('GET', registry_url, self._get_json_headers())
         if r.status_code != 200:
             raise RuntimeError('Error accessing registry at %s: [%s] %s' %
                                (registry_url, r.status_code, r.reason))
@@ -117,8 +136,7 @@ class UnicoreJobManager(object):
         :param resource: Resource to get the properties from
         :return: Properties of the specified resource
         """
-        r = requests.get(resource, proxies=self._http_proxies,
-                         headers=self._get_json_headers(), verify=False)
+        r = self._request('GET', resource, self._get_json_headers())
         if r.status_code != 200:
             raise RuntimeError('Error getting properties: %s' % r.status_code)
         else:
@@ -143,8 +161,7 @@ class UnicoreJobManager(object):
         :return:
         """
         action_url = self.get_properties(job_url)['_links']['action:' + action]['href']
-        r = requests.post(action_url, proxies=self._http_proxies, data=json.dumps(data),
-                          headers=self._get_json_headers(), verify=False)
+        r = self._request('POST', action_url, self._get_json_headers(), data=json.dumps(data))
         if r.status_code != 200:
             log.error(r.content)
             raise RuntimeError('Error invoking action: %s' % r.status_code)
@@ -158,8 +175,8 @@ class UnicoreJobManager(object):
         name = file_desc['To']
         data = file_desc['Data']
         # TODO file_desc could refer to local file
-        r = requests.put(destination + "/" + name, proxies=self._http_proxies, data=data,
-                         headers=self._get_octet_stream_headers(), verify=False)
+        r = self._request('PUT', destination + "/" + name, self._get_octet_stream_headers(),
+                          data=data)
         if r.status_code != 204:
             raise RuntimeError('Error uploading data: %s' % r.status_code)
 
@@ -180,8 +197,7 @@ class UnicoreJobManager(object):
         :return: List of jobs in a JSon representation
         """
         url = properties['_links']['jobs']['href']
-        r = requests.get(url, proxies=self._http_proxies,
-                         headers=self._get_json_headers(), verify=False)
+        r = self._request('GET', url, self._get_json_headers())
         if r.status_code != 200:
             raise RuntimeError("Error getting jobs: %s" % r.status_code)
         return r.json()
@@ -193,12 +209,171 @@ class UnicoreJobManager(object):
         """
         jobs = self.get_jobs(properties)["jobs"]
         for job in jobs:
-            r = requests.delete(job, proxies=self._http_proxies,
-                                headers=self._get_json_headers(), verify=False)
+            r = self._request('DELETE', job, self._get_json_headers())
             if r.status_code != 200 and r.status_code != 204:
                 raise RuntimeError(
                     'Error deleting jobs %s: %s' % (job, r.status_code))
 
+    def submit_job(self, job):
+        """
+        Submits a job to the site of the client
+        :param job: Job description
+        :return: The URL of the job, and the URL of its working directory
+        """
+        r = self._request('POST', self.site_url + '/jobs', self._get_json_headers(),
+                          data=json.dumps(job))
+        log.info(1, r.content)
+        if r.status_code != 201:
+            obj = json.loads(r.content)
+            raise RuntimeError('Error submitting job: ' + obj['errorMessage'])
+        properties = self.get_properties(r.headers['Location'])
+        self.work_dir = self.get_working_directory(None, properties)
+        return [properties['_links']['self']['href'], self.work_dir]
+
+    def delete_job(self, job_url):
+        """
+        Deletes a job
+        :param job_url: URL of the job
+        """
+        r = self._request('DELETE', job_url, self._get_json_headers())
+        log.info(1, r.content)
+        if r.status_code != 204:
+            message = str(r.status_code)
+            if r.content != '':
+                obj = json.loads(r.content)
+                message = obj['errorMessage']
+            raise RuntimeError('Error deleting job: ' + message)
+
+    def get_file_range(self, file_url, offset, length, tail):
+        """
+        Returns part of a file stored on the Unicore file system. Only the requested bytes are
+        transferred, using an HTTP range request
+        :param file_url: URL of the file
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file, or None
+        :return: The requested contents, and the offset following the returned bytes
+        """
+        try:
+            size = self.get_properties(file_url)['size']
+            if tail is not None:
+                offset = max(0, size - consts.LOG_TAIL_CHUNK_SIZE)
+                length = None
+            if offset >= size:
+                # Nothing new, or the file was truncated and the client resynchronizes
+                return ['', size]
+            last_byte = size - 1
+            if length is not None:
+                last_byte = min(last_byte, offset + length - 1)
+            headers = self._get_octet_stream_headers()
+            headers['Range'] = 'bytes=' + str(offset) + '-' + str(last_byte)
+            log.info(2, 'Getting file range ' + headers['Range'] + ' from ' + file_url)
+            r = self._request('GET', file_url, headers)
+            if r.status_code == 416:
+                return ['', size]
+            if r.status_code not in [200, 206]:
+                raise RuntimeError('Error getting file range: %s' % r.status_code)
+            contents = r.content
+            if r.status_code == 200:
+                # The server ignored the range and returned the whole file
+                contents = contents[offset:last_byte + 1]
+            if tail is not None:
+                lines = contents.splitlines(True)
+                return [''.join(lines[-tail:]) if tail > 0 else '', size]
+            return [contents, offset + len(contents)]
+        except RuntimeError as e:
+            log.error(str(e))
+            return ['', offset]
+
+    def get_file_content(self, file_url, check_size_limit=True, max_size=2048000):
+        """
+        Returns the contents of a file stored on the Unicore file system
+        :param file_url: URL of the file
+        :param check_size_limit: Check size limit before download
+        :param max_size: The maximum size of the file
+        :return: The contents of the remote file
+        """
+        try:
+            log.info(2, 'Getting file content from ' + file_url)
+            if check_size_limit:
+                size = self.get_properties(file_url)['size']
+                if size > max_size:
+                    raise RuntimeError('File size too large!')
+            r = self._request('GET', file_url, self._get_octet_stream_headers())
+            if r.status_code == 200:
+                return r.content
+        except RuntimeError as e:
+            log.error(e)
+        return None
+
+
+class UnicoreJobManager(object):
+    """
+    The job manager class provides methods for managing Unicore jobs
+    """
+
+    def __init__(self):
+        """
+        Setup job manager
+        """
+        self._locks = JobLocks(global_settings.SCHEDULER_MAX_REQUESTS_PER_CLUSTER)
+        self._http_proxies = global_settings.UNICORE_DEFAULT_HTTP_PROXIES
+        self._mutex = threading.Lock()
+        self._clients = dict()
+        # Clients are kept until their session is deleted, so that the logs of the job can still
+        # be archived once it is stopped
+        post_delete.connect(self._release_client, sender=Session)
+
+    def _client(self, session, auth_token=None):
+        """
+        Returns the Unicore client of a session
+        :param session: Current user session
+        :param auth_token: Token for Unicore authentication. If specified, a new client is
+                           created for the session
+        :return: The Unicore client of the session
+        :raise RuntimeError: If the session has no client, typically because it was scheduled
+                             before a restart of the service
+        """
+        with self._mutex:
+            client = self._clients.get(session.id)
+            if auth_token is not None:
+                client = UnicoreClient(auth_token, self._http_proxies)
+                self._clients[session.id] = client
+            if client is None:
+                raise RuntimeError('Unicore credentials of session ' + str(session.id) +
+                                   ' are not available')
+            return client
+
+    def has_client(self, session):
+        """
+        :param session: Current user session
+        :return: True if the credentials of the session are available
+        """
+        with self._mutex:
+            return session.id in self._clients
+
+    # pylint: disable=W0613
+    def _release_client(self, sender, instance, **kwargs):
+        """
+        Forgets the Unicore client of a session that has been deleted
+        :param sender: Session model
+        :param instance: Session that has been deleted
+        """
+        with self._mutex:
+            self._clients.pop(instance.id, None)
+
+    def _work_dir(self, session):
+        """
+        Returns the URL of the working directory of the job of a session, known by its client
+        once the job is submitted
+        :param session: Current user session
+        :return: The URL of the working directory, or None if the job or its credentials are
+                 unknown
+        """
+        if not self.has_client(session):
+            return None
+        return self._client(session).work_dir
+
     def submit(self, session, job_information):
         """
         Submits a job to the given URL, which can be the ".../jobs" URL or a ".../sites/site_name/"
@@ -207,25 +382,10 @@ class UnicoreJobManager(object):
         :param session: Current user session
         :param job_information: Job properties
         """
+        client = self._client(session)
         # make sure UNICORE does not start the job before we have uploaded data
         job_information.job['haveClientStageIn'] = 'true'
-
-        r = requests.post(self._registry_url + '/jobs',
-                          proxies=self._http_proxies,
-                          data=json.dumps(job_information.job),
-                          headers=self._get_json_headers(), verify=False)
-        log.info(1, r.content)
-        if r.status_code != 201:
-            obj = json.loads(r.content)
-            raise RuntimeError('Error submitting job: ' + obj['errorMessage'])
-        else:
-            session.job_id = r.headers['Location']
-
-        r = requests.get(session.job_id, proxies=self._http_proxies,
-                         headers=self._get_json_headers(), verify=False)
-        body = json.loads(r.content)
-        session.job_id = body['_links']['self']['href']
-        self._work_dir = body['_links']['workingDirectory']['href']
+        session.job_id, work_dir = client.submit_job(job_information.job)
 
         # Build command line
         input_sh_content = \
@@ -237,8 +397,7 @@ class UnicoreJobManager(object):
 
         # upload input data and explicitly start job
         for input_file in inputs:
-            self.upload(self._work_dir + "/files", input_file)
-        log.info(1, r.content)
+            client.upload(work_dir + "/files", input_file)
 
     def allocate(self, session, job_information):
         """
@@ -249,15 +408,16 @@ class UnicoreJobManager(object):
         :param job_information: Information about the job
         :return: A Json response containing on ok status or a description of the error
         """
+        self._locks.lock_session(session.id)
         try:
-            self._mutex.acquire()
-            self._registry_url = self.get_sites()[global_settings.UNICORE_DEFAULT_SITE]
+            client = self._client(session)
+            client.site_url = client.get_sites()[global_settings.UNICORE_DEFAULT_SITE]
             # get information about the current user, e.g.
             # role, Unix login and group(s)
-            props = self.get_properties(self._registry_url)
+            props = client.get_properties(client.site_url)
             if not 'user' == props['client']['role']['selected']:
                 log.error('Account is not registered on the selected site')
-            self.clear_jobs(props)
+            client.clear_jobs(props)
             # setup the job - please refer to the following link
             # https://unicore-dev.zam.kfa-juelich.de/documentation/
             #   ucc-7.8.0/ucc-manual.html#ucc_jobdescription
@@ -271,7 +431,8 @@ class UnicoreJobManager(object):
             job_information.job['Resources'] = {'Nodes': max(1, job_information.nb_nodes)}
 
             # Submit the job
-            self.submit(session, job_information)
+            with self._locks.cluster(global_settings.UNICORE_DEFAULT_SITE):
+                self.submit(session, job_information)
             session.status = SESSION_STATUS_SCHEDULED
             session.save()
             response = 'Job submitted to %s' % session.job_id
@@ -281,20 +442,25 @@ class UnicoreJobManager(object):
             log.info(1, e)
             return [403, str(e)]
         finally:
-            if self._mutex.locked():
-                self._mutex.release()
+            self._locks.unlock_session(session.id)
 
     def schedule(self, session, job_information, auth_token):
         """
         Allocates a job and starts the rendering resource process. If successful, the session
-        job_id is populated and the session status is set to SESSION_STATUS_STARTING
+        job_id is populated and the session status is set to SESSION_STATUS_STARTING. The client
+        of the session is replaced under the session lock, so that it does not change while a
+        previous request of the session is allocating its job
         :param session: Current user session
         :param job_information: Information about the job
         :param auth_token: Token for Unicore authentication
         :return: A Json response containing on ok status or a description of the error
         """
-        self._auth_token = auth_token
-        return self.allocate(session, job_information)
+        self._locks.lock_session(session.id)
+        try:
+            self._client(session, auth_token)
+            return self.allocate(session, job_information)
+        finally:
+            self._locks.unlock_session(session.id)
 
     @staticmethod
     def _build_start_command_line(session, job_information):
@@ -350,9 +516,10 @@ class UnicoreJobManager(object):
         :param job_information: Information about the job
         :return: A Json response containing on ok status or a description of the error
         """
+        self._locks.lock_session(session.id)
         try:
-            self._mutex.acquire()
-            self.invoke_action(session.job_id, 'start')
+            with self._locks.cluster(global_settings.UNICORE_DEFAULT_SITE):
+                self._client(session).invoke_action(session.job_id, 'start')
 
             rr_settings = \
                 manager.RenderingResourceSettingsManager.get_by_id(session.configuration_id.lower())
@@ -370,8 +537,7 @@ class UnicoreJobManager(object):
             response = json.dumps({'contents': str(e)})
             return [400, response]
         finally:
-            if self._mutex.locked():
-                self._mutex.release()
+            self._locks.unlock_session(session.id)
 
     def stop(self, session):
         """
@@ -380,25 +546,21 @@ class UnicoreJobManager(object):
         :return: A Json response containing on ok status or a description of the error
         """
         result = [500, 'Unexpected error']
+        if not self.has_client(session):
+            msg = 'Job ' + str(session.job_id) + ' cannot be deleted without the Unicore ' + \
+                  'credentials of its session, it is left to expire on the site'
+            log.error(msg)
+            return [200, json.dumps({'contents': msg})]
+        self._locks.lock_session(session.id)
         try:
-            self._work_dir = None
-            self._mutex.acquire()
             session.status = SESSION_STATUS_STOPPING
             session.save()
 
-            # make sure UNICORE does not start the job before we have uploaded data
-            r = requests.delete(session.job_id, proxies=self._http_proxies,
-                                headers=self._get_json_headers(), verify=False)
-            log.info(1, r.content)
-            if r.status_code != 204:
-                message = str(r.status_code)
-                if r.content != '':
-                    obj = json.loads(r.content)
-                    message = obj['errorMessage']
-                raise RuntimeError('Error deleting job: ' + message)
+            client = self._client(session)
+            with self._locks.cluster(global_settings.UNICORE_DEFAULT_SITE):
+                client.delete_job(session.job_id)
         finally:
-            if self._mutex.locked():
-                self._mutex.release()
+            self._locks.unlock_session(session.id)
         return result
 
     @staticmethod
@@ -426,15 +588,16 @@ class UnicoreJobManager(object):
         """
         Returns the Job http url for the current session
         :param session: Current user session
-        :return: The hostname of the host if the job is running, empty otherwise
+        :return: The hostname of the host if the job is running, empty otherwise, and FAILED
+                 if the job cannot be managed anymore
         """
+        if not self.has_client(session):
+            log.error('Unicore credentials of session ' + str(session.id) + ' are not available')
+            return 'FAILED'
         value = ''
-        r = requests.get(session.job_id, proxies=self._http_proxies,
-                         headers=self._get_json_headers(), verify=False)
+        client = self._client(session)
         try:
-            if r.content == '':
-                return value
-            obj = json.loads(r.content)
+            obj = client.get_properties(session.job_id)
             log.info(1, str(obj))
             status = obj['status']
             log.info(1, 'Unicore job status is ' + str(status))
@@ -444,7 +607,10 @@ class UnicoreJobManager(object):
                 self.stop(session)
             else:
                 # TODO: CHANGE TO STDOUT when Renderer is deployed on the cluster
-                log_file = self._get_file_content(self._work_dir + '/files/stderr')
+                work_dir = self._work_dir(session)
+                log_file = None
+                if work_dir is not None:
+                    log_file = client.get_file_content(work_dir + '/files/stderr')
                 if log_file is not None:
                     try:
                         log.info(1, 'Log: ' + log_file)
@@ -454,7 +620,7 @@ class UnicoreJobManager(object):
                         session.save()
                     except AttributeError as e:
                         value = ''
-        except KeyError as e:
+        except (RuntimeError, KeyError) as e:
             log.error(e)
         return value
 
@@ -466,44 +632,76 @@ class UnicoreJobManager(object):
         """
         return self._query(session)
 
-    def rendering_resource_out_log(self, session):
+    def rendering_resource_out_log(self, session, offset=0, length=None, tail=None):
         """
         Returns the contents of the rendering resource output file
         :param session: Current user session
-        :return: A string containing the output log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file. If specified,
+                     offset and length are ignored
+        :return: A string containing the output log, and the offset following the returned bytes
         """
-        return self._get_file_content(self._work_dir + '/files/stdout')
+        return self._get_file_range(session, '/files/stdout', offset, length, tail)
 
-    def rendering_resource_err_log(self, session):
+    def rendering_resource_err_log(self, session, offset=0, length=None, tail=None):
         """
         Returns the contents of the rendering resource error file
         :param session: Current user session
-        :return: A string containing the error log
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file. If specified,
+                     offset and length are ignored
+        :return: A string containing the error log, and the offset following the returned bytes
         """
-        return self._get_file_content(self._work_dir + '/files/stdout')
+        return self._get_file_range(session, '/files/stderr', offset, length, tail)
 
-    def _get_file_content(self, file_url, check_size_limit=True, max_size=2048000):
-        """
-        Returns the contents of a file stored on the Unicore file system
-        :param file_url: URL of the file
-        :param check_size_limit: Check size limit before download
-        :param max_size: The maximum size of the file
-        :return: The contents of the remote file
+    def fetch_rendering_resource_log(self, session, err, max_size):
         """
+        Returns the end of the rendering resource output or error file, whatever the status of
+        the session. This is typically used to archive the logs when the session is destroyed
+        :param session: Current user session
+        :param err: True for the error file
+        :param max_size: Maximum number of bytes to be returned
+        :return: A string containing the end of the log, or None if it cannot be read
+        """
+        work_dir = self._work_dir(session)
+        if work_dir is None:
+            return None
+        client = self._client(session)
+        file_url = work_dir + ('/files/stderr' if err else '/files/stdout')
         try:
-            log.info(2, 'Getting file content from ' + file_url)
-            if check_size_limit:
-                size = self.get_properties(file_url)['size']
-                if size > max_size:
-                    raise RuntimeError('File size too large!')
-            r = requests.get(file_url, proxies=self._http_proxies,
-                             headers=self._get_octet_stream_headers(), verify=False)
-            if r.status_code == 200:
-                return r.content
+            size = client.get_properties(file_url)['size']
         except RuntimeError as e:
-            log.error(e)
+            log.error(str(e))
+            return None
+        return client.get_file_range(file_url, max(0, size - max_size), None, None)[0]
+
+    def follow_rendering_resource_log(self, session, err=False):
+        """
+        UNICORE does not provide a way to follow a file. Logs are followed with successive
+        range requests instead (see rendering_resource_out_log)
+        :param session: Current user session
+        :param err: True to follow the error file
+        :return: None
+        """
         return None
 
+    def _get_file_range(self, session, path, offset, length, tail):
+        """
+        Returns part of a file of the working directory of a job
+        :param session: Current user session
+        :param path: Path of the file in the working directory
+        :param offset: Position of the first byte to be returned
+        :param length: Maximum number of bytes to be returned, the whole remaining file if None
+        :param tail: Number of lines to be returned from the end of the file, or None
+        :return: The requested contents, and the offset following the returned bytes
+        """
+        work_dir = self._work_dir(session)
+        if work_dir is None:
+            return ['', offset]
+        return self._client(session).get_file_range(work_dir + path, offset, length, tail)
+
     def _query(self, session, attribute=None):
         """
         Queries Unicore for information
@@ -513,8 +711,8 @@ class UnicoreJobManager(object):
         """
         if session.job_id is not None and attribute is not None:
             try:
-                return self.get_properties(session.job_id)[attribute]
-            except OSError as e:
+                return self._client(session).get_properties(session.job_id)[attribute]
+            except (OSError, RuntimeError) as e:
                 log.error(str(e))
                 return None
         return None
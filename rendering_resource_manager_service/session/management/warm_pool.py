@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+The warm pool keeps pre-allocated and already started rendering resources for the
+configurations that define a warm_pool_size. Warm rendering resources are held by sessions
+owned by the pool. When a user schedules a rendering resource with the default job parameters,
+the job of a running warm session is handed over to the user session, and the pool is refilled
+in the background. Warm sessions that are not claimed within the warm_pool_max_idle delay of
+their configuration, counted from the moment they are running, expire and are destroyed by the
+keep-alive thread. Backends authenticating with the token of the user cannot have warm pools.
+"""
+
+import datetime
+import threading
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.config.models import RenderingResourceSettings
+from rendering_resource_manager_service.session.management import job_manager
+from rendering_resource_manager_service.session.management import session_manager
+from rendering_resource_manager_service.session.management import task_queue
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_SCHEDULING, SESSION_STATUS_SCHEDULED, SESSION_STATUS_GETTING_HOSTNAME, \
+    SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, SESSION_STATUS_FAILED
+
+# Owner given to warm sessions while they are being handed over to a user session
+WARM_POOL_CLAIMED_OWNER = consts.WARM_POOL_OWNER + '-claimed'
+
+# States of the warm sessions that are, or will be, available
+WARM_POOL_STARTING_STATES = [SESSION_STATUS_SCHEDULING, SESSION_STATUS_SCHEDULED,
+                             SESSION_STATUS_GETTING_HOSTNAME, SESSION_STATUS_STARTING]
+WARM_POOL_STATES = WARM_POOL_STARTING_STATES + [SESSION_STATUS_RUNNING]
+
+# Job parameters that prevent a schedule request from being served by the pool
+JOB_PARAMETERS = ['params', 'environment', 'reservation', 'nb_cpus', 'nb_gpus', 'nb_nodes',
+                  'memory', 'queue', 'exclusive', 'allocation_time', 'backend']
+
+
+def is_default_job(parameters):
+    """
+    :param parameters: Job parameters of a schedule request
+    :return: True if the job uses the default parameters of its configuration, and can
+             therefore be served by a warm rendering resource
+    """
+    for name in JOB_PARAMETERS:
+        if parameters.get(name):
+            return False
+    return True
+
+
+class WarmPool(object):
+    """
+    Hands over warm rendering resources to user sessions, and counts pool hits and misses per
+    configuration
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self._mutex = threading.Lock()
+        self._counters = dict()
+        self._refill_requested = threading.Event()
+
+    def _count(self, configuration_id, hit):
+        """
+        Updates the hit and miss counters of the given configuration
+        :param configuration_id: Id of the rendering resource configuration
+        :param hit: True if a warm rendering resource was claimed
+        """
+        with self._mutex:
+            counters = self._counters.setdefault(configuration_id, {'hits': 0, 'misses': 0})
+            if hit:
+                counters['hits'] += 1
+            else:
+                counters['misses'] += 1
+
+    def claim(self, session):
+        """
+        Hands over a running warm rendering resource to the given session. The session
+        inherits the job, host and port of the warm session, which is then deleted
+        :param session: User session requesting a rendering resource
+        :return: True if a warm rendering resource was claimed
+        """
+        configuration_id = session.configuration_id.lower()
+        try:
+            rr_settings = RenderingResourceSettings.objects.get(id=configuration_id)
+        except RenderingResourceSettings.DoesNotExist:
+            return False
+        if rr_settings.warm_pool_size <= 0 or \
+                job_manager.requires_user_token(job_manager.configuration_backend(rr_settings)):
+            return False
+
+        claimed = None
+        warm_sessions = Session.objects.filter(
+            owner=consts.WARM_POOL_OWNER, configuration_id=configuration_id,
+            status=SESSION_STATUS_RUNNING).exclude(http_host='')
+        for warm_session in warm_sessions:
+            # Only one of the concurrent requests succeeds in changing the owner
+            if Session.objects.filter(id=warm_session.id, owner=consts.WARM_POOL_OWNER).update(
+                    owner=WARM_POOL_CLAIMED_OWNER) == 1:
+                claimed = warm_session
+                break
+
+        self._count(configuration_id, claimed is not None)
+        self.request_refill()
+        if claimed is None:
+            log.info(1, 'No warm rendering resource available for ' + configuration_id)
+            return False
+
+        session.job_id = claimed.job_id
+        session.cluster_node = claimed.cluster_node
+        session.backend = claimed.backend
+        session.http_host = claimed.http_host
+        session.http_port = claimed.http_port
+        session.status = claimed.status
+        session.save()
+        # Deleting the warm session leaves its job running
+        claimed.delete()
+        log.info(1, 'Session ' + str(session.id) + ' claimed warm job ' + str(session.job_id) +
+                 ' on ' + session.http_host + ':' + str(session.http_port))
+        return True
+
+    @staticmethod
+    def refill():
+        """
+        Starts the warm rendering resources missing in the pool of each configuration, and
+        updates the status of the ones being started. The expiration of the warm rendering
+        resources being started is postponed, so that their idle delay counts from the moment
+        they are running
+        """
+        Session.objects.filter(
+            owner=consts.WARM_POOL_OWNER, status=SESSION_STATUS_FAILED).delete()
+        for session in Session.objects.filter(
+                owner=consts.WARM_POOL_OWNER, status=SESSION_STATUS_STARTING):
+            session_manager.SessionManager.query_status(session.id)
+
+        for rr_settings in RenderingResourceSettings.objects.filter(warm_pool_size__gt=0):
+            backend = job_manager.configuration_backend(rr_settings)
+            if job_manager.requires_user_token(backend):
+                log.error('Warm pool of ' + rr_settings.id + ' is ignored, the ' + backend +
+                          ' backend needs the token of the user')
+                continue
+            now = datetime.datetime.now()
+            Session.objects.filter(
+                owner=consts.WARM_POOL_OWNER, configuration_id=rr_settings.id,
+                status__in=WARM_POOL_STARTING_STATES).update(
+                    valid_until=now + datetime.timedelta(seconds=rr_settings.warm_pool_max_idle))
+            count = Session.objects.filter(
+                owner=consts.WARM_POOL_OWNER, configuration_id=rr_settings.id,
+                status__in=WARM_POOL_STATES).count()
+            for _ in range(rr_settings.warm_pool_size - count):
+                session = Session(
+                    id=str(session_manager.SessionManager.get_session_id()),
+                    owner=consts.WARM_POOL_OWNER,
+                    configuration_id=rr_settings.id,
+                    created=now,
+                    valid_until=now + datetime.timedelta(seconds=rr_settings.warm_pool_max_idle),
+                    status=SESSION_STATUS_SCHEDULING)
+                session.save(force_insert=True)
+                log.info(1, 'Starting warm rendering resource ' + session.id + ' for ' +
+                         rr_settings.id)
+                task_queue.globalTaskQueue.submit(session.id, consts.TASK_COMMAND_SCHEDULE)
+
+    def statistics(self):
+        """
+        :return: A dictionary containing, for each configuration with a warm pool, the size of
+                 the pool, the number of ready and starting rendering resources, and the hit and
+                 miss counters
+        """
+        statistics = dict()
+        for rr_settings in RenderingResourceSettings.objects.filter(warm_pool_size__gt=0):
+            warm_sessions = Session.objects.filter(
+                owner=consts.WARM_POOL_OWNER, configuration_id=rr_settings.id)
+            ready = warm_sessions.filter(status=SESSION_STATUS_RUNNING).count()
+            statistics[rr_settings.id] = {
+                'size': rr_settings.warm_pool_size,
+                'ready': ready,
+                'starting': warm_sessions.filter(status__in=WARM_POOL_STATES).count() - ready,
+                'hits': 0,
+                'misses': 0
+            }
+        with self._mutex:
+            for configuration_id, counters in self._counters.items():
+                statistics.setdefault(configuration_id, {}).update(counters)
+        return statistics
+
+    def request_refill(self):
+        """
+        Wakes up the warm pool thread so that the pool is refilled without waiting for the next
+        cycle
+        """
+        self._refill_requested.set()
+
+    def wait_for_refill_request(self, timeout):
+        """
+        Waits until a refill is requested or the timeout expires
+        :param timeout: Maximum waiting time (in seconds)
+        """
+        self._refill_requested.wait(timeout)
+        self._refill_requested.clear()
+
+
+class WarmPoolThread(threading.Thread):
+    """
+    Keeps the warm pools of all configurations filled
+    """
+
+    def __init__(self, pool):
+        """
+        Initialization
+        :param pool: Warm pool
+        """
+        threading.Thread.__init__(self)
+        self.signal = True
+        self._pool = pool
+        log.info(1, 'Warm pool thread started...')
+
+    def run(self):
+        """
+        Refills the pools and waits for the next cycle
+        """
+        while self.signal:
+            try:
+                self._pool.refill()
+            # pylint: disable=W0703
+            except Exception as e:
+                log.error('Failed to refill warm pool: ' + str(e))
+            self._pool.wait_for_refill_request(consts.WARM_POOL_INTERVAL)
+
+
+# Global pool of warm rendering resources
+globalWarmPool = WarmPool()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+WebSocket tunnels between clients and rendering resources. A client opens a WebSocket on
+<prefix>/session/websocket/<path>?session_id=<id>, and its frames are relayed in both
+directions to ws://<http_host>:<http_port>/<path> on the rendering resource of the session.
+Tunnels require a server able to upgrade connections, such as the gateway (see
+service/gateway.py), and the optional websocket-client package.
+"""
+
+import threading
+import datetime
+import struct
+import urllib
+from urlparse import parse_qsl
+
+import websocket
+from django.db import connection
+from django.db.models.signals import post_delete
+
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.config.models import SystemGlobalSettings
+from rendering_resource_manager_service.session.models import Session, SESSION_STATUS_RUNNING
+
+
+# WebSocket close codes sent to the client
+WEBSOCKET_CLOSE_NORMAL = 1000
+WEBSOCKET_CLOSE_GOING_AWAY = 1001
+WEBSOCKET_CLOSE_POLICY_VIOLATION = 1008
+WEBSOCKET_CLOSE_INTERNAL_ERROR = 1011
+
+
+def close_client(client, code, reason=''):
+    """
+    Closes a client WebSocket with the given close code
+    :param client: WebSocket opened by the client
+    :param code: WebSocket close code
+    :param reason: Description sent to the client
+    """
+    # gevent-websocket ignores the close code, the close frame is therefore sent explicitly.
+    # The socket is then only flagged as closed, as close() would send a second close frame
+    try:
+        client.send_frame(struct.pack('!H', code) + reason, client.OPCODE_CLOSE)
+    finally:
+        client.closed = True
+
+
+class WebSocketTunnel(object):
+    """
+    Relays the frames of a client WebSocket to the WebSocket of a rendering resource, and back
+    """
+
+    def __init__(self, session_id, client, upstream, keep_alive_timeout):
+        """
+        Initialization
+        :param session_id: Id of the session owning the rendering resource
+        :param client: WebSocket opened by the client
+        :param upstream: WebSocket opened on the rendering resource
+        :param keep_alive_timeout: Session lifetime granted by tunnel activity (in seconds)
+        """
+        self.session_id = session_id
+        self._client = client
+        self._upstream = upstream
+        self._keep_alive_timeout = keep_alive_timeout
+        self._last_activity = None
+        self._closed = False
+        self._mutex = threading.Lock()
+
+    def _keep_alive(self):
+        """
+        Extends the lifetime of the session, at most once per WEBSOCKET_KEEP_ALIVE_INTERVAL
+        """
+        now = datetime.datetime.now()
+        if self._last_activity is not None and now < self._last_activity + \
+                datetime.timedelta(seconds=consts.WEBSOCKET_KEEP_ALIVE_INTERVAL):
+            return
+        self._last_activity = now
+        # Only the expiration is updated, the session does not need to be loaded
+        Session.objects.filter(id=self.session_id).update(
+            valid_until=now + datetime.timedelta(seconds=self._keep_alive_timeout))
+
+    def _relay_to_upstream(self):
+        """
+        Relays the client messages to the rendering resource until one of the sockets is closed
+        """
+        while not self._closed:
+            message = self._client.receive()
+            if message is None:
+                break
+            if isinstance(message, unicode):
+                self._upstream.send(message.encode('utf-8'), websocket.ABNF.OPCODE_TEXT)
+            else:
+                self._upstream.send(bytes(message), websocket.ABNF.OPCODE_BINARY)
+            self._keep_alive()
+
+    def _relay_to_client(self):
+        """
+        Relays the rendering resource messages to the client until one of the sockets is closed
+        """
+        try:
+            while not self._closed:
+                opcode, data = self._upstream.recv_data()
+                if opcode == websocket.ABNF.OPCODE_CLOSE:
+                    break
+                self._client.send(data, binary=(opcode == websocket.ABNF.OPCODE_BINARY))
+                self._keep_alive()
+        # pylint: disable=W0703
+        except Exception as e:
+            if not self._closed:
+                log.info(2, 'Tunnel of session ' + str(self.session_id) + ' interrupted: ' +
+                         str(e))
+        finally:
+            self.close(WEBSOCKET_CLOSE_GOING_AWAY)
+            connection.close()
+
+    def run(self):
+        """
+        Relays messages in both directions until one of the sockets is closed
+        """
+        downstream = threading.Thread(target=self._relay_to_client)
+        downstream.setDaemon(True)
+        downstream.start()
+        try:
+            self._relay_to_upstream()
+        # pylint: disable=W0703
+        except Exception as e:
+            if not self._closed:
+                log.info(2, 'Tunnel of session ' + str(self.session_id) + ' interrupted: ' +
+                         str(e))
+        finally:
+            self.close(WEBSOCKET_CLOSE_NORMAL)
+            downstream.join()
+            connection.close()
+
+    def close(self, code=WEBSOCKET_CLOSE_NORMAL, reason=''):
+        """
+        Closes both sockets of the tunnel
+        :param code: WebSocket close code sent to the client
+        :param reason: Description sent to the client
+        """
+        with self._mutex:
+            if self._closed:
+                return
+            self._closed = True
+        for close in [lambda: self._upstream.close(),
+                      lambda: close_client(self._client, code, reason)]:
+            try:
+                close()
+            # pylint: disable=W0703
+            except Exception as e:
+                log.debug(1, 'Failed to close tunnel socket: ' + str(e))
+
+
+class TunnelRegistry(object):
+    """
+    Thread safe registry of the open tunnels, indexed by session id
+    """
+
+    def __init__(self):
+        """
+        Initialization
+        """
+        self._mutex = threading.Lock()
+        self._tunnels = dict()
+
+    def add(self, tunnel):
+        """
+        Registers an open tunnel
+        :param tunnel: WebSocketTunnel to be registered
+        """
+        with self._mutex:
+            self._tunnels.setdefault(str(tunnel.session_id), set()).add(tunnel)
+
+    def remove(self, tunnel):
+        """
+        Unregisters a tunnel
+        :param tunnel: WebSocketTunnel to be unregistered
+        """
+        with self._mutex:
+            tunnels = self._tunnels.get(str(tunnel.session_id), set())
+            tunnels.discard(tunnel)
+            if len(tunnels) == 0:
+                self._tunnels.pop(str(tunnel.session_id), None)
+
+    def close_session(self, session_id):
+        """
+        Closes all tunnels of the given session
+        :param session_id: Id of the session
+        """
+        with self._mutex:
+            tunnels = self._tunnels.pop(str(session_id), set())
+        for tunnel in tunnels:
+            log.info(1, 'Closing tunnel of session ' + str(session_id))
+            tunnel.close(WEBSOCKET_CLOSE_GOING_AWAY, 'Session destroyed')
+
+    def count(self, session_id):
+        """
+        :param session_id: Id of the session
+        :return: The number of open tunnels of the given session
+        """
+        with self._mutex:
+            return len(self._tunnels.get(str(session_id), set()))
+
+
+# Global registry of the tunnels open in the current process
+globalTunnelRegistry = TunnelRegistry()
+
+
+# pylint: disable=W0613
+def close_tunnels(sender, instance, **kwargs):
+    """
+    Closes the tunnels of a session that has been deleted
+    :param sender: Session model
+    :param instance: Session that has been deleted
+    """
+    globalTunnelRegistry.close_session(instance.id)
+
+
+post_delete.connect(close_tunnels, sender=Session)
+
+
+def open_tunnel(client, path, query_string):
+    """
+    Opens a tunnel between a client WebSocket and the rendering resource of a session, and
+    relays messages until one of the sockets is closed
+    :param client: WebSocket opened by the client
+    :param path: Path of the WebSocket on the rendering resource
+    :param query_string: Query string of the client request, containing the session id
+    """
+    parameters = parse_qsl(query_string)
+    session_id = dict(parameters).get(consts.REQUEST_PARAMETER_SESSIONID)
+    try:
+        session = Session.objects.get(id=session_id)
+        keep_alive_timeout = SystemGlobalSettings.objects.get(id=0).session_keep_alive_timeout
+    except (Session.DoesNotExist, SystemGlobalSettings.DoesNotExist):
+        close_client(client, WEBSOCKET_CLOSE_POLICY_VIOLATION, 'Session does not exist')
+        return
+    finally:
+        connection.close()
+    if session.status != SESSION_STATUS_RUNNING:
+        close_client(client, WEBSOCKET_CLOSE_POLICY_VIOLATION, 'Session is not running')
+        return
+
+    # Parameters other than the session id are passed to the rendering resource
+    query = urllib.urlencode([parameter for parameter in parameters
+                              if parameter[0] != consts.REQUEST_PARAMETER_SESSIONID])
+    url = 'ws://' + session.http_host + ':' + str(session.http_port) + '/' + path
+    if query != '':
+        url += '?' + query
+    log.info(1, 'Opening tunnel to ' + url + ' for session ' + str(session.id))
+    try:
+        upstream = websocket.create_connection(url, timeout=settings.REQUEST_TIMEOUT)
+        # Once connected, the tunnel waits for messages without timeout
+        upstream.settimeout(None)
+    # pylint: disable=W0703
+    except Exception as e:
+        log.error('Failed to open tunnel to ' + url + ': ' + str(e))
+        close_client(client, WEBSOCKET_CLOSE_INTERNAL_ERROR, 'Rendering resource is not reachable')
+        return
+
+    tunnel = WebSocketTunnel(session.id, client, upstream, keep_alive_timeout)
+    globalTunnelRegistry.add(tunnel)
+    try:
+        tunnel.run()
+    finally:
+        globalTunnelRegistry.remove(tunnel)
+        log.info(1, 'Tunnel of session ' + str(session.id) + ' closed')
+
+
+class WebSocketTunnelMiddleware(object):
+    """
+    WSGI middleware handling WebSocket requests on the tunnel path, and passing all other
+    requests to the application
+    """
+
+    def __init__(self, application):
+        """
+        Initialization
+        :param application: WSGI application
+        """
+        self.application = application
+        self.prefix = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION + \
+            consts.WEBSOCKET_TUNNEL_PATH
+
+    def __call__(self, environ, start_response):
+        """
+        Opens a tunnel if the request is a WebSocket on the tunnel path
+        """
+        client = environ.get('wsgi.websocket')
+        path = environ.get('PATH_INFO', '')
+        if client is None or not (path == self.prefix or path.startswith(self.prefix + '/')):
+            return self.application(environ, start_response)
+        open_tunnel(client, path[len(self.prefix) + 1:], environ.get('QUERY_STRING', ''))
+        return []
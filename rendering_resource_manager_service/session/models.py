@@ -38,6 +38,11 @@ SESSION_STATUS_STOPPING = 6
 SESSION_STATUS_FAILED = 7
 SESSION_STATUS_BUSY = 8
 
+TASK_STATUS_PENDING = 0
+TASK_STATUS_RUNNING = 1
+TASK_STATUS_COMPLETED = 2
+TASK_STATUS_FAILED = 3
+
 
 class Session(models.Model):
     """
@@ -57,6 +62,7 @@ class Session(models.Model):
     parameters = models.CharField(max_length=2048, default='')
     status = models.IntegerField(default=0)
     cluster_node = models.CharField(max_length=512, default='')
+    backend = models.CharField(max_length=50, default='')
 
     class Meta(object):
         """
@@ -68,3 +74,32 @@ class Session(models.Model):
         return '%s, %s' % (self.owner, self.configuration_id)
 
     __unicode__ = __str__
+
+
+class Task(models.Model):
+    """
+    A long running command executed in the background on behalf of a session
+    """
+
+    id = models.CharField(max_length=32, primary_key=True)
+    session_id = models.CharField(max_length=64)
+    command = models.CharField(max_length=20)
+    parameters = models.TextField(default='')
+    status = models.IntegerField(default=TASK_STATUS_PENDING)
+    code = models.IntegerField(default=0)
+    contents = models.TextField(default='')
+    owner = models.CharField(max_length=128, default='')
+    heartbeat = models.DateTimeField(null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta(object):
+        """
+        A Meta object for the Task
+        """
+        ordering = ('created',)
+
+    def __str__(self):
+        return '%s, %s' % (self.session_id, self.command)
+
+    __unicode__ = __str__
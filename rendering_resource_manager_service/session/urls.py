@@ -29,7 +29,8 @@ Defines application URLs
 
 from django.conf.urls import patterns, url
 from rendering_resource_manager_service.session.views import \
-    SessionViewSet, CommandViewSet, SessionDetailsViewSet
+    SessionViewSet, CommandViewSet, SessionDetailsViewSet, StatusWatchViewSet, \
+    SessionStatusesViewSet, TaskViewSet, WarmPoolViewSet, LogStreamViewSet
 from rest_framework.urlpatterns import format_suffix_patterns
 
 session_list = SessionViewSet.as_view({
@@ -40,6 +41,22 @@ session_list = SessionViewSet.as_view({
 session_details = SessionDetailsViewSet.as_view({
     'get': 'get_session',
 })
+session_watch = StatusWatchViewSet.as_view({
+    'get': 'watch_status',
+})
+session_statuses = SessionStatusesViewSet.as_view({
+    'get': 'query_statuses',
+    'post': 'query_statuses',
+})
+session_task = TaskViewSet.as_view({
+    'get': 'get_task',
+})
+session_pool = WarmPoolViewSet.as_view({
+    'get': 'get_statistics',
+})
+session_log_stream = LogStreamViewSet.as_view({
+    'get': 'stream_log',
+})
 session_command = CommandViewSet.as_view({
     'get': 'execute',
     'put': 'execute',
@@ -48,6 +65,11 @@ session_command = CommandViewSet.as_view({
 urlpatterns = patterns(
     '',
     url(r'/session/$', session_list),
+    url(r'/session/watch$', session_watch),
+    url(r'/session/statuses$', session_statuses),
+    url(r'/session/task$', session_task),
+    url(r'/session/pool$', session_pool),
+    url(r'/session/log/stream$', session_log_stream),
     url(r'/session/(?P<pk>[a-zA-Z0-9]+)/$', session_details),
     url(r'/session/(?P<command>[a-zA-Z0-9]+)', session_command),
 )
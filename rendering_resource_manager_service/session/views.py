@@ -35,17 +35,27 @@ import json
 import traceback
 
 from rest_framework import serializers, viewsets
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import management.session_manager_settings as consts
 import rendering_resource_manager_service.service.settings as settings
 import rendering_resource_manager_service.utils.custom_logging as log
 import rendering_resource_manager_service.utils.tools as tools
+import rendering_resource_manager_service.utils.http_pool as http_pool
 from rendering_resource_manager_service.session.models import Session
+from rendering_resource_manager_service.config.models import RenderingResourceSettings
+from rendering_resource_manager_service.config.management import \
+    rendering_resource_settings_manager as manager
 from rendering_resource_manager_service.session.management import job_manager
 from rendering_resource_manager_service.session.management import process_manager
+from rendering_resource_manager_service.session.management import routing_table
+from rendering_resource_manager_service.session.management import frame_manager
+from rendering_resource_manager_service.session.management import task_queue
+from rendering_resource_manager_service.session.management import warm_pool
+from rendering_resource_manager_service.session.management import log_stream
 import management.session_manager as session_manager
 from rendering_resource_manager_service.session.models import \
-    SESSION_STATUS_GETTING_HOSTNAME, SESSION_STATUS_SCHEDULED, SESSION_STATUS_STARTING
+    SESSION_STATUS_SCHEDULED, SESSION_STATUS_STARTING, SESSION_STATUS_RUNNING, \
+    SESSION_STATUS_SCHEDULING, SESSION_STATUS_STOPPING, TASK_STATUS_COMPLETED, TASK_STATUS_FAILED
 
 
 class SessionSerializer(serializers.ModelSerializer):
@@ -205,18 +215,221 @@ class SessionViewSet(viewsets.ModelViewSet):
     @classmethod
     def destroy_session(cls, request):
         """
-        Stops the renderer and destroys the user session
+        Stops the renderer and destroys the user session in the background
         :param : request: The REST request
-        :rtype : An HTTP response containing on ok status or a description of the error
+        :rtype : An HTTP response containing the id of the task destroying the session, or a
+                 description of the error
         """
         sm = session_manager.SessionManager()
         session_id = sm.get_session_id_from_request(request)
-        log.info(1, 'Remove session from db')
-        status = sm.delete_session(session_id)
-        log.info(1, 'Session deleted ' + str(session_id))
+        try:
+            session = Session.objects.get(id=session_id)
+        except Session.DoesNotExist:
+            response = json.dumps({'contents': 'Session does not exist'})
+            return HttpResponse(status=404, content=response)
+        session.status = SESSION_STATUS_STOPPING
+        session.save()
+        log.info(1, 'Destroying session ' + str(session_id))
+        return task_response(task_queue.globalTaskQueue.submit(
+            session_id, consts.TASK_COMMAND_STOP))
+
+
+class StatusWatchViewSet(viewsets.ModelViewSet):
+    """
+    Notifies clients of session status changes, either by long-polling or with server-sent events
+    """
+
+    queryset = Session.objects.all()
+    serializer_class = KeepAliveSerializer
+
+    @classmethod
+    def watch_status(cls, request):
+        """
+        Waits for a change of the status code, hostname or port of the session. Clients
+        accepting text/event-stream (or passing stream=sse) receive an event for each change.
+        Other clients receive the status as soon as it differs from the 'since' code (and the
+        optional 'hostname' and 'port' parameters), or after 'wait' seconds
+        :param : request: The REST request
+        :rtype : An HTTP response containing the session status, or a stream of events
+        """
+        sm = session_manager.SessionManager()
+        try:
+            session_id = sm.get_session_id_from_request(request)
+        except KeyError:
+            response = json.dumps({'contents': 'Session id is missing'})
+            return HttpResponse(status=404, content=response)
+
+        # Each watch holds a worker until it returns, so only a few can run at the same time
+        if not session_manager.globalStatusWatches.acquire(False):
+            response = HttpResponse(
+                status=503, content=json.dumps({'contents': 'Too many status watches'}))
+            response['Retry-After'] = str(consts.STATUS_WATCH_INTERVAL * 10)
+            return response
+
+        if request.QUERY_PARAMS.get('stream') == 'sse' or \
+                'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            response = StreamingHttpResponse(
+                tools.ClosingIterator(sm.status_events(session_id),
+                                      session_manager.globalStatusWatches.release),
+                content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        try:
+            wait = min(float(request.QUERY_PARAMS.get('wait', consts.STATUS_WATCH_DEFAULT_WAIT)),
+                       consts.STATUS_WATCH_MAX_WAIT)
+        except ValueError:
+            wait = consts.STATUS_WATCH_DEFAULT_WAIT
+        since = {
+            'code': request.QUERY_PARAMS.get('since'),
+            'hostname': request.QUERY_PARAMS.get('hostname'),
+            'port': request.QUERY_PARAMS.get('port')
+        }
+        try:
+            status = sm.wait_for_status_change(session_id, since, max(wait, 0))
+        finally:
+            session_manager.globalStatusWatches.release()
         return HttpResponse(status=status[0], content=status[1])
 
 
+class LogStreamViewSet(viewsets.ModelViewSet):
+    """
+    Streams the log of a rendering resource with server-sent events
+    """
+
+    queryset = Session.objects.all()
+    serializer_class = KeepAliveSerializer
+
+    @classmethod
+    def stream_log(cls, request):
+        """
+        Sends an event for each line written to the output log of the rendering resource, or
+        to its error log if the 'err' query parameter is set. The last lines of the log are
+        sent first
+        :param : request: The REST request
+        :rtype : A stream of events, or an HTTP response containing a description of the error
+        """
+        try:
+            session_id = session_manager.SessionManager().get_session_id_from_request(request)
+            session = Session.objects.get(id=session_id)
+        except KeyError:
+            response = json.dumps({'contents': 'Session id is missing'})
+            return HttpResponse(status=404, content=response)
+        except Session.DoesNotExist:
+            response = json.dumps({'contents': 'Session does not exist'})
+            return HttpResponse(status=404, content=response)
+
+        # Each stream holds a worker until it ends, so only a few can run at the same time
+        if not log_stream.globalLogStreams.acquire(False):
+            response = HttpResponse(
+                status=503, content=json.dumps({'contents': 'Too many log streams'}))
+            response['Retry-After'] = str(consts.LOG_STREAM_INTERVAL * 10)
+            return response
+
+        err = request.QUERY_PARAMS.get('err', 'false').lower() in ['1', 'true']
+        response = StreamingHttpResponse(
+            tools.ClosingIterator(log_stream.globalLogStreamHub.events(session, err),
+                                  log_stream.globalLogStreams.release),
+            content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class SessionStatusesViewSet(viewsets.ModelViewSet):
+    """
+    Returns the status of several sessions in a single response
+    """
+
+    queryset = Session.objects.all()
+    serializer_class = KeepAliveSerializer
+
+    @classmethod
+    def query_statuses(cls, request):
+        """
+        Queries the status of the sessions listed in the request. Ids are given either as a
+        comma separated 'session_ids' query parameter, or as a 'session_ids' list in the JSON
+        body of a POST request
+        :param : request: The REST request
+        :rtype : A Json response containing the status of each session
+        """
+        if request.method == consts.REST_VERB_POST:
+            session_ids = request.DATA.get('session_ids', list())
+        else:
+            session_ids = [session_id for session_id in
+                           request.QUERY_PARAMS.get('session_ids', '').split(',')
+                           if session_id != '']
+        if not isinstance(session_ids, list) or len(session_ids) == 0:
+            response = json.dumps({'contents': 'No session ids specified'})
+            return HttpResponse(status=400, content=response)
+        sm = session_manager.SessionManager()
+        status = sm.query_statuses(session_ids)
+        return HttpResponse(status=status[0], content=status[1], content_type='application/json')
+
+
+class WarmPoolViewSet(viewsets.ModelViewSet):
+    """
+    Returns the state of the pools of warm rendering resources
+    """
+
+    queryset = Session.objects.all()
+    serializer_class = KeepAliveSerializer
+
+    @classmethod
+    # pylint: disable=W0613
+    def get_statistics(cls, request):
+        """
+        Returns, for each configuration, the size of its warm pool, the number of ready and
+        starting rendering resources, and the pool hit and miss counters
+        :param : request: The REST request
+        :rtype : A Json response containing the statistics of each pool
+        """
+        response = json.dumps(warm_pool.globalWarmPool.statistics())
+        return HttpResponse(status=200, content=response, content_type='application/json')
+
+
+def task_response(task_id):
+    """
+    Builds the response to a command executed in the background
+    :param task_id: Id of the task executing the command
+    :return: An HTTP response containing the id of the task
+    """
+    response = json.dumps({'contents': 'Task queued', 'task_id': task_id})
+    return HttpResponse(status=202, content=response, content_type='application/json')
+
+
+class TaskViewSet(viewsets.ModelViewSet):
+    """
+    Returns the progress or the result of the commands executed in the background
+    """
+
+    queryset = Session.objects.all()
+    serializer_class = KeepAliveSerializer
+
+    @classmethod
+    def get_task(cls, request):
+        """
+        Returns the result of a finished task, as it would have been returned by the command
+        itself, or a description of the progress of the task
+        :param : request: The REST request, with a 'task_id' query parameter
+        :rtype : The result of the task if it is finished, a 202 response with the task status
+                 otherwise
+        """
+        task = task_queue.globalTaskQueue.get(request.QUERY_PARAMS.get('task_id'))
+        if task is None:
+            response = json.dumps({'contents': 'Task does not exist'})
+            return HttpResponse(status=404, content=response)
+        if task.status in [TASK_STATUS_COMPLETED, TASK_STATUS_FAILED]:
+            return HttpResponse(status=task.code, content=task.contents)
+        response = json.dumps({
+            'task_id': task.id,
+            'session': task.session_id,
+            'command': task.command,
+            'status': task_queue.status_as_string(task.status)})
+        return HttpResponse(status=202, content=response, content_type='application/json')
+
+
 class CommandViewSet(viewsets.ModelViewSet):
     """
     ViewSets define the view behavior
@@ -237,6 +450,21 @@ class CommandViewSet(viewsets.ModelViewSet):
         try:
             session_id = session_manager.SessionManager().get_session_id_from_request(request)
             log.info(2, 'Processing command <' + command + '> for session ' + str(session_id))
+            # Sessions known to be running are reached without checking their status
+            route = routing_table.globalRoutingTable.get(session_id)
+            if route is not None:
+                response = None
+                if command == consts.RRM_SESSION_COMMAND_IMAGE:
+                    response = cls.__send_to_route(session_id, lambda: cls.__send_image_request(
+                        session_id, route.host, route.port, request))
+                elif command not in consts.RRM_SESSION_COMMANDS:
+                    response = cls.__send_to_route(session_id, lambda: cls.__send_request(
+                        route.host, route.port, cls.__command_path(request), request,
+                        route.streaming_proxy))
+                if response is not None:
+                    return response
+            if command in [consts.TASK_COMMAND_LOG, consts.TASK_COMMAND_ERR]:
+                return cls.__rendering_resource_log(session_id, command, request)
             session = Session.objects.get(id=session_id)
             response = None
             if command == 'schedule':
@@ -246,21 +474,16 @@ class CommandViewSet(viewsets.ModelViewSet):
             elif command == 'status':
                 status = cls.__session_status(session)
                 response = HttpResponse(status=status[0], content=status[1])
-            elif command == 'log':
-                status = cls.__rendering_resource_out_log(session)
-                response = HttpResponse(status=status[0], content=status[1])
-            elif command == 'err':
-                status = cls.__rendering_resource_err_log(session)
-                response = HttpResponse(status=status[0], content=status[1])
-
             elif command == 'job':
                 status = cls.__job_information(session)
                 response = HttpResponse(status=status[0], content=status[1])
+            elif command == consts.RRM_SESSION_COMMAND_IMAGE:
+                response = cls.__session_image(session, request)
+            elif command == consts.RRM_SESSION_COMMAND_CALLBACK:
+                status = cls.__rendering_resource_callback(session, request)
+                response = HttpResponse(status=status[0], content=status[1])
             else:
-                url = request.get_full_path()
-                prefix = settings.BASE_URL_PREFIX + '/session/'
-                cmd = url[url.find(prefix) + len(prefix) + 1: len(url)]
-                response = cls.__forward_request(session, cmd, request)
+                response = cls.__forward_request(session, cls.__command_path(request), request)
             return response
         except (KeyError, TypeError) as e:
             log.debug(1, str(traceback.format_exc(e)))
@@ -284,30 +507,30 @@ class CommandViewSet(viewsets.ModelViewSet):
     @classmethod
     def __schedule_job(cls, session, request):
         """
-        Starts a rendering resource by scheduling a slurm job
+        Starts a rendering resource by scheduling a job in the background. Progress is
+        reported by the session status. Jobs using the default parameters of their
+        configuration are served immediately by the warm pool when possible
         :param : session: Session holding the rendering resource
         :param : request: HTTP request with a body containing a JSON representation of the job
                  parameters
-        :rtype : An HTTP response containing the status and description of the command
+        :rtype : An HTTP response containing the id of the scheduling task, or the warm job
+                 assigned to the session
         """
-        job_information = job_manager.JobInformation()
-        body = request.DATA
-        job_information.params = body.get('params')
-        job_information.environment = body.get('environment')
-        job_information.reservation = body.get('reservation')
-        job_information.nb_cpus = body.get('nb_cpus', 0)
-        job_information.nb_gpus = body.get('nb_gpus', 0)
-        job_information.nb_nodes = body.get('nb_nodes', 0)
-        job_information.memory = body.get('memory', 0)
-        job_information.queue = body.get('queue')
-        job_information.exclusive_allocation = body.get('exclusive', False)
-        job_information.allocation_time = body.get('allocation_time', settings.SLURM_DEFAULT_TIME)
+        parameters = dict(request.DATA.items())
+        backend = parameters.get('backend')
+        if backend and str(backend).upper() not in job_manager.enabled_backends():
+            response = json.dumps({'contents': 'Backend ' + str(backend) + ' is not enabled'})
+            return HttpResponse(status=400, content=response)
+        if warm_pool.is_default_job(parameters) and warm_pool.globalWarmPool.claim(session):
+            response = json.dumps({'message': 'Job assigned from the warm pool',
+                                   'jobId': session.job_id})
+            return HttpResponse(status=200, content=response)
         sm = session_manager.SessionManager()
-        auth_token = sm.get_authentication_token_from_request(request)
-        session.http_host = ''
-        session.http_port = consts.DEFAULT_RENDERER_HTTP_PORT + random.randint(0, 1000)
-        status = job_manager.globalJobManager.schedule(session, job_information, auth_token)
-        return HttpResponse(status=status[0], content=status[1])
+        parameters['auth_token'] = sm.get_authentication_token_from_request(request)
+        session.status = SESSION_STATUS_SCHEDULING
+        session.save()
+        return task_response(task_queue.globalTaskQueue.submit(
+            session.id, consts.TASK_COMMAND_SCHEDULE, parameters))
 
     @classmethod
     def __open_process(cls, session, request):
@@ -347,72 +570,79 @@ class CommandViewSet(viewsets.ModelViewSet):
             return HttpResponse(status=401, content=response)
 
     @classmethod
-    def __verify_hostname(cls, session):
-        """
-        Verify the existence of an hostname for the current session, and tries
-        to populate it if null
-        :param : session: Session holding the rendering resource
-        """
-        log.info(2, 'Verifying hostname ' + session.http_host + ' for session ' + str(session.id))
-        if not session.status == SESSION_STATUS_GETTING_HOSTNAME and \
-                session.job_id and session.http_host == '':
-            session.status = SESSION_STATUS_GETTING_HOSTNAME
-            session.save()
-            log.info(1, 'Querying JOB hostname for job id: ' + str(session.job_id))
-            hostname = job_manager.globalJobManager.hostname(session)
-            if hostname == '':
-                msg = 'Job scheduled but ' + session.configuration_id + ' is not yet running'
-                log.error(msg)
-                if session.status != SESSION_STATUS_STARTING:
-                    session.status = SESSION_STATUS_SCHEDULED
-                    session.save()
-                response = json.dumps({'contents': str(msg)})
-                return [200, response]
-            elif hostname == 'FAILED':
-                sm = session_manager.SessionManager()
-                sm.delete_session(session.id)
-                msg = 'Job as been cancelled'
-                log.error(msg)
-                response = json.dumps({'contents': str(msg)})
-                return [404, response]
-            else:
-                session.http_host = hostname
-                session.save()
-                msg = 'Resolved hostname for job ' + str(session.job_id) + ' to ' + \
-                      str(session.http_host)
-                log.info(1, msg)
-                response = json.dumps({'contents': str(msg)})
-                return [200, response]
-        response = json.dumps({'contents': str('Job is running on host ' + session.http_host)})
-        return [200, response]
-
-    @classmethod
-    def __rendering_resource_out_log(cls, session):
+    def __rendering_resource_callback(cls, session, request):
         """
-        Forwards the HTTP request to the rendering resource held by the given session
+        Registers the hostname and port reported by a rendering resource launched by a batch
+        job. The request must carry, in its token header, the token bound to the session and
+        job by the service when the job was submitted. The report is only accepted once, while
+        the job is scheduled, and for a hostname that is plausible for the compute node of the
+        job
         :param : session: Session holding the rendering resource
-        :rtype : An HTTP response containing the status and description of the command
-        """
-        # check if the hostname of the rendering resource is currently available
-        contents = 'Rendering resource is currently unavailable'
-        if session.job_id:
-            contents = job_manager.globalJobManager.rendering_resource_out_log(session)
-        response = json.dumps({'contents': str(contents)})
+        :param : request: HTTP request with 'hostname' and 'port' query parameters
+        :rtype : A tuple containing the status and a description of the command
+        """
+        parameters = request.QUERY_PARAMS
+        header = 'HTTP_' + consts.SLURM_CALLBACK_TOKEN_HEADER.upper().replace('-', '_')
+        if not session.job_id or not job_manager.hostname_reported(session) or \
+                not tools.verify_job_token(session.id, session.job_id,
+                                           request.META.get(header, '')):
+            response = json.dumps({'contents': 'Invalid token'})
+            return [403, response]
+        if session.status != SESSION_STATUS_SCHEDULED or session.http_host != '':
+            response = json.dumps({'contents': 'Rendering resource was already reported'})
+            return [409, response]
+        try:
+            hostname = str(parameters['hostname'])
+            port = int(parameters.get('port', session.http_port))
+        except (KeyError, ValueError, UnicodeEncodeError) as e:
+            response = json.dumps({'contents': 'Invalid hostname or port: ' + str(e)})
+            return [400, response]
+        if port != session.http_port or \
+                not job_manager.get_job_manager(session).is_compute_node(session, hostname):
+            response = json.dumps({'contents': 'Invalid hostname or port: ' + hostname + ':' +
+                                               str(port)})
+            return [400, response]
+        session.http_host = hostname
+        session.http_port = port
+        session.status = SESSION_STATUS_STARTING
+        session.save()
+        msg = session.configuration_id + ' reported ' + hostname + ':' + str(port) + \
+            ' for job ' + str(session.job_id)
+        log.info(1, msg)
+        response = json.dumps({'contents': msg})
         return [200, response]
 
     @classmethod
-    def __rendering_resource_err_log(cls, session):
-        """
-        Forwards the HTTP request to the rendering resource held by the given session
-        :param : session: Session holding the rendering resource
-        :rtype : An HTTP response containing the status and description of the command
-        """
-        # check if the hostname of the rendering resource is currently available
-        contents = 'Rendering resource is currently unavailable'
-        if session.job_id:
-            contents = job_manager.globalJobManager.rendering_resource_err_log(session)
-        response = json.dumps({'contents': str(contents)})
-        return [200, response]
+    def __rendering_resource_log(cls, session_id, command, request):
+        """
+        Queues the retrieval of part of the rendering resource log. The 'offset' and 'length'
+        query parameters define the range of bytes to be returned, and 'tail' the number of
+        last lines. The task result holds the offset to be requested by the next call. Logs of
+        destroyed sessions are returned immediately from the local archive
+        :param : session_id: Id of the session holding the rendering resource
+        :param : command: Log to be retrieved (out or err)
+        :param : request: The REST request
+        :rtype : An HTTP response containing the id of the task or the archived log, or a
+                 description of the error
+        """
+        parameters = dict()
+        for name in ['offset', 'length', 'tail']:
+            value = request.GET.get(name)
+            if value is None:
+                continue
+            try:
+                parameters[name] = int(value)
+            except ValueError:
+                parameters[name] = -1
+            if parameters[name] < 0:
+                response = json.dumps({'contents': 'Invalid ' + name + ' parameter: ' + value})
+                return HttpResponse(status=400, content=response)
+        if Session.objects.filter(id=session_id).exists():
+            return task_response(
+                task_queue.globalTaskQueue.submit(session_id, command, parameters))
+        status = task_queue.archived_rendering_resource_log(
+            session_id, command == consts.TASK_COMMAND_ERR, parameters)
+        return HttpResponse(status=status[0], content=status[1])
 
     @classmethod
     def __job_information(cls, session):
@@ -424,7 +654,7 @@ class CommandViewSet(viewsets.ModelViewSet):
         # check if the hostname of the rendering resource is currently available
         contents = 'Rendering resource is currently unavailable'
         if session.job_id:
-            contents = job_manager.globalJobManager.job_information(session)
+            contents = job_manager.get_job_manager(session).job_information(session)
         response = json.dumps({'contents': str(contents)})
         return [200, response]
 
@@ -438,7 +668,7 @@ class CommandViewSet(viewsets.ModelViewSet):
         :rtype : An HTTP response containing the status and description of the command
         """
         # check if the hostname of the rendering resource is currently available
-        status = cls.__verify_hostname(session)
+        status = session_manager.SessionManager.verify_hostname(session)
         if status[0] != 200:
             return status
 
@@ -451,6 +681,33 @@ class CommandViewSet(viewsets.ModelViewSet):
             log.debug(1, msg)
             return status
 
+    @classmethod
+    def __session_route(cls, session):
+        """
+        Checks the status of the given session and returns the route to its rendering resource.
+        The route of a running session is stored in the routing table
+        :param : session: Session holding the rendering resource
+        :rtype : A list containing an HTTP response describing the error, if the rendering
+                 resource cannot be used, and the route to the rendering resource
+        """
+        # query the status of the current session
+        status = cls.__session_status(session)
+        if status[0] != 200:
+            return [HttpResponse(status=status[0], content=status[1]), None]
+
+        try:
+            rr_settings = manager.RenderingResourceSettingsManager.get_by_id(
+                session.configuration_id.lower())
+            streaming_proxy = rr_settings.streaming_proxy
+        except RenderingResourceSettings.DoesNotExist:
+            streaming_proxy = False
+
+        code = json.loads(status[1]).get('code')
+        route = routing_table.Route(session.http_host, session.http_port, code, streaming_proxy)
+        if code == SESSION_STATUS_RUNNING:
+            routing_table.globalRoutingTable.set(session.id, route)
+        return [None, route]
+
     @classmethod
     def __forward_request(cls, session, command, request):
         """
@@ -460,24 +717,147 @@ class CommandViewSet(viewsets.ModelViewSet):
         :param : request: HTTP request
         :rtype : An HTTP response containing the status and description of the command
         """
-        # query the status of the current session
-        status = cls.__session_status(session)
-        if status[0] != 200:
-            return HttpResponse(status=status[0], content=status[1])
+        error, route = cls.__session_route(session)
+        if error is not None:
+            return error
 
         try:
             # Any other command is forwarded to the rendering resource
-            url = 'http://' + session.http_host + ':' + str(session.http_port) + '/' + command
-            log.info(1, 'Querying ' + str(url))
-            headers = tools.get_request_headers(request)
+            return cls.__send_request(
+                route.host, route.port, command, request, route.streaming_proxy)
+        except requests.exceptions.RequestException as e:
+            response = json.dumps({'contents': str(e)})
+            return HttpResponse(status=400, content=response)
+
+    @classmethod
+    def __session_image(cls, session, request):
+        """
+        Returns the current frame of the rendering resource held by the given session
+        :param : session: Session holding the rendering resource
+        :param : request: HTTP request
+        :rtype : An HTTP response containing the raw image, or a description of the error
+        """
+        error, route = cls.__session_route(session)
+        if error is not None:
+            return error
 
-            response = requests.request(
-                method=request.method, timeout=settings.REQUEST_TIMEOUT,
-                url=url, headers=headers, data=request.body)
+        try:
+            return cls.__send_image_request(session.id, route.host, route.port, request)
+        except requests.exceptions.RequestException as e:
+            response = json.dumps({'contents': str(e)})
+            return HttpResponse(status=400, content=response)
 
-            data = response.content
-            response.close()
-            return HttpResponse(status=response.status_code, content=data)
+    @classmethod
+    def __send_to_route(cls, session_id, send):
+        """
+        Sends a request to the rendering resource of a session known to be running, without
+        checking the status of the session
+        :param : session_id: Id of the session
+        :param : send: Function sending the request to the rendering resource and returning
+                 the HTTP response
+        :rtype : An HTTP response, or None if the rendering resource could not be reached and
+                 the status of the session must be checked
+        """
+        try:
+            return send()
+        except requests.exceptions.ConnectionError as e:
+            log.info(1, 'Route to session ' + str(session_id) + ' failed: ' + str(e))
+            routing_table.globalRoutingTable.remove(session_id)
+            return None
         except requests.exceptions.RequestException as e:
             response = json.dumps({'contents': str(e)})
             return HttpResponse(status=400, content=response)
+
+    @staticmethod
+    def __send_image_request(session_id, host, port, request):
+        """
+        Returns the latest frame of the given rendering resource, shared by all viewers of the
+        session. A viewer already holding the latest frame receives a 304 response
+        :param : session_id: Id of the session
+        :param : host: Host of the rendering resource
+        :param : port: Port of the rendering resource
+        :param : request: HTTP request
+        :rtype : An HTTP response containing the raw image, or a description of the error
+        """
+        frame = frame_manager.globalFrameHub.get_frame(session_id, host, port)
+        known_etags = [etag.strip() for etag in
+                       request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]
+        if frame.code == 200 and frame.etag in known_etags:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(
+                status=frame.code, content=frame.data, content_type=frame.content_type or None)
+            response['Content-Length'] = str(len(frame.data))
+        response['ETag'] = frame.etag
+        response[consts.FRAME_SEQUENCE_HEADER] = str(frame.sequence)
+        # Frames change continuously and must be revalidated by viewers
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    @classmethod
+    def __send_request(cls, host, port, command, request, streaming_proxy):
+        """
+        Sends the HTTP request to the given rendering resource
+        :param : host: Host of the rendering resource
+        :param : port: Port of the rendering resource
+        :param : command: Command passed to the rendering resource
+        :param : request: HTTP request
+        :param : streaming_proxy: True if the request and response bodies are streamed
+        :rtype : An HTTP response containing the response of the rendering resource
+        """
+        url = 'http://' + host + ':' + str(port) + '/' + command
+        log.info(1, 'Querying ' + str(url))
+        if streaming_proxy:
+            return cls.__stream_request(url, request)
+        headers = tools.get_request_headers(request)
+
+        response = http_pool.request(
+            method=request.method, timeout=settings.REQUEST_TIMEOUT,
+            url=url, headers=headers, data=request.body)
+
+        data = response.content
+        response.close()
+        return HttpResponse(status=response.status_code, content=data)
+
+    @staticmethod
+    def __command_path(request):
+        """
+        Extracts the command forwarded to the rendering resource from the request URL
+        :param : request: HTTP request
+        :rtype : The path and query string passed to the rendering resource
+        """
+        url = request.get_full_path()
+        prefix = settings.BASE_URL_PREFIX + '/session/'
+        return url[url.find(prefix) + len(prefix) + 1: len(url)]
+
+    @classmethod
+    def __stream_request(cls, url, request):
+        """
+        Forwards the HTTP request to the given URL without loading the request and response
+        bodies in memory. The request body is uploaded in chunks, and the response body is
+        relayed to the client as it is received from the rendering resource
+        :param : url: URL of the rendering resource command
+        :param : request: HTTP request
+        :rtype : A streaming HTTP response relaying the response of the rendering resource
+        """
+        headers = tools.filter_hop_by_hop_headers(tools.get_request_headers(request))
+        body = None
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if length > 0:
+            body = tools.RequestBodyStream(request, length, consts.STREAMING_CHUNK_SIZE)
+            if request.META.get('CONTENT_TYPE'):
+                headers['Content-Type'] = request.META['CONTENT_TYPE']
+
+        response = http_pool.request(
+            method=request.method, timeout=settings.REQUEST_TIMEOUT,
+            url=url, headers=headers, data=body, stream=True)
+
+        # The undecoded response body is relayed, and the connection to the rendering resource
+        # is released once done, even if the client disconnects before the body is relayed
+        body = tools.ClosingIterator(
+            response.raw.stream(consts.STREAMING_CHUNK_SIZE, decode_content=False),
+            response.close)
+        streaming_response = StreamingHttpResponse(body, status=response.status_code)
+        for name, value in tools.filter_hop_by_hop_headers(dict(response.headers)).items():
+            streaming_response[name] = value
+        return streaming_response
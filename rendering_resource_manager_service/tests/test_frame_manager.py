@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+from rendering_resource_manager_service.session.management import frame_manager
+import base64
+import json
+
+JPEG_IMAGE = '\xff\xd8\xff\xe0' + 'jpeg'
+PNG_IMAGE = '\x89PNG\r\n\x1a\n' + 'png'
+
+
+class TestFrameManager(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+
+    def test_raw_frame(self):
+        log.debug(1, 'test_raw_frame')
+        frame = frame_manager.decode_frame(PNG_IMAGE, 'image/png; charset=binary')
+        nt.assert_equal(frame, [PNG_IMAGE, 'image/png'])
+
+    def test_base64_frame(self):
+        log.debug(1, 'test_base64_frame')
+        for image, content_type in [(JPEG_IMAGE, 'image/jpeg'), (PNG_IMAGE, 'image/png')]:
+            payload = json.dumps({'data': base64.b64encode(image)})
+            frame = frame_manager.decode_frame(payload, 'application/json')
+            nt.assert_equal(frame, [image, content_type])
+
+    def test_invalid_frame(self):
+        log.debug(1, 'test_invalid_frame')
+        for payload in ['not json', json.dumps({'size': 0}),
+                        json.dumps({'data': base64.b64encode('unknown')})]:
+            nt.assert_raises(ValueError, frame_manager.decode_frame, payload, 'application/json')
+
+    def test_frame_hub(self):
+        log.debug(1, 'test_frame_hub')
+        frames = [JPEG_IMAGE, JPEG_IMAGE, PNG_IMAGE]
+        fetches = []
+
+        def fetch(host, port):
+            fetches.append((host, port))
+            return [200, frames[len(fetches) - 1], 'image/jpeg']
+
+        # Viewers share the same frame within the interval
+        hub = frame_manager.FrameHub(60, 1024, fetch)
+        first = hub.get_frame('session', 'localhost', 3000)
+        nt.assert_true(hub.get_frame('session', 'localhost', 3000) is first)
+        nt.assert_equal(len(fetches), 1)
+
+        # Sequence only changes with the image
+        hub = frame_manager.FrameHub(0, 1024, fetch)
+        unchanged = hub.get_frame('session', 'localhost', 3000)
+        changed = hub.get_frame('session', 'localhost', 3000)
+        nt.assert_equal(unchanged.etag, first.etag)
+        nt.assert_equal(unchanged.sequence, 0)
+        nt.assert_equal(changed.sequence, 1)
+        nt.assert_not_equal(changed.etag, first.etag)
+
+    def test_frame_hub_size(self):
+        log.debug(1, 'test_frame_hub_size')
+        hub = frame_manager.FrameHub(60, 2 * len(JPEG_IMAGE),
+                                     lambda host, port: [200, JPEG_IMAGE, 'image/jpeg'])
+        for session_id in ['session1', 'session2', 'session3']:
+            hub.get_frame(session_id, 'localhost', 3000)
+        nt.assert_equal(hub.size(), 2 * len(JPEG_IMAGE))
+        hub.remove('session3')
+        nt.assert_equal(hub.size(), len(JPEG_IMAGE))
+
+    def test_frame_hub_removed_while_fetching(self):
+        log.debug(1, 'test_frame_hub_removed_while_fetching')
+        hubs = []
+
+        def fetch(host, port):
+            # The session is removed while its frame is being fetched
+            hubs[0].remove('session')
+            return [200, JPEG_IMAGE, 'image/jpeg']
+
+        hubs.append(frame_manager.FrameHub(0, 1024, fetch))
+        frame = hubs[0].get_frame('session', 'localhost', 3000)
+        nt.assert_equal(frame.data, JPEG_IMAGE)
+        nt.assert_equal(hubs[0].size(), 0)
+
+        # Frames of evicted entries are not subtracted twice either
+        hub = frame_manager.FrameHub(0, len(JPEG_IMAGE),
+                                     lambda host, port: [200, JPEG_IMAGE, 'image/jpeg'])
+        hub.get_frame('session1', 'localhost', 3000)
+        entry = hub._entry('session1')
+        hub.get_frame('session2', 'localhost', 3000)
+        hub._store('session1', entry, frame_manager.Frame([200, PNG_IMAGE, 'image/png'], 0, ''))
+        nt.assert_equal(hub.size(), len(JPEG_IMAGE))
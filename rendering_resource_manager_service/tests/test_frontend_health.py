@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+
+import json
+import time
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.session.management import frontend_health
+from rendering_resource_manager_service.session.management.frontend_health import \
+    FrontendHealth, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+from rendering_resource_manager_service.session.management.job_manager import JobInformation
+from rendering_resource_manager_service.session.management.slurm_job_manager import \
+    SlurmJobManager
+
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+HOSTS = ['down.epfl.ch', 'slow.epfl.ch', 'fast.epfl.ch']
+
+
+class FakeSession(object):
+    def __init__(self, session_id):
+        self.id = session_id
+        self.status = None
+        self.cluster_node = None
+        self.job_id = None
+
+    def save(self):
+        pass
+
+
+class TestFrontendHealth(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        self._health = frontend_health.globalFrontendHealth
+        self._run = ssh_pool.run
+        self._hosts = settings.SLURM_HOSTS
+        self._commands = list()
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        frontend_health.globalFrontendHealth = self._health
+        ssh_pool.run = self._run
+        settings.SLURM_HOSTS = self._hosts
+
+    def _fake_run(self, host, command):
+        self._commands.append(host)
+        if host == 'down.epfl.ch':
+            return [255, '', 'ssh: connect to host down.epfl.ch: Connection timed out']
+        return [1, '', 'salloc: Granted job allocation 12']
+
+    def test_order(self):
+        log.debug(1, 'test_order')
+        health = FrontendHealth(3, 60)
+        nt.assert_equal(health.order(HOSTS), HOSTS)
+        health.record('slow.epfl.ch', 20.0, True)
+        health.record('fast.epfl.ch', 1.0, True)
+        health.record('down.epfl.ch', 1.0, False)
+        nt.assert_equal(health.order(HOSTS), ['fast.epfl.ch', 'slow.epfl.ch', 'down.epfl.ch'])
+
+    def test_circuit(self):
+        log.debug(1, 'test_circuit')
+        health = FrontendHealth(2, 0.2)
+        for _ in range(2):
+            health.record('down.epfl.ch', 1.0, False)
+        nt.assert_equal(health.scores()['down.epfl.ch']['circuit'], CIRCUIT_OPEN)
+        nt.assert_equal(health.order(HOSTS), ['slow.epfl.ch', 'fast.epfl.ch'])
+
+        # A single trial request is let through once the cooldown expired
+        time.sleep(0.3)
+        nt.assert_equal(health.scores()['down.epfl.ch']['circuit'], CIRCUIT_HALF_OPEN)
+        nt.assert_true('down.epfl.ch' in health.order(HOSTS))
+        nt.assert_false('down.epfl.ch' in health.order(HOSTS))
+        health.record('down.epfl.ch', 1.0, True)
+        nt.assert_true('down.epfl.ch' in health.order(HOSTS))
+
+        # Listing a cluster node does not extend the time during which its circuit is open
+        open_until = health._statistics['down.epfl.ch'].open_until
+        health.order(HOSTS)
+        nt.assert_equal(health._statistics['down.epfl.ch'].open_until, open_until)
+
+        # Cluster nodes are tried anyway if all circuits are open
+        health.record('down.epfl.ch', 1.0, False)
+        health.record('down.epfl.ch', 1.0, False)
+        nt.assert_equal(health.order(['down.epfl.ch']), ['down.epfl.ch'])
+
+    def test_allocation_skips_open_circuit(self):
+        log.debug(1, 'test_allocation_skips_open_circuit')
+        frontend_health.globalFrontendHealth = FrontendHealth(1, 60)
+        ssh_pool.run = self._fake_run
+        settings.SLURM_HOSTS = ['down.epfl.ch', 'fast.epfl.ch']
+        job_manager = SlurmJobManager()
+        job_manager._build_allocation_command = lambda session, job_information: 'salloc'
+        for session_id in ['1', '2']:
+            status = job_manager._allocate_sequentially(FakeSession(session_id),
+                                                          JobInformation())
+            nt.assert_equal(status[0], 200)
+        nt.assert_equal(self._commands, ['down.epfl.ch', 'fast.epfl.ch', 'fast.epfl.ch'])
+
+        response = self.client.get(SERVICE_URL + '/admin/frontends')
+        nt.assert_equal(response.status_code, 200)
+        scores = json.loads(response.content)
+        nt.assert_equal(scores['down.epfl.ch']['circuit'], CIRCUIT_OPEN)
+        nt.assert_equal(scores['fast.epfl.ch']['successes'], 2)
+
+    def test_rejections(self):
+        log.debug(1, 'test_rejections')
+        frontend_health.globalFrontendHealth = FrontendHealth(1, 60)
+        ssh_pool.run = lambda host, command: \
+            [1, '', 'salloc: error: Invalid account or account/partition combination']
+        settings.SLURM_HOSTS = ['fast.epfl.ch']
+        job_manager = SlurmJobManager()
+        job_manager._build_allocation_command = lambda session, job_information: 'salloc'
+        for session_id in ['1', '2']:
+            status = job_manager._allocate_sequentially(FakeSession(session_id),
+                                                          JobInformation())
+            nt.assert_equal(status[0], 400)
+
+        # Allocations rejected by the scheduler do not open the circuit of the cluster node
+        scores = frontend_health.globalFrontendHealth.scores()['fast.epfl.ch']
+        nt.assert_equal(scores['circuit'], 'closed')
+        nt.assert_equal(scores['consecutive_failures'], 0)
+        nt.assert_equal(scores['rejections'], 2)
+        nt.assert_equal(job_manager.allocation_statistics()['fast.epfl.ch']['rejections'], 2)
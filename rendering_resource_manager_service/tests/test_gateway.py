@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import socket
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+import gevent
+import requests
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.service import gateway
+from rendering_resource_manager_service.session.models import SESSION_STATUS_RUNNING
+from rendering_resource_manager_service.session.management import routing_table
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+
+SESSION_ID = '42'
+
+
+class RendererHandler(BaseHTTPRequestHandler):
+    """
+    Answers the commands of the rendering resource with their path and body
+    """
+
+    def do_PUT(self):
+        length = int(self.headers.getheader('Content-Length', 0))
+        contents = self.path + ' ' + self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(contents)))
+        self.end_headers()
+        self.wfile.write(contents)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    """
+    :return: A port on which nothing is listening
+    """
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestGateway(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        self._renderer = HTTPServer(('127.0.0.1', 0), RendererHandler)
+        thread = threading.Thread(target=self._renderer.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+        # The gateway runs in its own thread, and therefore in its own gevent loop. It shares
+        # the connection to the in-memory test database, as Django live servers do
+        SessionManager()
+        shared_connection = connections['default']
+        shared_connection.allow_thread_sharing = True
+        self._port = free_port()
+        self._stop = threading.Event()
+        started = threading.Event()
+
+        def serve():
+            connections['default'] = shared_connection
+            server = gateway.create_server('127.0.0.1', self._port, get_wsgi_application())
+            server.start()
+            started.set()
+            while not self._stop.is_set():
+                gevent.sleep(0.05)
+            server.stop()
+        self._gateway = threading.Thread(target=serve)
+        self._gateway.setDaemon(True)
+        self._gateway.start()
+        nt.assert_true(started.wait(5))
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        self._stop.set()
+        self._gateway.join(5)
+        connections['default'].allow_thread_sharing = False
+        routing_table.globalRoutingTable.clear()
+        http_pool.evict('127.0.0.1', self._renderer.server_address[1])
+        self._renderer.shutdown()
+        self._renderer.server_close()
+
+    def test_forward(self):
+        log.debug(1, 'test_forward')
+        for streaming_proxy in [False, True]:
+            routing_table.globalRoutingTable.set(SESSION_ID, routing_table.Route(
+                '127.0.0.1', self._renderer.server_address[1], SESSION_STATUS_RUNNING,
+                streaming_proxy))
+            url = 'http://127.0.0.1:' + str(self._port) + '/' + settings.APPLICATION_NAME + \
+                '/' + settings.API_VERSION + '/session/camera?session_id=' + SESSION_ID
+            response = requests.put(url, data='{"origin": [0, 0, 1]}', timeout=5)
+            nt.assert_equal(response.status_code, 200)
+            path, body = response.content.split(' ', 1)
+            nt.assert_true(path.startswith('/camera'))
+            nt.assert_equal(body, '{"origin": [0, 0, 1]}')
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+from django.test import TestCase
+from nose import tools as nt
+import time
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+import rendering_resource_manager_service.utils.custom_logging as log
+from rendering_resource_manager_service.utils.http_pool import HTTPSessionPool
+
+
+class CookieHandler(BaseHTTPRequestHandler):
+    """
+    Sets a cookie, and returns the cookies sent by the client
+    """
+
+    def do_GET(self):
+        contents = self.headers.getheader('Cookie', '')
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'user=alice; Path=/')
+        self.send_header('Content-Length', str(len(contents)))
+        self.end_headers()
+        self.wfile.write(contents)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPSessionPool(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+
+    def test_key_from_url(self):
+        log.debug(1, 'test_key_from_url')
+        nt.assert_true(HTTPSessionPool.key_from_url('http://Host:3000/registry') == 'host:3000')
+        nt.assert_true(HTTPSessionPool.key_from_url('http://host/registry') == 'host:80')
+        nt.assert_true(HTTPSessionPool.key_from_url('https://host/rest/core') == 'host:443')
+
+    def test_session_reuse(self):
+        log.debug(1, 'test_session_reuse')
+        pool = HTTPSessionPool(4, 2, 60)
+        session = pool.get_session(pool.key('host', 3000))
+        nt.assert_true(pool.get_session(pool.key('host', 3000)) is session)
+        nt.assert_true(pool.get_session(pool.key('host', 3001)) is not session)
+        nt.assert_true(pool.size() == 2)
+        pool.evict('host', 3000)
+        nt.assert_true(pool.size() == 1)
+        nt.assert_true(pool.get_session(pool.key('host', 3000)) is not session)
+        pool.clear()
+        nt.assert_true(pool.size() == 0)
+
+    def test_least_recently_used_eviction(self):
+        log.debug(1, 'test_least_recently_used_eviction')
+        pool = HTTPSessionPool(2, 2, 60)
+        first = pool.get_session('host:1')
+        pool.get_session('host:2')
+        pool.get_session('host:1')
+        pool.get_session('host:3')
+        nt.assert_true(pool.size() == 2)
+        # host:2 was the least recently used session
+        nt.assert_true(pool.get_session('host:1') is first)
+        nt.assert_true(pool.size() == 2)
+
+    def test_idle_eviction(self):
+        log.debug(1, 'test_idle_eviction')
+        pool = HTTPSessionPool(4, 2, 0.01)
+        session = pool.get_session('host:1')
+        time.sleep(0.05)
+        nt.assert_true(pool.get_session('host:1') is not session)
+        nt.assert_true(pool.size() == 1)
+
+    def test_no_cookie_persistence(self):
+        log.debug(1, 'test_no_cookie_persistence')
+        server = HTTPServer(('127.0.0.1', 0), CookieHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:' + str(server.server_address[1]) + '/'
+            pool = HTTPSessionPool(4, 2, 60)
+            session = pool.get_session(pool.key_from_url(url))
+            response = session.get(url)
+            nt.assert_equal(response.cookies.get('user'), 'alice')
+            nt.assert_equal(len(session.cookies), 0)
+
+            # Cookies set for a previous request are not sent with the next ones
+            nt.assert_equal(session.get(url).text, '')
+            nt.assert_equal(session.get(url, cookies={'user': 'bob'}).text, 'user=bob')
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import time
+import threading
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.service.settings as global_settings
+from rendering_resource_manager_service.session.management.job_locks import JobLocks
+from rendering_resource_manager_service.session.management.job_manager import JobInformation
+from rendering_resource_manager_service.session.management.slurm_job_manager import \
+    SlurmJobManager
+
+CLUSTER_NODES = ['frontend1.epfl.ch', 'frontend2.epfl.ch']
+FAKE_SCHEDULER_DELAY = 0.2
+NB_SESSIONS = 8
+
+
+class FakeSession(object):
+    """
+    Session that is not stored in the database, so that it can be used by several threads
+    """
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.status = None
+        self.cluster_node = None
+        self.job_id = None
+
+    def save(self):
+        pass
+
+
+class FakeSchedulerJobManager(SlurmJobManager):
+    """
+    Slurm job manager that does not need a rendering resource configuration
+    """
+
+    @staticmethod
+    def _build_allocation_command(session, job_information):
+        return 'salloc --no-shell'
+
+
+class GlobalLockJobManager(FakeSchedulerJobManager):
+    """
+    Slurm job manager serializing all allocations behind a single lock, as it used to
+    """
+
+    def __init__(self):
+        FakeSchedulerJobManager.__init__(self)
+        self._global_mutex = threading.Lock()
+
+    def allocate(self, session, job_information):
+        with self._global_mutex:
+            return FakeSchedulerJobManager.allocate(self, session, job_information)
+
+
+class TestJobLocks(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        self._run = ssh_pool.run
+        self._hosts = global_settings.SLURM_HOSTS
+        self._job_ids = iter(range(1000, 2000))
+        self._job_ids_mutex = threading.Lock()
+        ssh_pool.run = self._fake_scheduler
+        global_settings.SLURM_HOSTS = CLUSTER_NODES
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        ssh_pool.run = self._run
+        global_settings.SLURM_HOSTS = self._hosts
+
+    def _fake_scheduler(self, host, command):
+        time.sleep(FAKE_SCHEDULER_DELAY)
+        with self._job_ids_mutex:
+            job_id = next(self._job_ids)
+        return [1, '', 'salloc: Granted job allocation ' + str(job_id)]
+
+    @staticmethod
+    def _allocate_sessions(job_manager):
+        sessions = [FakeSession(str(i)) for i in range(NB_SESSIONS)]
+        statuses = dict()
+
+        def allocate(session):
+            statuses[session.id] = job_manager.allocate(session, JobInformation())[0]
+
+        threads = [threading.Thread(target=allocate, args=(session,)) for session in sessions]
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        nt.assert_equal(statuses.values(), [200] * NB_SESSIONS)
+        nt.assert_equal(len(set([session.job_id for session in sessions])), NB_SESSIONS)
+        return time.time() - start_time
+
+    def test_allocation_throughput(self):
+        log.debug(1, 'test_allocation_throughput')
+        serialized = self._allocate_sessions(GlobalLockJobManager())
+        concurrent = self._allocate_sessions(FakeSchedulerJobManager())
+        log.info(1, str(NB_SESSIONS) + ' allocations took ' + '%.2f' % serialized +
+                 ' seconds with a global lock and ' + '%.2f' % concurrent +
+                 ' seconds with per-session locks')
+        nt.assert_true(serialized >= NB_SESSIONS * FAKE_SCHEDULER_DELAY)
+        nt.assert_true(concurrent < serialized / 2)
+
+    def test_session_lock(self):
+        log.debug(1, 'test_session_lock')
+        locks = JobLocks(0)
+        events = list()
+
+        def lifecycle(name):
+            locks.lock_session('session')
+            try:
+                events.append(name + ' begin')
+                time.sleep(0.05)
+                events.append(name + ' end')
+            finally:
+                locks.unlock_session('session')
+
+        threads = [threading.Thread(target=lifecycle, args=(name,)) for name in ['a', 'b']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        nt.assert_equal([event.split()[1] for event in events], ['begin', 'end'] * 2)
+        nt.assert_equal(locks.size(), 0)
+
+    def test_cluster_semaphore(self):
+        log.debug(1, 'test_cluster_semaphore')
+        locks = JobLocks(2)
+        mutex = threading.Lock()
+        counters = {'running': 0, 'max': 0}
+
+        def request():
+            with locks.cluster(CLUSTER_NODES[0]):
+                with mutex:
+                    counters['running'] += 1
+                    counters['max'] = max(counters['max'], counters['running'])
+                time.sleep(0.05)
+                with mutex:
+                    counters['running'] -= 1
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        nt.assert_equal(counters['max'], 2)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import datetime
+import json
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session
+from rendering_resource_manager_service.session.management import job_manager
+from rendering_resource_manager_service.session.management import task_queue
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management.agent_job_manager import \
+    AgentJobManager
+from rendering_resource_manager_service.session.management.keep_alive_thread import \
+    KeepAliveThread
+
+DEFAULT_USER = 'testuser'
+
+
+class RecordingJobManager(object):
+    """
+    Records the sessions it schedules
+    """
+
+    def __init__(self):
+        self.scheduled = list()
+
+    def schedule(self, session, job_information, auth_token=None):
+        self.scheduled.append(session.id)
+        return [200, json.dumps({'message': 'Job scheduled'})]
+
+
+class TestJobManagerRegistry(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        manager.clear()
+        for configuration_id, backend in [['default', ''], ['agent', 'node_agent']]:
+            params = dict()
+            params['id'] = configuration_id
+            params['command_line'] = 'braynsService'
+            params['environment_variables'] = ''
+            params['modules'] = ''
+            params['process_rest_parameters_format'] = ''
+            params['scheduler_rest_parameters_format'] = ''
+            params['project'] = ''
+            params['queue'] = ''
+            params['exclusive'] = False
+            params['nb_nodes'] = 1
+            params['nb_cpus'] = 1
+            params['nb_gpus'] = 0
+            params['memory'] = 0
+            params['graceful_exit'] = False
+            params['wait_until_running'] = True
+            params['backend'] = backend
+            params['name'] = 'name'
+            params['description'] = 'description'
+            nt.assert_true(manager.create(params)[0] == 201)
+        SessionManager().clear_sessions()
+        self._settings = [settings.RESOURCE_ALLOCATOR, settings.RESOURCE_ALLOCATORS]
+        settings.RESOURCE_ALLOCATOR = settings.RESOURCE_ALLOCATOR_SLURM
+        settings.RESOURCE_ALLOCATORS = [settings.RESOURCE_ALLOCATOR_NODE_AGENT]
+        self._registry = job_manager.globalJobManagerRegistry
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        job_manager.globalJobManagerRegistry = self._registry
+        settings.RESOURCE_ALLOCATOR, settings.RESOURCE_ALLOCATORS = self._settings
+        RenderingResourceSettingsManager().clear()
+
+    def test_lazy_loading(self):
+        log.debug(1, 'test_lazy_loading')
+        registry = job_manager.JobManagerRegistry({
+            settings.RESOURCE_ALLOCATOR_NODE_AGENT: [
+                'rendering_resource_manager_service.session.management.agent_job_manager',
+                'AgentJobManager'],
+            settings.RESOURCE_ALLOCATOR_UNICORE: [
+                'rendering_resource_manager_service.session.management.unicore_job_manager',
+                'UnicoreJobManager']
+        })
+        nt.assert_equal(registry.loaded(), [])
+        agent_manager = registry.get('node_agent')
+        nt.assert_true(isinstance(agent_manager, AgentJobManager))
+        nt.assert_true(registry.get(settings.RESOURCE_ALLOCATOR_NODE_AGENT) is agent_manager)
+        nt.assert_equal(registry.loaded(), [settings.RESOURCE_ALLOCATOR_NODE_AGENT])
+        # Known backends that are not enabled cannot be used
+        nt.assert_raises(ValueError, registry.get, settings.RESOURCE_ALLOCATOR_UNICORE)
+        nt.assert_raises(ValueError, registry.get, 'UNKNOWN')
+
+    def test_schedule_routing(self):
+        log.debug(1, 'test_schedule_routing')
+        registry = job_manager.JobManagerRegistry(dict())
+        slurm_manager = RecordingJobManager()
+        agent_manager = RecordingJobManager()
+        registry._backends = {settings.RESOURCE_ALLOCATOR_SLURM: None,
+                              settings.RESOURCE_ALLOCATOR_NODE_AGENT: None}
+        registry._job_managers = {settings.RESOURCE_ALLOCATOR_SLURM: slurm_manager,
+                                  settings.RESOURCE_ALLOCATOR_NODE_AGENT: agent_manager}
+        job_manager.globalJobManagerRegistry = registry
+
+        session_ids = list()
+        for configuration_id in ['default', 'agent', 'agent']:
+            session_id = str(SessionManager.get_session_id())
+            status = SessionManager().create_session(session_id, DEFAULT_USER, configuration_id)
+            nt.assert_true(status[0] == 201)
+            session_ids.append(session_id)
+
+        nt.assert_equal(task_queue.schedule_job(session_ids[0], dict())[0], 200)
+        nt.assert_equal(task_queue.schedule_job(session_ids[1], dict())[0], 200)
+        # The backend of the configuration can be overridden by the schedule request
+        nt.assert_equal(task_queue.schedule_job(
+            session_ids[2], {'backend': settings.RESOURCE_ALLOCATOR_SLURM})[0], 200)
+        nt.assert_equal(slurm_manager.scheduled, [session_ids[0], session_ids[2]])
+        nt.assert_equal(agent_manager.scheduled, [session_ids[1]])
+        nt.assert_equal(task_queue.schedule_job(
+            session_ids[2], {'backend': settings.RESOURCE_ALLOCATOR_UNICORE})[0], 400)
+
+        # Later requests use the job manager of the backend that allocated the job
+        session = Session.objects.get(id=session_ids[1])
+        nt.assert_true(job_manager.get_job_manager(session) is agent_manager)
+        sessions = job_manager.backend_sessions(Session.objects, settings.RESOURCE_ALLOCATOR_SLURM)
+        nt.assert_equal(set(sessions.values_list('id', flat=True)),
+                        set([session_ids[0], session_ids[2]]))
+
+    def test_disabled_backend(self):
+        log.debug(1, 'test_disabled_backend')
+        job_manager.globalJobManagerRegistry = job_manager.JobManagerRegistry(dict())
+        session_ids = list()
+        for _ in range(2):
+            session_id = str(SessionManager.get_session_id())
+            status = SessionManager().create_session(session_id, DEFAULT_USER, 'agent')
+            nt.assert_true(status[0] == 201)
+            session = Session.objects.get(id=session_id)
+            # The session was scheduled by a backend that is no longer enabled
+            session.backend = settings.RESOURCE_ALLOCATOR_UNICORE
+            session.job_id = '42'
+            session.save()
+            session_ids.append(session_id)
+
+        nt.assert_equal(SessionManager.delete_session(session_ids[0])[0], 200)
+        nt.assert_false(Session.objects.filter(id=session_ids[0]).exists())
+
+        session = Session.objects.get(id=session_ids[1])
+        session.valid_until = datetime.datetime.now() - datetime.timedelta(seconds=1)
+        session.save()
+        KeepAliveThread.close_session(session)
+        nt.assert_false(Session.objects.filter(id=session_ids[1]).exists())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_RUNNING, SESSION_STATUS_BUSY
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management import liveness_prober
+import json
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'testrenderer'
+
+
+class TestLivenessProber(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        sm = SessionManager()
+        status = sm.clear_sessions()
+        nt.assert_true(status[0] == 200)
+        status = sm.resume_sessions()
+        nt.assert_true(status[0] == 200)
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+
+    def test_snapshot(self):
+        log.debug(1, 'test_snapshot')
+        snapshot = liveness_prober.LivenessSnapshot()
+        nt.assert_true(snapshot.get('session') is None)
+        snapshot.set('session', liveness_prober.LivenessStatus(200, 'vocabulary'))
+        nt.assert_true(snapshot.get('session').code == 200)
+        snapshot.retain(['other'])
+        nt.assert_true(snapshot.get('session') is None)
+
+    def test_probe_session(self):
+        log.debug(1, 'test_probe_session')
+        sessions = [Session(id='probed1'), Session(id='probed2')]
+        liveness_prober.probe_sessions(sessions, lambda session: [503, 'Unavailable'])
+        for session in sessions:
+            status = liveness_prober.globalLivenessSnapshot.get(session.id)
+            nt.assert_true(status.code == 503)
+            liveness_prober.globalLivenessSnapshot.remove(session.id)
+
+    def test_status_from_snapshot(self):
+        log.debug(1, 'test_status_from_snapshot')
+        session_id = str(SessionManager.get_session_id())
+        sm = SessionManager()
+        status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        session = Session.objects.get(id=session_id)
+        session.status = SESSION_STATUS_RUNNING
+        session.save()
+
+        # Rendering resource not responding, session becomes busy
+        liveness_prober.globalLivenessSnapshot.set(
+            session_id, liveness_prober.LivenessStatus(503, 'Unavailable'))
+        status = sm.query_status(session_id)
+        nt.assert_true(status[0] == 200)
+        nt.assert_true(json.loads(status[1])['code'] == SESSION_STATUS_BUSY)
+
+        # Rendering resource responding again, session is back to running
+        liveness_prober.globalLivenessSnapshot.set(
+            session_id, liveness_prober.LivenessStatus(200, 'vocabulary'))
+        status = sm.query_status(session_id)
+        nt.assert_true(status[0] == 200)
+        nt.assert_true(json.loads(status[1])['code'] == SESSION_STATUS_RUNNING)
+
+        # Deleting the session removes its probe result
+        status = sm.delete_session(session_id)
+        nt.assert_true(status[0] == 200)
+        nt.assert_true(liveness_prober.globalLivenessSnapshot.get(session_id) is None)
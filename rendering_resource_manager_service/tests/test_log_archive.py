@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+
+import json
+import os
+import shutil
+import tempfile
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.session.management import job_manager
+from rendering_resource_manager_service.session.management import log_archive
+from rendering_resource_manager_service.session.management.log_archive import LogArchive
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.models import Session
+
+LOG_CONTENTS = 'line 1\nline 2\nline 3\n'
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+
+
+class FakeSession(object):
+    def __init__(self, session_id, job_id):
+        self.id = session_id
+        self.job_id = job_id
+        self.backend = ''
+
+
+class TestLogArchive(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        self._directory = tempfile.mkdtemp()
+        self._archive = log_archive.globalLogArchive
+        log_archive.globalLogArchive = LogArchive(self._directory, 1024 * 1024)
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        log_archive.globalLogArchive = self._archive
+        shutil.rmtree(self._directory)
+
+    def test_read(self):
+        log.debug(1, 'test_read')
+        archive = log_archive.globalLogArchive
+        nt.assert_true(archive.read('1') is None)
+        archive.store('1', False, LOG_CONTENTS)
+        nt.assert_equal(archive.read('1'), [LOG_CONTENTS, len(LOG_CONTENTS)])
+        nt.assert_equal(archive.read('1', offset=7, length=6), ['line 2', 13])
+        nt.assert_equal(archive.read('1', tail=1), ['line 3\n', len(LOG_CONTENTS)])
+        nt.assert_true(archive.read('1', err=True) is None)
+
+    def test_retention(self):
+        log.debug(1, 'test_retention')
+        archive = LogArchive(self._directory, 1024)
+        archive.store('old', False, os.urandom(800))
+        os.utime(os.path.join(self._directory, 'old.out.gz'), (0, 0))
+        archive.store('new', False, os.urandom(800))
+        nt.assert_true(archive.read('old') is None)
+        nt.assert_true(archive.read('new') is not None)
+
+    def test_archive_session(self):
+        log.debug(1, 'test_archive_session')
+        manager = job_manager.globalJobManagerRegistry.get(settings.RESOURCE_ALLOCATOR)
+        manager.fetch_rendering_resource_log = \
+            lambda session, err, max_size: 'error\n' if err else LOG_CONTENTS
+        try:
+            log_archive.archive_session(FakeSession('2', '42'))
+        finally:
+            del manager.fetch_rendering_resource_log
+
+        # Logs of destroyed sessions are served from the archive
+        response = self.client.get(SERVICE_URL + '/session/err?session_id=2&offset=0')
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_equal(json.loads(response.content), {'contents': 'error\n', 'offset': 6})
+        response = self.client.get(SERVICE_URL + '/session/log?session_id=2&tail=1')
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_equal(json.loads(response.content)['contents'], 'line 3\n')
+        response = self.client.get(SERVICE_URL + '/session/log?session_id=3')
+        nt.assert_equal(response.status_code, 404)
+
+    def test_archive_before_stop(self):
+        log.debug(1, 'test_archive_before_stop')
+        session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(session_id, 'testuser', 'testrenderer')
+        nt.assert_true(status[0] == 201)
+        Session.objects.filter(id=session_id).update(job_id='42')
+
+        # Stopping the job deletes its logs, like Unicore deletes the working directory
+        logs = {'contents': LOG_CONTENTS}
+        manager = job_manager.globalJobManagerRegistry.get(settings.RESOURCE_ALLOCATOR)
+        manager.fetch_rendering_resource_log = \
+            lambda session, err, max_size: None if err else logs['contents']
+        manager.stop = lambda session: logs.clear()
+        manager.kill = lambda session: [200, '']
+        try:
+            nt.assert_equal(SessionManager.delete_session(session_id)[0], 200)
+        finally:
+            del manager.fetch_rendering_resource_log
+            del manager.stop
+            del manager.kill
+        nt.assert_equal(log_archive.globalLogArchive.read(session_id),
+                        [LOG_CONTENTS, len(LOG_CONTENTS)])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+
+import datetime
+import os
+import subprocess
+import tempfile
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_RUNNING
+from rendering_resource_manager_service.session.management.slurm_job_manager import \
+    SlurmJobManager
+
+LOG_CONTENTS = 'line 1\nline 2\nline 3\n'
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+
+
+class TestLogRange(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        handle, self._filename = tempfile.mkstemp()
+        os.write(handle, LOG_CONTENTS)
+        os.close(handle)
+        self._run = ssh_pool.run
+        ssh_pool.run = self._local_run
+        self._manager = SlurmJobManager()
+        self._manager._file_name = lambda session, extension: self._filename
+        self._session = Session(id='1', status=SESSION_STATUS_RUNNING, cluster_node='localhost')
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        ssh_pool.run = self._run
+        os.remove(self._filename)
+
+    @staticmethod
+    def _local_run(host, command):
+        process = subprocess.Popen(
+            command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error = process.communicate()
+        return [process.returncode, output, error]
+
+    def test_offset(self):
+        log.debug(1, 'test_offset')
+        nt.assert_equal(self._manager.rendering_resource_out_log(self._session),
+                        [LOG_CONTENTS, len(LOG_CONTENTS)])
+        nt.assert_equal(self._manager.rendering_resource_out_log(self._session, 7),
+                        ['line 2\nline 3\n', len(LOG_CONTENTS)])
+        nt.assert_equal(self._manager.rendering_resource_out_log(self._session, 7, 6),
+                        ['line 2', 13])
+
+        # Nothing new until the file grows
+        nt.assert_equal(self._manager.rendering_resource_out_log(self._session, 21),
+                        ['', 21])
+        with open(self._filename, 'a') as log_file:
+            log_file.write('line 4\n')
+        nt.assert_equal(self._manager.rendering_resource_out_log(self._session, 21),
+                        ['line 4\n', 28])
+
+    def test_truncated(self):
+        log.debug(1, 'test_truncated')
+        nt.assert_equal(self._manager.rendering_resource_err_log(self._session, 100),
+                        ['', len(LOG_CONTENTS)])
+
+    def test_tail(self):
+        log.debug(1, 'test_tail')
+        nt.assert_equal(self._manager.rendering_resource_out_log(self._session, tail=2),
+                        ['line 2\nline 3\n', len(LOG_CONTENTS)])
+
+    def test_invalid_parameter(self):
+        log.debug(1, 'test_invalid_parameter')
+        self._session.valid_until = datetime.datetime.now()
+        self._session.save()
+        response = self.client.get(SERVICE_URL + '/session/log?session_id=1&offset=abc')
+        nt.assert_equal(response.status_code, 400)
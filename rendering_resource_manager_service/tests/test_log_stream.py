@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.management import log_stream
+from rendering_resource_manager_service.session.management.log_stream import LogStreamHub
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+
+TIMEOUT = 5
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'testrenderer'
+
+
+class FakeSession(object):
+    def __init__(self, session_id, status='RUNNING'):
+        self.id = session_id
+        self.status = status
+
+
+class ProcessBackend(object):
+    """
+    Follows a local file the way the Slurm job manager follows a remote one
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.processes = list()
+
+    def follow_rendering_resource_log(self, session, err=False):
+        process = subprocess.Popen(['tail', '-n', '100', '-F', self.filename],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.processes.append(process)
+        return process
+
+
+class RangeBackend(object):
+    """
+    Provides a log that can only be read by ranges, like the UNICORE job manager
+    """
+
+    def __init__(self):
+        self.contents = 'first\n'
+
+    def follow_rendering_resource_log(self, session, err=False):
+        return None
+
+    def rendering_resource_out_log(self, session, offset=0, length=None, tail=None):
+        if tail is not None:
+            return [self.contents, len(self.contents)]
+        return [self.contents[offset:], len(self.contents)]
+
+
+class PendingBackend(ProcessBackend):
+    """
+    Follows the log only once the rendering resource is started, like the Slurm job manager
+    """
+
+    def follow_rendering_resource_log(self, session, err=False):
+        if session.status != 'RUNNING':
+            return None
+        return ProcessBackend.follow_rendering_resource_log(self, session, err)
+
+    def rendering_resource_out_log(self, session, offset=0, length=None, tail=None):
+        return [consts.LOG_NOT_AVAILABLE, offset]
+
+
+class TestLogStream(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        handle, self._filename = tempfile.mkstemp()
+        os.write(handle, 'line 1\n')
+        os.close(handle)
+        self._sessions = dict()
+        self._streams = log_stream.globalLogStreams
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        log_stream.globalLogStreams = self._streams
+        os.remove(self._filename)
+
+    def _session(self, session_id, status='RUNNING'):
+        session = FakeSession(session_id, status)
+        self._sessions[session_id] = session
+        return session
+
+    def test_shared_follower(self):
+        log.debug(1, 'test_shared_follower')
+        backend = ProcessBackend(self._filename)
+        hub = LogStreamHub(backend, self._sessions.get)
+        session = self._session('1')
+        first = hub.subscribe(session)
+        second = hub.subscribe(session)
+        nt.assert_equal(hub.size(), 1)
+        nt.assert_equal(first.get(timeout=TIMEOUT), 'line 1\n')
+        with open(self._filename, 'a') as log_file:
+            log_file.write('line 2\n')
+        nt.assert_equal(first.get(timeout=TIMEOUT), 'line 2\n')
+        nt.assert_equal(second.get(timeout=TIMEOUT), 'line 1\n')
+        nt.assert_equal(second.get(timeout=TIMEOUT), 'line 2\n')
+
+        # The file is followed once, and no longer followed when the last subscriber leaves
+        nt.assert_equal(len(backend.processes), 1)
+        hub.unsubscribe(session.id, False, first)
+        nt.assert_equal(hub.size(), 1)
+        nt.assert_true(backend.processes[0].poll() is None)
+        hub.unsubscribe(session.id, False, second)
+        nt.assert_equal(hub.size(), 0)
+        deadline = time.time() + TIMEOUT
+        while backend.processes[0].poll() is None and time.time() < deadline:
+            time.sleep(0.1)
+        nt.assert_true(backend.processes[0].poll() is not None)
+
+    def test_range_follower(self):
+        log.debug(1, 'test_range_follower')
+        backend = RangeBackend()
+        hub = LogStreamHub(backend, self._sessions.get)
+        session = self._session('2')
+        subscriber = hub.subscribe(session)
+        nt.assert_equal(subscriber.get(timeout=TIMEOUT), 'first\n')
+        backend.contents += 'second\nthi'
+        backend.contents += 'rd\n'
+        nt.assert_equal(subscriber.get(timeout=TIMEOUT), 'second\n')
+        nt.assert_equal(subscriber.get(timeout=TIMEOUT), 'third\n')
+        hub.unsubscribe(session.id, False, subscriber)
+        nt.assert_equal(hub.size(), 0)
+
+    def test_pending_follower(self):
+        log.debug(1, 'test_pending_follower')
+        backend = PendingBackend(self._filename)
+        hub = LogStreamHub(backend, self._sessions.get)
+        session = self._session('4', 'SCHEDULED')
+        subscriber = hub.subscribe(session)
+
+        # The placeholder returned before the rendering resource starts is not published
+        time.sleep(consts.LOG_STREAM_INTERVAL * 1.5)
+        nt.assert_true(subscriber.empty())
+        nt.assert_equal(len(backend.processes), 0)
+
+        # The log is followed once the rendering resource is started
+        self._session('4', 'RUNNING')
+        nt.assert_equal(subscriber.get(timeout=TIMEOUT), 'line 1\n')
+        nt.assert_equal(len(backend.processes), 1)
+        hub.unsubscribe(session.id, False, subscriber)
+        nt.assert_equal(hub.size(), 0)
+
+    def test_deleted_session(self):
+        log.debug(1, 'test_deleted_session')
+        hub = LogStreamHub(RangeBackend(), self._sessions.get)
+        subscriber = hub.subscribe(FakeSession('5'))
+        nt.assert_true(subscriber.get(timeout=TIMEOUT) is None)
+        nt.assert_equal(hub.size(), 0)
+
+    def test_events(self):
+        log.debug(1, 'test_events')
+        hub = LogStreamHub(ProcessBackend(self._filename), self._sessions.get)
+        session = self._session('3')
+        events = hub.events(session)
+        nt.assert_equal(next(events), 'event: log\ndata: {"contents": "line 1\\n"}\n\n')
+        nt.assert_equal(hub.size(), 1)
+        events.close()
+        nt.assert_equal(hub.size(), 0)
+
+        # Lines read by ranges may already be decoded
+        backend = RangeBackend()
+        backend.contents = u'caf\xe9\n'
+        events = LogStreamHub(backend, self._sessions.get).events(self._session('6'))
+        nt.assert_equal(next(events), 'event: log\ndata: {"contents": "caf\\u00e9\\n"}\n\n')
+        events.close()
+
+    def test_concurrent_streams(self):
+        log.debug(1, 'test_concurrent_streams')
+        session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        log_stream.globalLogStreams = threading.BoundedSemaphore(1)
+        url = SERVICE_URL + '/session/log/stream?session_id=' + session_id
+        response = self.client.get(url)
+        nt.assert_equal(response.status_code, 200)
+
+        # Further streams are refused until the running one is closed
+        refused = self.client.get(url)
+        nt.assert_equal(refused.status_code, 503)
+        nt.assert_true(int(refused['Retry-After']) > 0)
+        response.close()
+        response = self.client.get(url)
+        nt.assert_equal(response.status_code, 200)
+        response.close()
+        nt.assert_true(log_stream.globalLogStreams.acquire(False))
+
+    def test_unknown_session(self):
+        log.debug(1, 'test_unknown_session')
+        response = self.client.get(SERVICE_URL + '/session/log/stream?session_id=unknown')
+        nt.assert_equal(response.status_code, 404)
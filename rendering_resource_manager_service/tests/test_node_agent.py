@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.utils.node_agent import NodeAgentServer, read_log
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_RUNNING, SESSION_STATUS_FAILED
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management.job_manager import JobInformation
+from rendering_resource_manager_service.session.management.agent_job_manager import \
+    AgentJobManager, agent_request, process_exited
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'echo'
+
+
+class TestNodeAgent(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        manager.clear()
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'echo'
+        params['environment_variables'] = ''
+        params['modules'] = ''
+        params['process_rest_parameters_format'] = ''
+        params['scheduler_rest_parameters_format'] = 'hello ${rest_port} && sleep 30'
+        params['project'] = ''
+        params['queue'] = ''
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 2
+        params['nb_gpus'] = 0
+        params['memory'] = 0
+        params['graceful_exit'] = False
+        params['wait_until_running'] = False
+        params['name'] = 'name'
+        params['description'] = 'description'
+        status = manager.create(params)
+        nt.assert_true(status[0] == 201)
+        SessionManager().clear_sessions()
+
+        # Two agents on localhost, the second one having more free CPUs
+        self._agents = list()
+        self._directories = list()
+        for cpus, ports in [[2, [13000, 13009]], [4, [13010, 13019]]]:
+            directory = tempfile.mkdtemp()
+            agent = NodeAgentServer(
+                ('localhost', 0), cpus, 0, directory, 'localhost', 'token', ports)
+            thread = threading.Thread(target=agent.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self._agents.append(agent)
+            self._directories.append(directory)
+        self._settings = [settings.NODE_AGENT_URLS, settings.NODE_AGENT_TOKEN]
+        settings.NODE_AGENT_URLS = [
+            'http://localhost:' + str(agent.server_address[1]) for agent in self._agents]
+        settings.NODE_AGENT_TOKEN = 'token'
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        for agent in self._agents:
+            for process_id in agent._processes.keys():
+                agent.terminate(process_id)
+            agent.shutdown()
+            agent.server_close()
+        for directory in self._directories:
+            shutil.rmtree(directory, ignore_errors=True)
+        settings.NODE_AGENT_URLS, settings.NODE_AGENT_TOKEN = self._settings
+        RenderingResourceSettingsManager().clear()
+
+    def _create_session(self):
+        session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        session = Session.objects.get(id=session_id)
+        return session
+
+    def test_schedule(self):
+        log.debug(1, 'test_schedule')
+        job_manager = AgentJobManager()
+        first = self._create_session()
+        nt.assert_equal(job_manager.schedule(first, JobInformation())[0], 200)
+        first = Session.objects.get(id=first.id)
+        nt.assert_equal(first.status, SESSION_STATUS_RUNNING)
+        nt.assert_equal(first.cluster_node, settings.NODE_AGENT_URLS[1])
+        nt.assert_equal(first.http_host, 'localhost')
+        nt.assert_equal(first.http_port, 13010)
+        nt.assert_equal(job_manager.hostname(first), 'localhost')
+
+        # Both agents now have two free CPUs, the first one is preferred
+        second = self._create_session()
+        nt.assert_equal(job_manager.schedule(second, JobInformation())[0], 200)
+        nt.assert_equal(Session.objects.get(id=second.id).cluster_node,
+                        settings.NODE_AGENT_URLS[0])
+        third = self._create_session()
+        nt.assert_equal(job_manager.schedule(third, JobInformation())[0], 200)
+        nt.assert_equal(Session.objects.get(id=third.id).cluster_node,
+                        settings.NODE_AGENT_URLS[1])
+        # Ports are chosen by the agents, and never shared by two rendering resources
+        nt.assert_equal(Session.objects.get(id=second.id).http_port, 13000)
+        nt.assert_equal(Session.objects.get(id=third.id).http_port, 13011)
+
+        # No agent has free slots left
+        fourth = self._create_session()
+        nt.assert_equal(job_manager.schedule(fourth, JobInformation())[0], 400)
+        nt.assert_equal(Session.objects.get(id=fourth.id).status, SESSION_STATUS_FAILED)
+
+        time.sleep(0.2)
+        contents, offset = job_manager.rendering_resource_out_log(first)
+        nt.assert_equal(contents, 'hello 13010\n')
+        nt.assert_equal(offset, 12)
+        nt.assert_equal(job_manager.rendering_resource_out_log(first, offset=6)[0], '13010\n')
+        nt.assert_equal(job_manager.fetch_rendering_resource_log(first, False, 6), '13010\n')
+
+        # Stopping the rendering resource releases its slots and publishes an exit event
+        nt.assert_equal(job_manager.stop(first)[0], 200)
+        code, events = agent_request('GET', first.cluster_node, '/events', params={'wait': 5})
+        nt.assert_equal(code, 200)
+        nt.assert_equal(events['events'][0]['id'], first.job_id)
+        nt.assert_equal(job_manager.hostname(first), 'FAILED')
+        nt.assert_false(json.loads(job_manager.job_information(first))['running'])
+        nt.assert_equal(agent_request('GET', first.cluster_node, '/slots')[1]['free_cpus'], 2)
+
+        process_exited(Session.objects, first.cluster_node, events['events'])
+        nt.assert_equal(Session.objects.get(id=first.id).status, SESSION_STATUS_FAILED)
+        nt.assert_equal(Session.objects.get(id=third.id).status, SESSION_STATUS_RUNNING)
+
+    def test_rejected_token(self):
+        log.debug(1, 'test_rejected_token')
+        settings.NODE_AGENT_TOKEN = 'invalid'
+        code = agent_request('GET', settings.NODE_AGENT_URLS[0], '/slots')[0]
+        nt.assert_equal(code, 401)
+        status = AgentJobManager().allocate(self._create_session(), JobInformation())
+        nt.assert_equal(status[0], 400)
+
+    def test_token_required(self):
+        log.debug(1, 'test_token_required')
+        nt.assert_raises(ValueError, NodeAgentServer, ('localhost', 0), 1, 0,
+                         self._directories[0], 'localhost', None)
+
+    def test_read_log(self):
+        log.debug(1, 'test_read_log')
+        filename = os.path.join(self._directories[0], 'test.out')
+        with open(filename, 'w') as log_file:
+            log_file.write('line 1\nline 2\nline 3\n')
+        nt.assert_equal(read_log(filename, {'offset': '7', 'length': '6'}), ['line 2', 13])
+        nt.assert_equal(read_log(filename, {'offset': '30'}), ['', 21])
+        nt.assert_equal(read_log(filename, {'tail': '2'}), ['line 2\nline 3\n', 21])
+        nt.assert_equal(read_log(filename, {'last': '7'}), ['line 3\n', 21])
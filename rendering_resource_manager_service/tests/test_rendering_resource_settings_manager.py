@@ -184,6 +184,10 @@ class TestSessionManager(TestCase):
                     '"memory": 0, ' \
                     '"graceful_exit": true, ' \
                     '"wait_until_running": true, ' \
+                    '"streaming_proxy": false, ' \
+                    '"warm_pool_size": 0, ' \
+                    '"warm_pool_max_idle": 600, ' \
+                    '"backend": "", ' \
                     '"name": "name", ' \
                     '"description": "description"}, ' \
                     '{"id": "rtneuron", ' \
@@ -204,6 +208,10 @@ class TestSessionManager(TestCase):
                     '"memory": 0, ' \
                     '"graceful_exit": true, ' \
                     '"wait_until_running": true, ' \
+                    '"streaming_proxy": false, ' \
+                    '"warm_pool_size": 0, ' \
+                    '"warm_pool_max_idle": 600, ' \
+                    '"backend": "", ' \
                     '"name": "name", ' \
                     '"description": "description"}' \
                     ']'
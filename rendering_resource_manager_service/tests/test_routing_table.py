@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+import datetime
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.session.models import Session, Task, \
+    SESSION_STATUS_RUNNING, SESSION_STATUS_STOPPING, SESSION_STATUS_BUSY
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management import routing_table
+from rendering_resource_manager_service.session.management import liveness_prober
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'testrenderer'
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+
+
+class RendererHandler(BaseHTTPRequestHandler):
+    """
+    Records the paths of the commands received by the rendering resource
+    """
+
+    def do_PUT(self):
+        length = int(self.headers.getheader('Content-Length', 0))
+        self.rfile.read(length)
+        self.server.paths.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write('{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRoutingTable(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        sm = SessionManager()
+        status = sm.clear_sessions()
+        nt.assert_true(status[0] == 200)
+        routing_table.globalRoutingTable.clear()
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        routing_table.globalRoutingTable.clear()
+        Task.objects.all().delete()
+
+    def test_routes(self):
+        log.debug(1, 'test_routes')
+        table = routing_table.RoutingTable()
+        nt.assert_true(table.get('session') is None)
+        table.set('session', routing_table.Route('localhost', 3000, SESSION_STATUS_RUNNING))
+        nt.assert_true(table.get('session').port == 3000)
+        table.remove('session')
+        nt.assert_true(table.get('session') is None)
+
+    def test_invalidation(self):
+        log.debug(1, 'test_invalidation')
+        session_id = str(SessionManager.get_session_id())
+        sm = SessionManager()
+        status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        route = routing_table.Route('localhost', 3000, SESSION_STATUS_RUNNING)
+
+        # Keep-alive updates of a running session keep the route
+        session = Session.objects.get(id=session_id)
+        session.http_host = 'localhost'
+        session.http_port = 3000
+        session.status = SESSION_STATUS_RUNNING
+        session.save()
+        routing_table.globalRoutingTable.set(session_id, route)
+        session.valid_until = datetime.datetime.now() + datetime.timedelta(seconds=300)
+        session.save()
+        nt.assert_true(routing_table.globalRoutingTable.get(session_id) is route)
+
+        # A new address invalidates the route
+        session.http_port = 3001
+        session.save()
+        nt.assert_true(routing_table.globalRoutingTable.get(session_id) is None)
+
+        # So does leaving the running state
+        routing_table.globalRoutingTable.set(session_id, route)
+        session.status = SESSION_STATUS_STOPPING
+        session.save()
+        nt.assert_true(routing_table.globalRoutingTable.get(session_id) is None)
+
+        # Including transitions applied by batch status queries
+        session.http_port = 3000
+        session.status = SESSION_STATUS_RUNNING
+        session.save()
+        routing_table.globalRoutingTable.set(session_id, route)
+        liveness_prober.globalLivenessSnapshot.set(
+            session_id, liveness_prober.LivenessStatus(503, 'Not responding'))
+        try:
+            nt.assert_true(sm.query_statuses([session_id])[0] == 200)
+        finally:
+            liveness_prober.globalLivenessSnapshot.remove(session_id)
+        nt.assert_equal(Session.objects.get(id=session_id).status, SESSION_STATUS_BUSY)
+        nt.assert_true(routing_table.globalRoutingTable.get(session_id) is None)
+
+        # So does its destruction
+        routing_table.globalRoutingTable.set(session_id, route)
+        status = sm.delete_session(session_id)
+        nt.assert_true(status[0] == 200)
+        nt.assert_true(routing_table.globalRoutingTable.get(session_id) is None)
+
+    def test_destroy(self):
+        log.debug(1, 'test_destroy')
+        renderer = HTTPServer(('127.0.0.1', 0), RendererHandler)
+        renderer.paths = list()
+        thread = threading.Thread(target=renderer.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        port = renderer.server_address[1]
+        try:
+            session_id = str(SessionManager.get_session_id())
+            status = SessionManager().create_session(
+                session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+            nt.assert_true(status[0] == 201)
+            session = Session.objects.get(id=session_id)
+            session.http_host = '127.0.0.1'
+            session.http_port = port
+            session.status = SESSION_STATUS_RUNNING
+            session.save()
+            routing_table.globalRoutingTable.set(session_id, routing_table.Route(
+                '127.0.0.1', port, SESSION_STATUS_RUNNING))
+
+            url = SERVICE_URL + '/session/camera?session_id=' + session_id
+            response = self.client.put(url, data='{}', content_type='application/json')
+            nt.assert_equal(response.status_code, 200)
+            nt.assert_equal(len(renderer.paths), 1)
+
+            # Once the session is being destroyed, commands no longer take the fast path,
+            # although the session exists until its stop task is executed
+            response = self.client.delete(SERVICE_URL + '/session/?session_id=' + session_id)
+            nt.assert_equal(response.status_code, 202)
+            nt.assert_equal(Session.objects.get(id=session_id).status, SESSION_STATUS_STOPPING)
+            nt.assert_true(routing_table.globalRoutingTable.get(session_id) is None)
+        finally:
+            http_pool.evict('127.0.0.1', port)
+            renderer.shutdown()
+            renderer.server_close()
@@ -23,7 +23,14 @@
 
 from django.test import TestCase
 from nose import tools as nt
+import threading
 import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.models import Session, SESSION_STATUS_RUNNING
+from rendering_resource_manager_service.session.management import job_manager
+from rendering_resource_manager_service.session.management import liveness_prober
+from rendering_resource_manager_service.session.management import session_manager
 from rendering_resource_manager_service.session.views import SessionDetailsSerializer
 from rendering_resource_manager_service.session.management.session_manager import SessionManager
 import json
@@ -140,3 +147,153 @@ class TestSessionManager(TestCase):
         sm = SessionManager()
         status = sm.delete_session(session_id)
         nt.assert_true(status[0] == 200)
+
+    def test_wait_for_status_change(self):
+        log.debug(1, 'test_wait_for_status_change')
+        session_id = SessionManager.get_session_id()
+        sm = SessionManager()
+        # Create session
+        status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        # Status differs from the one known by the client, returns immediately
+        status = sm.wait_for_status_change(session_id, {'code': 5}, 10)
+        nt.assert_true(status[0] == 200)
+        nt.assert_true(json.loads(status[1])['code'] == 0)
+        # Status is unchanged, returns when timeout expires
+        status = sm.wait_for_status_change(session_id, {'code': 0}, 0)
+        nt.assert_true(status[0] == 200)
+        nt.assert_true(json.loads(status[1])['code'] == 0)
+        # Status events
+        events = sm.status_events(session_id, 1)
+        nt.assert_true(events.next().startswith('event: status'))
+        # Delete session
+        status = sm.delete_session(session_id)
+        nt.assert_true(status[0] == 200)
+        status = sm.wait_for_status_change(session_id, {'code': 0}, 10)
+        nt.assert_true(status[0] == 404)
+
+    def test_watch_resolves_hostname(self):
+        log.debug(1, 'test_watch_resolves_hostname')
+        session_id = str(SessionManager.get_session_id())
+        sm = SessionManager()
+        status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        Session.objects.filter(id=session_id).update(job_id='42', http_host='')
+
+        # Clients only watching the status see the hostname of the job once it is running
+        manager = job_manager.globalJobManagerRegistry.get(settings.RESOURCE_ALLOCATOR)
+        manager.hostname = lambda session: 'node042'
+        try:
+            status = sm.wait_for_status_change(session_id, {'hostname': ''}, 5)
+        finally:
+            del manager.hostname
+        nt.assert_true(status[0] == 200)
+        nt.assert_equal(json.loads(status[1])['hostname'], 'node042')
+
+    def test_watch_limit(self):
+        log.debug(1, 'test_watch_limit')
+        watches = session_manager.globalStatusWatches
+        session_manager.globalStatusWatches = threading.BoundedSemaphore(1)
+        try:
+            url = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION + \
+                  '/session/watch?session_id=unknown&wait=0'
+            nt.assert_equal(self.client.get(url).status_code, 404)
+            session_manager.globalStatusWatches.acquire()
+            response = self.client.get(url)
+            nt.assert_equal(response.status_code, 503)
+            session_manager.globalStatusWatches.release()
+
+            # Watches are released once their stream is closed, even if it was never read
+            response = self.client.get(url + '&stream=sse')
+            nt.assert_false(session_manager.globalStatusWatches.acquire(False))
+            response.close()
+            nt.assert_true(session_manager.globalStatusWatches.acquire(False))
+        finally:
+            session_manager.globalStatusWatches = watches
+
+    def test_query_statuses(self):
+        log.debug(1, 'test_query_statuses')
+        session_ids = [str(SessionManager.get_session_id()) for _ in range(3)]
+        sm = SessionManager()
+        # Create sessions
+        for session_id in session_ids:
+            status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+            nt.assert_true(status[0] == 201)
+        # Query all sessions plus an unknown one
+        status = sm.query_statuses(session_ids + ['unknown'])
+        nt.assert_true(status[0] == 200)
+        js = json.loads(status[1])
+        nt.assert_true(len(js['statuses']) == 3)
+        nt.assert_true(js['unknown'] == ['unknown'])
+        for session_status in js['statuses']:
+            nt.assert_true(session_status['session'] in session_ids)
+            nt.assert_true(session_status['code'] == 0)
+        # Delete sessions
+        for session_id in session_ids:
+            status = sm.delete_session(session_id)
+            nt.assert_true(status[0] == 200)
+
+    def test_query_statuses_read_only(self):
+        log.debug(1, 'test_query_statuses_read_only')
+        session_id = str(SessionManager.get_session_id())
+        sm = SessionManager()
+        status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        session = Session.objects.get(id=session_id)
+        session.status = SESSION_STATUS_RUNNING
+        session.http_host = 'unreachable'
+        session.http_port = 1
+        session.save()
+        liveness_prober.globalLivenessSnapshot.remove(session_id)
+        probe = SessionManager.probe_rendering_resource
+        probed = list()
+        try:
+            SessionManager.probe_rendering_resource = classmethod(
+                lambda cls, s: probed.append(s.id) or [404, 'Job has been cancelled'])
+            status = sm.query_statuses([session_id])
+        finally:
+            SessionManager.probe_rendering_resource = probe
+        # Rendering resources without liveness result are left to the liveness prober
+        nt.assert_equal(probed, [])
+        nt.assert_true(status[0] == 200)
+        nt.assert_equal(json.loads(status[1])['statuses'][0]['code'], SESSION_STATUS_RUNNING)
+        nt.assert_true(Session.objects.filter(id=session_id).exists())
+
+        # The number of queried sessions is bounded
+        session_ids = [str(i) for i in range(consts.STATUS_QUERY_MAX_SESSIONS + 1)]
+        nt.assert_true(sm.query_statuses(session_ids)[0] == 400)
+        nt.assert_true(sm.query_statuses(session_ids[1:])[0] == 200)
+
+    def test_query_statuses_probe_request(self):
+        log.debug(1, 'test_query_statuses_probe_request')
+        sm = SessionManager()
+        session_ids = [str(SessionManager.get_session_id()) for _ in range(3)]
+        for session_id in session_ids:
+            status = sm.create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+            nt.assert_true(status[0] == 201)
+            session = Session.objects.get(id=session_id)
+            session.status = SESSION_STATUS_RUNNING
+            session.http_host = 'localhost'
+            session.http_port = 3000
+            session.save()
+        snapshot = liveness_prober.globalLivenessSnapshot
+        requests = list()
+        try:
+            snapshot.request_probe = lambda: requests.append(True)
+            for session_id in session_ids:
+                snapshot.set(session_id, liveness_prober.LivenessStatus(200, 'OK'))
+            nt.assert_true(sm.query_statuses(session_ids)[0] == 200)
+            nt.assert_equal(requests, [])
+
+            # A single probe is requested for the sessions without liveness result
+            snapshot.remove(session_ids[0])
+            snapshot.remove(session_ids[1])
+            status = sm.query_statuses(session_ids)
+            nt.assert_true(status[0] == 200)
+            nt.assert_equal(requests, [True])
+            for session_status in json.loads(status[1])['statuses']:
+                nt.assert_equal(session_status['code'], SESSION_STATUS_RUNNING)
+        finally:
+            del snapshot.request_probe
+            for session_id in session_ids:
+                snapshot.remove(session_id)
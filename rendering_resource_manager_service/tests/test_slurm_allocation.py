@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+import time
+import threading
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.session.management.session_manager_settings as settings
+from rendering_resource_manager_service.session.management.slurm_job_manager import \
+    SlurmJobManager
+
+# Answers of the fake cluster nodes: delay (in seconds) and error output of salloc
+FAKE_ALLOCATIONS = {
+    'slow.epfl.ch': [0.4, 'salloc: Granted job allocation 12'],
+    'fast.epfl.ch': [0.1, 'salloc: Granted job allocation 34'],
+    'busy.epfl.ch': [0.0, 'salloc: error: Unable to allocate resources: Immediate failure'],
+    'hung.epfl.ch': [0.5, 'salloc: Granted job allocation 56'],
+}
+
+
+class TestSlurmAllocation(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        self._run = ssh_pool.run
+        self._cancelled = list()
+        self._cancellation = threading.Event()
+        ssh_pool.run = self._fake_run
+        self._timeout = settings.SLURM_ALLOCATION_RESULT_TIMEOUT
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        ssh_pool.run = self._run
+        settings.SLURM_ALLOCATION_RESULT_TIMEOUT = self._timeout
+
+    def _fake_run(self, host, command):
+        if command.startswith('scancel'):
+            self._cancelled.append([host, command.split()[1]])
+            self._cancellation.set()
+            return [0, '', '']
+        if host == 'broken.epfl.ch':
+            raise ValueError('Unexpected failure')
+        delay, error = FAKE_ALLOCATIONS[host]
+        time.sleep(delay)
+        return [1, '', error]
+
+    def test_first_grant_is_kept(self):
+        log.debug(1, 'test_first_grant_is_kept')
+        job_manager = SlurmJobManager()
+        start_time = time.time()
+        cluster_node, job_id, _ = job_manager._submit_allocation(
+            ['slow.epfl.ch', 'busy.epfl.ch', 'fast.epfl.ch'], 'salloc --no-shell')
+        nt.assert_true(time.time() - start_time < 0.4)
+        nt.assert_equal(cluster_node, 'fast.epfl.ch')
+        nt.assert_equal(job_id, '34')
+
+        # The job granted by the slow cluster node is cancelled as soon as it arrives
+        nt.assert_true(self._cancellation.wait(2))
+        nt.assert_equal(self._cancelled, [['slow.epfl.ch', '12']])
+
+        statistics = job_manager.allocation_statistics()
+        nt.assert_equal(sorted(statistics.keys()),
+                        ['busy.epfl.ch', 'fast.epfl.ch', 'slow.epfl.ch'])
+        nt.assert_equal(statistics['busy.epfl.ch']['grants'], 0)
+        nt.assert_equal(statistics['slow.epfl.ch']['grants'], 1)
+        nt.assert_true(statistics['slow.epfl.ch']['average_latency'] >= 0.4)
+
+    def test_no_grant(self):
+        log.debug(1, 'test_no_grant')
+        cluster_node, job_id, error = SlurmJobManager()._submit_allocation(
+            ['busy.epfl.ch'], 'salloc --no-shell')
+        nt.assert_equal(cluster_node, 'busy.epfl.ch')
+        nt.assert_equal(job_id, None)
+        nt.assert_true('Immediate failure' in error)
+        nt.assert_equal(self._cancelled, [])
+
+    def test_unexpected_failure(self):
+        log.debug(1, 'test_unexpected_failure')
+        cluster_node, job_id, error = SlurmJobManager()._submit_allocation(
+            ['broken.epfl.ch'], 'salloc --no-shell')
+        nt.assert_equal(cluster_node, 'broken.epfl.ch')
+        nt.assert_equal(job_id, None)
+        nt.assert_true('broken.epfl.ch' in error)
+
+    def test_timeout(self):
+        log.debug(1, 'test_timeout')
+        settings.SLURM_ALLOCATION_RESULT_TIMEOUT = 0.2
+        start_time = time.time()
+        cluster_node, job_id, _ = SlurmJobManager()._submit_allocation(
+            ['hung.epfl.ch', 'busy.epfl.ch'], 'salloc --no-shell')
+        nt.assert_true(time.time() - start_time < 0.5)
+        nt.assert_equal(job_id, None)
+
+        # The job granted after the timeout is cancelled
+        nt.assert_true(self._cancellation.wait(2))
+        nt.assert_equal(self._cancelled, [['hung.epfl.ch', '56']])
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+import rendering_resource_manager_service.utils.tools as tools
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_SCHEDULED, SESSION_STATUS_STARTING
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management.job_manager import JobInformation
+from rendering_resource_manager_service.session.management import slurm_job_watcher
+from rendering_resource_manager_service.session.management.slurm_job_manager import \
+    SlurmJobManager
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'brayns'
+CLUSTER_NODE = 'frontend.epfl.ch'
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+
+
+class TestSlurmBatch(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        status = manager.clear()
+        nt.assert_true(status[0] == 200)
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'braynsService'
+        params['environment_variables'] = 'BRAYNS_LOG=1'
+        params['modules'] = 'BBP/viz/latest'
+        params['process_rest_parameters_format'] = '--http-server ${rest_hostname}:${rest_port}'
+        params['scheduler_rest_parameters_format'] = '--http-server :${rest_port}'
+        params['project'] = 'proj3'
+        params['queue'] = 'interactive'
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 1
+        params['nb_gpus'] = 0
+        params['memory'] = 0
+        params['graceful_exit'] = True
+        params['wait_until_running'] = True
+        params['name'] = 'name'
+        params['description'] = 'description'
+        status = manager.create(params)
+        nt.assert_true(status[0] == 201)
+        status = SessionManager().clear_sessions()
+        nt.assert_true(status[0] == 200)
+        self._session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(
+            self._session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        self._commands = list()
+        self._run = ssh_pool.run
+        self._hosts = settings.SLURM_HOSTS
+        self._allocator = settings.RESOURCE_ALLOCATOR
+        self._launch_mode = settings.SLURM_LAUNCH_MODE
+        ssh_pool.run = self._fake_run
+        settings.SLURM_HOSTS = [CLUSTER_NODE]
+        settings.RESOURCE_ALLOCATOR = settings.RESOURCE_ALLOCATOR_SLURM
+        settings.SLURM_LAUNCH_MODE = settings.SLURM_LAUNCH_MODE_BATCH
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        ssh_pool.run = self._run
+        settings.SLURM_HOSTS = self._hosts
+        settings.RESOURCE_ALLOCATOR = self._allocator
+        settings.SLURM_LAUNCH_MODE = self._launch_mode
+        RenderingResourceSettingsManager().clear()
+
+    def _fake_run(self, host, command, input_data=None):
+        self._commands.append([host, command, input_data])
+        if command.startswith('sbatch '):
+            return [0, 'Submitted batch job 77\n', '']
+        return [0, '', '']
+
+    def test_submit(self):
+        log.debug(1, 'test_submit')
+        session = Session.objects.get(id=self._session_id)
+        session.http_port = 3000
+        job_information = JobInformation()
+        status = SlurmJobManager().submit(session, job_information)
+        nt.assert_equal(status[0], 200)
+
+        # The job script is submitted on hold, then released once its token is written
+        nt.assert_equal(len(self._commands), 2)
+        host, command, input_data = self._commands[0]
+        nt.assert_equal(host, CLUSTER_NODE)
+        nt.assert_true(input_data is None)
+        lines = command.split('\n')
+        nt.assert_true(lines[0].startswith('sbatch --hold '))
+        nt.assert_true('--account=proj3' in lines[0])
+        nt.assert_equal(lines[1], '#!/bin/bash')
+        nt.assert_true('module load BBP/viz/latest' in lines)
+        nt.assert_true(lines[-4].startswith('RRM_TOKEN=$(cat '))
+        nt.assert_true('curl -s -K - -X PUT' in lines[-3])
+        nt.assert_true('hostname=${SLURMD_NODENAME}.epfl.ch&port=3000' in lines[-3])
+        nt.assert_false('token' in lines[-3].split('curl')[1])
+        nt.assert_true(lines[-2].startswith('BRAYNS_LOG=1 braynsService --http-server :3000'))
+        nt.assert_true('_${SLURM_JOB_ID}_' in lines[-2])
+        nt.assert_equal(lines[-1], 'RRM_JOB_SCRIPT')
+        host, command, input_data = self._commands[1]
+        nt.assert_true(command.startswith('umask 077 && cat > '))
+        nt.assert_true(command.endswith('scontrol release 77'))
+        nt.assert_equal(input_data, tools.job_token(self._session_id, '77') + '\n')
+
+        session = Session.objects.get(id=self._session_id)
+        nt.assert_equal(session.job_id, '77')
+        nt.assert_equal(session.status, SESSION_STATUS_SCHEDULED)
+
+    def test_launch_connection(self):
+        log.debug(1, 'test_launch_connection')
+        commands = list()
+        popen = ssh_pool.subprocess.Popen
+        pool = ssh_pool.globalSSHConnectionPool
+
+        def fake_popen(args, **kwargs):
+            commands.append(args)
+            return popen(['true'], **kwargs)
+        ssh_pool.subprocess.Popen = fake_popen
+        try:
+            session = Session.objects.get(id=self._session_id)
+            session.cluster_node = CLUSTER_NODE
+            session.job_id = '77'
+            session.http_host = 'node042.epfl.ch'
+            session.http_port = 3042
+            status = SlurmJobManager().start(session, JobInformation())
+        finally:
+            ssh_pool.subprocess.Popen = popen
+        nt.assert_equal(status[0], 200)
+
+        # The rendering resource is launched over a dedicated connection, not the pooled one
+        nt.assert_equal(len(commands), 1)
+        nt.assert_true(commands[0][-1].startswith('srun --jobid=77 '))
+        nt.assert_true('ControlPath=none' in commands[0])
+        nt.assert_false('ControlPath=' + pool.control_path(CLUSTER_NODE) in commands[0])
+        nt.assert_equal(pool.size(), 0)
+
+    def _callback(self, hostname, port, token):
+        url = SERVICE_URL + '/session/callback?session_id=' + self._session_id + \
+            '&hostname=' + hostname + '&port=' + str(port)
+        return self.client.put(url, HTTP_X_RRM_CALLBACK_TOKEN=token)
+
+    def _schedule(self):
+        session = Session.objects.get(id=self._session_id)
+        session.cluster_node = CLUSTER_NODE
+        session.job_id = '77'
+        session.http_host = ''
+        session.http_port = 3042
+        session.status = SESSION_STATUS_SCHEDULED
+        session.save()
+
+    def test_callback(self):
+        log.debug(1, 'test_callback')
+        self._schedule()
+        token = tools.job_token(self._session_id, '77')
+        response = self._callback('node042.epfl.ch', 3042, 'invalid')
+        nt.assert_equal(response.status_code, 403)
+
+        # Tokens are bound to the job
+        response = self._callback('node042.epfl.ch', 3042, tools.sign(self._session_id))
+        nt.assert_equal(response.status_code, 403)
+        response = self._callback('node042.epfl.ch', 3042, tools.job_token(self._session_id, 78))
+        nt.assert_equal(response.status_code, 403)
+
+        # Only compute nodes are accepted
+        for hostname in ['127.0.0.1', 'localhost.epfl.ch', 'node042.example.com']:
+            response = self._callback(hostname, 3042, token)
+            nt.assert_equal(response.status_code, 400)
+        response = self._callback('node042.epfl.ch', 80, token)
+        nt.assert_equal(response.status_code, 400)
+
+        response = self._callback('node042.epfl.ch', 3042, token)
+        nt.assert_equal(response.status_code, 200)
+        session = Session.objects.get(id=self._session_id)
+        nt.assert_equal(session.http_host, 'node042.epfl.ch')
+        nt.assert_equal(session.http_port, 3042)
+        nt.assert_equal(session.status, SESSION_STATUS_STARTING)
+
+        # The hostname cannot be changed once reported
+        response = self._callback('node043.epfl.ch', 3042, token)
+        nt.assert_equal(response.status_code, 409)
+        session = Session.objects.get(id=self._session_id)
+        nt.assert_equal(session.http_host, 'node042.epfl.ch')
+
+    def test_callback_batch_host(self):
+        log.debug(1, 'test_callback_batch_host')
+        self._schedule()
+        table = slurm_job_watcher.globalSlurmJobTable
+        table.update(CLUSTER_NODE, ['77'], slurm_job_watcher.parse_jobs(
+            'JobId=77 JobState=RUNNING BatchHost=node042'))
+        try:
+            token = tools.job_token(self._session_id, '77')
+            response = self._callback('node043.epfl.ch', 3042, token)
+            nt.assert_equal(response.status_code, 400)
+            response = self._callback('node042.epfl.ch', 3042, token)
+            nt.assert_equal(response.status_code, 200)
+        finally:
+            table.retain([])
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.ssh_pool as ssh_pool
+from rendering_resource_manager_service.session.models import Session
+from rendering_resource_manager_service.session.management import slurm_job_watcher
+from rendering_resource_manager_service.session.management.slurm_job_manager import \
+    SlurmJobManager
+
+CLUSTER_NODE = 'frontend.epfl.ch'
+OTHER_CLUSTER_NODE = 'other.epfl.ch'
+SCONTROL_OUTPUT = \
+    'JobId=42 JobName=testuser_brayns JobState=RUNNING Reason=None ' \
+    'StartTime=2017-03-01T10:00:00 BatchHost=node042\n' \
+    'slurm_load_jobs error: Invalid job id specified\n' \
+    'JobId=43 JobName=testuser_livre JobState=PENDING Reason=Resources ' \
+    'StartTime=Unknown BatchHost=\n'
+
+
+class TestSlurmJobWatcher(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        slurm_job_watcher.globalSlurmJobTable.update(
+            CLUSTER_NODE, ['42', '43', '44'], slurm_job_watcher.parse_jobs(SCONTROL_OUTPUT))
+        self._run = ssh_pool.run
+        self._commands = list()
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        ssh_pool.run = self._run
+        slurm_job_watcher.globalSlurmJobTable.retain([])
+
+    def _fake_run(self, status):
+        def run(host, command):
+            self._commands.append([host, command])
+            return status
+        return run
+
+    def test_parse_jobs(self):
+        log.debug(1, 'test_parse_jobs')
+        jobs = slurm_job_watcher.parse_jobs(SCONTROL_OUTPUT)
+        nt.assert_equal(sorted(jobs.keys()), ['42', '43'])
+        nt.assert_equal(jobs['42'].state, 'RUNNING')
+        nt.assert_equal(jobs['42'].batch_host, 'node042')
+        nt.assert_equal(jobs['42'].start_time, '2017-03-01T10:00:00')
+        nt.assert_equal(jobs['43'].batch_host, '')
+
+    def test_job_table(self):
+        log.debug(1, 'test_job_table')
+        table = slurm_job_watcher.globalSlurmJobTable
+        nt.assert_equal(table.get(CLUSTER_NODE, '42')[1].state, 'RUNNING')
+        # Listed but not found: the job does not exist anymore
+        nt.assert_equal(table.get(CLUSTER_NODE, '44'), [True, None])
+        # Not listed: the job is not watched yet
+        nt.assert_equal(table.get(CLUSTER_NODE, '45'), [False, None])
+        nt.assert_equal(table.get('other.epfl.ch', '42'), [False, None])
+
+    def test_hostname_from_table(self):
+        log.debug(1, 'test_hostname_from_table')
+        job_manager = SlurmJobManager()
+        session = Session(id='watched', cluster_node=CLUSTER_NODE, job_id='42')
+        nt.assert_equal(job_manager.hostname(session), 'node042.epfl.ch')
+        nt.assert_true('JobState=RUNNING' in job_manager.job_information(session))
+        session.job_id = '44'
+        nt.assert_equal(job_manager.hostname(session), '')
+
+    def test_list_jobs(self):
+        log.debug(1, 'test_list_jobs')
+        table = slurm_job_watcher.globalSlurmJobTable
+        output = SCONTROL_OUTPUT.replace('slurm_load_jobs error: Invalid job id specified\n', '')
+        ssh_pool.run = self._fake_run([0, output, ''])
+        slurm_job_watcher.list_jobs(OTHER_CLUSTER_NODE, ['42', '44'])
+        # All jobs are listed with a single command
+        nt.assert_equal(self._commands, [[OTHER_CLUSTER_NODE, 'scontrol -o show job']])
+        nt.assert_equal(table.get(OTHER_CLUSTER_NODE, '42')[1].state, 'RUNNING')
+        nt.assert_equal(table.get(OTHER_CLUSTER_NODE, '44'), [True, None])
+        nt.assert_equal(table.get(OTHER_CLUSTER_NODE, '43'), [False, None])
+
+    def test_failed_listing(self):
+        log.debug(1, 'test_failed_listing')
+        table = slurm_job_watcher.globalSlurmJobTable
+        # Failed listings do not mark the jobs as finished
+        for status in [[1, '', 'slurm_load_jobs error: Unable to contact slurm controller'],
+                       [0, '', 'slurm_load_jobs error: Socket timed out'],
+                       [ssh_pool.SSH_CONNECTION_ERROR, '', 'Connection refused']]:
+            ssh_pool.run = self._fake_run(status)
+            slurm_job_watcher.list_jobs(OTHER_CLUSTER_NODE, ['42'])
+            nt.assert_equal(table.get(OTHER_CLUSTER_NODE, '42'), [False, None])
+            slurm_job_watcher.list_jobs(CLUSTER_NODE, ['42'])
+            nt.assert_equal(table.get(CLUSTER_NODE, '42')[1].state, 'RUNNING')
+        nt.assert_equal(len(self._commands), 6)
+
+        session = Session(id='watched', cluster_node=OTHER_CLUSTER_NODE, job_id='42')
+        ssh_pool.run = self._fake_run([0, SCONTROL_OUTPUT.splitlines()[0], ''])
+        nt.assert_equal(SlurmJobManager().hostname(session), 'node042.epfl.ch')
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+
+import json
+import threading
+import time
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.utils.fake_slurmrestd import FakeSlurmRestServer
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_STARTING, SESSION_STATUS_SCHEDULED
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management.job_manager import JobInformation
+from rendering_resource_manager_service.session.management.slurm_rest_job_manager import \
+    SlurmRestJobManager
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'brayns'
+START_DELAY = 0.3
+
+
+class TestSlurmRest(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        manager.clear()
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'braynsService'
+        params['environment_variables'] = ''
+        params['modules'] = 'BBP/viz/latest'
+        params['process_rest_parameters_format'] = '--http-server ${rest_hostname}:${rest_port}'
+        params['scheduler_rest_parameters_format'] = '--http-server :${rest_port}'
+        params['project'] = 'proj3'
+        params['queue'] = 'interactive'
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 2
+        params['nb_gpus'] = 1
+        params['memory'] = 0
+        params['graceful_exit'] = False
+        params['wait_until_running'] = True
+        params['name'] = 'name'
+        params['description'] = 'description'
+        status = manager.create(params)
+        nt.assert_true(status[0] == 201)
+        SessionManager().clear_sessions()
+        self._session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(
+            self._session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+
+        self._server = FakeSlurmRestServer(('localhost', 0), START_DELAY, 'token')
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self._settings = [settings.SLURM_REST_URL, settings.SLURM_REST_TOKEN,
+                          settings.SLURM_HOSTS, settings.SLURM_DEFAULT_TIME]
+        settings.SLURM_REST_URL = 'http://localhost:' + str(self._server.server_address[1])
+        settings.SLURM_REST_TOKEN = 'token'
+        settings.SLURM_HOSTS = ['frontend.epfl.ch']
+        settings.SLURM_DEFAULT_TIME = '1:00:00'
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        self._server.shutdown()
+        self._server.server_close()
+        settings.SLURM_REST_URL, settings.SLURM_REST_TOKEN, \
+            settings.SLURM_HOSTS, settings.SLURM_DEFAULT_TIME = self._settings
+        RenderingResourceSettingsManager().clear()
+
+    def test_schedule(self):
+        log.debug(1, 'test_schedule')
+        job_manager = SlurmRestJobManager()
+        session = Session.objects.get(id=self._session_id)
+        session.http_port = 3000
+        status = job_manager.schedule(session, JobInformation())
+        nt.assert_equal(status[0], 200)
+        session = Session.objects.get(id=self._session_id)
+        nt.assert_equal(session.job_id, '1000')
+        nt.assert_equal(session.status, SESSION_STATUS_SCHEDULED)
+        nt.assert_equal(session.http_host, '')
+
+        # A pending job is neither started nor considered as dead
+        nt.assert_equal(job_manager.hostname(session), '')
+        nt.assert_equal(SessionManager.probe_rendering_resource(session)[0], 503)
+        nt.assert_equal(Session.objects.get(id=self._session_id).status,
+                        SESSION_STATUS_SCHEDULED)
+
+        description = self._server.jobs[1000]['description']
+        nt.assert_equal(description['job']['account'], 'proj3')
+        nt.assert_equal(description['job']['cpus_per_task'], 2)
+        nt.assert_equal(description['job']['tres_per_node'], 'gres/gpu:1')
+        nt.assert_equal(description['job']['time_limit'], 60)
+        nt.assert_true('module load BBP/viz/latest' in description['script'])
+        nt.assert_true('braynsService --http-server :3000' in description['script'])
+
+        # The hostname is known once the job runs
+        time.sleep(START_DELAY)
+        nt.assert_equal(job_manager.hostname(session), 'node001.epfl.ch')
+        nt.assert_equal(Session.objects.get(id=self._session_id).status,
+                        SESSION_STATUS_STARTING)
+        nt.assert_equal(job_manager.kill(session)[0], 200)
+        job = json.loads(job_manager.job_information(session))
+        nt.assert_equal(job['job_state'], 'CANCELLED')
+        nt.assert_equal(job_manager.hostname(session), 'FAILED')
+
+    def test_rejected_token(self):
+        log.debug(1, 'test_rejected_token')
+        settings.SLURM_REST_TOKEN = 'invalid'
+        session = Session.objects.get(id=self._session_id)
+        status = SlurmRestJobManager().allocate(session, JobInformation())
+        nt.assert_equal(status[0], 400)
+        nt.assert_true('Authentication failure' in status[1])
+
+    def test_time_limit(self):
+        log.debug(1, 'test_time_limit')
+        nt.assert_equal(SlurmRestJobManager._time_limit('30'), 30)
+        nt.assert_equal(SlurmRestJobManager._time_limit('30:30'), 31)
+        nt.assert_equal(SlurmRestJobManager._time_limit('2:00:00'), 120)
+        nt.assert_equal(SlurmRestJobManager._time_limit('1-2'), 1560)
+        nt.assert_equal(SlurmRestJobManager._time_limit('1-00:30:00'), 1470)
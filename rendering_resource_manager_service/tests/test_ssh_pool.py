@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.fake_ssh as fake_ssh
+from rendering_resource_manager_service.utils import ssh_pool
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HANDSHAKE_DELAY = 0.3
+
+
+class TestSSHPool(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        os.environ['FAKE_SSH_HANDSHAKE_DELAY'] = str(HANDSHAKE_DELAY)
+        self._control_dir = tempfile.mkdtemp()
+        fake_ssh_path = os.path.splitext(fake_ssh.__file__)[0] + '.py'
+        self._ssh_command = [sys.executable, fake_ssh_path]
+        self._pool = ssh_pool.SSHConnectionPool(
+            self._ssh_command, 'user', 'key', self._control_dir, 10)
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        self._pool.close_all()
+        shutil.rmtree(self._control_dir)
+
+    def test_run(self):
+        log.debug(1, 'test_run')
+        status = self._pool.run('localhost', 'echo Granted job 42 >&2; exit 3')
+        nt.assert_equal(status[0], 3)
+        nt.assert_equal(status[2].strip(), 'Granted job 42')
+        nt.assert_equal(self._pool.size(), 1)
+
+    def test_multiplexing(self):
+        log.debug(1, 'test_multiplexing')
+        nt.assert_true(self._pool.connect('localhost'))
+        start = time.time()
+        for _ in range(5):
+            nt.assert_equal(self._pool.run('localhost', 'echo ok')[1].strip(), 'ok')
+        # Commands do not pay for a new handshake
+        nt.assert_true(time.time() - start < 5 * HANDSHAKE_DELAY)
+
+    def test_restart(self):
+        log.debug(1, 'test_restart')
+        nt.assert_true(self._pool.connect('localhost'))
+        # Master connection dies
+        subprocess.call(self._ssh_command + [
+            '-S', self._pool.control_path('localhost'), '-O', 'exit', 'user@localhost'])
+        time.sleep(0.5)
+        nt.assert_equal(self._pool.size(), 0)
+        nt.assert_equal(self._pool.run('localhost', 'echo ok')[1].strip(), 'ok')
+        nt.assert_equal(self._pool.size(), 1)
+
+    def test_spawn_detached(self):
+        log.debug(1, 'test_spawn_detached')
+        nt.assert_true(self._pool.connect('localhost'))
+        start = time.time()
+        process = self._pool.spawn_detached('localhost', 'echo ok')
+        nt.assert_equal(process.communicate()[0].strip(), 'ok')
+        # The command pays for its own handshake instead of using the master connection
+        nt.assert_true(time.time() - start >= HANDSHAKE_DELAY)
+
+        # Closing the master connection does not tear down detached commands
+        process = self._pool.spawn_detached('localhost', 'sleep 0.5; echo ok')
+        self._pool.close('localhost')
+        nt.assert_equal(process.communicate()[0].strip(), 'ok')
+        nt.assert_equal(process.returncode, 0)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import socket
+import StringIO
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.utils.tools as tools
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.models import SESSION_STATUS_RUNNING
+from rendering_resource_manager_service.session.management import routing_table
+
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+SESSION_ID = '42'
+
+
+class RendererHandler(BaseHTTPRequestHandler):
+    """
+    Records the requests it receives, and answers with a chunked body. The second chunk of the
+    'stream' command is only sent once the proxy is disconnected
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        length = int(self.headers.getheader('Content-Length', 0))
+        self.server.requests.append([self.path, dict(self.headers), self.rfile.read(length)])
+        self._send_chunks(['{"frame": ', '1}'])
+
+    def do_GET(self):
+        self.server.requests.append([self.path, dict(self.headers), ''])
+        self._send_chunks(['first'])
+        if self.path.startswith('/stream'):
+            self.connection.settimeout(5)
+            try:
+                data = self.rfile.read(1)
+            except socket.timeout:
+                return
+            except socket.error:
+                # Connections closed with unread data are reset
+                data = ''
+            if data == '':
+                self.server.disconnected.set()
+
+    def _send_chunks(self, chunks):
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Keep-Alive', 'timeout=5')
+        self.send_header('X-Frame', '1')
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write('%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.flush()
+        if not self.path.startswith('/stream'):
+            self.wfile.write('0\r\n\r\n')
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeRenderer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), RendererHandler)
+        self.requests = list()
+        self.disconnected = threading.Event()
+
+
+class TestStreamingProxy(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        self._renderer = FakeRenderer()
+        thread = threading.Thread(target=self._renderer.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        routing_table.globalRoutingTable.set(SESSION_ID, routing_table.Route(
+            '127.0.0.1', self._renderer.server_address[1], SESSION_STATUS_RUNNING, True))
+        self._chunk_size = consts.STREAMING_CHUNK_SIZE
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        consts.STREAMING_CHUNK_SIZE = self._chunk_size
+        routing_table.globalRoutingTable.clear()
+        http_pool.evict('127.0.0.1', self._renderer.server_address[1])
+        self._renderer.shutdown()
+        self._renderer.server_close()
+
+    def test_hop_by_hop_headers(self):
+        log.debug(1, 'test_hop_by_hop_headers')
+        headers = tools.filter_hop_by_hop_headers({
+            'Connection': 'Keep-Alive, X-Hop', 'Keep-Alive': 'timeout=5', 'X-Hop': '1',
+            'Transfer-Encoding': 'chunked', 'Upgrade': 'websocket',
+            'Content-Type': 'application/json', 'X-Frame': '1'})
+        nt.assert_equal(headers, {'Content-Type': 'application/json', 'X-Frame': '1'})
+
+    def test_request_body_stream(self):
+        log.debug(1, 'test_request_body_stream')
+        body = tools.RequestBodyStream(StringIO.StringIO('0123456789'), 10, 4)
+        nt.assert_equal(len(body), 10)
+        nt.assert_equal(list(body), ['0123', '4567', '89'])
+
+    def test_chunked_bodies(self):
+        log.debug(1, 'test_chunked_bodies')
+        consts.STREAMING_CHUNK_SIZE = 4
+        response = self.client.put(
+            SERVICE_URL + '/session/frame?session_id=' + SESSION_ID, data='0123456789',
+            content_type='application/octet-stream', HTTP_CONNECTION='X-Hop', HTTP_X_HOP='1',
+            HTTP_X_CAMERA='front')
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_true(response.streaming)
+        nt.assert_equal(''.join(response.streaming_content), '{"frame": 1}')
+
+        # The request body is forwarded in full, without the hop-by-hop headers
+        path, headers, body = self._renderer.requests[0]
+        nt.assert_true(path.startswith('/frame'))
+        nt.assert_equal(body, '0123456789')
+        nt.assert_equal(headers['content-length'], '10')
+        nt.assert_equal(headers['content-type'], 'application/octet-stream')
+        nt.assert_equal(headers['x-camera'], 'front')
+        nt.assert_false('x-hop' in headers)
+
+        # The response is relayed without the headers of the rendering resource connection
+        nt.assert_equal(response['X-Frame'], '1')
+        nt.assert_false(response.has_header('Transfer-Encoding'))
+        nt.assert_false(response.has_header('Keep-Alive'))
+
+    def test_client_disconnect(self):
+        log.debug(1, 'test_client_disconnect')
+        response = self.client.get(SERVICE_URL + '/session/stream?session_id=' + SESSION_ID)
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_equal(next(iter(response.streaming_content)), 'first')
+        # The connection to the rendering resource is closed with the client response
+        response.close()
+        nt.assert_true(self._renderer.disconnected.wait(5))
+
+    def test_client_disconnect_before_body(self):
+        log.debug(1, 'test_client_disconnect_before_body')
+        response = self.client.get(SERVICE_URL + '/session/stream?session_id=' + SESSION_ID)
+        nt.assert_equal(response.status_code, 200)
+        response.close()
+        nt.assert_true(self._renderer.disconnected.wait(5))
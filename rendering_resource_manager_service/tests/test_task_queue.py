@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import json
+import datetime
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.session.models import Session, Task, \
+    TASK_STATUS_PENDING, TASK_STATUS_RUNNING, TASK_STATUS_COMPLETED, TASK_STATUS_FAILED
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management import task_queue
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'testrenderer'
+SERVICE_URL = '/' + settings.APPLICATION_NAME + '/' + settings.API_VERSION
+
+
+class TestTaskQueue(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        sm = SessionManager()
+        status = sm.clear_sessions()
+        nt.assert_true(status[0] == 200)
+        self._session_id = str(SessionManager.get_session_id())
+        status = sm.create_session(self._session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        Task.objects.all().delete()
+
+    def test_task_lifecycle(self):
+        log.debug(1, 'test_task_lifecycle')
+        queue = task_queue.TaskQueue()
+        queue.register('echo', lambda session_id, parameters: [200, parameters['message']])
+        task_id = queue.submit(self._session_id, 'echo', {'message': 'hello'})
+        nt.assert_equal(queue.get(task_id).status, TASK_STATUS_PENDING)
+
+        nt.assert_true(queue.process_next())
+        nt.assert_false(queue.process_next())
+        task = queue.get(task_id)
+        nt.assert_equal(task.status, TASK_STATUS_COMPLETED)
+        nt.assert_equal(task.code, 200)
+        nt.assert_equal(task.contents, 'hello')
+
+        task_id = queue.submit(self._session_id, 'unknown')
+        nt.assert_true(queue.process_next())
+        nt.assert_equal(queue.get(task_id).status, TASK_STATUS_FAILED)
+        nt.assert_equal(queue.get(task_id).code, 400)
+
+    def test_recover(self):
+        log.debug(1, 'test_recover')
+        queue = task_queue.TaskQueue()
+        task_id = queue.submit(self._session_id, consts.TASK_COMMAND_LOG)
+        nt.assert_equal(queue.claim().id, task_id)
+        nt.assert_equal(queue.get(task_id).status, TASK_STATUS_RUNNING)
+        nt.assert_equal(queue.get(task_id).owner, queue.owner())
+        nt.assert_true(queue.claim() is None)
+
+        # Tasks run by a live process are left alone
+        queue.heartbeat()
+        queue.recover()
+        nt.assert_equal(queue.get(task_id).status, TASK_STATUS_RUNNING)
+
+        # Tasks whose heartbeat stopped are executed again
+        self._expire(task_id)
+        queue.recover()
+        nt.assert_equal(queue.get(task_id).status, TASK_STATUS_PENDING)
+        nt.assert_equal(queue.get(task_id).owner, '')
+
+    def test_recover_schedule(self):
+        log.debug(1, 'test_recover_schedule')
+        queue = task_queue.TaskQueue()
+        task_id = queue.submit(self._session_id, consts.TASK_COMMAND_SCHEDULE,
+                               {'auth_token': 'secret', 'params': '--fast'})
+        nt.assert_equal(queue.claim().id, task_id)
+
+        # Interrupted scheduling tasks are not replayed, and their session is stopped
+        self._expire(task_id)
+        queue.recover()
+        task = queue.get(task_id)
+        nt.assert_equal(task.status, TASK_STATUS_FAILED)
+        nt.assert_equal(json.loads(task.parameters), {'params': '--fast'})
+        stop = queue.claim()
+        nt.assert_equal(stop.command, consts.TASK_COMMAND_STOP)
+        nt.assert_equal(stop.session_id, self._session_id)
+
+    def test_scrub_parameters(self):
+        log.debug(1, 'test_scrub_parameters')
+        queue = task_queue.TaskQueue()
+        queue.register('echo', lambda session_id, parameters: [200, parameters['auth_token']])
+        task_id = queue.submit(self._session_id, 'echo', {'auth_token': 'secret', 'tail': 10})
+        nt.assert_true(queue.process_next())
+        task = queue.get(task_id)
+        nt.assert_equal(task.contents, 'secret')
+        nt.assert_equal(json.loads(task.parameters), {'tail': 10})
+
+    @staticmethod
+    def _expire(task_id):
+        Task.objects.filter(id=task_id).update(
+            heartbeat=datetime.datetime.now() -
+            datetime.timedelta(seconds=consts.TASK_QUEUE_HEARTBEAT_EXPIRY + 1))
+
+    def test_background_commands(self):
+        log.debug(1, 'test_background_commands')
+        response = self.client.get(
+            SERVICE_URL + '/session/log?session_id=' + self._session_id)
+        nt.assert_equal(response.status_code, 202)
+        task_id = json.loads(response.content)['task_id']
+
+        response = self.client.get(SERVICE_URL + '/session/task?task_id=' + task_id)
+        nt.assert_equal(response.status_code, 202)
+        nt.assert_equal(json.loads(response.content)['status'], 'Pending')
+
+        # Once executed, the task returns the result of the command
+        nt.assert_true(task_queue.globalTaskQueue.process_next())
+        response = self.client.get(SERVICE_URL + '/session/task?task_id=' + task_id)
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_equal(json.loads(response.content)['contents'],
+                        'Rendering resource is currently unavailable')
+
+        response = self.client.get(SERVICE_URL + '/session/task?task_id=unknown')
+        nt.assert_equal(response.status_code, 404)
+
+        # Sessions are destroyed in the background
+        response = self.client.delete(SERVICE_URL + '/session/?session_id=' + self._session_id)
+        nt.assert_equal(response.status_code, 202)
+        nt.assert_true(Session.objects.filter(id=self._session_id).exists())
+        nt.assert_true(task_queue.globalTaskQueue.process_next())
+        nt.assert_false(Session.objects.filter(id=self._session_id).exists())
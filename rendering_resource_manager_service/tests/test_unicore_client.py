@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import json
+from django.test import TestCase
+from nose import tools as nt
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.utils.http_pool as http_pool
+import rendering_resource_manager_service.service.settings as settings
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session, \
+    SESSION_STATUS_SCHEDULED
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management.job_manager import JobInformation
+from rendering_resource_manager_service.session.management.unicore_job_manager import \
+    UnicoreJobManager
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'brayns'
+REGISTRY_URL = 'https://registry.epfl.ch/rest/registries/default_registry'
+SITE_URL = 'https://unicore.epfl.ch/SITE/rest/core'
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, contents='', headers=None):
+        self.status_code = status_code
+        self.content = contents if isinstance(contents, basestring) else json.dumps(contents)
+        self.headers = headers or dict()
+        self.reason = ''
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeUnicore(object):
+    """
+    Answers the requests of the Unicore job manager, and records their authorization
+    """
+
+    def __init__(self):
+        self.requests = list()
+        self.jobs = 0
+
+    def request(self, method, url, headers=None, data=None, **kwargs):
+        self.requests.append([method, url, headers.get('Authorization')])
+        if url == REGISTRY_URL:
+            return FakeResponse(200, {'entries': [
+                {'href': SITE_URL + '/factories/default', 'type': 'TargetSystemFactory'}]})
+        if url == SITE_URL:
+            return FakeResponse(200, {'client': {'role': {'selected': 'user'}},
+                                      '_links': {'jobs': {'href': SITE_URL + '/jobs'}}})
+        if url == SITE_URL + '/jobs':
+            if method == 'GET':
+                return FakeResponse(200, {'jobs': []})
+            self.jobs += 1
+            location = SITE_URL + '/jobs/' + str(self.jobs)
+            return FakeResponse(201, headers={'Location': location})
+        if url.startswith(SITE_URL + '/jobs/'):
+            job = url.split('/')[-1]
+            return FakeResponse(200, {'status': 'RUNNING', '_links': {
+                'self': {'href': url},
+                'workingDirectory': {'href': SITE_URL + '/storages/' + job + '-uspace'}}})
+        if url.endswith('/files/input.sh'):
+            return FakeResponse(204)
+        if url.endswith('/files/stdout'):
+            contents = 'output of ' + url.split('/')[-3] + '\n'
+            if headers['Accept'] == 'application/json':
+                return FakeResponse(200, {'size': len(contents)})
+            return FakeResponse(200, contents)
+        return FakeResponse(404)
+
+
+class TestUnicoreClient(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        manager.clear()
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'braynsService'
+        params['environment_variables'] = 'BRAYNS_LOG=1'
+        params['modules'] = ''
+        params['process_rest_parameters_format'] = ''
+        params['scheduler_rest_parameters_format'] = '--http-server :${rest_port}'
+        params['project'] = ''
+        params['queue'] = ''
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 1
+        params['nb_gpus'] = 0
+        params['memory'] = 0
+        params['graceful_exit'] = False
+        params['wait_until_running'] = True
+        params['name'] = 'name'
+        params['description'] = 'description'
+        nt.assert_true(manager.create(params)[0] == 201)
+        SessionManager().clear_sessions()
+
+        self._unicore = FakeUnicore()
+        self._request = http_pool.request
+        http_pool.request = self._unicore.request
+        self._settings = [settings.UNICORE_DEFAULT_REGISTRY_URL, settings.UNICORE_DEFAULT_SITE]
+        settings.UNICORE_DEFAULT_REGISTRY_URL = REGISTRY_URL
+        settings.UNICORE_DEFAULT_SITE = 'SITE'
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        http_pool.request = self._request
+        settings.UNICORE_DEFAULT_REGISTRY_URL, settings.UNICORE_DEFAULT_SITE = self._settings
+        RenderingResourceSettingsManager().clear()
+
+    def test_sessions_keep_their_token(self):
+        log.debug(1, 'test_sessions_keep_their_token')
+        job_manager = UnicoreJobManager()
+        sessions = list()
+        for token in ['Bearer first', 'Bearer second']:
+            session_id = str(SessionManager.get_session_id())
+            status = SessionManager().create_session(
+                session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+            nt.assert_true(status[0] == 201)
+            session = Session.objects.get(id=session_id)
+            nt.assert_equal(job_manager.schedule(session, JobInformation(), token)[0], 200)
+            nt.assert_equal(session.status, SESSION_STATUS_SCHEDULED)
+            sessions.append(session)
+        nt.assert_equal(sessions[0].job_id, SITE_URL + '/jobs/1')
+        nt.assert_equal(sessions[1].job_id, SITE_URL + '/jobs/2')
+
+        # Scheduling the second session did not change the token and files of the first one
+        del self._unicore.requests[:]
+        nt.assert_equal(job_manager.rendering_resource_out_log(sessions[0]),
+                        ['output of 1-uspace\n', 19])
+        nt.assert_equal(job_manager.rendering_resource_out_log(sessions[1])[0],
+                        'output of 2-uspace\n')
+        for method, url, token in self._unicore.requests:
+            nt.assert_equal(token, 'Bearer first' if '/1-uspace/' in url else 'Bearer second')
+
+        # Clients are released when their session is deleted
+        sessions[0].delete()
+        nt.assert_equal(job_manager._clients.keys(), [sessions[1].id])
+
+    def test_sessions_without_credentials(self):
+        log.debug(1, 'test_sessions_without_credentials')
+        session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(
+            session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        session = Session.objects.get(id=session_id)
+        nt.assert_equal(UnicoreJobManager().schedule(session, JobInformation(), 'Bearer')[0], 200)
+
+        # After a restart, the job cannot be managed without the token of its user: the session
+        # fails and can be deleted, without unauthenticated requests to Unicore
+        job_manager = UnicoreJobManager()
+        del self._unicore.requests[:]
+        nt.assert_equal(job_manager.hostname(session), 'FAILED')
+        nt.assert_equal(job_manager.rendering_resource_out_log(session), ['', 0])
+        nt.assert_true(job_manager.fetch_rendering_resource_log(session, False, 100) is None)
+        nt.assert_equal(job_manager.stop(session)[0], 200)
+        nt.assert_equal(self._unicore.requests, [])
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+from django.test import TestCase
+from nose import tools as nt
+import datetime
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.session.management.session_manager_settings as consts
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session, Task, \
+    SESSION_STATUS_RUNNING, SESSION_STATUS_SCHEDULING
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management import warm_pool
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'warmrenderer'
+
+
+class TestWarmPool(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        status = manager.clear()
+        nt.assert_true(status[0] == 200)
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'braynsService'
+        params['environment_variables'] = ''
+        params['modules'] = ''
+        params['process_rest_parameters_format'] = '--http-server ${rest_hostname}:${rest_port}'
+        params['scheduler_rest_parameters_format'] = '--http-server :${rest_port}'
+        params['project'] = 'project'
+        params['queue'] = 'test'
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 1
+        params['nb_gpus'] = 0
+        params['memory'] = 0
+        params['graceful_exit'] = True
+        params['wait_until_running'] = True
+        params['warm_pool_size'] = 2
+        params['backend'] = 'SLURM'
+        params['name'] = 'name'
+        params['description'] = 'description'
+        status = manager.create(params)
+        nt.assert_true(status[0] == 201)
+        sm = SessionManager()
+        status = sm.clear_sessions()
+        nt.assert_true(status[0] == 200)
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        Task.objects.all().delete()
+        RenderingResourceSettingsManager().clear()
+
+    def test_default_job(self):
+        log.debug(1, 'test_default_job')
+        nt.assert_true(warm_pool.is_default_job({'params': '', 'environment': ''}))
+        nt.assert_false(warm_pool.is_default_job({'nb_gpus': 2}))
+
+    def test_claim(self):
+        log.debug(1, 'test_claim')
+        pool = warm_pool.WarmPool()
+        pool.refill()
+        warm_sessions = Session.objects.filter(owner=consts.WARM_POOL_OWNER)
+        nt.assert_equal(warm_sessions.count(), 2)
+        nt.assert_equal(Task.objects.filter(command=consts.TASK_COMMAND_SCHEDULE).count(), 2)
+
+        # One of the warm rendering resources is ready
+        warm_session = warm_sessions[0]
+        warm_session.job_id = '42'
+        warm_session.http_host = 'node042'
+        warm_session.http_port = 3042
+        warm_session.status = SESSION_STATUS_RUNNING
+        warm_session.save()
+
+        session_id = str(SessionManager.get_session_id())
+        status = SessionManager().create_session(session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)
+        nt.assert_true(status[0] == 201)
+        session = Session.objects.get(id=session_id)
+        nt.assert_true(pool.claim(session))
+        session = Session.objects.get(id=session_id)
+        nt.assert_equal(session.job_id, '42')
+        nt.assert_equal(session.http_host, 'node042')
+        nt.assert_equal(session.status, SESSION_STATUS_RUNNING)
+        nt.assert_false(Session.objects.filter(id=warm_session.id).exists())
+
+        # The other one is not started yet
+        nt.assert_false(pool.claim(session))
+        statistics = pool.statistics()[DEFAULT_CONFIGURATION]
+        nt.assert_equal(statistics['hits'], 1)
+        nt.assert_equal(statistics['misses'], 1)
+        nt.assert_equal(statistics['ready'], 0)
+        nt.assert_equal(statistics['starting'], 1)
+
+        # The claimed rendering resource is replaced
+        pool.refill()
+        nt.assert_equal(Session.objects.filter(
+            owner=consts.WARM_POOL_OWNER, status=SESSION_STATUS_SCHEDULING).count(), 2)
+
+    def test_user_token_backend(self):
+        log.debug(1, 'test_user_token_backend')
+        manager = RenderingResourceSettingsManager()
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'braynsService'
+        params['environment_variables'] = ''
+        params['modules'] = ''
+        params['process_rest_parameters_format'] = ''
+        params['scheduler_rest_parameters_format'] = ''
+        params['project'] = 'project'
+        params['queue'] = 'test'
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 1
+        params['nb_gpus'] = 0
+        params['memory'] = 0
+        params['graceful_exit'] = True
+        params['wait_until_running'] = True
+        params['warm_pool_size'] = 2
+        params['backend'] = 'UNICORE'
+        params['name'] = 'name'
+        params['description'] = 'description'
+        status = manager.update(params)
+        nt.assert_equal(status[0], 400)
+        params['id'] = 'unicorerenderer'
+        status = manager.create(params)
+        nt.assert_equal(status[0], 400)
+        params['warm_pool_size'] = 0
+        status = manager.create(params)
+        nt.assert_equal(status[0], 201)
+
+    def test_idle_from_ready(self):
+        log.debug(1, 'test_idle_from_ready')
+        pool = warm_pool.WarmPool()
+        pool.refill()
+        long_ago = datetime.datetime.now() - datetime.timedelta(days=1)
+        Session.objects.filter(owner=consts.WARM_POOL_OWNER).update(
+            created=long_ago, valid_until=long_ago)
+        warm_session = Session.objects.filter(owner=consts.WARM_POOL_OWNER)[0]
+        warm_session.status = SESSION_STATUS_RUNNING
+        warm_session.save()
+
+        # Warm rendering resources being started do not expire
+        pool.refill()
+        now = datetime.datetime.now()
+        for session in Session.objects.filter(owner=consts.WARM_POOL_OWNER):
+            if session.id == warm_session.id:
+                nt.assert_true(session.valid_until < now)
+            else:
+                nt.assert_true(session.valid_until > now)
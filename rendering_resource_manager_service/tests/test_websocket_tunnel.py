@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+import datetime
+import Queue
+import struct
+import websocket
+from django.test import TestCase
+from nose import tools as nt
+from geventwebsocket.websocket import WebSocket
+import rendering_resource_manager_service.utils.custom_logging as log
+from rendering_resource_manager_service.config.management.rendering_resource_settings_manager \
+    import RenderingResourceSettingsManager
+from rendering_resource_manager_service.session.models import Session, SESSION_STATUS_RUNNING
+from rendering_resource_manager_service.session.management.session_manager import SessionManager
+from rendering_resource_manager_service.session.management import websocket_tunnel
+
+DEFAULT_USER = 'testuser'
+DEFAULT_CONFIGURATION = 'brayns'
+
+
+class FakeStream(object):
+    """
+    Records the bytes written to a client connection
+    """
+
+    def __init__(self):
+        self.written = ''
+
+    def write(self, data):
+        self.written += data
+
+    def read(self, length):
+        return ''
+
+
+class FakeClient(object):
+    """
+    Client WebSocket answering close frames, as browsers do
+    """
+    OPCODE_CLOSE = WebSocket.OPCODE_CLOSE
+
+    def __init__(self, messages):
+        self.messages = Queue.Queue()
+        for message in messages:
+            self.messages.put(message)
+        self.sent = list()
+        self.frames = list()
+        self.closed = False
+
+    def receive(self):
+        return self.messages.get(timeout=5)
+
+    def send(self, data, binary=False):
+        self.sent.append([data, binary])
+
+    def send_frame(self, data, opcode):
+        self.frames.append([opcode, data])
+        if opcode == self.OPCODE_CLOSE:
+            self.messages.put(None)
+
+    def close_code(self):
+        """
+        :return: The close code of the last close frame sent to the client
+        """
+        closes = [data for opcode, data in self.frames if opcode == self.OPCODE_CLOSE]
+        nt.assert_equal(len(closes), 1)
+        return struct.unpack('!H', closes[0][:2])[0]
+
+
+class FakeUpstream(object):
+    """
+    WebSocket of a rendering resource, closing itself after receiving a number of messages
+    """
+
+    def __init__(self, frames, close_after):
+        self.frames = Queue.Queue()
+        for frame in frames:
+            self.frames.put(frame)
+        self.sent = list()
+        self.closed = False
+        self._close_after = close_after
+
+    def send(self, data, opcode):
+        self.sent.append([data, opcode])
+        if len(self.sent) == self._close_after:
+            self.frames.put([websocket.ABNF.OPCODE_CLOSE, ''])
+
+    def recv_data(self):
+        frame = self.frames.get(timeout=5)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def close(self):
+        self.closed = True
+        self.frames.put([websocket.ABNF.OPCODE_CLOSE, ''])
+
+
+class TestWebSocketTunnel(TestCase):
+    def setUp(self):
+        log.debug(1, 'setUp')
+        manager = RenderingResourceSettingsManager()
+        manager.clear()
+        params = dict()
+        params['id'] = DEFAULT_CONFIGURATION
+        params['command_line'] = 'braynsService'
+        params['environment_variables'] = ''
+        params['modules'] = ''
+        params['process_rest_parameters_format'] = ''
+        params['scheduler_rest_parameters_format'] = ''
+        params['project'] = ''
+        params['queue'] = ''
+        params['exclusive'] = False
+        params['nb_nodes'] = 1
+        params['nb_cpus'] = 1
+        params['nb_gpus'] = 0
+        params['memory'] = 0
+        params['graceful_exit'] = False
+        params['wait_until_running'] = True
+        params['name'] = 'name'
+        params['description'] = 'description'
+        nt.assert_true(manager.create(params)[0] == 201)
+        sm = SessionManager()
+        sm.clear_sessions()
+        self._session_id = str(SessionManager.get_session_id())
+        nt.assert_true(sm.create_session(
+            self._session_id, DEFAULT_USER, DEFAULT_CONFIGURATION)[0] == 201)
+        self._create_connection = websocket.create_connection
+
+    def tearDown(self):
+        log.debug(1, 'tearDown')
+        websocket.create_connection = self._create_connection
+        RenderingResourceSettingsManager().clear()
+
+    def _tunnel(self, client, upstream):
+        tunnel = websocket_tunnel.WebSocketTunnel(self._session_id, client, upstream, 300)
+        # Sessions are only visible from the test thread, keep-alive is tested separately
+        tunnel._last_activity = datetime.datetime.now()
+        return tunnel
+
+    def test_close_client(self):
+        log.debug(1, 'test_close_client')
+        stream = FakeStream()
+        client = WebSocket(dict(), stream, None)
+        websocket_tunnel.close_client(
+            client, websocket_tunnel.WEBSOCKET_CLOSE_GOING_AWAY, 'Session destroyed')
+        # The WebSocket handler closes sockets that are not flagged as closed
+        nt.assert_true(client.closed)
+        # A single close frame is sent, with its code and reason
+        nt.assert_equal(stream.written, '\x88\x13' + struct.pack('!H', 1001) + 'Session destroyed')
+
+    def test_relay(self):
+        log.debug(1, 'test_relay')
+        client = FakeClient([u'{"camera": 1}', bytearray('\x00\x01')])
+        upstream = FakeUpstream([[websocket.ABNF.OPCODE_TEXT, '{"frame": 1}'],
+                                 [websocket.ABNF.OPCODE_BINARY, '\xff\xd8']], 2)
+        self._tunnel(client, upstream).run()
+        nt.assert_equal(upstream.sent, [['{"camera": 1}', websocket.ABNF.OPCODE_TEXT],
+                                        ['\x00\x01', websocket.ABNF.OPCODE_BINARY]])
+        nt.assert_equal(client.sent, [['{"frame": 1}', False], ['\xff\xd8', True]])
+        # The rendering resource closed the tunnel
+        nt.assert_true(upstream.closed)
+        nt.assert_equal(client.close_code(), websocket_tunnel.WEBSOCKET_CLOSE_GOING_AWAY)
+
+    def test_client_close(self):
+        log.debug(1, 'test_client_close')
+        client = FakeClient([None])
+        upstream = FakeUpstream([], 0)
+        self._tunnel(client, upstream).run()
+        nt.assert_true(upstream.closed)
+        nt.assert_equal(client.close_code(), websocket_tunnel.WEBSOCKET_CLOSE_NORMAL)
+
+    def test_upstream_failure(self):
+        log.debug(1, 'test_upstream_failure')
+        client = FakeClient([])
+        upstream = FakeUpstream([websocket.WebSocketConnectionClosedException('Lost')], 0)
+        self._tunnel(client, upstream).run()
+        nt.assert_true(upstream.closed)
+        nt.assert_equal(client.close_code(), websocket_tunnel.WEBSOCKET_CLOSE_GOING_AWAY)
+
+    def test_unreachable_rendering_resource(self):
+        log.debug(1, 'test_unreachable_rendering_resource')
+        query_string = 'session_id=' + self._session_id
+        client = FakeClient([])
+        websocket_tunnel.open_tunnel(client, 'ws', query_string)
+        nt.assert_equal(client.close_code(), websocket_tunnel.WEBSOCKET_CLOSE_POLICY_VIOLATION)
+
+        def refuse(url, timeout):
+            raise IOError('Connection refused by ' + url)
+        websocket.create_connection = refuse
+        session = Session.objects.get(id=self._session_id)
+        session.status = SESSION_STATUS_RUNNING
+        session.http_host = 'node042'
+        session.http_port = 3042
+        session.save()
+        client = FakeClient([])
+        websocket_tunnel.open_tunnel(client, 'ws', query_string)
+        nt.assert_equal(client.close_code(), websocket_tunnel.WEBSOCKET_CLOSE_INTERNAL_ERROR)
+        nt.assert_equal(websocket_tunnel.globalTunnelRegistry.count(self._session_id), 0)
+
+    def test_keep_alive(self):
+        log.debug(1, 'test_keep_alive')
+        tunnel = websocket_tunnel.WebSocketTunnel(
+            self._session_id, FakeClient([]), FakeUpstream([], 0), 300)
+        expired = datetime.datetime.now() - datetime.timedelta(seconds=1)
+        Session.objects.filter(id=self._session_id).update(valid_until=expired)
+        tunnel._keep_alive()
+        valid_until = Session.objects.get(id=self._session_id).valid_until
+        nt.assert_true(valid_until > datetime.datetime.now() + datetime.timedelta(seconds=290))
+
+        # Activity within the keep-alive interval does not update the session
+        Session.objects.filter(id=self._session_id).update(valid_until=expired)
+        tunnel._keep_alive()
+        nt.assert_equal(Session.objects.get(id=self._session_id).valid_until, expired)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+Local stand-in for slurmrestd, used to test and benchmark the Slurm REST job manager without a
+cluster. Jobs are kept in memory and are not executed. The following requests are supported:
+
+    POST /slurm/<version>/job/submit    Submits a job, which is pending for a while and then
+                                        runs on node001
+    GET /slurm/<version>/job/<id>       Returns the state of a job
+    DELETE /slurm/<version>/job/<id>    Cancels a job
+
+Usage: fake_slurmrestd.py [port] [start delay in seconds]
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+# Node on which all jobs run
+FAKE_BATCH_HOST = 'node001'
+
+JOB_PATH = re.compile(r'^/slurm/[^/]+/job/(\w+)$')
+
+
+class FakeSlurmRestServer(ThreadingMixIn, HTTPServer):
+    """
+    Fake slurmrestd serving each request in its own thread
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, start_delay=0.0, token=None):
+        """
+        Initialization
+        :param address: Host and port on which the server listens
+        :param start_delay: Delay during which submitted jobs are pending (in seconds)
+        :param token: Token expected in the X-SLURM-USER-TOKEN header, any token if None
+        """
+        HTTPServer.__init__(self, address, FakeSlurmRestHandler)
+        self.start_delay = start_delay
+        self.token = token
+        self.mutex = threading.Lock()
+        self.jobs = dict()
+        self.next_job_id = 1000
+
+    def submit(self, description):
+        """
+        Stores a submitted job
+        :param description: Job script and properties
+        :return: The id of the job
+        """
+        with self.mutex:
+            job_id = self.next_job_id
+            self.next_job_id += 1
+            self.jobs[job_id] = {
+                'description': description,
+                'submit_time': time.time(),
+                'cancelled': False
+            }
+            return job_id
+
+    def job(self, job_id):
+        """
+        :param job_id: Id of the job
+        :return: The job as described by slurmrestd, or None if the job does not exist
+        """
+        with self.mutex:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            state = 'PENDING'
+            if job['cancelled']:
+                state = 'CANCELLED'
+            elif time.time() >= job['submit_time'] + self.start_delay:
+                state = 'RUNNING'
+            return {
+                'job_id': job_id,
+                'name': job['description']['job'].get('name', ''),
+                'job_state': state,
+                'batch_host': FAKE_BATCH_HOST if state == 'RUNNING' else '',
+                'nodes': FAKE_BATCH_HOST if state == 'RUNNING' else ''
+            }
+
+    def cancel(self, job_id):
+        """
+        Cancels a job
+        :param job_id: Id of the job
+        :return: True if the job exists
+        """
+        with self.mutex:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            job['cancelled'] = True
+            return True
+
+
+class FakeSlurmRestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests sent to the fake slurmrestd
+    """
+
+    def log_message(self, *args):
+        """
+        Requests are not logged
+        """
+        pass
+
+    def _reply(self, code, contents):
+        """
+        Sends a JSON response
+        :param code: HTTP code
+        :param contents: Dictionary sent as the JSON body of the response
+        """
+        body = json.dumps(contents)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        """
+        Sends an error in the slurmrestd format
+        :param code: HTTP code
+        :param message: Description of the error
+        """
+        self._reply(code, {'errors': [{'error': message, 'error_number': code}]})
+
+    def _authorized(self):
+        """
+        :return: True if the request carries the expected token, otherwise an error is sent
+        """
+        if self.server.token is None or \
+                self.headers.getheader('X-SLURM-USER-TOKEN') == self.server.token:
+            return True
+        self._error(401, 'Authentication failure')
+        return False
+
+    def _job_id(self):
+        """
+        :return: The id of the job targeted by the request, or None if the path is invalid
+        """
+        match = JOB_PATH.match(self.path.split('?')[0])
+        if match is None or not match.group(1).isdigit():
+            return None
+        return int(match.group(1))
+
+    # pylint: disable=C0103
+    def do_POST(self):
+        """
+        Submits a job
+        """
+        if not self._authorized():
+            return
+        if not self.path.split('?')[0].endswith('/job/submit'):
+            self._error(404, 'Unknown path')
+            return
+        length = int(self.headers.getheader('Content-Length', 0))
+        try:
+            description = json.loads(self.rfile.read(length))
+            if 'script' not in description or 'job' not in description:
+                raise ValueError('script and job are required')
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        job_id = self.server.submit(description)
+        self._reply(200, {'job_id': job_id, 'step_id': 'batch', 'errors': []})
+
+    # pylint: disable=C0103
+    def do_GET(self):
+        """
+        Returns the state of a job
+        """
+        if not self._authorized():
+            return
+        job_id = self._job_id()
+        job = None if job_id is None else self.server.job(job_id)
+        if job is None:
+            self._error(404, 'Invalid job id specified')
+            return
+        self._reply(200, {'jobs': [job], 'errors': []})
+
+    # pylint: disable=C0103
+    def do_DELETE(self):
+        """
+        Cancels a job
+        """
+        if not self._authorized():
+            return
+        job_id = self._job_id()
+        if job_id is None or not self.server.cancel(job_id):
+            self._error(404, 'Invalid job id specified')
+            return
+        self._reply(200, {'errors': []})
+
+
+def main(args):
+    """
+    Runs the fake slurmrestd until it is interrupted
+    :param args: Command line arguments
+    :return: Exit code
+    """
+    port = int(args[0]) if args else 6820
+    start_delay = float(args[1]) if len(args) > 1 else 2.0
+    server = FakeSlurmRestServer(('localhost', port), start_delay)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
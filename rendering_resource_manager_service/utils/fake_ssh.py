@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+Local stand-in for the ssh client, used to test and benchmark the SSH connection pool without
+a cluster. Commands are executed on the local host. The options used by the pool are supported:
+
+    -M -N -S <path>     Runs a master connection listening on the control socket <path>
+    -O check|exit       Checks or stops the master connection of the control socket
+    <command>           Runs the command, through the master connection if one is listening
+                        on the control socket, otherwise after a simulated handshake
+
+The duration of the simulated handshake is given by the FAKE_SSH_HANDSHAKE_DELAY environment
+variable (in seconds, defaults to 0.2).
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+OPTIONS_WITH_VALUE = ['-i', '-o', '-S', '-O', '-p', '-l']
+
+
+def parse_arguments(args):
+    """
+    Parses the command line of the ssh client
+    :param args: Command line arguments
+    :return: A list containing the options, the destination and the remote command
+    """
+    options = dict()
+    position = 0
+    while position < len(args) and args[position].startswith('-'):
+        option = args[position]
+        if option in OPTIONS_WITH_VALUE:
+            position += 1
+            value = args[position]
+            if option == '-o' and '=' in value:
+                key, value = value.split('=', 1)
+                options[key] = value
+            else:
+                options[option] = value
+        else:
+            options[option] = True
+        position += 1
+    destination = args[position] if position < len(args) else ''
+    return [options, destination, ' '.join(args[position + 1:])]
+
+
+def control_path(options):
+    """
+    :param options: Options of the command line
+    :return: The path of the control socket, or None if not multiplexing
+    """
+    return options.get('-S', options.get('ControlPath'))
+
+
+def is_master_listening(path):
+    """
+    :param path: Path of the control socket
+    :return: True if a master connection is listening on the control socket
+    """
+    if path is None or path == 'none' or not os.path.exists(path):
+        return False
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        client.close()
+
+
+def handshake():
+    """
+    Simulates the handshake of a new SSH connection
+    """
+    time.sleep(float(os.environ.get('FAKE_SSH_HANDSHAKE_DELAY', '0.2')))
+
+
+def run_master(path):
+    """
+    Runs a master connection until it is stopped
+    :param path: Path of the control socket
+    """
+    handshake()
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+
+    def stop(signum, frame):
+        """
+        Removes the control socket when the master is stopped
+        """
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while True:
+        connection, _ = server.accept()
+        if connection.recv(4) == b'exit':
+            stop(None, None)
+        connection.close()
+
+
+def main(args):
+    """
+    Runs the fake ssh client
+    :param args: Command line arguments
+    :return: Exit code
+    """
+    options, _, command = parse_arguments(args)
+    path = control_path(options)
+    if '-O' in options:
+        if not is_master_listening(path):
+            sys.stderr.write('Control socket connect(' + str(path) + '): No such file\n')
+            return 255
+        if options['-O'] == 'exit':
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+            client.sendall(b'exit')
+            client.close()
+        return 0
+    if '-M' in options or options.get('ControlMaster') in ['yes', 'auto']:
+        if '-N' in options:
+            run_master(path)
+            return 0
+    if not is_master_listening(path):
+        handshake()
+    return subprocess.call(['/bin/sh', '-c', command])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
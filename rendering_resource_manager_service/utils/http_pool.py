@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+"""
+This module provides a pool of persistent HTTP sessions, one per remote host and port, so that
+outbound requests reuse keep-alive connections instead of opening a new one for every call
+"""
+
+import time
+from collections import OrderedDict
+from cookielib import DefaultCookiePolicy
+from threading import Lock
+from urlparse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+
+
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443,
+}
+
+
+class RejectCookiePolicy(DefaultCookiePolicy):
+    """
+    Cookie policy neither storing nor sending any cookie. Pooled sessions are shared by the
+    requests of all users, so the cookies set for one user must not be sent on behalf of
+    another one
+    """
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class HTTPSessionPool(object):
+    """
+    Pool of keep-alive HTTP sessions indexed by remote host and port. The least recently used
+    sessions are closed when the pool is full, and sessions that have not been used for a
+    while are closed when the pool is accessed
+    """
+
+    def __init__(self, max_hosts, connections_per_host, idle_timeout):
+        """
+        Initialization
+        :param max_hosts: Maximum number of remote hosts with an open session
+        :param connections_per_host: Maximum number of connections kept open per remote host
+        :param idle_timeout: Delay after which an unused session is closed (in seconds)
+        """
+        self._mutex = Lock()
+        self._sessions = OrderedDict()
+        self._max_hosts = max_hosts
+        self._connections_per_host = connections_per_host
+        self._idle_timeout = idle_timeout
+
+    @staticmethod
+    def key(host, port):
+        """
+        :param host: Remote host
+        :param port: Remote port
+        :return: Key identifying the remote host and port in the pool
+        """
+        return str(host).lower() + ':' + str(port)
+
+    @staticmethod
+    def key_from_url(url):
+        """
+        :param url: URL of the remote resource
+        :return: Key identifying the remote host and port of the URL in the pool
+        """
+        parsed_url = urlparse(url)
+        port = parsed_url.port
+        if port is None:
+            port = DEFAULT_PORTS.get(parsed_url.scheme, 80)
+        return HTTPSessionPool.key(parsed_url.hostname, port)
+
+    def _create_session(self):
+        """
+        :return: A new HTTP session with a bounded connection pool, and without cookie
+                 persistence
+        """
+        session = requests.Session()
+        session.cookies.set_policy(RejectCookiePolicy())
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self._connections_per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _evict_idle(self, now):
+        """
+        Closes the sessions that have not been used since the idle timeout. Must be called
+        with the mutex locked
+        :param now: Current time
+        """
+        for key in self._sessions.keys():
+            if now - self._sessions[key][1] > self._idle_timeout:
+                log.info(2, 'Closing idle HTTP session to ' + key)
+                self._sessions.pop(key)[0].close()
+
+    def get_session(self, key):
+        """
+        Returns the session for the given key, creating it if needed
+        :param key: Key identifying the remote host and port
+        :return: A keep-alive HTTP session
+        """
+        now = time.time()
+        with self._mutex:
+            self._evict_idle(now)
+            entry = self._sessions.pop(key, None)
+            if entry is None:
+                entry = [self._create_session(), now]
+                while len(self._sessions) >= self._max_hosts:
+                    evicted_key, evicted_entry = self._sessions.popitem(last=False)
+                    log.info(2, 'Closing least recently used HTTP session to ' + evicted_key)
+                    evicted_entry[0].close()
+            entry[1] = now
+            # Most recently used sessions are kept at the end of the dictionary
+            self._sessions[key] = entry
+            return entry[0]
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends an HTTP request using the session of the remote host and port
+        :param method: HTTP verb
+        :param url: URL of the remote resource
+        :param kwargs: Optional arguments passed to requests
+        :return: The HTTP response
+        """
+        return self.get_session(self.key_from_url(url)).request(method=method, url=url, **kwargs)
+
+    def evict(self, host, port):
+        """
+        Closes the session of the given remote host and port, typically when the rendering
+        resource it is connected to is destroyed
+        :param host: Remote host
+        :param port: Remote port
+        """
+        with self._mutex:
+            entry = self._sessions.pop(self.key(host, port), None)
+        if entry is not None:
+            entry[0].close()
+
+    def clear(self):
+        """
+        Closes all sessions
+        """
+        with self._mutex:
+            entries = self._sessions.values()
+            self._sessions.clear()
+        for entry in entries:
+            entry[0].close()
+
+    def size(self):
+        """
+        :return: The number of remote hosts with an open session
+        """
+        with self._mutex:
+            return len(self._sessions)
+
+
+# Global pool used for all outbound HTTP requests
+globalHTTPSessionPool = HTTPSessionPool(
+    settings.HTTP_POOL_MAX_HOSTS,
+    settings.HTTP_POOL_CONNECTIONS_PER_HOST,
+    settings.HTTP_POOL_IDLE_TIMEOUT)
+
+
+def request(method, url, **kwargs):
+    """
+    Sends an HTTP request through the global pool
+    :param method: HTTP verb
+    :param url: URL of the remote resource
+    :param kwargs: Optional arguments passed to requests
+    :return: The HTTP response
+    """
+    return globalHTTPSessionPool.request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    """
+    Sends a GET request through the global pool
+    """
+    return request('GET', url, **kwargs)
+
+
+def put(url, **kwargs):
+    """
+    Sends a PUT request through the global pool
+    """
+    return request('PUT', url, **kwargs)
+
+
+def post(url, **kwargs):
+    """
+    Sends a POST request through the global pool
+    """
+    return request('POST', url, **kwargs)
+
+
+def delete(url, **kwargs):
+    """
+    Sends a DELETE request through the global pool
+    """
+    return request('DELETE', url, **kwargs)
+
+
+def evict(host, port):
+    """
+    Closes the session of the given remote host and port in the global pool
+    :param host: Remote host
+    :param port: Remote port
+    """
+    globalHTTPSessionPool.evict(host, port)
@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+Node agent running on the rendering hosts. The rendering resource manager launches, stops and
+reads the logs of rendering resources through the agent, without going through a scheduler.
+The agent reports its free CPU and GPU slots, and the exit of the processes it launched.
+
+    GET /slots                          Returns the hostname and the free and total slots
+    POST /processes                     Launches a process described by its id, shell command,
+                                        environment, and number of CPUs and GPUs. The agent
+                                        gives the process a free port in RRM_PORT
+    GET /processes/<id>                 Returns the state and exit code of a process
+    DELETE /processes/<id>              Terminates a process, and kills it if it is still
+                                        running after a delay
+    GET /processes/<id>/log             Returns part of the output (or error, with err=1) of a
+                                        process, given by offset and length, tail (lines) or
+                                        last (bytes)
+    GET /events?since=<n>&wait=<s>      Returns the process exits following event n, waiting
+                                        up to s seconds for one to happen
+
+Every request must carry the token given to the agent in the X-Agent-Token header. The agent
+listens on localhost unless another --address is given. Several agents can run on the same
+host, for instance to test the service on localhost, with distinct port ranges:
+
+    node_agent.py --port 8765 --cpus 8 --gpus 2 --token secret --ports 3000-3499
+    node_agent.py --port 8766 --cpus 8 --gpus 2 --token secret --ports 3500-3999
+"""
+
+import argparse
+import hmac
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from urlparse import urlparse, parse_qs
+
+# Delay after which a terminated process is killed (in seconds)
+KILL_DELAY = 5
+
+# Maximum number of exit events kept by the agent
+MAX_EVENTS = 1000
+
+# Maximum duration of an events request (in seconds)
+MAX_EVENTS_WAIT = 60
+
+# Range of ports handed out to the rendering resources, first and last included
+DEFAULT_PORTS = [3000, 3999]
+
+# Size of the blocks read from the end of a log to find its last lines (in bytes)
+TAIL_BLOCK_SIZE = 65536
+
+# Environment variable giving its port to a rendering resource
+PORT_VARIABLE = 'RRM_PORT'
+
+PROCESS_PATH = re.compile(r'^/processes/([a-zA-Z0-9_\-]+)(/log)?$')
+
+
+class AgentProcess(object):
+    """
+    Process launched by the agent
+    """
+
+    def __init__(self, process_id, popen, cpus, gpus, port, out_file, err_file):
+        """
+        Initialization
+        :param process_id: Id given by the rendering resource manager
+        :param popen: Running process
+        :param cpus: Number of CPUs reserved for the process
+        :param gpus: Indices of the GPUs reserved for the process
+        :param port: Port reserved for the process
+        :param out_file: File receiving the output of the process
+        :param err_file: File receiving the error output of the process
+        """
+        self.id = process_id
+        self.popen = popen
+        self.cpus = cpus
+        self.gpus = gpus
+        self.port = port
+        self.out_file = out_file
+        self.err_file = err_file
+        self.exit_code = None
+        self.killer = None
+
+    def description(self, hostname):
+        """
+        :param hostname: Hostname of the agent
+        :return: A dictionary describing the process
+        """
+        return {
+            'id': self.id,
+            'hostname': hostname,
+            'port': self.port,
+            'pid': self.popen.pid,
+            'running': self.exit_code is None,
+            'exit_code': self.exit_code,
+            'cpus': self.cpus,
+            'gpus': self.gpus
+        }
+
+
+class NodeAgentServer(ThreadingMixIn, HTTPServer):
+    """
+    Node agent serving each request in its own thread
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, cpus, gpus, log_directory, hostname=None, token=None,
+                 ports=None):
+        """
+        Initialization
+        :param address: Host and port on which the agent listens
+        :param cpus: Number of CPUs available for rendering resources
+        :param gpus: Number of GPUs available for rendering resources
+        :param log_directory: Directory receiving the output of the processes
+        :param hostname: Hostname under which the rendering resources are reachable, the fully
+                         qualified name of the host if None
+        :param token: Token expected in the X-Agent-Token header
+        :param ports: First and last port handed out to the rendering resources, DEFAULT_PORTS
+                      if None
+        :raise ValueError: if no token is given, since the agent runs the commands it receives
+        """
+        if not token:
+            raise ValueError('The node agent requires a token')
+        HTTPServer.__init__(self, address, NodeAgentHandler)
+        self.hostname = hostname or socket.getfqdn()
+        self.token = token
+        self.ports = ports or DEFAULT_PORTS
+        self.total_cpus = cpus
+        self.total_gpus = gpus
+        self.log_directory = log_directory
+        self._condition = threading.Condition()
+        self._free_cpus = cpus
+        self._free_gpus = range(gpus)
+        self._processes = dict()
+        self._events = list()
+        self._sequence = 0
+
+    def slots(self):
+        """
+        :return: A dictionary containing the hostname and the free and total slots
+        """
+        with self._condition:
+            return {
+                'hostname': self.hostname,
+                'free_cpus': self._free_cpus,
+                'free_gpus': len(self._free_gpus),
+                'total_cpus': self.total_cpus,
+                'total_gpus': self.total_gpus,
+                'running': len([p for p in self._processes.values() if p.exit_code is None])
+            }
+
+    def _free_port(self):
+        """
+        Finds a port that is neither reserved for a running process nor used by another program.
+        Must be called with the condition locked
+        :return: The port, or None if all ports of the range are used
+        """
+        reserved = [p.port for p in self._processes.values() if p.exit_code is None]
+        for port in range(self.ports[0], self.ports[1] + 1):
+            if port in reserved:
+                continue
+            probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                probe.bind(('', port))
+                return port
+            except socket.error:
+                continue
+            finally:
+                probe.close()
+        return None
+
+    def launch(self, description):
+        """
+        Launches a process if enough slots are free. The process is given a free port in the
+        RRM_PORT environment variable
+        :param description: Dictionary containing the id, command, environment, and number of
+                            CPUs and GPUs of the process
+        :return: The HTTP code and the description of the process or of the error
+        """
+        process_id = str(description['id'])
+        cpus = int(description.get('cpus', 0))
+        gpus = int(description.get('gpus', 0))
+        with self._condition:
+            existing = self._processes.get(process_id)
+            if existing is not None and existing.exit_code is None:
+                return [409, {'contents': 'Process ' + process_id + ' is already running'}]
+            if cpus > self._free_cpus or gpus > len(self._free_gpus):
+                return [409, {'contents': 'Not enough free slots'}]
+            port = self._free_port()
+            if port is None:
+                return [409, {'contents': 'No free port'}]
+            environment = dict(os.environ)
+            environment.update(description.get('environment', dict()))
+            environment[PORT_VARIABLE] = str(port)
+            reserved_gpus = self._free_gpus[:gpus]
+            if gpus > 0:
+                environment['CUDA_VISIBLE_DEVICES'] = ','.join([str(g) for g in reserved_gpus])
+            out_file = os.path.join(self.log_directory, process_id + '.out')
+            err_file = os.path.join(self.log_directory, process_id + '.err')
+            with open(out_file, 'w') as out, open(err_file, 'w') as err:
+                # The process leads its own group so that its children are terminated with it
+                popen = subprocess.Popen(
+                    ['/bin/bash', '-c', description['command']], stdout=out, stderr=err,
+                    env=environment, preexec_fn=os.setsid, close_fds=True)
+            process = AgentProcess(
+                process_id, popen, cpus, reserved_gpus, port, out_file, err_file)
+            self._free_cpus -= cpus
+            self._free_gpus = self._free_gpus[gpus:]
+            self._processes[process_id] = process
+        monitor = threading.Thread(target=self._monitor, args=(process,))
+        monitor.daemon = True
+        monitor.start()
+        return [200, process.description(self.hostname)]
+
+    def _monitor(self, process):
+        """
+        Waits for the exit of a process, releases its slots and publishes the exit event
+        :param process: Process launched by the agent
+        """
+        exit_code = process.popen.wait()
+        with self._condition:
+            process.exit_code = exit_code
+            if process.killer is not None:
+                process.killer.cancel()
+            self._free_cpus += process.cpus
+            self._free_gpus = sorted(self._free_gpus + process.gpus)
+            self._sequence += 1
+            self._events.append({
+                'sequence': self._sequence, 'id': process.id, 'exit_code': exit_code})
+            del self._events[:-MAX_EVENTS]
+            self._condition.notify_all()
+
+    def process(self, process_id):
+        """
+        :param process_id: Id of the process
+        :return: The process, or None if it does not exist
+        """
+        with self._condition:
+            return self._processes.get(process_id)
+
+    def terminate(self, process_id):
+        """
+        Terminates a process, and kills it if it is still running after a delay
+        :param process_id: Id of the process
+        :return: True if the process exists
+        """
+        process = self.process(process_id)
+        if process is None:
+            return False
+        if process.exit_code is None:
+            self._signal(process, signal.SIGTERM)
+            with self._condition:
+                if process.killer is None and process.exit_code is None:
+                    process.killer = threading.Timer(
+                        KILL_DELAY, self._signal, args=(process, signal.SIGKILL))
+                    process.killer.daemon = True
+                    process.killer.start()
+        return True
+
+    @staticmethod
+    def _signal(process, signum):
+        """
+        Sends a signal to the process group of a running process
+        :param process: Process launched by the agent
+        :param signum: Signal to be sent
+        """
+        if process.popen.poll() is None:
+            try:
+                os.killpg(process.popen.pid, signum)
+            except OSError:
+                pass
+
+    def events(self, since, wait):
+        """
+        Returns the exit events following the given one, waiting for one to happen if needed
+        :param since: Sequence number of the last event known by the caller
+        :param wait: Maximum waiting time (in seconds)
+        :return: A dictionary containing the events and the sequence number of the last one
+        """
+        deadline = time.time() + min(wait, MAX_EVENTS_WAIT)
+        with self._condition:
+            while self._sequence <= since and time.time() < deadline:
+                self._condition.wait(deadline - time.time())
+            if since > self._sequence:
+                # The agent restarted, all events are new to the caller
+                since = 0
+            return {
+                'events': [event for event in self._events if event['sequence'] > since],
+                'sequence': self._sequence
+            }
+
+
+def read_log(filename, parameters):
+    """
+    Reads part of a log file. Only the requested part of the file is read
+    :param filename: Name of the log file
+    :param parameters: Query parameters: offset and length, tail (lines) or last (bytes)
+    :return: The requested contents and the offset following them
+    """
+    with open(filename, 'rb') as log_file:
+        size = os.fstat(log_file.fileno()).st_size
+        if 'tail' in parameters:
+            tail = int(parameters['tail'])
+            if tail <= 0:
+                return ['', size]
+            # Blocks are read from the end of the file until enough lines are found
+            start = size
+            contents = ''
+            while start > 0 and contents.count('\n') <= tail:
+                start = max(0, start - TAIL_BLOCK_SIZE)
+                log_file.seek(start)
+                contents = log_file.read(size - start)
+            return [''.join(contents.splitlines(True)[-tail:]), size]
+        if 'last' in parameters:
+            offset = max(0, size - int(parameters['last']))
+            length = size - offset
+        else:
+            offset = int(parameters.get('offset', 0))
+            if offset > size:
+                return ['', size]
+            length = size - offset
+            if 'length' in parameters:
+                length = min(length, int(parameters['length']))
+        if offset < 0 or length < 0:
+            raise ValueError('Invalid range')
+        log_file.seek(offset)
+        contents = log_file.read(length)
+    return [contents, offset + len(contents)]
+
+
+class NodeAgentHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests sent to the node agent
+    """
+
+    def log_message(self, *args):
+        """
+        Requests are not logged
+        """
+        pass
+
+    def _reply(self, code, contents):
+        """
+        Sends a JSON response
+        :param code: HTTP code
+        :param contents: Dictionary sent as the JSON body of the response
+        """
+        body = json.dumps(contents)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        """
+        :return: True if the request carries the expected token, otherwise an error is sent
+        """
+        token = self.headers.getheader('X-Agent-Token') or ''
+        if hmac.compare_digest(str(token), str(self.server.token)):
+            return True
+        self._reply(401, {'contents': 'Invalid token'})
+        return False
+
+    def _parse(self):
+        """
+        :return: The path of the request and its query parameters
+        """
+        url = urlparse(self.path)
+        parameters = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+        return [url.path, parameters]
+
+    # pylint: disable=C0103
+    def do_GET(self):
+        """
+        Returns the slots, the state or log of a process, or the exit events
+        """
+        if not self._authorized():
+            return
+        path, parameters = self._parse()
+        try:
+            if path == '/slots':
+                self._reply(200, self.server.slots())
+                return
+            if path == '/events':
+                self._reply(200, self.server.events(
+                    int(parameters.get('since', 0)), float(parameters.get('wait', 0))))
+                return
+            match = PROCESS_PATH.match(path)
+            process = None if match is None else self.server.process(match.group(1))
+            if process is None:
+                self._reply(404, {'contents': 'Unknown process'})
+                return
+            if match.group(2) is None:
+                self._reply(200, process.description(self.server.hostname))
+                return
+            filename = process.err_file if parameters.get('err') in ['1', 'true'] \
+                else process.out_file
+            contents, offset = read_log(filename, parameters)
+            self._reply(200, {'contents': contents.decode('utf-8', 'replace'), 'offset': offset})
+        except (ValueError, IOError) as e:
+            self._reply(400, {'contents': str(e)})
+
+    # pylint: disable=C0103
+    def do_POST(self):
+        """
+        Launches a process
+        """
+        if not self._authorized():
+            return
+        if self._parse()[0] != '/processes':
+            self._reply(404, {'contents': 'Unknown path'})
+            return
+        try:
+            length = int(self.headers.getheader('Content-Length', 0))
+            description = json.loads(self.rfile.read(length))
+            if not PROCESS_PATH.match('/processes/' + str(description['id'])):
+                raise ValueError('Invalid process id')
+            status = self.server.launch(description)
+        except (ValueError, KeyError, OSError) as e:
+            status = [400, {'contents': str(e)}]
+        self._reply(status[0], status[1])
+
+    # pylint: disable=C0103
+    def do_DELETE(self):
+        """
+        Terminates a process
+        """
+        if not self._authorized():
+            return
+        match = PROCESS_PATH.match(self._parse()[0])
+        if match is None or match.group(2) is not None or \
+                not self.server.terminate(match.group(1)):
+            self._reply(404, {'contents': 'Unknown process'})
+            return
+        self._reply(200, {'contents': 'Process terminated'})
+
+
+def main(args):
+    """
+    Runs the node agent until it is interrupted
+    :param args: Command line arguments
+    :return: Exit code
+    """
+    parser = argparse.ArgumentParser(description='Rendering resource manager node agent')
+    parser.add_argument('--address', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--cpus', type=int, default=1, help='CPUs available for rendering')
+    parser.add_argument('--gpus', type=int, default=0, help='GPUs available for rendering')
+    parser.add_argument('--hostname', help='Hostname advertised to the service')
+    parser.add_argument('--token', required=True, help='Token expected from the service')
+    parser.add_argument('--ports', default='%d-%d' % tuple(DEFAULT_PORTS),
+                        help='Range of ports handed out to the rendering resources')
+    parser.add_argument('--log-directory', help='Directory receiving the process outputs')
+    options = parser.parse_args(args)
+    ports = [int(port) for port in options.ports.split('-')]
+    log_directory = options.log_directory or tempfile.mkdtemp(prefix='rrm_agent_')
+    if not os.path.isdir(log_directory):
+        os.makedirs(log_directory)
+    server = NodeAgentServer(
+        (options.address, options.port), options.cpus, options.gpus, log_directory,
+        options.hostname, options.token, ports)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if options.log_directory is None:
+            shutil.rmtree(log_directory, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
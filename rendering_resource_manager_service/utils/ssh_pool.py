@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2014-2017, Human Brain Project
+#                          Cyrille Favreau <cyrille.favreau@epfl.ch>
+#
+# This file is part of RenderingResourceManager
+# <https://github.com/BlueBrain/RenderingResourceManager>
+#
+# This library is free software; you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License version 3.0 as published
+# by the Free Software Foundation.
+#
+# This library is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this library; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# All rights reserved. Do not distribute without further notice.
+
+
+"""
+This module provides a pool of persistent SSH connections, one per cluster node. Each
+connection is an OpenSSH master connection, and commands are multiplexed over its control
+socket, so that they do not pay for a new SSH handshake. Master connections that die are
+restarted when the next command is run.
+
+The pool is meant for short request/response commands. Each multiplexed command holds a session
+of the master connection until it completes, and is torn down with it, so long-running commands
+such as rendering resource launches are started over dedicated connections instead.
+"""
+
+import os
+import subprocess
+import time
+from threading import Lock
+
+import rendering_resource_manager_service.utils.custom_logging as log
+import rendering_resource_manager_service.service.settings as settings
+
+
+# Exit code of the ssh client when the connection itself failed
+SSH_CONNECTION_ERROR = 255
+
+
+class SSHConnectionPool(object):
+    """
+    Pool of multiplexed SSH connections indexed by cluster node
+    """
+
+    def __init__(self, ssh_command, username, key, control_dir, connect_timeout):
+        """
+        Initialization
+        :param ssh_command: List containing the ssh client executable and its arguments
+        :param username: User name on the cluster nodes
+        :param key: Path of the private key used for authentication
+        :param control_dir: Directory holding the control sockets of the master connections
+        :param connect_timeout: Maximum time to establish a master connection (in seconds)
+        """
+        self._mutex = Lock()
+        self._host_mutexes = dict()
+        self._masters = dict()
+        self._ssh_command = ssh_command
+        self._username = username
+        self._key = key
+        self._control_dir = control_dir
+        self._connect_timeout = connect_timeout
+
+    def control_path(self, host):
+        """
+        :param host: Cluster node
+        :return: Path of the control socket of the master connection to the cluster node
+        """
+        return os.path.join(self._control_dir, self._username + '@' + host)
+
+    def _command(self, host, *args):
+        """
+        :param host: Cluster node
+        :param args: Additional ssh arguments
+        :return: The ssh command line using the control socket of the cluster node
+        """
+        return self._ssh_command + [
+            '-i', self._key,
+            '-o', 'BatchMode=yes',
+            '-o', 'ControlPath=' + self.control_path(host)] + \
+            list(args) + [self._username + '@' + host]
+
+    def _host_mutex(self, host):
+        """
+        :param host: Cluster node
+        :return: The lock serializing the creation of the master connection to the cluster node
+        """
+        with self._mutex:
+            return self._host_mutexes.setdefault(host, Lock())
+
+    def _is_listening(self, host):
+        """
+        :param host: Cluster node
+        :return: True if the master connection accepts commands
+        """
+        process = subprocess.Popen(
+            self._command(host, '-O', 'check'),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process.communicate()
+        return process.returncode == 0
+
+    def connect(self, host):
+        """
+        Makes sure that a master connection to the given cluster node is running, restarting
+        it if it died
+        :param host: Cluster node
+        :return: True if the master connection accepts commands
+        """
+        with self._host_mutex(host):
+            master = self._masters.get(host)
+            if master is not None and master.poll() is None:
+                return True
+            if master is not None:
+                log.info(1, 'SSH master connection to ' + host + ' died with code ' +
+                         str(master.returncode) + ', restarting it')
+            if not os.path.exists(self._control_dir):
+                os.makedirs(self._control_dir, 0700)
+            log.info(1, 'Opening SSH master connection to ' + host)
+            master = subprocess.Popen(
+                self._command(host, '-M', '-N', '-o', 'ControlPersist=no'),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._masters[host] = master
+            deadline = time.time() + self._connect_timeout
+            while time.time() < deadline and master.poll() is None:
+                if self._is_listening(host):
+                    return True
+                time.sleep(0.1)
+            log.error('Failed to open SSH master connection to ' + host)
+            return False
+
+    def spawn(self, host, command):
+        """
+        Starts a command on the given cluster node without waiting for its completion
+        :param host: Cluster node
+        :param command: Command to be executed on the cluster node
+        :return: The ssh process
+        """
+        # Without a master connection, ssh falls back to a direct connection
+        self.connect(host)
+        return subprocess.Popen(
+            self._command(host, '-o', 'ControlMaster=no') + [command],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def spawn_detached(self, host, command):
+        """
+        Starts a long-running command on the given cluster node over a dedicated connection,
+        bypassing the master connection. The command does not hold one of its sessions, and
+        survives it being restarted or closed
+        :param host: Cluster node
+        :param command: Command to be executed on the cluster node
+        :return: The ssh process
+        """
+        return subprocess.Popen(
+            self._ssh_command + [
+                '-i', self._key,
+                '-o', 'BatchMode=yes',
+                '-o', 'ControlPath=none',
+                '-o', 'ConnectTimeout=' + str(self._connect_timeout),
+                self._username + '@' + host, command],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def run(self, host, command, input_data=None):
+        """
+        Runs a command on the given cluster node. The command is run once more if the master
+        connection died while it was running
+        :param host: Cluster node
+        :param command: Command to be executed on the cluster node
+        :param input_data: Data written to the standard input of the command, keeping it out of
+               the command line
+        :return: A list containing the exit code, the output and the error output of the command
+        """
+        for _ in range(2):
+            process = self.spawn(host, command)
+            output, error = process.communicate(input_data)
+            master = self._masters.get(host)
+            if process.returncode != SSH_CONNECTION_ERROR or \
+                    master is None or master.poll() is None:
+                break
+        return [process.returncode, output, error]
+
+    def close(self, host):
+        """
+        Closes the master connection to the given cluster node
+        :param host: Cluster node
+        """
+        with self._host_mutex(host):
+            master = self._masters.pop(host, None)
+            if master is not None and master.poll() is None:
+                master.terminate()
+                master.communicate()
+
+    def close_all(self):
+        """
+        Closes all master connections
+        """
+        with self._mutex:
+            hosts = self._masters.keys()
+        for host in hosts:
+            self.close(host)
+
+    def size(self):
+        """
+        :return: The number of running master connections
+        """
+        with self._mutex:
+            return len([master for master in self._masters.values() if master.poll() is None])
+
+
+# Global pool used for all commands run on the cluster nodes
+globalSSHConnectionPool = SSHConnectionPool(
+    [settings.SLURM_SSH_BINARY],
+    settings.SLURM_USERNAME,
+    settings.SLURM_SSH_KEY,
+    settings.SLURM_SSH_CONTROL_DIR,
+    settings.SLURM_SSH_CONNECT_TIMEOUT)
+
+
+def run(host, command, input_data=None):
+    """
+    Runs a command on the given cluster node through the global pool
+    :param host: Cluster node
+    :param command: Command to be executed on the cluster node
+    :param input_data: Data written to the standard input of the command
+    :return: A list containing the exit code, the output and the error output of the command
+    """
+    if input_data is None:
+        return globalSSHConnectionPool.run(host, command)
+    return globalSSHConnectionPool.run(host, command, input_data)
+
+
+def spawn(host, command):
+    """
+    Starts a command on the given cluster node through the global pool
+    :param host: Cluster node
+    :param command: Command to be executed on the cluster node
+    :return: The ssh process
+    """
+    return globalSSHConnectionPool.spawn(host, command)
+
+
+def spawn_detached(host, command):
+    """
+    Starts a long-running command on the given cluster node over a dedicated connection
+    :param host: Cluster node
+    :param command: Command to be executed on the cluster node
+    :return: The ssh process
+    """
+    return globalSSHConnectionPool.spawn_detached(host, command)
@@ -26,6 +26,12 @@
 This module provides various utility functions
 """
 
+import hmac
+import hashlib
+from wsgiref.util import is_hop_by_hop
+
+import rendering_resource_manager_service.service.settings as settings
+
 
 def get_request_headers(request):
     """
@@ -44,3 +50,146 @@ def get_request_headers(request):
                     if k.startswith("HTTP_")])
     headers["Cookie"] = "; ".join([k + "=" + v for k, v in request.COOKIES.items()])
     return headers
+
+
+def filter_hop_by_hop_headers(headers):
+    """
+    Removes the hop-by-hop headers, including the ones listed in the Connection header, from
+    the given headers. Those headers only apply to a single connection and must not be
+    forwarded by a proxy
+    :param headers: Dictionary of header values
+    :return: Dictionary of end-to-end header values
+    """
+    connection_headers = list()
+    for name, value in headers.items():
+        if name.lower() == 'connection':
+            connection_headers = [header.strip().lower() for header in value.split(',')]
+    return dict([(name, value) for name, value in headers.items()
+                 if not is_hop_by_hop(name) and name.lower() not in connection_headers])
+
+
+def sign(value):
+    """
+    Signs the given value with the secret key of the service, so that it can be handed over
+    to a third party and verified when it comes back
+    :param value: Value to be signed
+    :return: The hexadecimal signature of the value
+    """
+    return hmac.new(settings.SECRET_KEY, str(value), hashlib.sha256).hexdigest()
+
+
+def verify_signature(value, signature):
+    """
+    :param value: Signed value
+    :param signature: Signature to be verified
+    :return: True if the signature matches the value
+    """
+    return hmac.compare_digest(sign(value), str(signature))
+
+
+def job_token(session_id, job_id):
+    """
+    :param session_id: Id of the session
+    :param job_id: Id of the job launching the rendering resource of the session
+    :return: The token allowing the job, and only this job, to report on the session
+    """
+    return sign(job_token_value(session_id, job_id))
+
+
+def verify_job_token(session_id, job_id, token):
+    """
+    :param session_id: Id of the session
+    :param job_id: Id of the job launching the rendering resource of the session
+    :param token: Token reported by the job
+    :return: True if the token was issued for the given session and job
+    """
+    return verify_signature(job_token_value(session_id, job_id), token)
+
+
+def job_token_value(session_id, job_id):
+    """
+    :param session_id: Id of the session
+    :param job_id: Id of the job
+    :return: The value signed in the token of the job
+    """
+    return str(session_id) + ':' + str(job_id)
+
+
+class RequestBodyStream(object):
+    """
+    File-like wrapper around the body of an incoming HTTP request, allowing the body to be
+    forwarded in chunks without being loaded in memory
+    """
+
+    def __init__(self, request, length, chunk_size):
+        """
+        Initialization
+        :param request: Incoming HTTP request
+        :param length: Length of the request body
+        :param chunk_size: Size of the chunks read from the request
+        """
+        self._request = request
+        self._length = length
+        self._chunk_size = chunk_size
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self._chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def read(self, size=-1):
+        """
+        Reads the next chunk of the request body
+        :param size: Maximum number of bytes to read
+        :return: The next chunk, or an empty string when the body has been fully read
+        """
+        if size is None or size < 0:
+            size = self._chunk_size
+        return self._request.read(size)
+
+
+class ClosingIterator(object):
+    """
+    Iterator calling a function once the wrapped iterator is exhausted or closed, typically to
+    release a resource held by a streaming response. Unlike the finally clause of a generator,
+    the function is also called when the response is closed before being iterated
+    """
+
+    def __init__(self, iterable, on_close):
+        """
+        Initialization
+        :param iterable: Wrapped iterable
+        :param on_close: Function called once, without arguments
+        """
+        self._iterator = iter(iterable)
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """
+        :return: The next item of the wrapped iterator
+        """
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Closes the wrapped iterator, and calls the function if it was not called yet
+        """
+        on_close, self._on_close = self._on_close, None
+        try:
+            if hasattr(self._iterator, 'close'):
+                self._iterator.close()
+        finally:
+            if on_close is not None:
+                on_close()